@@ -39,6 +39,23 @@ MODEL_TEMPERATURE = 0.1  # 溫度: 0.0-1.0，越低越保守，SQL 生成建議
 MODEL_TOP_P = 0.9  # Top-p 採樣: 0.0-1.0
 MODEL_MAX_TOKENS = 512  # 最大生成 token 數
 
+# Prefix KV 快取：系統指令 + schema 的 past-key-values 只計算一次並重複使用（僅本地模型）
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "true").lower() == "true"
+PREFIX_CACHE_MAX_ENTRIES = int(os.getenv("PREFIX_CACHE_MAX_ENTRIES", "4"))
+
+# 微批次：同時到達的請求合併成一次 model.generate（僅本地模型）
+# 第一個請求到達後最多等待 LOCAL_BATCH_MAX_WAIT_MS 收集更多請求
+LOCAL_BATCH_MAX_SIZE = int(os.getenv("LOCAL_BATCH_MAX_SIZE", "8"))
+LOCAL_BATCH_MAX_WAIT_MS = float(os.getenv("LOCAL_BATCH_MAX_WAIT_MS", "20"))
+
+# 停止序列：輸出 ```sql 區塊的結束 fence 後立即停止生成，避免模型在 SQL 之後繼續輸出
+# 本地模型另外在 SQL 區塊中頂層的 ; 之後停止；雲端模型對應到各自原生的 stop 參數
+MODEL_STOP_AT_SQL_END = os.getenv("MODEL_STOP_AT_SQL_END", "true").lower() == "true"
+MODEL_STOP_SEQUENCES = ["\n```\n"] if MODEL_STOP_AT_SQL_END else []
+
+# 語法約束解碼：遮蔽 logits，使本地模型只能輸出 schema 內表格/欄位組成的 MySQL SELECT
+LOCAL_CONSTRAINED_DECODING = os.getenv("LOCAL_CONSTRAINED_DECODING", "false").lower() == "true"
+
 # 允許透過環境變數覆蓋（可選）
 MODEL_NAME = os.getenv("MODEL_NAME", MODEL_NAME)
 MODEL_DEVICE = os.getenv("MODEL_DEVICE", MODEL_DEVICE)
@@ -50,7 +67,7 @@ MODEL_TOP_P = float(os.getenv("MODEL_TOP_P", str(MODEL_TOP_P)))
 # v1.3.0+ Provider 設定 (Multi-Provider Support)
 # ============================================================================
 
-# Provider 選擇: "local", "bedrock", "genai"
+# Provider 選擇: "local", "bedrock", "genai", "fallback"
 MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "local")
 
 # AWS Bedrock 設定 (需要安裝: pip install boto3 botocore)
@@ -63,22 +80,82 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
 GENAI_MODEL_NAME = os.getenv("GENAI_MODEL_NAME", "gemini-2.5-flash")
 GOOGLE_API_KEY = os.getenv("GCP_API_KEY", "")
 
-# 重試機制設定 (需要安裝: pip install tenacity)
-RETRY_ENABLED = True
-RETRY_MAX_ATTEMPTS = 3
-RETRY_INITIAL_DELAY = 1.0  # 秒
-RETRY_MAX_DELAY = 10.0  # 秒
+# 多 Provider 備援（provider="fallback"）：依序使用，以 ">" 分隔，每項為 "provider" 或 "provider:model_id"
+MODEL_FALLBACK_CHAIN = os.getenv("MODEL_FALLBACK_CHAIN", "genai>bedrock>local")
+# Hedged request：目前的 provider 超過其首 token 延遲的第 N 百分位仍未輸出時，同時送出下一個
+# provider，採用先完成者並取消另一個；出錯時直接改用下一個
+MODEL_HEDGE_ENABLED = os.getenv("MODEL_HEDGE_ENABLED", "true").lower() == "true"
+MODEL_HEDGE_PERCENTILE = float(os.getenv("MODEL_HEDGE_PERCENTILE", "95"))
+MODEL_HEDGE_DEFAULT_DELAY = float(os.getenv("MODEL_HEDGE_DEFAULT_DELAY", "2.0"))  # 樣本不足時（秒）
+MODEL_HEDGE_MIN_SAMPLES = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20"))
+
+# 重試機制設定：Bedrock / GenAI 的暫時性錯誤（429、5xx、逾時、連線中斷）以指數退避重試
+# 串流在已輸出 token 後不再重試
+RETRY_ENABLED = os.getenv("RETRY_ENABLED", "true").lower() == "true"
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_INITIAL_DELAY = float(os.getenv("RETRY_INITIAL_DELAY", "1.0"))  # 秒
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "10.0"))  # 秒
 RETRY_EXPONENTIAL_BASE = 2
-RETRY_JITTER = True  # 隨機抖動
+RETRY_JITTER = True  # 隨機抖動（full jitter）
+
+# 斷路器：同一 provider 連續失敗達門檻後直接失敗，經過 RESET 秒再放行一個探測請求
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+
+# 用戶端限流：每個 provider 的每分鐘請求數 / token 數與同時進行的請求上限（0 = 不限制）
+# 超過時排隊等待（先到先服務）而不是直接失敗
+BEDROCK_REQUESTS_PER_MINUTE = float(os.getenv("BEDROCK_REQUESTS_PER_MINUTE", "0"))
+BEDROCK_TOKENS_PER_MINUTE = float(os.getenv("BEDROCK_TOKENS_PER_MINUTE", "0"))
+BEDROCK_MAX_IN_FLIGHT = int(os.getenv("BEDROCK_MAX_IN_FLIGHT", "0"))
+GENAI_REQUESTS_PER_MINUTE = float(os.getenv("GENAI_REQUESTS_PER_MINUTE", "0"))
+GENAI_TOKENS_PER_MINUTE = float(os.getenv("GENAI_TOKENS_PER_MINUTE", "0"))
+GENAI_MAX_IN_FLIGHT = int(os.getenv("GENAI_MAX_IN_FLIGHT", "0"))
+# 多個 worker 共用配額時指定同一個 SQLite 檔案（空字串 = 各 process 各自計算）
+RATE_LIMIT_SHARED_PATH = os.getenv("RATE_LIMIT_SHARED_PATH", "")
 
 # 超時設定
-REQUEST_TIMEOUT = 30  # 秒
-GENERATION_TIMEOUT = 60  # 秒
+REQUEST_TIMEOUT = 30  # 秒（單次 API 呼叫，不超過 GENERATION_TIMEOUT 的剩餘時間）
+GENERATION_TIMEOUT = float(os.getenv("GENERATION_TIMEOUT", "60"))  # 秒（含重試的整體上限）
 
 # 驗證設make
 VALIDATE_SQL_OUTPUT = True
 AUTO_RETRY_ON_VALIDATION_FAILURE = True
 
+# Self-consistency：自動執行時先以不同溫度同時產生多個候選 SQL，各自執行（限制列數）後
+# 以結果多數決選出答案；全部失敗時才進入逐次重試
+SELF_CONSISTENCY_ENABLED = os.getenv("SELF_CONSISTENCY_ENABLED", "false").lower() == "true"
+SELF_CONSISTENCY_CANDIDATES = int(os.getenv("SELF_CONSISTENCY_CANDIDATES", "5"))
+# 候選溫度由 MODEL_TEMPERATURE 平均遞增到此值
+SELF_CONSISTENCY_MAX_TEMPERATURE = float(os.getenv("SELF_CONSISTENCY_MAX_TEMPERATURE", "0.8"))
+# 同時進行的模型呼叫與查詢總數上限
+SELF_CONSISTENCY_CONCURRENCY = int(os.getenv("SELF_CONSISTENCY_CONCURRENCY", "4"))
+# 投票時每個候選查詢最多讀取的列數
+SELF_CONSISTENCY_ROW_LIMIT = int(os.getenv("SELF_CONSISTENCY_ROW_LIMIT", "1000"))
+
+
+# ============================================================================
+# 模型註冊表設定 (Model Registry Configuration)
+# ============================================================================
+
+# 已初始化模型的記憶體預算（MB），超過時以 LRU 淘汰閒置模型
+MODEL_REGISTRY_MEMORY_BUDGET_MB = int(os.getenv("MODEL_REGISTRY_MEMORY_BUDGET_MB", "8192"))
+
+# 啟動時預先載入的模型，以逗號分隔，格式為 "provider" 或 "provider:model_id"
+# 例如: "local" 或 "local,genai:gemini-2.5-flash"
+MODEL_PRELOAD = [spec.strip() for spec in os.getenv("MODEL_PRELOAD", "").split(",") if spec.strip()]
+
+
+# ============================================================================
+# 非同步執行設定 (Async Execution Configuration)
+# ============================================================================
+
+# 專用執行緒池大小：阻塞的模型呼叫與資料庫查詢在此執行，不佔用 event loop
+MODEL_EXECUTOR_WORKERS = int(os.getenv("MODEL_EXECUTOR_WORKERS", "32"))
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", os.getenv("DB_POOL_MAX_SIZE", "10")))
+
+# 串流橋接緩衝：生成執行緒最多領先 event loop 的 token 數（超過時生成執行緒等待）
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "64"))
+
 
 # ============================================================================
 # 資料庫設定 (Database Configuration)
@@ -99,6 +176,29 @@ class DatabaseConfig:
     ssl_key: str = os.getenv("DB_SSL_KEY", str(BASE_DIR / "server-cert" / "client-key.pem"))
     charset: str = "utf8mb4"
 
+    # 連線池設定
+    pool_min_size: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    pool_max_size: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # 等待可用連線的秒數
+    pool_idle_timeout: float = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))  # 閒置回收秒數
+    pool_max_lifetime: float = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))  # 連線最長壽命
+    pool_health_check_interval: float = float(
+        os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "5")
+    )  # 閒置超過此秒數的連線在借出前先 ping
+
+    # 串流查詢設定（/api/execute/stream，使用 server-side cursor 分批送出）
+    stream_chunk_size: int = int(os.getenv("DB_STREAM_CHUNK_SIZE", "1000"))  # 每批列數
+    stream_max_rows: int = int(os.getenv("DB_STREAM_MAX_ROWS", "1000000"))  # 單次串流列數上限
+    # 同時進行的串流查詢／匯出上限（各佔一條連線與一個專用執行緒，超過時回 503）
+    stream_max_concurrent: int = int(os.getenv("DB_STREAM_MAX_CONCURRENT", "4"))
+    # Arrow/Parquet 匯出每個 record batch（Parquet row group）的列數（需安裝 pyarrow）
+    arrow_batch_size: int = int(os.getenv("DB_ARROW_BATCH_SIZE", "65536"))
+
+    # 非串流查詢（/api/execute、自動執行、CLI）讀取結果的硬上限：以 server-side cursor 邊讀邊計，
+    # 超過即停止讀取並標記 truncated，避免沒有 LIMIT 的查詢把整個結果集載入記憶體
+    result_max_rows: int = int(os.getenv("DB_RESULT_MAX_ROWS", "100000"))
+    result_max_bytes: int = int(os.getenv("DB_RESULT_MAX_BYTES", str(64 * 1024 * 1024)))
+
 
 DB_CONFIG = DatabaseConfig()
 
@@ -110,6 +210,36 @@ DB_CONFIG = DatabaseConfig()
 # SQL 格式化設定
 SQL_FORMAT_REINDENT = True  # 是否重新縮排
 SQL_FORMAT_KEYWORD_CASE = "upper"  # 關鍵字大小寫: "upper", "lower", "capitalize"
+# false = 不格式化（只擷取 SQL，完全略過 sqlparse），適合只執行或比對 SQL 的程式使用
+SQL_FORMAT_OUTPUT = os.getenv("SQL_FORMAT_OUTPUT", "true").lower() == "true"
+SQL_PARSER_CACHE_SIZE = int(os.getenv("SQL_PARSER_CACHE_SIZE", "512"))  # clean_sql 結果快取筆數
+
+# 自動 LIMIT：執行前在最外層 SELECT 加上（或收緊）LIMIT，各入口分別設定；0 = 不加。
+# 呼叫端要求完整結果（/api/execute 與 /api/auto-execute 的 full_results）時略過，仍受 DB_RESULT_MAX_* 限制
+SQL_AUTO_LIMIT_EXECUTE = int(os.getenv("SQL_AUTO_LIMIT_EXECUTE", "1000"))  # /api/execute
+SQL_AUTO_LIMIT_AUTO_EXECUTE = int(
+    os.getenv("SQL_AUTO_LIMIT_AUTO_EXECUTE", "1000")
+)  # /api/auto-execute
+SQL_AUTO_LIMIT_CLI = int(os.getenv("SQL_AUTO_LIMIT_CLI", "100"))  # src/main.py 互動介面
+
+# 靜態檢查：執行前以 schema 檢查表格/別名/欄位與 GROUP BY（ONLY_FULL_GROUP_BY），
+# 不需連線資料庫即可將錯誤回饋給重試 prompt
+SQL_STATIC_VALIDATION = os.getenv("SQL_STATIC_VALIDATION", "true").lower() == "true"
+# 檢查用 schema 來源："config"（FULL_SCHEMA）或 "database"（啟動後第一次使用時讀取 information_schema）
+SQL_VALIDATION_SCHEMA_SOURCE = os.getenv("SQL_VALIDATION_SCHEMA_SOURCE", "config")
+
+# 成本檢查：執行前以 EXPLAIN FORMAT=JSON 估算成本，超出預算的查詢拒絕（原因回饋重試 prompt）或降級執行
+SQL_COST_GUARD_ENABLED = os.getenv("SQL_COST_GUARD_ENABLED", "true").lower() == "true"
+# 帶過濾條件的全表/全索引掃描可檢查的估計列數上限（無法使用索引的條件，0 = 不限）
+SQL_COST_MAX_SCAN_ROWS = int(os.getenv("SQL_COST_MAX_SCAN_ROWS", "1000000"))
+SQL_COST_MAX_QUERY_COST = float(
+    os.getenv("SQL_COST_MAX_QUERY_COST", "0")
+)  # query_cost 上限（0 = 不限）
+# 超出預算時的處理："reject"（拒絕）或 "downgrade"（加上 MAX_EXECUTION_TIME 後照常執行）
+SQL_COST_GUARD_ACTION = os.getenv("SQL_COST_GUARD_ACTION", "reject")
+SQL_COST_DOWNGRADE_TIMEOUT_MS = int(os.getenv("SQL_COST_DOWNGRADE_TIMEOUT_MS", "30000"))
+SQL_COST_PLAN_CACHE_SIZE = 1024  # 依 SQL 指紋快取的執行計畫數
+SQL_COST_PLAN_CACHE_TTL = float(os.getenv("SQL_COST_PLAN_CACHE_TTL", "600"))  # 執行計畫快取秒數
 
 # SQL 驗證設定
 VALID_SQL_TYPES = [
@@ -196,6 +326,21 @@ FULL_SCHEMA = f"""{TENCENT_BILL_SCHEMA}
 {GLOBAL_BILL_L3_SCHEMA}
 """
 
+# 送給模型的 schema 格式："original"（原始 DDL）、"ddl"（精簡 DDL，去除 charset/collate/engine/default）
+# "compact"（每張表一行）、"json"；可用 tools/schema_token_report.py 比較各格式的 token 數
+SCHEMA_FORMAT = os.getenv("SCHEMA_FORMAT", "original")
+
+# Schema linking：依問題只保留相關的表格/欄位（含 PK/UK），以精簡後的 DDL 送給模型
+SCHEMA_LINKING_ENABLED = os.getenv("SCHEMA_LINKING_ENABLED", "false").lower() == "true"
+# 語意比對：""（僅字詞比對）、"hashing"（內建字元 n-gram）或 sentence-transformers 模型名稱
+SCHEMA_LINKING_EMBEDDER = os.getenv("SCHEMA_LINKING_EMBEDDER", "")
+SCHEMA_LINKING_MAX_TABLES = int(os.getenv("SCHEMA_LINKING_MAX_TABLES", "0"))  # 0 表示不限制
+# 問題用語 → schema 用語（欄位名稱/註解中沒有出現的說法）
+SCHEMA_LINKING_SYNONYMS = {
+    "騰訊": "tencent",
+    "帳單": "bill",
+}
+
 
 # ============================================================================
 # 系統常數 (System Constants)
@@ -216,6 +361,53 @@ DEFAULT_TEST_QUERIES = [
 CACHE_DIR = BASE_DIR / ".cache"
 MODEL_CACHE_DIR = CACHE_DIR / "models"
 
+# 生成結果快取：相同問題（正規化後）+ schema + 模型/採樣設定直接重用先前的模型輸出
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+GENERATION_CACHE_MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1024"))
+GENERATION_CACHE_TTL_SECONDS = float(
+    os.getenv("GENERATION_CACHE_TTL_SECONDS", "86400")
+)  # 0 表示不過期
+# 磁碟層：存於 CACHE_DIR/generation，重新啟動後仍可命中
+GENERATION_CACHE_DISK = os.getenv("GENERATION_CACHE_DISK", "false").lower() == "true"
+GENERATION_CACHE_MAX_DISK_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_DISK_ENTRIES", "10000"))
+
+# 語意快取：精確比對未命中時，以問題向量相似度重用改寫問法的結果（月份/數字等常值會重新代入）
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+# 向量模型：sentence-transformers 模型名稱（未安裝時改用內建 "hashing"）
+SEMANTIC_CACHE_EMBEDDER = os.getenv(
+    "SEMANTIC_CACHE_EMBEDDER", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))  # 餘弦相似度門檻
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "4096"))
+# 向量索引以 memory-mapped 檔案存於 CACHE_DIR/semantic，重新啟動不需重建
+SEMANTIC_CACHE_PERSIST = os.getenv("SEMANTIC_CACHE_PERSIST", "true").lower() == "true"
+
+# 查詢結果快取：相同 SQL（正規化後）直接回傳先前的查詢結果；只快取不含 NOW()/RAND() 等函式的 SELECT
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_MB = int(
+    os.getenv("RESULT_CACHE_MAX_MB", "64")
+)  # 記憶體上限，超過時淘汰最久未用的結果
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+# 各表格的存活秒數，格式 "table=seconds,..."；查詢多張表時取最短者
+RESULT_CACHE_TABLE_TTLS = {
+    table.strip(): float(ttl)
+    for table, _, ttl in (
+        item.partition("=") for item in os.getenv("RESULT_CACHE_TABLE_TTLS", "").split(",")
+    )
+    if table.strip() and ttl.strip()
+}
+# 每隔此秒數檢查表格異動（information_schema.TABLES.UPDATE_TIME 與下列欄位的 MAX 值），有變動即清除該表的快取；0 表示不檢查
+RESULT_CACHE_WATERMARK_INTERVAL = float(os.getenv("RESULT_CACHE_WATERMARK_INTERVAL", "30"))
+# 各表格的異動時間欄位，格式 "table=column,..."（UPDATE_TIME 可能因 information_schema_stats_expiry 而延遲更新）
+# 每次檢查都會執行 SELECT MAX(column)：欄位必須有索引，否則每次都是全表掃描；預設不設定，只看 UPDATE_TIME
+RESULT_CACHE_WATERMARK_COLUMNS = {
+    table.strip(): column.strip()
+    for table, _, column in (
+        item.partition("=") for item in os.getenv("RESULT_CACHE_WATERMARK_COLUMNS", "").split(",")
+    )
+    if table.strip() and column.strip()
+}
+
 # 日誌設定
 LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -0,0 +1,270 @@
+"""Two-tier (memory LRU + optional disk) cache of model outputs for repeated questions."""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import config
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?？。.!！;；]+$")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for exact-match caching.
+
+    Applies NFKC (full-width to half-width), lower-cases, collapses whitespace
+    and drops trailing punctuation, so "統計每個帳期的總成本？" and
+    "統計每個帳期的總成本" share an entry.
+    """
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def schema_fingerprint(schema: str) -> str:
+    """Short hash of the schema text (whitespace-insensitive)."""
+    normalized = _WHITESPACE.sub(" ", schema).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class GenerationCache:
+    """
+    Cache of raw model outputs keyed by question, schema and model settings.
+
+    The memory tier is an LRU bounded by ``max_entries``; the optional disk tier
+    stores one JSON file per entry under ``disk_dir`` and is bounded by
+    ``max_disk_entries`` (oldest files are removed first). Entries older than
+    ``ttl_seconds`` are treated as misses in both tiers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float | None = 86400,
+        disk_dir: str | Path | None = None,
+        max_disk_entries: int = 10000,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl_seconds: Entry lifetime (None for no expiry)
+            disk_dir: Directory for the persistent tier (None to keep entries in memory only)
+            max_disk_entries: Maximum number of entries kept on disk
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self.max_disk_entries = max_disk_entries
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_count: int | None = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(question: str, schema: str, identity: dict[str, Any]) -> str:
+        """
+        Build a cache key.
+
+        The generation length limit is deliberately not part of the key: SQL
+        answers end well before it, so convert() and convert_stream() share entries.
+
+        Args:
+            question: User's natural language query
+            schema: Schema text sent to the model
+            identity: Provider, model ID and sampling settings (ILanguageModel.cache_identity())
+
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = {
+            "question": normalize_question(question),
+            "schema": schema_fingerprint(schema),
+            "identity": identity,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        Look up a cached output.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Cached output, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created = entry
+                if self._expired(created, now):
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, entry[0], entry[1])
+            return entry[0]
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Store an output in both tiers.
+
+        Args:
+            key: Key from make_key()
+            value: Raw model output
+        """
+        created = time.time()
+        with self._lock:
+            self._store(key, value, created)
+        self._write_disk(key, value, created)
+
+    def clear(self) -> None:
+        """Drop all entries from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self.disk_dir is not None and self.disk_dir.exists():
+            with self._disk_lock:
+                for path in self.disk_dir.glob("*/*.json"):
+                    path.unlink(missing_ok=True)
+                self._disk_count = 0
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss statistics."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_entries": self._disk_count,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _store(self, key: str, value: str, created: float) -> None:
+        """Insert into the memory tier (caller holds the lock)."""
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str, now: float) -> tuple[str, float] | None:
+        if self.disk_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+        try:
+            data = json.loads(text)
+            value, created = data["value"], float(data["created"])
+            if not isinstance(value, str):
+                msg = f"value is {type(value).__name__}, not str"
+                raise TypeError(msg)
+        except (ValueError, KeyError, TypeError) as e:
+            # Truncated or old-format entry: drop it and treat it as a miss.
+            print(f"[WARN] 生成快取檔案損壞，已刪除 {path.name}: {e!r}")
+            path.unlink(missing_ok=True)
+            return None
+        if self._expired(created, now):
+            path.unlink(missing_ok=True)
+            with self._lock:
+                self.expirations += 1
+            return None
+        return value, created
+
+    def _write_disk(self, key: str, value: str, created: float) -> None:
+        if self.disk_dir is None:
+            return
+        path = self._path(key)
+        with self._disk_lock:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                existed = path.exists()
+                # Write then rename so concurrent readers never see a partial file.
+                tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp_path.write_text(
+                    json.dumps({"value": value, "created": created}, ensure_ascii=False),
+                    encoding="utf-8",
+                )
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"[WARN] 生成快取寫入失敗: {e}")
+                return
+            if self._disk_count is None:
+                self._disk_count = sum(1 for _ in self.disk_dir.glob("*/*.json"))
+            elif not existed:
+                self._disk_count += 1
+            if self._disk_count > self.max_disk_entries:
+                self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Remove the oldest files, leaving 10% headroom (caller holds the disk lock)."""
+        paths = sorted(self.disk_dir.glob("*/*.json"), key=lambda path: path.stat().st_mtime)
+        target = int(self.max_disk_entries * 0.9)
+        excess = max(0, len(paths) - target)
+        for path in paths[:excess]:
+            path.unlink(missing_ok=True)
+        self._disk_count = len(paths) - excess
+        with self._lock:
+            self.evictions += excess
+
+
+_cache: GenerationCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache | None:
+    """Return the process-wide generation cache, or None when it is disabled."""
+    global _cache
+    if not config.GENERATION_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = GenerationCache(
+                max_entries=config.GENERATION_CACHE_MAX_ENTRIES,
+                ttl_seconds=config.GENERATION_CACHE_TTL_SECONDS or None,
+                disk_dir=config.CACHE_DIR / "generation" if config.GENERATION_CACHE_DISK else None,
+                max_disk_entries=config.GENERATION_CACHE_MAX_DISK_ENTRIES,
+            )
+        return _cache
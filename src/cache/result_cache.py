@@ -0,0 +1,455 @@
+"""Memory-capped LRU cache of query results with per-table TTLs and invalidation."""
+
+import hashlib
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple
+
+_TOKEN = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|\#[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    |(?P<quoted>`(?:[^`]|``)*`)
+    |(?P<word>[A-Za-z_][\w$]*)
+    |(?P<space>\s+)
+    |(?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_KEYWORDS = frozenset(
+    """
+    select from where group by order having limit offset join inner left right outer cross
+    natural on using as and or not in is null like between case when then else end distinct
+    union all exists asc desc with recursive over partition window straight_join
+    """.split()
+)
+
+# Functions whose value changes between executions: such queries are never cached.
+_VOLATILE_FUNCTIONS = frozenset(
+    """
+    now curdate curtime current_date current_time current_timestamp localtime localtimestamp
+    sysdate utc_date utc_time utc_timestamp unix_timestamp rand uuid uuid_short
+    last_insert_id found_rows row_count connection_id sleep get_lock
+    """.split()
+)
+
+# Clauses that make a SELECT write, lock or leave the session.
+_SIDE_EFFECT_WORDS = frozenset(("INTO", "FOR", "LOCK"))
+
+_CLAUSE_END = frozenset(
+    """
+    WHERE GROUP ORDER HAVING LIMIT UNION JOIN INNER LEFT RIGHT CROSS NATURAL STRAIGHT_JOIN
+    ON USING WINDOW
+    """.split()
+)
+
+
+class _Token(NamedTuple):
+    kind: str
+    text: str
+
+
+def _tokens(sql: str) -> list[_Token]:
+    """Split SQL into tokens, dropping comments and whitespace."""
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("comment", "space"):
+            continue
+        text = match.group()
+        if kind == "quoted":
+            # `name` and name refer to the same identifier.
+            kind, text = "word", text[1:-1].replace("``", "`")
+        elif kind == "word" and text.lower() in _KEYWORDS:
+            text = text.upper()
+        tokens.append(_Token(kind, text))
+    while tokens and tokens[-1].text == ";":
+        tokens.pop()
+    return tokens
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize SQL for result caching.
+
+    Comments, redundant whitespace, identifier backticks and trailing semicolons
+    are dropped and keywords are upper-cased; string literals are kept verbatim,
+    so ``select  `cost` from t;`` and ``SELECT cost FROM t`` share an entry.
+    """
+    return " ".join(token.text for token in _tokens(sql))
+
+
+def sql_fingerprint(sql: str) -> str:
+    """Hash of the normalized SQL."""
+    return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+
+def _is_read_only(tokens: list[_Token]) -> bool:
+    words = [token.text for token in tokens if token.kind == "word"]
+    if not words or words[0] not in ("SELECT", "WITH"):
+        return False
+    if any(token.text == ";" for token in tokens):
+        return False
+    return not any(word.upper() in _SIDE_EFFECT_WORDS for word in words)
+
+
+def is_read_only(sql: str) -> bool:
+    """True for a single SELECT/WITH statement without INTO, FOR UPDATE or LOCK IN SHARE MODE."""
+    return _is_read_only(_tokens(sql))
+
+
+def referenced_tables(sql: str) -> tuple[str, ...] | None:
+    """
+    Return the tables a read-only query depends on.
+
+    Args:
+        sql: SQL statement
+
+    Returns:
+        Sorted table names (without database prefix), or None when the statement
+        must not be cached: not a single SELECT/WITH, uses a volatile function such
+        as NOW() or RAND(), has INTO/FOR UPDATE/LOCK IN SHARE MODE, or reads no table
+    """
+    tokens = _tokens(sql)
+    if not _is_read_only(tokens):
+        return None
+
+    ctes = set()
+    tables = set()
+    for index, token in enumerate(tokens):
+        if token.kind != "word":
+            continue
+        following = tokens[index + 1].text if index + 1 < len(tokens) else ""
+        if token.text.lower() in _VOLATILE_FUNCTIONS and (
+            following == "(" or token.text.upper().startswith("CURRENT_")
+        ):
+            return None
+        if following == "AS" and index + 2 < len(tokens) and tokens[index + 2].text == "(":
+            ctes.add(token.text)
+        elif token.text in ("FROM", "JOIN"):
+            tables.update(_table_list(tokens, index + 1, comma_separated=token.text == "FROM"))
+
+    tables -= ctes
+    return tuple(sorted(tables)) or None
+
+
+def _table_list(tokens: list[_Token], start: int, comma_separated: bool) -> list[str]:
+    """Read ``db.table [AS] alias, ...`` after FROM/JOIN (subqueries are skipped)."""
+    names = []
+    index = start
+    while index < len(tokens):
+        token = tokens[index]
+        if token.kind != "word" or token.text.upper() in _CLAUSE_END:
+            break
+        name = token.text
+        index += 1
+        if index + 1 < len(tokens) and tokens[index].text == ".":
+            name = tokens[index + 1].text
+            index += 2
+        names.append(name)
+        # Skip an optional alias.
+        if index < len(tokens) and tokens[index].text == "AS":
+            index += 1
+        if (
+            index < len(tokens)
+            and tokens[index].kind == "word"
+            and tokens[index].text.upper() not in _CLAUSE_END
+        ):
+            index += 1
+        if not comma_separated or index >= len(tokens) or tokens[index].text != ",":
+            break
+        index += 1
+    return names
+
+
+class _Entry(NamedTuple):
+    payload: bytes
+    tables: tuple[str, ...]
+    expires: float
+
+
+class ResultCache:
+    """
+    Cache of query result rows keyed by the normalized SQL.
+
+    Rows are stored pickled, which both measures their size for the ``max_bytes``
+    cap (least recently used entries are evicted first) and hands every caller its
+    own copy. Each entry lives for the shortest TTL of the tables it reads and is
+    dropped when any of those tables is invalidated, either explicitly through
+    invalidate_table() or when ``watermark_source`` reports a changed watermark.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 300,
+        table_ttls: dict[str, float] | None = None,
+        watermark_source: Callable[[list[str]], dict[str, Any]] | None = None,
+        watermark_interval: float = 30,
+        max_entry_bytes: int | None = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Memory cap for the pickled rows of all entries
+            ttl_seconds: Default entry lifetime
+            table_ttls: Lifetime overrides per table name
+            watermark_source: Returns the current change watermark of each given table
+                (e.g. information_schema UPDATE_TIME or MAX(created_date)); a changed
+                value invalidates the table's entries
+            watermark_interval: Minimum seconds between watermark polls of a table
+            max_entry_bytes: Larger results are not cached (default: max_bytes / 4)
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.table_ttls = dict(table_ttls or {})
+        self.watermark_source = watermark_source
+        self.watermark_interval = watermark_interval
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._by_table: dict[str, set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._watermarks: dict[str, Any] = {}
+        self._polled_at: dict[str, float] = {}
+        self._invalidated_at: dict[str, float] = {}
+        self._cleared_at = float("-inf")
+
+        self._table_stats: dict[str, dict[str, int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def clock() -> float:
+        """Time source for TTLs; pass its value to put() as ``started``."""
+        return time.monotonic()
+
+    def ttl_for(self, tables: Iterable[str]) -> float:
+        """Return the shortest configured TTL among ``tables``."""
+        return min(self.table_ttls.get(table, self.ttl_seconds) for table in tables)
+
+    def get(self, sql: str) -> list[dict[str, Any]] | None:
+        """
+        Look up cached rows for a query.
+
+        When an entry exists, the watermarks of its tables are polled first if
+        they are due. A miss only polls tables seen for the first time, so the
+        baseline that later polls compare against predates the query that fills
+        the entry.
+
+        Args:
+            sql: SQL statement
+
+        Returns:
+            A fresh copy of the cached rows, or None on a miss or for uncacheable SQL
+        """
+        tables = referenced_tables(sql)
+        if tables is None:
+            with self._lock:
+                self.uncacheable += 1
+            return None
+
+        key = sql_fingerprint(sql)
+        with self._lock:
+            cached = key in self._entries
+        if cached:
+            self.refresh_watermarks(tables)
+        elif self.watermark_source is not None:
+            with self._lock:
+                unseen = [table for table in tables if table not in self._watermarks]
+            if unseen:
+                self.refresh_watermarks(unseen)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= now:
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                self._count(tables, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._count(tables, "hits")
+            payload = entry.payload
+        return pickle.loads(payload)
+
+    def put(self, sql: str, rows: list[dict[str, Any]], started: float | None = None) -> bool:
+        """
+        Store the rows of a query.
+
+        Args:
+            sql: SQL statement the rows came from
+            rows: Result rows
+            started: clock() value taken before the query ran; the rows are dropped
+                if one of their tables was invalidated after that
+
+        Returns:
+            True if the rows were cached
+        """
+        tables = referenced_tables(sql)
+        if tables is None:
+            return False
+        try:
+            payload = pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        if len(payload) > self.max_entry_bytes:
+            return False
+
+        key = sql_fingerprint(sql)
+        now = self.clock()
+        with self._lock:
+            if started is not None and (
+                self._cleared_at >= started
+                or any(
+                    self._invalidated_at.get(table, self._cleared_at) >= started for table in tables
+                )
+            ):
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(payload, tables, now + self.ttl_for(tables))
+            self._bytes += len(payload)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def invalidate_table(self, table: str) -> int:
+        """
+        Drop every entry that reads ``table``.
+
+        Args:
+            table: Table name (without database prefix)
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            return self._invalidate(table)
+
+    def clear(self) -> None:
+        """Drop all entries and forget the known watermarks."""
+        with self._lock:
+            self._cleared_at = self.clock()
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+            self._watermarks.clear()
+            self._polled_at.clear()
+
+    def refresh_watermarks(self, tables: Iterable[str], force: bool = False) -> None:
+        """
+        Poll the watermark source and invalidate tables whose watermark changed.
+
+        A table's first poll only records its baseline. If the source fails the
+        tables are invalidated.
+
+        Args:
+            tables: Tables to check
+            force: Ignore watermark_interval
+        """
+        if self.watermark_source is None:
+            return
+        with self._poll_lock:
+            now = self.clock()
+            due = [
+                table
+                for table in tables
+                if force
+                or now - self._polled_at.get(table, float("-inf")) >= self.watermark_interval
+            ]
+            if not due:
+                return
+            try:
+                current = self.watermark_source(due)
+            except Exception as e:
+                print(f"[WARN] 查詢結果快取無法取得資料表異動時間: {e}")
+                current = {}
+                changed = due
+            else:
+                changed = [
+                    table
+                    for table in due
+                    if table in self._watermarks and current.get(table) != self._watermarks[table]
+                ]
+            with self._lock:
+                for table in due:
+                    self._polled_at[table] = now
+                    self._watermarks[table] = current.get(table)
+                for table in changed:
+                    self._invalidate(table)
+
+    def stats(self) -> dict[str, Any]:
+        """Return size, hit/miss and per-table statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            tables = {}
+            for table, counts in sorted(self._table_stats.items()):
+                table_lookups = counts["hits"] + counts["misses"]
+                tables[table] = {
+                    **counts,
+                    "entries": len(self._by_table.get(table, ())),
+                    "hit_rate": counts["hits"] / table_lookups if table_lookups else 0.0,
+                    "ttl_seconds": self.table_ttls.get(table, self.ttl_seconds),
+                }
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "uncacheable": self.uncacheable,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "tables": tables,
+            }
+
+    def _count(self, tables: Iterable[str], field: str) -> None:
+        """Bump a per-table counter (caller holds the lock)."""
+        for table in tables:
+            counts = self._table_stats.setdefault(
+                table, {"hits": 0, "misses": 0, "invalidations": 0}
+            )
+            counts[field] += 1
+
+    def _invalidate(self, table: str) -> int:
+        """Drop a table's entries (caller holds the lock)."""
+        self._invalidated_at[table] = self.clock()
+        keys = self._by_table.pop(table, set())
+        for key in keys:
+            self._remove(key)
+        self.invalidations += 1
+        self._count((table,), "invalidations")
+        return len(keys)
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry and its table index references (caller holds the lock)."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= len(entry.payload)
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
@@ -0,0 +1,424 @@
+"""Serve paraphrased questions from earlier generations via embedding similarity."""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+
+import config
+from src.cache.generation_cache import schema_fingerprint
+from src.utils.embeddings import HashingEmbedder, create_embedder
+
+# Literal slots, most specific first; matched text is replaced before later patterns run.
+_SLOT_PATTERNS = (
+    (
+        "date",
+        re.compile(r"(?<!\d)(\d{4})\s*[-/年]\s*(\d{1,2})\s*[-/月]\s*(\d{1,2})\s*[日號]?(?!\d)"),
+    ),
+    ("month", re.compile(r"(?<!\d)(\d{4})\s*[-/年]\s*(\d{1,2})(?:\s*月份?)?(?![\d/-])")),
+    ("year", re.compile(r"(?<!\d)(\d{4})\s*年(?!\s*\d)")),
+    ("number", re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)(?![\w.])")),
+)
+_SLOT_MARKER = "\x00{}\x00"
+_SLOT_MARKER_PATTERN = re.compile("\x00(\\d+)\x00")
+
+
+class Slot(NamedTuple):
+    """A literal value found in a question, in the form it takes in SQL."""
+
+    kind: str
+    value: str
+
+
+def extract_slots(question: str) -> tuple[str, list[Slot]]:
+    """
+    Replace literal values in a question with typed placeholders.
+
+    "查詢 2025年1月 前 10 筆" becomes ("查詢 <month> 前 <number> 筆",
+    [Slot("month", "2025-01"), Slot("number", "10")]).
+
+    Args:
+        question: User's natural language query
+
+    Returns:
+        Template text and the slots in order of appearance
+    """
+    found: list[tuple[int, int, Slot]] = []
+    text = question
+    for kind, pattern in _SLOT_PATTERNS:
+
+        def replace(match: re.Match, kind: str = kind) -> str:
+            slot = Slot(kind, _canonical(kind, match.groups()))
+            found.append((match.start(), match.end(), slot))
+            # Same-length filler keeps offsets valid and hides the span from later patterns.
+            return "\x01" * (match.end() - match.start())
+
+        text = pattern.sub(replace, text)
+
+    found.sort(key=lambda item: item[0])
+    template = []
+    position = 0
+    for start, end, slot in found:
+        template.append(question[position:start])
+        template.append(f"<{slot.kind}>")
+        position = end
+    template.append(question[position:])
+    return "".join(template), [slot for _, _, slot in found]
+
+
+def make_sql_template(sql: str, slots: Sequence[Slot]) -> str | None:
+    """
+    Replace each slot value in ``sql`` with a positional marker.
+
+    Returns None when a slot value does not appear in the SQL or two slots share
+    a value, since the answer could then not be adapted to different values.
+    """
+    if len({slot.value for slot in slots}) != len(slots):
+        return None
+    template = sql
+    for index, slot in enumerate(slots):
+        template, count = _slot_pattern(slot).subn(_SLOT_MARKER.format(index), template)
+        if count == 0:
+            return None
+    return template
+
+
+def fill_sql_template(template: str, slots: Sequence[Slot]) -> str:
+    """Substitute slot values into a template from make_sql_template()."""
+    return _SLOT_MARKER_PATTERN.sub(lambda match: slots[int(match.group(1))].value, template)
+
+
+def _canonical(kind: str, groups: tuple[str, ...]) -> str:
+    if kind == "date":
+        return f"{groups[0]}-{int(groups[1]):02d}-{int(groups[2]):02d}"
+    if kind == "month":
+        return f"{groups[0]}-{int(groups[1]):02d}"
+    return groups[0]
+
+
+def _slot_pattern(slot: Slot) -> re.Pattern:
+    if slot.kind == "number":
+        # Not part of an identifier, a decimal or a date/month literal.
+        return re.compile(rf"(?<![\w.\-/]){re.escape(slot.value)}(?![\w.\-/])")
+    # Months also match the start of date literals ('2025-01' in '2025-01-31').
+    return re.compile(rf"(?<!\d){re.escape(slot.value)}(?!\d)")
+
+
+class NumpyVectorIndex:
+    """
+    Brute-force cosine-similarity index over a fixed-capacity float32 matrix.
+
+    With ``path`` the matrix is a memory-mapped file, so vectors survive
+    restarts without re-embedding. Rows are addressed by the caller; an ANN
+    index with the same set()/search() interface can replace this one.
+    """
+
+    def __init__(self, dimensions: int, capacity: int, path: str | Path | None = None):
+        """
+        Initialize the index.
+
+        Args:
+            dimensions: Vector size
+            capacity: Number of rows
+            path: Backing file (created or reopened); None keeps vectors in memory
+        """
+        self.dimensions = dimensions
+        self.capacity = capacity
+        self.path = Path(path) if path is not None else None
+        shape = (capacity, dimensions)
+        if self.path is None:
+            self._vectors = np.zeros(shape, dtype=np.float32)
+        else:
+            expected = capacity * dimensions * np.dtype(np.float32).itemsize
+            reuse = self.path.exists() and self.path.stat().st_size == expected
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._vectors = np.memmap(
+                self.path, dtype=np.float32, mode="r+" if reuse else "w+", shape=shape
+            )
+
+    def set(self, row: int, vector: np.ndarray) -> None:
+        """Store a normalised vector at ``row``."""
+        self._vectors[row] = vector
+
+    def search(
+        self, vector: np.ndarray, rows: Sequence[int], k: int = 5
+    ) -> list[tuple[int, float]]:
+        """
+        Return the ``k`` most similar rows among ``rows``.
+
+        Args:
+            vector: Normalised query vector
+            rows: Candidate rows (e.g. entries in the caller's scope)
+            k: Number of results
+
+        Returns:
+            (row, cosine similarity) pairs, best first
+        """
+        if not rows:
+            return []
+        candidates = np.asarray(rows)
+        scores = self._vectors[candidates] @ vector
+        order = np.argsort(-scores)[:k]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def flush(self) -> None:
+        """Write pending changes of a memory-mapped index to disk."""
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+
+
+class SemanticCache:
+    """
+    Cache of generated SQL looked up by question similarity.
+
+    Questions are reduced to templates (literal months, dates and numbers
+    replaced by placeholders) before embedding. A hit requires a stored
+    template above ``threshold`` with the same slot kinds in the same scope
+    (schema + model settings); the stored SQL is then re-filled with the new
+    question's values. Entries form a ring buffer of ``max_entries`` rows.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = 0.9,
+        max_entries: int = 4096,
+        directory: str | Path | None = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            embedder: Object with ``encode(texts) -> ndarray`` of normalised vectors
+                (default: HashingEmbedder)
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Number of questions kept (oldest overwritten first)
+            directory: Persist the index and entries here (None for memory only)
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory is not None else None
+        self._lock = threading.Lock()
+        self._index: NumpyVectorIndex | None = None
+        self._entries: dict[int, dict[str, Any]] = {}
+        self._next_row = 0
+        self._log_lines = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+
+        if self.directory is not None:
+            self._load()
+
+    @staticmethod
+    def make_scope(schema: str, identity: dict[str, Any]) -> str:
+        """Identify the schema and model settings an answer is valid for."""
+        encoded = json.dumps(
+            {"schema": schema_fingerprint(schema), "identity": identity},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+    def lookup(self, question: str, scope: str) -> str | None:
+        """
+        Return SQL for a paraphrase of an earlier question, adapted to this question's values.
+
+        Args:
+            question: User's natural language query
+            scope: Value from make_scope()
+
+        Returns:
+            SQL, or None on a miss
+        """
+        template, slots = extract_slots(question)
+        kinds = [slot.kind for slot in slots]
+        with self._lock:
+            rows = [row for row, entry in self._entries.items() if entry["scope"] == scope]
+        if not rows:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        vector = self.embedder.encode([template])[0]
+        with self._lock:
+            if self._index is not None:
+                for row, score in self._index.search(vector, rows):
+                    entry = self._entries.get(row)
+                    if score < self.threshold:
+                        break
+                    if entry is not None and entry["scope"] == scope and entry["kinds"] == kinds:
+                        self.hits += 1
+                        return fill_sql_template(entry["sql"], slots)
+            self.misses += 1
+            return None
+
+    def add(self, question: str, scope: str, sql: str) -> bool:
+        """
+        Remember the SQL generated for a question.
+
+        Args:
+            question: User's natural language query
+            scope: Value from make_scope()
+            sql: Cleaned SQL generated for the question
+
+        Returns:
+            False if the question's literal values could not be located in the SQL
+        """
+        template, slots = extract_slots(question)
+        sql_template = make_sql_template(sql, slots)
+        if sql_template is None:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        vector = self.embedder.encode([template])[0]
+        entry = {
+            "scope": scope,
+            "template": template,
+            "kinds": [slot.kind for slot in slots],
+            "sql": sql_template,
+            "created": time.time(),
+        }
+        with self._lock:
+            index = self._ensure_index(len(vector))
+            row = self._next_row
+            self._next_row = (row + 1) % self.max_entries
+            index.set(row, vector)
+            self._entries[row] = entry
+            self.stores += 1
+            self._append_log(row, entry)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "rejected": self.rejected,
+            }
+
+    def warmup(self) -> None:
+        """Load the embedding model ahead of the first question (e.g. at startup)."""
+        self.embedder.encode(["warmup"])
+
+    def flush(self) -> None:
+        """Write the memory-mapped index to disk."""
+        with self._lock:
+            if self._index is not None:
+                self._index.flush()
+
+    def _embedder_name(self) -> str:
+        return getattr(self.embedder, "model_name", type(self.embedder).__name__)
+
+    def _ensure_index(self, dimensions: int) -> NumpyVectorIndex:
+        """Create the index on first use (caller holds the lock)."""
+        if self._index is not None and self._index.dimensions == dimensions:
+            return self._index
+        # New or changed embedder: stored vectors are not comparable any more.
+        self._entries.clear()
+        self._next_row = 0
+        path = None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / "entries.jsonl").write_text("", encoding="utf-8")
+            self._log_lines = 0
+            meta = {
+                "dimensions": dimensions,
+                "capacity": self.max_entries,
+                "embedder": self._embedder_name(),
+            }
+            (self.directory / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+            path = self.directory / "vectors.f32"
+            path.unlink(missing_ok=True)
+        self._index = NumpyVectorIndex(dimensions, self.max_entries, path)
+        return self._index
+
+    def _load(self) -> None:
+        """Reopen a persisted index (no re-embedding); ignore it if settings changed."""
+        try:
+            meta = json.loads((self.directory / "meta.json").read_text(encoding="utf-8"))
+            lines = (self.directory / "entries.jsonl").read_text(encoding="utf-8").splitlines()
+        except (OSError, ValueError):
+            return
+        if (
+            meta.get("capacity") != self.max_entries
+            or meta.get("embedder") != self._embedder_name()
+        ):
+            return
+
+        last_row = -1
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn final line after a crash
+            last_row = record.pop("row")
+            self._entries[last_row] = record
+        self._next_row = (last_row + 1) % self.max_entries
+        self._log_lines = len(lines)
+        self._index = NumpyVectorIndex(
+            meta["dimensions"], self.max_entries, self.directory / "vectors.f32"
+        )
+
+    def _append_log(self, row: int, entry: dict[str, Any]) -> None:
+        """Persist an entry (caller holds the lock); compacts the log when it doubles."""
+        if self.directory is None:
+            return
+        log_path = self.directory / "entries.jsonl"
+        try:
+            self._index.flush()
+            if self._log_lines >= 2 * self.max_entries:
+                # Rewrite oldest-first so the last line still marks the newest row.
+                ordered = sorted(self._entries.items(), key=lambda item: item[1]["created"])
+                lines = [json.dumps({"row": r, **e}, ensure_ascii=False) for r, e in ordered]
+                tmp_path = log_path.with_suffix(".tmp")
+                tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                tmp_path.replace(log_path)
+                self._log_lines = len(lines)
+            else:
+                with log_path.open("a", encoding="utf-8") as log:
+                    log.write(json.dumps({"row": row, **entry}, ensure_ascii=False) + "\n")
+                self._log_lines += 1
+        except OSError as e:
+            print(f"[WARN] 語意快取寫入失敗: {e}")
+
+
+_cache: SemanticCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache | None:
+    """Return the process-wide semantic cache, or None when it is disabled."""
+    global _cache
+    if not config.SEMANTIC_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                embedder = create_embedder(config.SEMANTIC_CACHE_EMBEDDER, config.MODEL_DEVICE)
+            except ImportError as e:
+                print(f"[WARN] 語意快取改用內建 hashing 向量: {e}")
+                embedder = HashingEmbedder()
+            _cache = SemanticCache(
+                embedder=embedder,
+                threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                max_entries=config.SEMANTIC_CACHE_MAX_ENTRIES,
+                directory=config.CACHE_DIR / "semantic" if config.SEMANTIC_CACHE_PERSIST else None,
+            )
+        return _cache
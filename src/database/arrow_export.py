@@ -0,0 +1,366 @@
+"""Build Arrow record batches from streamed query results and encode them as IPC or Parquet."""
+
+import io
+from collections.abc import AsyncIterator, Generator, Iterable
+from contextlib import aclosing, closing
+from typing import Any
+
+from pymysql.constants import FIELD_TYPE
+
+from config import DB_CONFIG
+from src.database.db_connector import DatabaseConnector, RowChunk
+from src.utils.async_bridge import iterate_in_thread
+from src.utils.executors import get_stream_executor
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+ARROW_FORMATS = ("arrow", "arrow_file", "parquet")
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "arrow_file": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# File extensions recommended by the Arrow project for the IPC stream and file formats.
+EXTENSIONS = {"arrow": "arrows", "arrow_file": "arrow", "parquet": "parquet"}
+
+# Metadata key set to "true" when the export stopped at its row limit.
+TRUNCATED_KEY = "truncated"
+
+# Accept header values that select a columnar format.
+_ACCEPT_FORMATS = {
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.arrow.file": "arrow_file",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/parquet": "parquet",
+}
+# Accept header values that the default JSON response satisfies.
+_JSON_TYPES = frozenset(("application/json", "application/*", "*/*"))
+
+_INTEGER_TYPES = {
+    FIELD_TYPE.TINY,
+    FIELD_TYPE.SHORT,
+    FIELD_TYPE.INT24,
+    FIELD_TYPE.LONG,
+    FIELD_TYPE.LONGLONG,
+    FIELD_TYPE.YEAR,
+}
+_STRING_TYPES = {
+    FIELD_TYPE.VARCHAR,
+    FIELD_TYPE.VAR_STRING,
+    FIELD_TYPE.STRING,
+    FIELD_TYPE.ENUM,
+    FIELD_TYPE.SET,
+    FIELD_TYPE.JSON,
+}
+# BLOB type codes are shared by TEXT and BLOB columns; the values decide.
+_BLOB_TYPES = {
+    FIELD_TYPE.TINY_BLOB,
+    FIELD_TYPE.MEDIUM_BLOB,
+    FIELD_TYPE.LONG_BLOB,
+    FIELD_TYPE.BLOB,
+    FIELD_TYPE.BIT,
+    FIELD_TYPE.GEOMETRY,
+}
+
+
+def negotiate_format(accept: str | None) -> str | None:
+    """
+    Pick a columnar format from an HTTP Accept header.
+
+    Media ranges are ranked by q-value, then by specificity (an exact type beats
+    ``application/*``, which beats ``*/*``), then by position. A columnar format
+    is only served when it ranks above JSON.
+
+    Args:
+        accept: Accept header value
+
+    Returns:
+        "arrow", "arrow_file", "parquet", or None when JSON should be served
+    """
+    if not accept:
+        return None
+    best: tuple[tuple, str | None] | None = None
+    for position, media_range in enumerate(accept.split(",")):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        media_type = media_type.lower()
+        if media_type in _ACCEPT_FORMATS:
+            export_format = _ACCEPT_FORMATS[media_type]
+        elif media_type in _JSON_TYPES:
+            export_format = None
+        else:
+            continue
+        quality = next((param[2:] for param in params if param.lower().startswith("q=")), "1")
+        try:
+            quality = float(quality)
+        except ValueError:
+            continue
+        if quality <= 0:
+            continue
+        rank = (quality, 2 - media_type.count("*"), -position)
+        if best is None or rank > best[0]:
+            best = (rank, export_format)
+    return best[1] if best is not None else None
+
+
+def arrow_type(type_code: int, precision: int | None, scale: int | None, sample: Any = None):
+    """
+    Map a PyMySQL column type to an Arrow type.
+
+    DECIMAL keeps its exact scale: the reported length includes the sign and the
+    decimal point, so it is used as a (safe) precision. Types that PyMySQL does not
+    describe precisely (TEXT/BLOB) are decided from a sample value.
+
+    Args:
+        type_code: cursor.description type code (pymysql.constants.FIELD_TYPE)
+        precision: cursor.description precision (column length)
+        scale: cursor.description scale
+        sample: A non-null value of the column, if any
+
+    Returns:
+        pyarrow.DataType
+    """
+    if type_code in (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL):
+        scale = scale or 0
+        digits = max((precision or 0) - (1 if scale else 0), scale, 1)
+        if digits <= 38:
+            return pa.decimal128(digits, scale)
+        return pa.decimal256(min(digits, 76), scale)
+    if type_code in _INTEGER_TYPES:
+        return pa.int64()
+    if type_code == FIELD_TYPE.FLOAT:
+        return pa.float32()
+    if type_code == FIELD_TYPE.DOUBLE:
+        return pa.float64()
+    if type_code in (FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE):
+        return pa.date32()
+    if type_code in (FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP):
+        return pa.timestamp("us")
+    if type_code == FIELD_TYPE.TIME:
+        return pa.duration("us")
+    if type_code in _STRING_TYPES:
+        return pa.string()
+    if type_code in _BLOB_TYPES:
+        return pa.binary() if isinstance(sample, (bytes, bytearray)) else pa.string()
+    if type_code == FIELD_TYPE.NULL:
+        return pa.null()
+    return pa.string()
+
+
+def arrow_schema(description: Iterable[tuple], rows: list[tuple] = ()):
+    """
+    Build an Arrow schema from cursor.description.
+
+    Args:
+        description: PEP 249 cursor.description
+        rows: First rows of the result (tuples), used for TEXT/BLOB columns
+
+    Returns:
+        pyarrow.Schema
+    """
+    fields = []
+    for index, column in enumerate(description):
+        name, type_code, _, _, precision, scale, null_ok = column[:7]
+        sample = next((row[index] for row in rows if row[index] is not None), None)
+        fields.append(
+            pa.field(name, arrow_type(type_code, precision, scale, sample), nullable=null_ok)
+        )
+    return pa.schema(fields)
+
+
+def record_batch(rows: list[tuple], schema):
+    """
+    Convert tuple rows to a record batch, one column at a time.
+
+    Args:
+        rows: Rows in schema column order
+        schema: Schema from arrow_schema()
+
+    Returns:
+        pyarrow.RecordBatch
+    """
+    columns = list(zip(*rows, strict=True)) if rows else [()] * len(schema)
+    arrays = [
+        pa.array(values, type=field.type) for values, field in zip(columns, schema, strict=True)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def record_batches(chunks: Iterable[RowChunk], batch_size: int) -> Generator:
+    """
+    Turn a tuple-row stream into record batches.
+
+    The schema is built from the description of the header chunk and the first
+    rows; the stream is closed when this generator is.
+
+    Args:
+        chunks: DatabaseConnector.stream_query(..., tuples=True)
+        batch_size: Rows per record batch
+
+    Yields:
+        The pyarrow.Schema first, then pyarrow.RecordBatch objects
+
+    Returns:
+        Whether the stream was cut off at its row or byte limit (the generator's
+        return value)
+    """
+    stream = iter(chunks)
+    try:
+        schema = None
+        description = ()
+        truncated = False
+        pending: list[tuple] = []
+        for chunk in stream:
+            description = chunk.description or description
+            truncated = truncated or chunk.truncated
+            pending.extend(chunk.rows)
+            if schema is None and (pending or chunk.done):
+                schema = arrow_schema(description, pending[:batch_size])
+                yield schema
+            while len(pending) >= batch_size:
+                yield record_batch(pending[:batch_size], schema)
+                del pending[:batch_size]
+        if schema is None:
+            schema = arrow_schema(description, pending)
+            yield schema
+        if pending:
+            yield record_batch(pending, schema)
+        return truncated
+    finally:
+        # Stops the query and releases its connection when the export is abandoned.
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+class _Drain(io.RawIOBase):
+    """Writable sink whose contents are taken out after each write."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def encode_batches(chunks: Iterable[RowChunk], export_format: str, batch_size: int):
+    """
+    Encode a tuple-row stream as an Arrow IPC stream or file, or a Parquet file.
+
+    Output is produced per record batch (one Parquet row group each), so the
+    response starts before the query finishes. When the stream was cut off at
+    its row or byte limit, the output says so with ``truncated: "true"``: in the
+    Parquet footer's key-value metadata, or as the custom metadata of an empty
+    last record batch in the Arrow formats (their schema is written before the
+    end of the result is known).
+
+    Args:
+        chunks: DatabaseConnector.stream_query(..., tuples=True)
+        export_format: "arrow", "arrow_file" or "parquet"
+        batch_size: Rows per record batch / row group
+
+    Yields:
+        Encoded bytes
+
+    Raises:
+        ImportError: If pyarrow is not installed
+        ValueError: If the format is unknown
+    """
+    if not PYARROW_AVAILABLE:
+        msg = "pyarrow is not installed. Install it with: pip install pyarrow"
+        raise ImportError(msg)
+    if export_format not in ARROW_FORMATS:
+        msg = f"Unknown export format: {export_format}. Use one of: {', '.join(ARROW_FORMATS)}"
+        raise ValueError(msg)
+
+    sink = _Drain()
+    batches = record_batches(chunks, batch_size)
+    with closing(batches):
+        schema = next(batches)
+        if export_format == "arrow":
+            writer = pa.ipc.new_stream(sink, schema)
+        elif export_format == "arrow_file":
+            writer = pa.ipc.new_file(sink, schema)
+        else:
+            writer = pa.parquet.ParquetWriter(sink, schema)
+        with writer:
+            while True:
+                try:
+                    batch = next(batches)
+                except StopIteration as done:
+                    truncated = done.value
+                    break
+                if export_format == "parquet":
+                    writer.write_batch(batch, row_group_size=batch_size)
+                else:
+                    writer.write_batch(batch)
+                data = sink.take()
+                if data:
+                    yield data
+            if truncated:
+                marker = {TRUNCATED_KEY: "true"}
+                if export_format == "parquet":
+                    writer.add_key_value_metadata(marker)
+                else:
+                    writer.write_batch(record_batch([], schema), marker)
+        # Closing writes the end-of-stream marker / IPC or Parquet footer.
+        data = sink.take()
+        if data:
+            yield data
+
+
+async def aexport_query(
+    sql: str, export_format: str, batch_size: int | None = None, max_rows: int | None = None
+) -> AsyncIterator[bytes]:
+    """
+    Run a query and stream it as Arrow IPC or Parquet, encoding on the stream executor.
+
+    The export holds a DatabaseConnector.stream_slot() until it ends. Closing the
+    iterator early stops the query and discards its connection.
+
+    Args:
+        sql: SQL query to execute
+        export_format: "arrow", "arrow_file" or "parquet"
+        batch_size: Rows per record batch (default: DB_CONFIG.arrow_batch_size)
+        max_rows: Stop after this many rows (default: DB_CONFIG.stream_max_rows)
+
+    Yields:
+        Encoded bytes
+
+    Raises:
+        StreamLimitError: If DB_STREAM_MAX_CONCURRENT streams are already open
+    """
+    batch_size = batch_size or DB_CONFIG.arrow_batch_size
+
+    def encode():
+        chunks = DatabaseConnector.stream_query(sql, batch_size, max_rows, tuples=True)
+        return encode_batches(chunks, export_format, batch_size)
+
+    with DatabaseConnector.stream_slot():
+        data = iterate_in_thread(encode, maxsize=2, executor=get_stream_executor())
+        async with aclosing(data):
+            async for part in data:
+                yield part
@@ -0,0 +1,314 @@
+"""Thread-safe pool of reusable database connections."""
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no connection becomes available before the checkout timeout."""
+
+
+@dataclass
+class _PooledConnection:
+    """A pooled connection and its lifecycle timestamps."""
+
+    connection: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe connection pool.
+
+    Connections are created lazily up to ``max_size``. Idle connections are
+    recycled after ``idle_timeout`` (never below ``min_size``), every connection
+    is rotated after ``max_lifetime``, and connections idle for longer than
+    ``health_check_interval`` are pinged before being handed out.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        idle_timeout: float = 300.0,
+        max_lifetime: float = 3600.0,
+        health_check_interval: float = 5.0,
+        reset: Callable[[Any], None] | None = None,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            connect: Callable that opens a new connection
+            min_size: Connections kept open even when idle
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection on checkout
+            idle_timeout: Seconds after which idle connections are closed
+            max_lifetime: Seconds after which connections are rotated
+            health_check_interval: Idle seconds after which a connection is pinged on checkout
+            reset: Called on every released connection to restore session state a
+                borrower may have changed (e.g. the database selected by ``USE``);
+                connections it fails on are discarded
+        """
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            msg = f"Invalid pool size: min_size={min_size}, max_size={max_size}"
+            raise ValueError(msg)
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.reset = reset
+
+        self._idle: deque[_PooledConnection] = deque()
+        self._in_use: dict[int, _PooledConnection] = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._metrics = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "recycled_idle": 0,
+            "recycled_lifetime": 0,
+            "failed_health_checks": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def acquire(self, timeout: float | None = None) -> Any:
+        """
+        Check out a connection, waiting if the pool is exhausted.
+
+        Args:
+            timeout: Seconds to wait (default: pool timeout)
+
+        Returns:
+            Open database connection
+
+        Raises:
+            PoolTimeoutError: If no connection became available in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            pooled, stale = self._checkout(deadline)
+            self._close_all(stale)
+
+            if pooled is None:
+                pooled = self._open()
+            elif not self._is_healthy(pooled):
+                self._discard(pooled)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                pooled.last_used = time.monotonic()
+                self._in_use[id(pooled.connection)] = pooled
+                self._metrics["checkouts"] += 1
+                self._metrics["wait_seconds_total"] += waited
+                self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+            return pooled.connection
+
+    def release(self, connection: Any, discard: bool = False) -> None:
+        """
+        Return a connection to the pool.
+
+        Args:
+            connection: Connection previously returned by acquire()
+            discard: Close the connection instead of reusing it
+        """
+        with self._cond:
+            pooled = self._in_use.pop(id(connection), None)
+        if pooled is None:
+            return
+
+        now = time.monotonic()
+        if not discard and now - pooled.created_at >= self.max_lifetime:
+            discard = True
+            with self._cond:
+                self._metrics["recycled_lifetime"] += 1
+
+        if not discard:
+            try:
+                # End the implicit transaction so the next borrower gets a fresh snapshot.
+                connection.rollback()
+                if self.reset is not None:
+                    self.reset(connection)
+            except Exception:
+                discard = True
+
+        if discard or self._closed:
+            self._discard(pooled)
+            return
+
+        with self._cond:
+            pooled.last_used = now
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None) -> Iterator[Any]:
+        """
+        Borrow a connection for the duration of a block.
+
+        The connection is discarded instead of reused if the block raises.
+
+        Yields:
+            Open database connection
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def warmup(self) -> None:
+        """Open connections until the pool holds ``min_size`` of them."""
+        borrowed = []
+        try:
+            while True:
+                with self._cond:
+                    if self._closed or self._size >= self.min_size:
+                        return
+                borrowed.append(self.acquire())
+        finally:
+            for connection in borrowed:
+                self.release(connection)
+
+    def close(self) -> None:
+        """Close idle connections and stop handing out new ones."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        self._close_all(idle)
+
+    def stats(self) -> dict[str, Any]:
+        """Return pool size and checkout-wait metrics."""
+        with self._cond:
+            checkouts = self._metrics["checkouts"]
+            total_wait = self._metrics["wait_seconds_total"]
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._metrics,
+                "wait_seconds_avg": total_wait / checkouts if checkouts else 0.0,
+            }
+
+    def _checkout(self, deadline: float) -> tuple[_PooledConnection | None, list]:
+        """
+        Take an idle connection or reserve a slot for a new one.
+
+        Returns:
+            (pooled connection or None if a new one must be opened, stale connections)
+        """
+        stale: list[_PooledConnection] = []
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        msg = "Connection pool is closed"
+                        raise RuntimeError(msg)
+
+                    stale.extend(self._reap_locked(time.monotonic()))
+                    if self._idle:
+                        return self._idle.pop(), stale
+
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None, stale
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        msg = f"Timed out after {self.timeout}s waiting for a database connection"
+                        raise PoolTimeoutError(msg)
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _reap_locked(self, now: float) -> list[_PooledConnection]:
+        """Remove expired idle connections. Caller must hold the lock."""
+        stale = []
+        for pooled in list(self._idle):
+            if now - pooled.created_at >= self.max_lifetime:
+                self._metrics["recycled_lifetime"] += 1
+            elif now - pooled.last_used >= self.idle_timeout and self._size > self.min_size:
+                self._metrics["recycled_idle"] += 1
+            else:
+                continue
+            self._idle.remove(pooled)
+            self._size -= 1
+            stale.append(pooled)
+        return stale
+
+    def _open(self) -> _PooledConnection:
+        """Open a new connection in a slot reserved by _checkout()."""
+        try:
+            connection = self._connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._metrics["created"] += 1
+        return _PooledConnection(connection)
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        """Ping a connection that has been idle for a while."""
+        if time.monotonic() - pooled.last_used < self.health_check_interval:
+            return True
+
+        try:
+            pooled.connection.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._metrics["failed_health_checks"] += 1
+            return False
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        """Close a connection and free its slot."""
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+        self._close_all([pooled])
+
+    def _close_all(self, pooled_connections: list[_PooledConnection]) -> None:
+        """Close connections, ignoring errors from already-broken sockets."""
+        for pooled in pooled_connections:
+            try:
+                pooled.connection.close()
+            except Exception:
+                pass
+            with self._cond:
+                self._metrics["closed"] += 1
@@ -0,0 +1,273 @@
+"""Reject or slow-path expensive generated queries using the optimizer's estimates."""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import config
+from src.cache.result_cache import is_read_only, sql_fingerprint
+from src.database.db_connector import DatabaseConnector
+from src.utils.executors import get_db_executor, run_in_executor
+from src.utils.sql_parser import SQLParser
+
+_FULL_SCANS = frozenset(("ALL", "index"))
+_ACTIONS = ("reject", "downgrade")
+
+
+@dataclass(frozen=True)
+class TableAccess:
+    """One table access in a plan."""
+
+    table: str
+    access_type: str  # ALL, index, range, ref, eq_ref, const, ...
+    rows: int  # rows_examined_per_scan
+    key: str | None = None
+    condition: str | None = None  # attached_condition (filter applied while reading)
+
+    @property
+    def full_scan(self) -> bool:
+        """True when every row of the table (or of an index) is read."""
+        return self.access_type in _FULL_SCANS
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Estimated cost and table accesses from EXPLAIN FORMAT=JSON."""
+
+    cost: float
+    accesses: tuple[TableAccess, ...]
+
+
+def parse_plan(document: dict[str, Any]) -> QueryPlan:
+    """
+    Collect the table accesses of an EXPLAIN FORMAT=JSON document.
+
+    Accesses are found wherever they are nested: joins, ordering/grouping
+    operations, UNION branches, derived tables and subqueries.
+    """
+    accesses = []
+    pending: list[Any] = [document]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(reversed(node))
+        elif isinstance(node, dict):
+            if "table_name" in node and "access_type" in node:
+                accesses.append(
+                    TableAccess(
+                        node["table_name"],
+                        node["access_type"],
+                        int(node.get("rows_examined_per_scan", 0)),
+                        node.get("key"),
+                        node.get("attached_condition"),
+                    )
+                )
+            pending.extend(reversed(list(node.values())))
+    cost = document.get("query_block", {}).get("cost_info", {}).get("query_cost", 0)
+    return QueryPlan(float(cost), tuple(accesses))
+
+
+@dataclass(frozen=True)
+class CostVerdict:
+    """Outcome of a cost check."""
+
+    action: str  # "allow", "downgrade" or "reject"
+    sql: str  # Statement to run (with MAX_EXECUTION_TIME when downgraded)
+    reasons: tuple[str, ...] = ()
+    plan: QueryPlan | None = None
+
+    def __str__(self) -> str:
+        return "; ".join(self.reasons)
+
+
+class QueryCostError(RuntimeError):
+    """Raised when a query's estimated cost is over budget."""
+
+    def __init__(self, verdict: CostVerdict):
+        super().__init__(f"成本檢查未通過: {verdict}")
+        self.verdict = verdict
+
+
+class CostGuard:
+    """
+    Run EXPLAIN before executing a query and act on queries over the cost budget.
+
+    Two budgets apply: the rows a filtered full table/index scan examines (the
+    signature of a non-sargable predicate such as ``DATE_FORMAT(bill_month, ...)
+    = ...``) and the optimizer's total query cost. Unfiltered scans only count
+    towards the total cost, so plain listings and whole-table aggregates are not
+    flagged by the scan budget. Plans are cached by SQL fingerprint, so repeated
+    queries skip the EXPLAIN round trip.
+    """
+
+    def __init__(
+        self,
+        explain: Callable[[str], dict[str, Any]],
+        max_scan_rows: int = 0,
+        max_query_cost: float = 0,
+        action: str = "reject",
+        timeout_ms: int = 30000,
+        cache_size: int = 1024,
+        cache_ttl: float = 600,
+    ):
+        """
+        Initialize the guard.
+
+        Args:
+            explain: Returns the EXPLAIN FORMAT=JSON document of a statement
+            max_scan_rows: Rows a filtered full scan may examine (0 = unlimited)
+            max_query_cost: Budget for the optimizer's query_cost (0 = unlimited)
+            action: "reject" raises QueryCostError; "downgrade" runs the query with
+                a MAX_EXECUTION_TIME hint of ``timeout_ms``
+            timeout_ms: Execution time limit for downgraded queries
+            cache_size: Plans kept in memory
+            cache_ttl: Seconds before a cached plan is refreshed
+        """
+        if action not in _ACTIONS:
+            msg = f"Unknown cost guard action: {action} (expected one of {', '.join(_ACTIONS)})"
+            raise ValueError(msg)
+        self.explain = explain
+        self.max_scan_rows = max_scan_rows
+        self.max_query_cost = max_query_cost
+        self.action = action
+        self.timeout_ms = timeout_ms
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+
+        self._lock = threading.Lock()
+        self._plans: OrderedDict[str, tuple[QueryPlan, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.downgraded = 0
+
+    def plan(self, sql: str) -> QueryPlan | None:
+        """
+        Return the (cached) plan of a read-only query.
+
+        Returns:
+            The plan, or None for statements that are not checked (anything but a
+            single SELECT/WITH) or when EXPLAIN fails
+        """
+        if not is_read_only(sql):
+            return None
+        key = sql_fingerprint(sql)
+        with self._lock:
+            entry = self._plans.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        try:
+            plan = parse_plan(self.explain(sql))
+        except Exception as e:
+            # Invalid SQL fails again (with the real error) when it is executed.
+            print(f"[WARN] EXPLAIN 失敗，略過成本檢查: {e}")
+            return None
+
+        with self._lock:
+            self._plans[key] = (plan, time.monotonic() + self.cache_ttl)
+            self._plans.move_to_end(key)
+            while len(self._plans) > self.cache_size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def reasons(self, plan: QueryPlan) -> list[str]:
+        """Explain why a plan is over budget (empty when it is within budget)."""
+        reasons = []
+        if self.max_scan_rows:
+            for access in plan.accesses:
+                if access.full_scan and access.condition and access.rows > self.max_scan_rows:
+                    kind = "table" if access.access_type == "ALL" else "index"
+                    reasons.append(
+                        f"Full {kind} scan of '{access.table}' examines ~{access.rows:,} rows "
+                        f"(budget {self.max_scan_rows:,}) because its WHERE condition cannot "
+                        "use an index; compare indexed columns directly to constants instead "
+                        "of wrapping them in functions or expressions"
+                    )
+        if self.max_query_cost and plan.cost > self.max_query_cost:
+            reasons.append(
+                f"Estimated query cost {plan.cost:,.0f} exceeds budget "
+                f"{self.max_query_cost:,.0f}; filter on indexed columns or aggregate fewer rows"
+            )
+        return reasons
+
+    def check(self, sql: str) -> CostVerdict:
+        """
+        Decide whether a query may run as is.
+
+        Args:
+            sql: SQL statement about to be executed
+
+        Returns:
+            The verdict; its ``sql`` is the statement to execute
+        """
+        plan = self.plan(sql)
+        reasons = self.reasons(plan) if plan is not None else []
+        if not reasons:
+            return CostVerdict("allow", sql, plan=plan)
+        with self._lock:
+            if self.action == "downgrade":
+                self.downgraded += 1
+            else:
+                self.rejected += 1
+        if self.action == "downgrade":
+            sql = SQLParser.apply_execution_timeout(sql, self.timeout_ms)
+        return CostVerdict(self.action, sql, tuple(reasons), plan)
+
+    def enforce(self, sql: str) -> str:
+        """
+        Check a query and return the statement to execute.
+
+        Raises:
+            QueryCostError: The query is over budget and the action is "reject"
+        """
+        verdict = self.check(sql)
+        if verdict.action == "reject":
+            raise QueryCostError(verdict)
+        if verdict.action == "downgrade":
+            print(f"[WARN] 查詢成本過高，限制執行時間 {self.timeout_ms} ms: {verdict}")
+        return verdict.sql
+
+    async def aenforce(self, sql: str) -> str:
+        """Async version of enforce(); EXPLAIN runs on the database executor."""
+        return await run_in_executor(get_db_executor(), self.enforce, sql)
+
+    def stats(self) -> dict[str, Any]:
+        """Return plan cache and verdict counters for monitoring."""
+        with self._lock:
+            return {
+                "plans": len(self._plans),
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "downgraded": self.downgraded,
+            }
+
+
+_guard: CostGuard | None = None
+_guard_lock = threading.Lock()
+
+
+def get_cost_guard() -> CostGuard | None:
+    """Return the process-wide cost guard, or None when SQL_COST_GUARD_ENABLED is off."""
+    global _guard
+    if not config.SQL_COST_GUARD_ENABLED:
+        return None
+    with _guard_lock:
+        if _guard is None:
+            _guard = CostGuard(
+                DatabaseConnector.explain,
+                max_scan_rows=config.SQL_COST_MAX_SCAN_ROWS,
+                max_query_cost=config.SQL_COST_MAX_QUERY_COST,
+                action=config.SQL_COST_GUARD_ACTION,
+                timeout_ms=config.SQL_COST_DOWNGRADE_TIMEOUT_MS,
+                cache_size=config.SQL_COST_PLAN_CACHE_SIZE,
+                cache_ttl=config.SQL_COST_PLAN_CACHE_TTL,
+            )
+        return _guard
@@ -1,13 +1,64 @@
 """Database connection and query execution."""
 
+import json
+import re
 import ssl
-from contextlib import contextmanager
+import threading
+from collections.abc import AsyncIterator, Generator
+from contextlib import aclosing, contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 import pymysql
 
+import config
 from config import DB_CONFIG
+from src.cache.result_cache import ResultCache
+from src.database.connection_pool import ConnectionPool
+from src.utils.async_bridge import iterate_in_thread
+from src.utils.executors import get_db_executor, get_stream_executor, run_in_executor
+from src.utils.sql_parser import SQLParser
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+_result_cache: ResultCache | None = None
+_result_cache_lock = threading.Lock()
+_stream_lock = threading.Lock()
+_stream_stats = {"open": 0, "rejected": 0}
+
+_UPDATE_TIME_SQL = """
+SELECT TABLE_NAME AS table_name, UPDATE_TIME AS update_time
+FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})
+"""
+_USE_STATEMENT = re.compile(r"\s*use\s", re.IGNORECASE)
+
+
+class StreamLimitError(RuntimeError):
+    """Raised when DB_STREAM_MAX_CONCURRENT streams are already open."""
+
+
+class RowChunk(NamedTuple):
+    """A batch of rows from DatabaseConnector.stream_query()."""
+
+    columns: list[str]
+    rows: list[dict[str, Any]] | list[tuple]  # Tuples when streamed with tuples=True
+    done: bool = False  # Last chunk of the stream
+    truncated: bool = False  # The result had more rows than max_rows
+    description: tuple = ()  # PEP 249 cursor.description (column types)
+
+
+class QueryResult(NamedTuple):
+    """Rows read under a row limit or the result-size ceilings."""
+
+    rows: list[dict[str, Any]]
+    truncated: bool = False  # More rows were available than were read
+
+
+def _row_size(row: dict[str, Any] | tuple) -> int:
+    """Approximate payload bytes of a row (string/bytes length, 8 for other values)."""
+    values = row.values() if isinstance(row, dict) else row
+    return sum(len(value) if isinstance(value, str | bytes) else 8 for value in values)
 
 
 class DatabaseConnector:
@@ -32,16 +83,22 @@ class DatabaseConnector:
         }
 
     @staticmethod
-    @contextmanager
-    def get_connection():
-        """
-        Get database connection with context manager.
-
-        Yields:
-            Connection: PyMySQL connection object
-        """
+    def _build_ssl_context() -> ssl.SSLContext | None:
+        """Build an SSL context from the certificate files, if they exist."""
         ssl_config = DatabaseConnector._prepare_ssl_config()
+        if ssl_config is None:
+            return None
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = ssl_config["check_hostname"]
+        context.verify_mode = ssl_config["verify_mode"]
+        context.load_verify_locations(cafile=ssl_config["ca"])
+        context.load_cert_chain(ssl_config["cert"], keyfile=ssl_config["key"])
+        return context
 
+    @staticmethod
+    def _connection_params(ssl_config: ssl.SSLContext | dict[str, Any] | None) -> dict[str, Any]:
+        """Build PyMySQL connection parameters."""
         conn_params = {
             "host": DB_CONFIG.host,
             "port": DB_CONFIG.port,
@@ -55,7 +112,19 @@ class DatabaseConnector:
         if DB_CONFIG.database:
             conn_params["database"] = DB_CONFIG.database
 
-        connection = pymysql.connect(**conn_params)
+        return conn_params
+
+    @staticmethod
+    @contextmanager
+    def get_connection():
+        """
+        Get a dedicated (unpooled) database connection with context manager.
+
+        Yields:
+            Connection: PyMySQL connection object
+        """
+        ssl_config = DatabaseConnector._prepare_ssl_config()
+        connection = pymysql.connect(**DatabaseConnector._connection_params(ssl_config))
 
         try:
             yield connection
@@ -63,21 +132,407 @@ class DatabaseConnector:
             connection.close()
 
     @staticmethod
-    def execute_query(sql: str) -> list[dict[str, Any]]:
+    def get_pool() -> ConnectionPool:
+        """
+        Get the shared connection pool, creating it on first use.
+
+        The SSL context is built once here and reused by every pooled connection.
+
+        Returns:
+            Process-wide ConnectionPool
+        """
+        global _pool
+        with _pool_lock:
+            if _pool is None:
+                conn_params = DatabaseConnector._connection_params(
+                    DatabaseConnector._build_ssl_context()
+                )
+                _pool = ConnectionPool(
+                    connect=lambda: pymysql.connect(**conn_params),
+                    min_size=DB_CONFIG.pool_min_size,
+                    max_size=DB_CONFIG.pool_max_size,
+                    timeout=DB_CONFIG.pool_timeout,
+                    idle_timeout=DB_CONFIG.pool_idle_timeout,
+                    max_lifetime=DB_CONFIG.pool_max_lifetime,
+                    health_check_interval=DB_CONFIG.pool_health_check_interval,
+                    reset=DatabaseConnector._reset_session,
+                )
+            return _pool
+
+    @staticmethod
+    def _reset_session(connection: Any) -> None:
+        """
+        Restore the default database on a connection returned to the pool.
+
+        A ``USE`` statement would otherwise carry over to the next borrower. Without
+        a configured default there is nothing to switch back to, so stream_query()
+        discards connections that ran ``USE`` instead.
+        """
+        if DB_CONFIG.database:
+            connection.select_db(DB_CONFIG.database)
+
+    @staticmethod
+    def reset_pool() -> None:
+        """Close the shared pool so the next call builds a fresh one."""
+        global _pool
+        with _pool_lock:
+            pool, _pool = _pool, None
+        if pool is not None:
+            pool.close()
+
+    @staticmethod
+    @contextmanager
+    def pooled_connection():
+        """
+        Borrow a connection from the shared pool.
+
+        Yields:
+            Connection: PyMySQL connection object
+        """
+        with DatabaseConnector.get_pool().connection() as connection:
+            yield connection
+
+    @staticmethod
+    def pool_stats() -> dict[str, Any]:
+        """Return connection pool metrics."""
+        return DatabaseConnector.get_pool().stats()
+
+    @staticmethod
+    @contextmanager
+    def stream_slot():
+        """
+        Hold one of the DB_STREAM_MAX_CONCURRENT slots for a long-lived stream.
+
+        Streams keep a pooled connection and a stream executor thread for as long
+        as the client reads, so their number is capped below the pool size.
+
+        Raises:
+            StreamLimitError: If every slot is taken
+        """
+        with _stream_lock:
+            if _stream_stats["open"] >= DB_CONFIG.stream_max_concurrent:
+                _stream_stats["rejected"] += 1
+                msg = f"Too many concurrent streams (limit {DB_CONFIG.stream_max_concurrent})"
+                raise StreamLimitError(msg)
+            _stream_stats["open"] += 1
+        try:
+            yield
+        finally:
+            with _stream_lock:
+                _stream_stats["open"] -= 1
+
+    @staticmethod
+    def stream_stats() -> dict[str, Any]:
+        """Return open and rejected stream counts."""
+        with _stream_lock:
+            return {**_stream_stats, "max_concurrent": DB_CONFIG.stream_max_concurrent}
+
+    @staticmethod
+    def get_result_cache() -> ResultCache | None:
+        """Return the process-wide query result cache, or None when it is disabled."""
+        global _result_cache
+        if not config.RESULT_CACHE_ENABLED:
+            return None
+        with _result_cache_lock:
+            if _result_cache is None:
+                interval = config.RESULT_CACHE_WATERMARK_INTERVAL
+                _result_cache = ResultCache(
+                    max_bytes=config.RESULT_CACHE_MAX_MB * 1024 * 1024,
+                    ttl_seconds=config.RESULT_CACHE_TTL_SECONDS,
+                    table_ttls=config.RESULT_CACHE_TABLE_TTLS,
+                    watermark_source=DatabaseConnector.table_watermarks if interval > 0 else None,
+                    watermark_interval=interval,
+                )
+            return _result_cache
+
+    @staticmethod
+    def invalidate_cache(table: str | None = None) -> int:
+        """
+        Drop cached query results.
+
+        Args:
+            table: Only drop results that read this table (default: everything)
+
+        Returns:
+            Number of entries removed
+        """
+        cache = DatabaseConnector.get_result_cache()
+        if cache is None:
+            return 0
+        if table is not None:
+            return cache.invalidate_table(table)
+        entries = cache.stats()["entries"]
+        cache.clear()
+        return entries
+
+    @staticmethod
+    def table_watermarks(tables: list[str]) -> dict[str, Any]:
+        """
+        Read change watermarks used to invalidate cached results.
+
+        Combines information_schema.TABLES.UPDATE_TIME with MAX() of the table's
+        column from config.RESULT_CACHE_WATERMARK_COLUMNS, because InnoDB's
+        UPDATE_TIME is not persisted and may lag behind information_schema_stats_expiry.
+        A configured column must be indexed (e.g. the primary key); otherwise every
+        poll is a full scan of the table.
+
+        Args:
+            tables: Table names in the connection's current database
+
+        Returns:
+            Mapping of table name to an opaque, comparable watermark
+        """
+        with DatabaseConnector.pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    _UPDATE_TIME_SQL.format(placeholders=", ".join(["%s"] * len(tables))),
+                    tuple(tables),
+                )
+                update_times = {row["table_name"]: row["update_time"] for row in cursor.fetchall()}
+                watermarks = {}
+                for table in tables:
+                    if table not in update_times:
+                        continue
+                    column = config.RESULT_CACHE_WATERMARK_COLUMNS.get(table)
+                    latest = None
+                    if column is not None:
+                        # Names come from information_schema above, so quoting is safe.
+                        cursor.execute(f"SELECT MAX(`{column}`) AS latest FROM `{table}`")
+                        latest = cursor.fetchone()["latest"]
+                    watermarks[table] = (update_times[table], latest)
+                return watermarks
+
+    @staticmethod
+    def result_cache_stats() -> dict[str, Any] | None:
+        """Return query result cache metrics (None when the cache is disabled)."""
+        cache = DatabaseConnector.get_result_cache()
+        return cache.stats() if cache is not None else None
+
+    @staticmethod
+    def execute_query(sql: str, use_cache: bool = True) -> list[dict[str, Any]]:
         """
         Execute SQL query and return results.
 
+        Cacheable SELECTs are served from the result cache when possible. Rows
+        beyond DB_RESULT_MAX_ROWS / DB_RESULT_MAX_BYTES are dropped with a
+        warning; use execute_bounded() to learn whether that happened.
+
         Args:
             sql: SQL query to execute
+            use_cache: Consult and fill the result cache
 
         Returns:
             List of result rows as dictionaries
         """
-        with DatabaseConnector.get_connection() as conn:
+        result = DatabaseConnector.execute_bounded(sql, use_cache=use_cache)
+        if result.truncated:
+            print(f"[WARN] 查詢結果超過上限，已截斷為 {len(result.rows)} 筆: {sql[:200]}")
+        return result.rows
+
+    @staticmethod
+    def execute_bounded(sql: str, row_limit: int = 0, use_cache: bool = True) -> QueryResult:
+        """
+        Execute SQL reading at most ``row_limit`` rows and never more than the result ceilings.
+
+        With a row limit the outermost SELECT is rewritten to LIMIT row_limit + 1
+        (SQLParser.apply_limit), so the database stops early and the extra row
+        tells whether the result was cut off. Rows are read with a server-side
+        cursor and reading stops at DB_CONFIG.result_max_rows/result_max_bytes,
+        so an unbounded query is truncated instead of exhausting memory. Only
+        complete results are cached.
+
+        Args:
+            sql: SQL query to execute
+            row_limit: Rows the caller needs (0 = full results)
+            use_cache: Consult and fill the result cache
+
+        Returns:
+            The rows, and whether more were available
+        """
+        if row_limit > 0:
+            sql = SQLParser.apply_limit(sql, row_limit + 1)
+
+        cache = DatabaseConnector.get_result_cache() if use_cache else None
+        rows = cache.get(sql) if cache is not None else None
+        truncated = False
+        if rows is None:
+            started = cache.clock() if cache is not None else None
+            rows, truncated = DatabaseConnector.execute_limited(sql, DB_CONFIG.result_max_rows)
+            if cache is not None and not truncated:
+                cache.put(sql, rows, started)
+
+        if 0 < row_limit < len(rows):
+            rows, truncated = rows[:row_limit], True
+        return QueryResult(rows, truncated)
+
+    @staticmethod
+    async def aexecute_query(sql: str, use_cache: bool = True) -> list[dict[str, Any]]:
+        """
+        Execute SQL query on the database executor without blocking the event loop.
+
+        Args:
+            sql: SQL query to execute
+            use_cache: Consult and fill the result cache
+
+        Returns:
+            List of result rows as dictionaries
+        """
+        return await run_in_executor(
+            get_db_executor(), DatabaseConnector.execute_query, sql, use_cache
+        )
+
+    @staticmethod
+    async def aexecute_bounded(sql: str, row_limit: int = 0, use_cache: bool = True) -> QueryResult:
+        """Async version of execute_bounded(), run on the database executor."""
+        return await run_in_executor(
+            get_db_executor(), DatabaseConnector.execute_bounded, sql, row_limit, use_cache
+        )
+
+    @staticmethod
+    def stream_query(
+        sql: str,
+        chunk_size: int | None = None,
+        max_rows: int | None = None,
+        tuples: bool = False,
+        max_bytes: int | None = None,
+    ) -> Generator[RowChunk, None, None]:
+        """
+        Execute SQL with an unbuffered server-side cursor and yield rows in chunks.
+
+        Rows are read from the socket as they are consumed, so memory stays bounded
+        by ``chunk_size`` and the first chunk arrives before the query finishes.
+        The result cache is bypassed. A stream that is closed early or cut off at
+        ``max_rows`` or ``max_bytes`` still has unread rows on the connection, so
+        that connection is closed instead of returned to the pool (draining it
+        could take longer than the query itself).
+
+        Args:
+            sql: SQL query to execute
+            chunk_size: Rows per chunk (default: DB_CONFIG.stream_chunk_size)
+            max_rows: Stop after this many rows (default: DB_CONFIG.stream_max_rows)
+            tuples: Yield rows as tuples in column order instead of dicts
+            max_bytes: Stop before the approximate payload exceeds this (default: no limit)
+
+        Yields:
+            A header chunk with the column names and no rows, then row chunks; the
+            last chunk has ``done`` set and reports whether rows were cut off
+        """
+        chunk_size = chunk_size or DB_CONFIG.stream_chunk_size
+        max_rows = DB_CONFIG.stream_max_rows if max_rows is None else max_rows
+
+        pool = DatabaseConnector.get_pool()
+        conn = pool.acquire()
+        reusable = False
+        try:
+            cursor_class = pymysql.cursors.SSCursor if tuples else pymysql.cursors.SSDictCursor
+            cursor = conn.cursor(cursor_class)
+            cursor.execute(sql)
+            description = tuple(cursor.description or ())
+            columns = [column[0] for column in description]
+            yield RowChunk(columns, [], description=description)
+
+            row_count = 0
+            size = 0
+            truncated = False
+            while row_count < max_rows and not truncated:
+                rows = cursor.fetchmany(min(chunk_size, max_rows - row_count))
+                if not rows:
+                    break
+                if max_bytes:
+                    for index, row in enumerate(rows):
+                        size += _row_size(row)
+                        if size > max_bytes:
+                            rows, truncated = rows[:index], True
+                            break
+                row_count += len(rows)
+                if rows:
+                    yield RowChunk(columns, rows, description=description)
+
+            if not truncated:
+                truncated = row_count >= max_rows and cursor.fetchone() is not None
+            if not truncated:
+                cursor.close()
+                reusable = bool(DB_CONFIG.database) or not _USE_STATEMENT.match(sql)
+            yield RowChunk(columns, [], True, truncated, description)
+        finally:
+            pool.release(conn, discard=not reusable)
+
+    @staticmethod
+    async def astream_query(
+        sql: str, chunk_size: int | None = None, max_rows: int | None = None
+    ) -> AsyncIterator[RowChunk]:
+        """
+        Async version of stream_query(), read on the stream executor.
+
+        The stream holds a stream_slot() until it ends. Closing the iterator early
+        (e.g. on client disconnect) stops the read and discards the connection.
+
+        Args:
+            sql: SQL query to execute
+            chunk_size: Rows per chunk (default: DB_CONFIG.stream_chunk_size)
+            max_rows: Stop after this many rows (default: DB_CONFIG.stream_max_rows)
+
+        Yields:
+            Chunks as described in stream_query()
+
+        Raises:
+            StreamLimitError: If DB_STREAM_MAX_CONCURRENT streams are already open
+        """
+        with DatabaseConnector.stream_slot():
+            chunks = iterate_in_thread(
+                lambda: DatabaseConnector.stream_query(sql, chunk_size, max_rows),
+                maxsize=2,
+                executor=get_stream_executor(),
+            )
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    yield chunk
+
+    @staticmethod
+    def execute_limited(sql: str, max_rows: int, max_bytes: int | None = None) -> QueryResult:
+        """
+        Execute SQL and read at most ``max_rows`` rows, bypassing the result cache.
+
+        Args:
+            sql: SQL query to execute
+            max_rows: Row limit
+            max_bytes: Approximate payload limit (default: DB_CONFIG.result_max_bytes)
+
+        Returns:
+            (rows, truncated) where truncated tells whether more rows were available
+        """
+        if max_bytes is None:
+            max_bytes = DB_CONFIG.result_max_bytes
+        rows: list[dict[str, Any]] = []
+        truncated = False
+        for chunk in DatabaseConnector.stream_query(sql, max_rows=max_rows, max_bytes=max_bytes):
+            rows.extend(chunk.rows)
+            truncated = chunk.truncated
+        return QueryResult(rows, truncated)
+
+    @staticmethod
+    async def aexecute_limited(sql: str, max_rows: int) -> QueryResult:
+        """Async version of execute_limited(), run on the database executor."""
+        return await run_in_executor(
+            get_db_executor(), DatabaseConnector.execute_limited, sql, max_rows
+        )
+
+    @staticmethod
+    def explain(sql: str) -> dict[str, Any]:
+        """
+        Return the optimizer's plan for a statement without running it.
+
+        Args:
+            sql: SQL statement
+
+        Returns:
+            The parsed EXPLAIN FORMAT=JSON document
+        """
+        with DatabaseConnector.pooled_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(sql)
-                results = cursor.fetchall()
-                return results
+                cursor.execute(f"EXPLAIN FORMAT=JSON {sql}")
+                row = cursor.fetchone()
+        return json.loads(next(iter(row.values())))
 
     @staticmethod
     def test_connection() -> bool:
@@ -88,7 +543,7 @@ class DatabaseConnector:
             True if connection successful, False otherwise
         """
         try:
-            with DatabaseConnector.get_connection() as conn:
+            with DatabaseConnector.pooled_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("SELECT 1")
                     return True
@@ -1,19 +1,33 @@
 """Abstract interface for language models."""
 
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from typing import Any
+
+from src.utils.async_bridge import iterate_in_thread
+from src.utils.executors import get_model_executor, run_in_executor
 
 
 class ILanguageModel(ABC):
-    """Abstract interface for language model implementations."""
+    """
+    Abstract interface for language model implementations.
+
+    Implementations end generation at any of ``stop_sequences`` and leave the
+    matched sequence out of the returned text (as hosted APIs do).
+    """
+
+    stop_sequences: tuple[str, ...] = ()
 
     @abstractmethod
-    def generate(self, prompt: str, max_tokens: int = 512) -> str:
+    def generate(self, prompt: str, max_tokens: int = 512, temperature: float | None = None) -> str:
         """
         Generate text based on the given prompt.
 
         Args:
             prompt: Input prompt for the model
             max_tokens: Maximum number of tokens to generate
+            temperature: Sampling temperature for this call (default: the model's)
 
         Returns:
             Generated text response
@@ -26,3 +40,67 @@ class ILanguageModel(ABC):
     @abstractmethod
     def is_initialized(self) -> bool:
         """Check if the model is initialized and ready to use."""
+
+    def cache_identity(self) -> dict[str, Any]:
+        """
+        Return the settings that determine the output for a given prompt.
+
+        Used to key generation caches. Implementations with additional
+        output-affecting options extend this mapping.
+        """
+        return {
+            "provider": type(self).__name__,
+            "model": getattr(self, "model_id", None) or getattr(self, "model_name", None),
+            "temperature": getattr(self, "temperature", None),
+            "top_p": getattr(self, "top_p", None),
+            "stop_sequences": list(self.stop_sequences),
+        }
+
+    async def agenerate(
+        self, prompt: str, max_tokens: int | None = None, temperature: float | None = None
+    ) -> str:
+        """
+        Generate text without blocking the event loop.
+
+        The default implementation runs generate() on the model executor.
+
+        Args:
+            prompt: Input prompt for the model
+            max_tokens: Maximum number of tokens to generate (default: model default)
+            temperature: Sampling temperature for this call (default: the model's)
+
+        Returns:
+            Generated text response
+        """
+        args = (prompt,) if max_tokens is None else (prompt, max_tokens)
+        if temperature is None:
+            return await run_in_executor(get_model_executor(), self.generate, *args)
+        return await run_in_executor(
+            get_model_executor(), self.generate, *args, temperature=temperature
+        )
+
+    async def agenerate_stream(
+        self, prompt: str, max_tokens: int | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text without blocking the event loop.
+
+        generate_stream() runs on a worker thread; closing this iterator early stops it.
+        Models without generate_stream() yield the full response as one chunk.
+
+        Args:
+            prompt: Input prompt for the model
+            max_tokens: Maximum number of tokens to generate (default: model default)
+
+        Yields:
+            Generated text tokens
+        """
+        generate_stream = getattr(self, "generate_stream", None)
+        if generate_stream is None:
+            yield await self.agenerate(prompt, max_tokens)
+            return
+
+        args = (prompt,) if max_tokens is None else (prompt, max_tokens)
+        async with aclosing(iterate_in_thread(lambda: generate_stream(*args))) as stream:
+            async for token in stream:
+                yield token
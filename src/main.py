@@ -1,8 +1,12 @@
 """Main entry point for Text-to-SQL CLI."""
 
-from config import FULL_SCHEMA
+from config import FULL_SCHEMA, SQL_AUTO_LIMIT_CLI
+from src.cache.generation_cache import get_generation_cache
+from src.cache.semantic_cache import get_semantic_cache
+from src.database.cost_guard import get_cost_guard
 from src.database.db_connector import DatabaseConnector
 from src.models.huggingface_model import HuggingFaceModel
+from src.schema.schema_linker import get_schema_linker
 from src.services.text_to_sql_service import TextToSQLService
 
 
@@ -11,7 +15,12 @@ def main() -> None:
     print("初始化 Text-to-SQL 系統...")
 
     model = HuggingFaceModel(device="cpu")
-    service = TextToSQLService(model)
+    service = TextToSQLService(
+        model,
+        get_schema_linker(),
+        generation_cache=get_generation_cache(),
+        semantic_cache=get_semantic_cache(),
+    )
 
     print("系統初始化完成！\n")
     print("資料庫 Schema:")
@@ -59,13 +68,18 @@ def main() -> None:
         execute = input("\n是否執行此 SQL？(y/n): ").strip().lower()
         if execute == "y":
             try:
-                results = DatabaseConnector.execute_query(sql)
-                print(f"\n查詢結果 ({len(results)} 筆):")
+                run_sql = sql
+                cost_guard = get_cost_guard()
+                if cost_guard is not None:
+                    run_sql = cost_guard.enforce(sql)
+                results, truncated = DatabaseConnector.execute_bounded(run_sql, SQL_AUTO_LIMIT_CLI)
+                more = "+" if truncated else ""
+                print(f"\n查詢結果 ({len(results)}{more} 筆):")
                 print("-" * 80)
                 for i, row in enumerate(results[:10], 1):
                     print(f"{i}. {row}")
                 if len(results) > 10:
-                    print(f"... 還有 {len(results) - 10} 筆資料")
+                    print(f"... 還有 {len(results) - 10}{more} 筆資料")
                 print("-" * 80)
             except Exception as e:
                 print(f"\n執行錯誤: {e}")
@@ -0,0 +1,196 @@
+"""Micro-batching scheduler for local model generation."""
+
+import queue
+import threading
+import time
+from collections.abc import Callable, Generator
+from dataclasses import dataclass, field
+from typing import Any
+
+_END = object()
+_STOP = object()
+
+
+@dataclass
+class GenerationRequest:
+    """A single prompt waiting to be generated as part of a batch."""
+
+    prompt: str
+    max_tokens: int
+    stream: bool = False
+    temperature: float | None = None
+    payload: Any = None
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    done: threading.Event = field(default_factory=threading.Event)
+    result: str | None = None
+    error: BaseException | None = None
+    _chunks: queue.Queue = field(default_factory=queue.Queue)
+
+    def emit(self, text: str) -> None:
+        """Deliver a streamed text chunk to the caller."""
+        if self.stream and text:
+            self._chunks.put(text)
+
+    def finish(self, result: str | None = None, error: BaseException | None = None) -> None:
+        """Complete the request with a result or an error."""
+        if self.done.is_set():
+            return
+        self.result = result
+        self.error = error
+        self.done.set()
+        if self.stream:
+            self._chunks.put(_END)
+
+    def cancel(self) -> None:
+        """Ask the scheduler to stop generating for this request."""
+        self.cancelled.set()
+
+    def wait(self) -> str:
+        """Block until the request completes and return the generated text."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result or ""
+
+    def iter_chunks(self) -> Generator[str, None, None]:
+        """Yield streamed chunks; closing the generator early cancels the request."""
+        try:
+            while True:
+                chunk = self._chunks.get()
+                if chunk is _END:
+                    break
+                yield chunk
+            if self.error is not None:
+                raise self.error
+        finally:
+            if not self.done.is_set():
+                self.cancel()
+
+
+class BatchScheduler:
+    """
+    Collects concurrent generation requests into micro-batches.
+
+    A single worker thread takes the first waiting request, keeps collecting
+    for up to ``max_wait_ms`` (or until ``max_batch_size`` requests are
+    waiting), then hands the whole batch to ``run_batch``. ``run_batch`` must
+    complete every request it receives via ``GenerationRequest.finish``.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list[GenerationRequest]], None],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        name: str = "batch-scheduler",
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            run_batch: Callable that generates a batch of requests
+            max_batch_size: Maximum requests per batch
+            max_wait_ms: How long to wait for more requests after the first one arrives
+            name: Worker thread name
+        """
+        self._run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_observed = 0
+
+    def submit(self, request: GenerationRequest) -> GenerationRequest:
+        """
+        Queue a request for the next batch.
+
+        Args:
+            request: Request to generate
+
+        Returns:
+            The same request, for chaining wait() / iter_chunks()
+        """
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._loop, name=self._name, daemon=True)
+                self._worker.start()
+        self._queue.put(request)
+        return request
+
+    def close(self) -> None:
+        """Stop the worker after the current batch."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(_STOP)
+
+    def stats(self) -> dict[str, Any]:
+        """Return batching statistics."""
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size_seen": self._max_observed,
+                "queued": self._queue.qsize(),
+            }
+
+    def _loop(self) -> None:
+        """Worker loop: collect a batch, run it, repeat."""
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch, stopping = self._collect(first)
+            batch = self._drop_cancelled(batch)
+            if batch:
+                with self._lock:
+                    self._batches += 1
+                    self._requests += len(batch)
+                    self._max_observed = max(self._max_observed, len(batch))
+                try:
+                    self._run_batch(batch)
+                except BaseException as e:
+                    for request in batch:
+                        request.finish(error=e)
+                # Safety net: a runner must never leave a caller waiting forever.
+                for request in batch:
+                    request.finish(error=RuntimeError("Generation finished without a result"))
+
+            if stopping:
+                return
+
+    def _collect(self, first: GenerationRequest) -> tuple[list[GenerationRequest], bool]:
+        """Gather more requests until the batch is full or the wait window closes."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = (
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    @staticmethod
+    def _drop_cancelled(batch: list[GenerationRequest]) -> list[GenerationRequest]:
+        """Complete requests cancelled while queued instead of generating them."""
+        active = []
+        for request in batch:
+            if request.cancelled.is_set():
+                request.finish(result="")
+            else:
+                active.append(request)
+        return active
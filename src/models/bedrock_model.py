@@ -1,9 +1,13 @@
 """AWS Bedrock Claude model implementation."""
 
+import math
+import threading
 from collections.abc import Generator
 
 import config
 from src.interfaces.language_model import ILanguageModel
+from src.models.rate_limiter import estimate_tokens, get_rate_limiter
+from src.models.resilience import Resilience
 
 try:
     import boto3
@@ -24,6 +28,7 @@ class BedrockModel(ILanguageModel):
         temperature: float | None = None,
         top_p: float | None = None,
         max_tokens: int | None = None,
+        stop_sequences: list[str] | None = None,
         aws_access_key_id: str | None = None,
         aws_secret_access_key: str | None = None,
     ):
@@ -36,6 +41,7 @@ class BedrockModel(ILanguageModel):
             temperature: Generation temperature
             top_p: Top-p sampling parameter
             max_tokens: Maximum tokens to generate
+            stop_sequences: Strings that end generation (default: from config.py)
             aws_access_key_id: AWS access key ID
             aws_secret_access_key: AWS secret access key
         """
@@ -48,11 +54,21 @@ class BedrockModel(ILanguageModel):
         self.temperature = temperature or config.MODEL_TEMPERATURE
         self.top_p = top_p or config.MODEL_TOP_P
         self.max_tokens = max_tokens or config.MODEL_MAX_TOKENS
+        self.stop_sequences = tuple(
+            stop_sequences if stop_sequences is not None else config.MODEL_STOP_SEQUENCES
+        )
         self.aws_access_key_id = aws_access_key_id or config.AWS_ACCESS_KEY_ID
         self.aws_secret_access_key = aws_secret_access_key or config.AWS_SECRET_ACCESS_KEY
 
+        self.rate_limiter = get_rate_limiter("bedrock")
+        self.resilience = Resilience(f"bedrock:{self.model_id}")
+
         self._initialized = False
         self.client = None
+        self._session = None
+        self._boto_config = None
+        self._clients: dict[int, object] = {}
+        self._clients_lock = threading.Lock()
 
     def initialize(self) -> None:
         """Initialize Bedrock client."""
@@ -71,9 +87,14 @@ class BedrockModel(ILanguageModel):
                 region_name=self.region,
                 read_timeout=config.REQUEST_TIMEOUT,
                 connect_timeout=config.REQUEST_TIMEOUT,
+                # Retries are done by self.resilience (backoff, deadline, circuit breaker).
+                retries={"max_attempts": 0},
             )
 
             self.client = session.client("bedrock-runtime", config=boto_config)
+            self._session = session
+            self._boto_config = boto_config
+            self._clients = {math.ceil(config.REQUEST_TIMEOUT): self.client}
             self._initialized = True
 
             print(f"✓ Bedrock 模型已初始化: {self.model_id}")
@@ -83,13 +104,20 @@ class BedrockModel(ILanguageModel):
             msg = f"Failed to initialize Bedrock client: {e}"
             raise RuntimeError(msg) from e
 
-    def generate(self, prompt: str, max_tokens: int | None = None) -> str:
+    def generate(
+        self, prompt: str, max_tokens: int | None = None, temperature: float | None = None
+    ) -> str:
         """
         Generate text using Bedrock Claude model.
 
+        Each attempt waits its turn in the provider's rate limiter. Throttling and
+        5xx errors are retried with backoff; while Bedrock keeps failing, the
+        circuit breaker fails calls fast.
+
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens to generate (optional)
+            temperature: Sampling temperature for this call (optional)
 
         Returns:
             Generated text
@@ -102,20 +130,18 @@ class BedrockModel(ILanguageModel):
         try:
             import json
 
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "temperature": self.temperature,
-                "top_p": self.top_p,
-                "messages": [{"role": "user", "content": prompt}],
-            }
-
-            response = self.client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(body),
-            )
+            body = json.dumps(self._request_body(prompt, max_tokens, temperature))
+
+            cost = estimate_tokens(prompt, max_tokens)
 
-            response_body = json.loads(response["body"].read())
+            def invoke(timeout: float):
+                with self.rate_limiter.acquire(cost):
+                    response = self._client_for(timeout).invoke_model(
+                        modelId=self.model_id, body=body
+                    )
+                    return json.loads(response["body"].read())
+
+            response_body = self.resilience.call(invoke)
             return response_body["content"][0]["text"]
 
         except Exception as e:
@@ -128,6 +154,10 @@ class BedrockModel(ILanguageModel):
         """
         Generate text using Bedrock with streaming.
 
+        Opening the stream is rate limited and retried like generate(); once text
+        has been yielded a failure is raised instead. The in-flight slot is held
+        until the stream ends.
+
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens to generate
@@ -143,30 +173,59 @@ class BedrockModel(ILanguageModel):
         try:
             import json
 
-            body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "temperature": self.temperature,
-                "top_p": self.top_p,
-                "messages": [{"role": "user", "content": prompt}],
-            }
-
-            response = self.client.invoke_model_with_response_stream(
-                modelId=self.model_id,
-                body=json.dumps(body),
-            )
+            body = json.dumps(self._request_body(prompt, max_tokens))
 
-            for event in response["body"]:
-                chunk = json.loads(event["chunk"]["bytes"])
+            cost = estimate_tokens(prompt, max_tokens)
 
-                if chunk["type"] == "content_block_delta":
-                    if chunk["delta"]["type"] == "text_delta":
-                        yield chunk["delta"]["text"]
+            def open_stream(timeout: float):
+                with self.rate_limiter.acquire(cost):
+                    response = self._client_for(timeout).invoke_model_with_response_stream(
+                        modelId=self.model_id, body=body
+                    )
+                    for event in response["body"]:
+                        chunk = json.loads(event["chunk"]["bytes"])
+
+                        if chunk["type"] == "content_block_delta":
+                            if chunk["delta"]["type"] == "text_delta":
+                                yield chunk["delta"]["text"]
+
+            yield from self.resilience.stream(open_stream)
 
         except Exception as e:
             msg = f"Bedrock streaming failed: {e}"
             raise RuntimeError(msg) from e
 
+    def _client_for(self, timeout: float):
+        """
+        Return a client whose read timeout is ``timeout`` rounded up to whole seconds.
+
+        botocore fixes the read timeout per client, so an attempt that has to end
+        by the generation deadline gets a client with a shorter one. At most one
+        client per second of REQUEST_TIMEOUT is ever created.
+        """
+        seconds = math.ceil(timeout)
+        with self._clients_lock:
+            client = self._clients.get(seconds)
+            if client is None:
+                client = self._clients[seconds] = self._session.client(
+                    "bedrock-runtime",
+                    config=self._boto_config.merge(BotoConfig(read_timeout=seconds)),
+                )
+        return client
+
+    def _request_body(self, prompt: str, max_tokens: int, temperature: float | None = None) -> dict:
+        """Build the Anthropic Messages request body."""
+        body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "temperature": self.temperature if temperature is None else temperature,
+            "top_p": self.top_p,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if self.stop_sequences:
+            body["stop_sequences"] = list(self.stop_sequences)
+        return body
+
     def is_initialized(self) -> bool:
         """Check if model is initialized."""
         return self._initialized
@@ -174,4 +233,5 @@ class BedrockModel(ILanguageModel):
     def cleanup(self) -> None:
         """Cleanup resources."""
         self.client = None
+        self._clients = {}
         self._initialized = False
@@ -0,0 +1,462 @@
+"""Composite model that hedges slow providers and falls back along a provider chain."""
+
+import asyncio
+import bisect
+import threading
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import ExitStack, aclosing
+from dataclasses import dataclass, field
+from typing import Any
+
+import config
+from src.interfaces.language_model import ILanguageModel
+from src.models.model_registry import ModelRegistry, get_model_registry
+
+# Bucket upper bounds in seconds: 10 ms to ~2 min, 25% apart.
+_BUCKETS = tuple(0.01 * 1.25**index for index in range(43))
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram with cheap aging.
+
+    Counts are halved whenever ``max_samples`` is reached, so percentiles follow
+    the provider's recent behaviour instead of its whole history.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        """
+        Initialize the histogram.
+
+        Args:
+            max_samples: Sample count at which older observations are decayed
+        """
+        self.max_samples = max_samples
+        self._counts = [0] * (len(_BUCKETS) + 1)
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        """Record one latency."""
+        index = bisect.bisect_left(_BUCKETS, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._total += 1
+            if self._total >= self.max_samples:
+                self._counts = [count // 2 for count in self._counts]
+                self._total = sum(self._counts)
+
+    @property
+    def count(self) -> int:
+        """Number of (decayed) samples."""
+        return self._total
+
+    def percentile(self, percent: float) -> float | None:
+        """
+        Return the bucket bound below which ``percent`` % of samples fall.
+
+        Args:
+            percent: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None without samples
+        """
+        with self._lock:
+            if self._total == 0:
+                return None
+            rank = self._total * percent / 100
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if count and seen >= rank:
+                    return _BUCKETS[min(index, len(_BUCKETS) - 1)]
+        return _BUCKETS[-1]
+
+    def stats(self) -> dict[str, Any]:
+        """Return sample count and common percentiles."""
+        return {
+            "samples": self.count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+def parse_chain(chain: str) -> list[tuple[str, str | None]]:
+    """
+    Parse a provider chain such as "genai>bedrock>local:Qwen/Qwen2.5-0.5B-Instruct".
+
+    Args:
+        chain: Providers in priority order, separated by ">", each "provider" or
+            "provider:model_id"
+
+    Returns:
+        (provider, model_id) pairs
+    """
+    providers = []
+    for spec in chain.split(">"):
+        provider, _, model_id = spec.strip().partition(":")
+        if provider:
+            providers.append((provider.strip(), model_id.strip() or None))
+    return providers
+
+
+@dataclass
+class _ProviderState:
+    """One provider of the chain and its latency statistics."""
+
+    label: str
+    model: ILanguageModel
+    first_token: LatencyHistogram = field(default_factory=LatencyHistogram)
+    wins: int = 0
+    errors: int = 0
+    hedges: int = 0
+
+
+@dataclass
+class _Attempt:
+    """A request in flight to one provider."""
+
+    state: _ProviderState
+    started: float
+    task: asyncio.Task | None = None
+    tokens: list[str] = field(default_factory=list)
+    first_token: asyncio.Event = field(default_factory=asyncio.Event)
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+
+class HedgedFallbackModel(ILanguageModel):
+    """
+    Runs an ordered chain of providers as one model.
+
+    The first provider gets the request. If it has not produced a token by its
+    hedge deadline (a percentile of its recent time-to-first-token), the next
+    provider is started as well; a provider that fails hands over to the next one
+    immediately. The first attempt to finish wins (for streams: the first to
+    produce a token) and the others are cancelled, which stops local generation
+    and closes cloud streams.
+    """
+
+    def __init__(
+        self,
+        chain: list[tuple[str, str | None]] | str | None = None,
+        factory: Callable[..., ILanguageModel] | None = None,
+        registry: ModelRegistry | None = None,
+        hedge_percentile: float | None = None,
+        hedge_default_delay: float | None = None,
+        hedge_min_samples: int | None = None,
+        hedging: bool | None = None,
+    ):
+        """
+        Initialize the composite model.
+
+        Args:
+            chain: Providers in priority order, as (provider, model_id) pairs or a
+                parse_chain() string (default: from config.py)
+            factory: Callable building each provider; when omitted, providers are leased
+                from ``registry`` instead
+            registry: ModelRegistry to lease providers from, so a local model is shared
+                with the rest of the process rather than loaded again (default: the
+                process-wide registry, unless ``factory`` is given)
+            hedge_percentile: Time-to-first-token percentile used as the hedge deadline
+                (default: from config.py)
+            hedge_default_delay: Hedge deadline in seconds until enough samples exist
+                (default: from config.py)
+            hedge_min_samples: Samples needed before the percentile is trusted
+                (default: from config.py)
+            hedging: Start the next provider when the current one is slow; when False
+                providers are only tried after a failure (default: from config.py)
+        """
+        if chain is None:
+            chain = config.MODEL_FALLBACK_CHAIN
+        self.chain = parse_chain(chain) if isinstance(chain, str) else list(chain)
+        if not self.chain:
+            msg = "Fallback chain is empty. Set MODEL_FALLBACK_CHAIN, e.g. genai>bedrock>local"
+            raise ValueError(msg)
+        if factory is None and registry is None:
+            registry = get_model_registry()
+        self._factory = factory
+        self._registry = registry if factory is None else None
+        self._leases = ExitStack()
+        self.hedge_percentile = (
+            hedge_percentile if hedge_percentile is not None else config.MODEL_HEDGE_PERCENTILE
+        )
+        self.hedge_default_delay = (
+            hedge_default_delay
+            if hedge_default_delay is not None
+            else config.MODEL_HEDGE_DEFAULT_DELAY
+        )
+        self.hedge_min_samples = (
+            hedge_min_samples if hedge_min_samples is not None else config.MODEL_HEDGE_MIN_SAMPLES
+        )
+        self.hedging = hedging if hedging is not None else config.MODEL_HEDGE_ENABLED
+        self.providers: list[_ProviderState] = []
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def initialize(self) -> None:
+        """Create and initialize every provider; unavailable ones are skipped."""
+        with self._init_lock:
+            if self._initialized:
+                return
+
+            providers = []
+            for provider, model_id in self.chain:
+                label = f"{provider}:{model_id}" if model_id else provider
+                try:
+                    model = self._open(provider, model_id)
+                except Exception as e:
+                    print(f"[WARN] 備援模型 {label} 無法使用，已略過: {e}")
+                    continue
+                providers.append(_ProviderState(label=label, model=model))
+
+            if not providers:
+                msg = "No provider in the fallback chain could be initialized"
+                raise RuntimeError(msg)
+            self.providers = providers
+            self._initialized = True
+
+    def _open(self, provider: str, model_id: str | None) -> ILanguageModel:
+        """Lease a provider from the registry, or build it with the factory."""
+        if self._registry is not None:
+            # The lease pins the shared model until cleanup(), so the registry
+            # neither evicts it nor loads a second copy for this chain.
+            return self._leases.enter_context(self._registry.lease(provider, model_id))
+        model = self._factory(provider=provider, model_id=model_id)
+        if not model.is_initialized():
+            model.initialize()
+        return model
+
+    def is_initialized(self) -> bool:
+        """Check if the providers are initialized."""
+        return self._initialized
+
+    def cleanup(self) -> None:
+        """Release every provider (leased providers go back to the registry)."""
+        if self._registry is None:
+            for state in self.providers:
+                cleanup = getattr(state.model, "cleanup", None)
+                if callable(cleanup):
+                    cleanup()
+        self._leases.close()
+        self.providers = []
+        self._initialized = False
+
+    def cache_identity(self) -> dict[str, Any]:
+        """Outputs depend on every provider that may answer."""
+        return {
+            "provider": type(self).__name__,
+            "chain": [state.model.cache_identity() for state in self.providers]
+            or [list(link) for link in self.chain],
+        }
+
+    def hedge_delay(self, state: _ProviderState) -> float:
+        """Seconds to wait for a provider's first token before hedging."""
+        if state.first_token.count < self.hedge_min_samples:
+            return self.hedge_default_delay
+        delay = state.first_token.percentile(self.hedge_percentile)
+        return min(delay, config.REQUEST_TIMEOUT)
+
+    def runtime_stats(self) -> dict[str, Any]:
+        """Return per-provider latency percentiles, wins, errors and hedges."""
+        return {
+            "providers": {
+                state.label: {
+                    "first_token_seconds": state.first_token.stats(),
+                    "hedge_delay_seconds": round(self.hedge_delay(state), 3),
+                    "wins": state.wins,
+                    "errors": state.errors,
+                    "hedges": state.hedges,
+                }
+                for state in self.providers
+            }
+        }
+
+    def generate(self, prompt: str, max_tokens: int = 512, temperature: float | None = None) -> str:
+        """
+        Generate text from the fastest healthy provider.
+
+        Args:
+            prompt: Input prompt
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature for this call (default: each provider's)
+
+        Returns:
+            Generated text
+        """
+        return asyncio.run(self.agenerate(prompt, max_tokens, temperature))
+
+    async def agenerate(
+        self, prompt: str, max_tokens: int | None = None, temperature: float | None = None
+    ) -> str:
+        """
+        Generate text without blocking the event loop; the first attempt to finish wins.
+
+        Args:
+            prompt: Input prompt
+            max_tokens: Maximum tokens to generate (default: model default)
+            temperature: Sampling temperature for this call (default: each provider's)
+
+        Returns:
+            Generated text
+        """
+        async with aclosing(self._race(prompt, max_tokens, temperature, stream=False)) as race:
+            async for attempt in race:
+                await attempt.task
+                return "".join(attempt.tokens)
+        msg = "Fallback race ended without a result"
+        raise RuntimeError(msg)
+
+    async def agenerate_stream(
+        self, prompt: str, max_tokens: int | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream from the first provider to produce a token.
+
+        Once a provider has produced tokens it is committed to: an error after that
+        point is raised instead of switching providers mid-answer.
+
+        Args:
+            prompt: Input prompt
+            max_tokens: Maximum tokens to generate (default: model default)
+
+        Yields:
+            Generated text tokens
+        """
+        async with aclosing(self._race(prompt, max_tokens, None, stream=True)) as race:
+            async for attempt in race:
+                while True:
+                    token = await attempt.queue.get()
+                    if token is None:
+                        break
+                    yield token
+                await attempt.task
+                return
+
+    async def _race(self, prompt, max_tokens, temperature, stream: bool):
+        """
+        Run attempts along the chain and yield the winning one.
+
+        Non-stream races are won by the first attempt to finish, stream races by
+        the first to produce a token. Losing attempts are cancelled before the
+        winner is yielded; closing this generator cancels everything.
+        """
+        if not self._initialized:
+            await asyncio.to_thread(self.initialize)
+
+        pending = iter(self.providers)
+        running: dict[asyncio.Task, _Attempt] = {}
+        errors: list[str] = []
+        hedging = self.hedging
+
+        def start(state: _ProviderState) -> _Attempt:
+            attempt = _Attempt(state=state, started=time.monotonic())
+            attempt.task = asyncio.ensure_future(
+                self._run_attempt(attempt, prompt, max_tokens, temperature)
+            )
+            running[attempt.task] = attempt
+            return attempt
+
+        try:
+            newest = start(next(pending))
+            while running:
+                waiters = set(running)
+                timeout = None
+                if hedging and not newest.first_token.is_set():
+                    elapsed = time.monotonic() - newest.started
+                    timeout = max(self.hedge_delay(newest.state) - elapsed, 0)
+                first_tokens = []
+                if stream:
+                    first_tokens = [
+                        asyncio.ensure_future(attempt.first_token.wait())
+                        for attempt in running.values()
+                    ]
+                    waiters.update(first_tokens)
+                done, _ = await asyncio.wait(
+                    waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for waiter in first_tokens:
+                    waiter.cancel()
+
+                winner = None
+                failed = False
+                for task in done:
+                    attempt = running.get(task)
+                    if attempt is None:
+                        continue
+                    if task.cancelled() or task.exception() is not None:
+                        del running[task]
+                        failed = True
+                        attempt.state.errors += 1
+                        error = "cancelled" if task.cancelled() else task.exception()
+                        errors.append(f"{attempt.state.label}: {error}")
+                    elif winner is None:
+                        winner = attempt
+                if stream and winner is None:
+                    winner = next(
+                        (attempt for attempt in running.values() if attempt.first_token.is_set()),
+                        None,
+                    )
+
+                if winner is not None:
+                    winner.state.wins += 1
+                    await self._cancel(running, keep=winner.task)
+                    yield winner
+                    return
+
+                if failed or not done:
+                    # A failure hands over to the next provider; a missed first-token
+                    # deadline (nothing done before the timeout) hedges with it.
+                    state = next(pending, None)
+                    if state is not None:
+                        if not failed:
+                            newest.state.hedges += 1
+                        newest = start(state)
+                    elif not failed:
+                        # Nothing left to hedge with: wait for the running attempts.
+                        hedging = False
+
+            msg = "All providers in the fallback chain failed: " + "; ".join(errors)
+            raise RuntimeError(msg)
+        finally:
+            await self._cancel(running)
+
+    @staticmethod
+    async def _run_attempt(attempt: _Attempt, prompt, max_tokens, temperature) -> None:
+        """Stream one provider's answer into the attempt, recording its first-token latency."""
+        model = attempt.state.model
+        if temperature is None:
+            source = model.agenerate_stream(prompt, max_tokens)
+        else:
+            # Streams take no temperature; the whole answer arrives as one chunk.
+            async def single():
+                yield await model.agenerate(prompt, max_tokens, temperature=temperature)
+
+            source = single()
+        try:
+            async with aclosing(source) as tokens:
+                async for token in tokens:
+                    if not attempt.first_token.is_set():
+                        attempt.state.first_token.observe(time.monotonic() - attempt.started)
+                        attempt.first_token.set()
+                    attempt.tokens.append(token)
+                    attempt.queue.put_nowait(token)
+        except asyncio.CancelledError:
+            if not attempt.first_token.is_set():
+                # A lower bound, but leaving hedged-out attempts out would make a
+                # slow provider look fast.
+                attempt.state.first_token.observe(time.monotonic() - attempt.started)
+            raise
+        finally:
+            attempt.queue.put_nowait(None)
+
+    @staticmethod
+    async def _cancel(running: dict[asyncio.Task, _Attempt], keep: asyncio.Task | None = None):
+        """Cancel running attempts except ``keep`` and wait for them to close their streams."""
+        losers = [task for task in running if task is not keep]
+        for task in losers:
+            task.cancel()
+            del running[task]
+        if losers:
+            await asyncio.gather(*losers, return_exceptions=True)
@@ -4,6 +4,8 @@ from collections.abc import Generator
 
 import config
 from src.interfaces.language_model import ILanguageModel
+from src.models.rate_limiter import estimate_tokens, get_rate_limiter
+from src.models.resilience import Resilience
 
 try:
     from google import genai
@@ -24,6 +26,7 @@ class GenAIModel(ILanguageModel):
         temperature: float | None = None,
         top_p: float | None = None,
         max_tokens: int | None = None,
+        stop_sequences: list[str] | None = None,
     ):
         """
         Initialize GenAI model.
@@ -34,6 +37,7 @@ class GenAIModel(ILanguageModel):
             temperature: Generation temperature
             top_p: Top-p sampling parameter
             max_tokens: Maximum tokens to generate
+            stop_sequences: Strings that end generation (default: from config.py)
         """
         if not GENAI_AVAILABLE:
             msg = "google-genai is not installed. Install with: pip install google-genai"
@@ -44,11 +48,17 @@ class GenAIModel(ILanguageModel):
         self.temperature = temperature or config.MODEL_TEMPERATURE
         self.top_p = top_p or config.MODEL_TOP_P
         self.max_tokens = max_tokens or config.MODEL_MAX_TOKENS
+        self.stop_sequences = tuple(
+            stop_sequences if stop_sequences is not None else config.MODEL_STOP_SEQUENCES
+        )
 
         if not self.api_key:
             msg = "Google API key is required. Set GCP_API_KEY in .env or pass api_key parameter."
             raise ValueError(msg)
 
+        self.rate_limiter = get_rate_limiter("genai")
+        self.resilience = Resilience(f"genai:{self.model_name}")
+
         self._initialized = False
         self.client = None
 
@@ -67,13 +77,20 @@ class GenAIModel(ILanguageModel):
             msg = f"Failed to initialize GenAI model: {e}"
             raise RuntimeError(msg) from e
 
-    def generate(self, prompt: str, max_tokens: int | None = None) -> str:
+    def generate(
+        self, prompt: str, max_tokens: int | None = None, temperature: float | None = None
+    ) -> str:
         """
         Generate text using GenAI model.
 
+        Each attempt waits its turn in the provider's rate limiter. Rate-limit and
+        5xx errors are retried with backoff; while the API keeps failing, the
+        circuit breaker fails calls fast.
+
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens to generate (optional)
+            temperature: Sampling temperature for this call (optional)
 
         Returns:
             Generated text
@@ -85,15 +102,17 @@ class GenAIModel(ILanguageModel):
 
         try:
             # 使用新版 SDK 的生成方式
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=self.temperature,
-                    top_p=self.top_p,
-                    max_output_tokens=max_tokens,
-                ),
-            )
+            cost = estimate_tokens(prompt, max_tokens)
+
+            def invoke(timeout: float):
+                with self.rate_limiter.acquire(cost):
+                    return self.client.models.generate_content(
+                        model=self.model_name,
+                        contents=prompt,
+                        config=self._generation_config(max_tokens, temperature, timeout),
+                    )
+
+            response = self.resilience.call(invoke)
 
             return response.text
 
@@ -107,6 +126,10 @@ class GenAIModel(ILanguageModel):
         """
         Generate text using GenAI with streaming.
 
+        Opening the stream is rate limited and retried like generate(); once text
+        has been yielded a failure is raised instead. The in-flight slot is held
+        until the stream ends.
+
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens to generate
@@ -121,24 +144,44 @@ class GenAIModel(ILanguageModel):
 
         try:
             # 使用新版 SDK 的串流生成
-            response = self.client.models.generate_content_stream(
-                model=self.model_name,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=self.temperature,
-                    top_p=self.top_p,
-                    max_output_tokens=max_tokens,
-                ),
-            )
-
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            cost = estimate_tokens(prompt, max_tokens)
+
+            def open_stream(timeout: float):
+                with self.rate_limiter.acquire(cost):
+                    response = self.client.models.generate_content_stream(
+                        model=self.model_name,
+                        contents=prompt,
+                        config=self._generation_config(max_tokens, timeout=timeout),
+                    )
+                    for chunk in response:
+                        if chunk.text:
+                            yield chunk.text
+
+            yield from self.resilience.stream(open_stream)
 
         except Exception as e:
             msg = f"GenAI streaming failed: {e}"
             raise RuntimeError(msg) from e
 
+    def _generation_config(
+        self, max_tokens: int, temperature: float | None = None, timeout: float | None = None
+    ) -> "types.GenerateContentConfig":
+        """
+        Build the generation config shared by generate and generate_stream.
+
+        ``timeout`` (seconds) overrides the HTTP timeout of this one request, so an
+        attempt ends by the generation deadline.
+        """
+        return types.GenerateContentConfig(
+            temperature=self.temperature if temperature is None else temperature,
+            top_p=self.top_p,
+            max_output_tokens=max_tokens,
+            stop_sequences=list(self.stop_sequences) or None,
+            http_options=None
+            if timeout is None
+            else types.HttpOptions(timeout=int(timeout * 1000)),
+        )
+
     def is_initialized(self) -> bool:
         """Check if model is initialized."""
         return self._initialized
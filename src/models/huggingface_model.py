@@ -2,10 +2,25 @@
 
 from collections.abc import Generator
 
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer, pipeline
+import torch
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    LogitsProcessor,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TopPLogitsWarper,
+)
+from transformers.generation.streamers import BaseStreamer
 
 import config
 from src.interfaces.language_model import ILanguageModel
+from src.models.batch_scheduler import BatchScheduler, GenerationRequest
+from src.models.prefix_cache import PrefixKVCache
+from src.models.sql_grammar import SQLGrammarLogitsProcessor, build_token_strings, get_sql_grammar
+from src.models.stop_sequences import StopSequenceMatcher
+from src.prompts.text_to_sql_prompt import TextToSQLPrompt
 
 # 從 config.py 讀取預設值
 DEFAULT_MODEL_NAME = config.MODEL_NAME
@@ -15,6 +30,95 @@ DEFAULT_TOP_P = config.MODEL_TOP_P
 DEFAULT_DEVICE = config.MODEL_DEVICE
 
 
+class RequestStoppingCriteria(StoppingCriteria):
+    """Per-row stop: cancelled, reached its own max_tokens, or hit a stop sequence."""
+
+    def __init__(
+        self,
+        requests: list[GenerationRequest],
+        prompt_length: int,
+        matchers: list[StopSequenceMatcher] | None = None,
+    ):
+        self.requests = requests
+        self.prompt_length = prompt_length
+        self.matchers = matchers
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs):
+        generated = input_ids.shape[1] - self.prompt_length
+        done = [
+            request.cancelled.is_set()
+            or generated >= request.max_tokens
+            or (self.matchers is not None and self.matchers[index].stopped)
+            for index, request in enumerate(self.requests)
+        ]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class RowTemperatureLogitsWarper(LogitsProcessor):
+    """Temperature scaling with its own temperature for each row of the batch."""
+
+    def __init__(self, temperatures: list[float]):
+        self.temperatures = temperatures
+        self._divisor: torch.Tensor | None = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self._divisor is None or self._divisor.device != scores.device:
+            self._divisor = torch.tensor(
+                self.temperatures, dtype=scores.dtype, device=scores.device
+            ).unsqueeze(1)
+        return scores / self._divisor
+
+
+class BatchTextStreamer(BaseStreamer):
+    """
+    Decodes each row of a batched generation as it is produced.
+
+    Every row's text is fed to its StopSequenceMatcher (generate() calls put()
+    before evaluating stopping criteria), and streaming requests receive the
+    text that can no longer turn into a stop sequence.
+    """
+
+    def __init__(self, tokenizer, requests: list[GenerationRequest], matchers):
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.matchers: list[StopSequenceMatcher] = matchers
+        self.token_ids: list[list[int]] = [[] for _ in requests]
+        self.printed: list[int] = [0] * len(requests)
+        self._prompt_seen = False
+
+    def put(self, value: torch.Tensor) -> None:
+        """Receive the newest token of every row (the first call carries the prompt)."""
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+
+        rows = value.reshape(len(self.requests), -1).tolist()
+        for index, token_ids in enumerate(rows):
+            if self.matchers[index].stopped:
+                continue
+            self.token_ids[index].extend(token_ids)
+            self._flush(index, final=False)
+
+    def end(self) -> None:
+        """Flush any text held back at the end of generation."""
+        for index in range(len(self.requests)):
+            self._flush(index, final=True)
+
+    def _flush(self, index: int, final: bool) -> None:
+        text = self.tokenizer.decode(self.token_ids[index], skip_special_tokens=True)
+        # Hold back incomplete multi-byte characters until the next token completes them.
+        if not final and text.endswith("\ufffd"):
+            return
+
+        matcher = self.matchers[index]
+        matcher.update(text)
+        request = self.requests[index]
+        if request.stream:
+            safe = matcher.safe_length(text, final=final)
+            request.emit(text[self.printed[index] : safe])
+            self.printed[index] = max(self.printed[index], safe)
+
+
 class HuggingFaceModel(ILanguageModel):
     """HuggingFace model implementation using transformers library."""
 
@@ -24,6 +128,12 @@ class HuggingFaceModel(ILanguageModel):
         device: str | None = None,
         temperature: float | None = None,
         top_p: float | None = None,
+        use_prefix_cache: bool | None = None,
+        max_batch_size: int | None = None,
+        max_batch_wait_ms: float | None = None,
+        stop_sequences: list[str] | None = None,
+        stop_at_semicolon: bool | None = None,
+        constrained_decoding: bool | None = None,
     ):
         """
         Initialize HuggingFace model.
@@ -33,6 +143,13 @@ class HuggingFaceModel(ILanguageModel):
             device: Device to run the model on (default: from config.py)
             temperature: Sampling temperature for generation (default: from config.py)
             top_p: Top-p sampling parameter (default: from config.py)
+            use_prefix_cache: Reuse KV states of the shared prompt prefix (default: from config.py)
+            max_batch_size: Maximum concurrent prompts per model.generate (default: from config.py)
+            max_batch_wait_ms: How long to collect concurrent prompts (default: from config.py)
+            stop_sequences: Strings that end generation (default: from config.py)
+            stop_at_semicolon: Stop after a top-level ";" in the SQL block (default: from config.py)
+            constrained_decoding: Restrict output to SELECT statements over the prompt's schema
+                (default: from config.py)
         """
         self.model_name = model_name or DEFAULT_MODEL_NAME
         self.device = device or DEFAULT_DEVICE
@@ -40,7 +157,32 @@ class HuggingFaceModel(ILanguageModel):
         self.top_p = top_p if top_p is not None else DEFAULT_TOP_P
         self.model = None
         self.tokenizer = None
-        self.pipeline = None
+        self.use_prefix_cache = (
+            use_prefix_cache if use_prefix_cache is not None else config.PREFIX_CACHE_ENABLED
+        )
+        self.stop_sequences = tuple(
+            stop_sequences if stop_sequences is not None else config.MODEL_STOP_SEQUENCES
+        )
+        self.stop_at_semicolon = (
+            stop_at_semicolon if stop_at_semicolon is not None else config.MODEL_STOP_AT_SQL_END
+        )
+        self.constrained_decoding = (
+            constrained_decoding
+            if constrained_decoding is not None
+            else config.LOCAL_CONSTRAINED_DECODING
+        )
+        self._token_strings: list[str | None] | None = None
+        self.prefix_cache = PrefixKVCache(max_entries=config.PREFIX_CACHE_MAX_ENTRIES)
+        self.scheduler = BatchScheduler(
+            self._run_batch,
+            max_batch_size=max_batch_size or config.LOCAL_BATCH_MAX_SIZE,
+            max_wait_ms=(
+                max_batch_wait_ms
+                if max_batch_wait_ms is not None
+                else config.LOCAL_BATCH_MAX_WAIT_MS
+            ),
+            name=f"batch-{self.model_name}",
+        )
         self._initialized = False
 
     def initialize(self) -> None:
@@ -53,25 +195,50 @@ class HuggingFaceModel(ILanguageModel):
             self.model_name, torch_dtype="auto", device_map="auto"
         )
 
-        self.pipeline = pipeline(
-            "text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
-        )
-
         self._initialized = True
 
     def is_initialized(self) -> bool:
         """Check if model is initialized."""
         return self._initialized
 
-    def generate(self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    def cleanup(self) -> None:
+        """Release model weights and tokenizer."""
+        self.scheduler.close()
+        self.model = None
+        self.tokenizer = None
+        self._token_strings = None
+        self.prefix_cache.clear()
+        self._initialized = False
+
+    def cache_identity(self) -> dict:
+        """Include local-only decoding options in the generation cache key."""
+        return {
+            **super().cache_identity(),
+            "stop_at_semicolon": self.stop_at_semicolon,
+            "constrained_decoding": self.constrained_decoding,
+        }
+
+    def cache_stats(self) -> dict[str, int]:
+        """Return prefix KV cache hit/miss statistics."""
+        return self.prefix_cache.stats()
+
+    def runtime_stats(self) -> dict:
+        """Return prefix cache and batching statistics."""
+        return {"prefix_cache": self.cache_stats(), "batching": self.scheduler.stats()}
+
+    def generate(
+        self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS, temperature: float | None = None
+    ) -> str:
         """
         Generate text using the model.
 
+        Concurrent calls are batched into a single model.generate by the scheduler,
+        including calls with different temperatures.
+
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature for this call (default: self.temperature)
 
         Returns:
             Generated text
@@ -79,22 +246,8 @@ class HuggingFaceModel(ILanguageModel):
         if not self._initialized:
             self.initialize()
 
-        messages = [{"role": "user", "content": prompt}]
-
-        # Use safe temperature (>0) to avoid numerical issues
-        safe_temperature = max(self.temperature, 0.1)
-
-        outputs = self.pipeline(
-            messages,
-            max_new_tokens=max_tokens,
-            temperature=safe_temperature,
-            top_p=self.top_p,
-            do_sample=True,
-            pad_token_id=self.tokenizer.eos_token_id,
-        )
-
-        generated_text = outputs[0]["generated_text"][-1]["content"]
-        return generated_text.strip()
+        request = self._make_request(prompt, max_tokens, stream=False, temperature=temperature)
+        return self.scheduler.submit(request).wait()
 
     def generate_stream(
         self, prompt: str, max_tokens: int = DEFAULT_MAX_TOKENS
@@ -102,6 +255,8 @@ class HuggingFaceModel(ILanguageModel):
         """
         Generate text using the model with streaming output.
 
+        Closing the generator early stops decoding for this prompt.
+
         Args:
             prompt: Input prompt
             max_tokens: Maximum tokens to generate
@@ -112,34 +267,185 @@ class HuggingFaceModel(ILanguageModel):
         if not self._initialized:
             self.initialize()
 
-        messages = [{"role": "user", "content": prompt}]
-        prompt_text = self.tokenizer.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
+        request = self._make_request(prompt, max_tokens, stream=True)
+        yield from self.scheduler.submit(request).iter_chunks()
+
+    def _make_request(
+        self, prompt: str, max_tokens: int, stream: bool, temperature: float | None = None
+    ) -> GenerationRequest:
+        """Tokenize on the caller's thread so the batch worker only runs the model."""
+        return GenerationRequest(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            stream=stream,
+            temperature=temperature,
+            payload=self._split_prompt_ids(prompt),
         )
 
-        inputs = self.tokenizer(prompt_text, return_tensors="pt")
-        inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
-
-        from threading import Thread
+    def _run_batch(self, requests: list[GenerationRequest]) -> None:
+        """Generate a micro-batch; requests sharing a cached prefix run together."""
+        groups: dict[tuple[int, ...], list[GenerationRequest]] = {}
+        for request in requests:
+            prefix_ids, _ = request.payload
+            groups.setdefault(tuple(prefix_ids), []).append(request)
+
+        for prefix_ids, group in groups.items():
+            try:
+                self._generate_group(list(prefix_ids), group)
+            except Exception as e:
+                for request in group:
+                    request.finish(error=e)
+
+    def _generate_group(self, prefix_ids: list[int], requests: list[GenerationRequest]) -> None:
+        """
+        Run one model.generate for requests that share the same prefix.
 
-        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        Rows are laid out as [prefix][padding][suffix]: the cached prefix KV
+        states are shared by every row, and padding is masked out so each row's
+        suffix continues directly after the prefix.
+        """
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = self.tokenizer.eos_token_id
+
+        suffixes = [request.payload[1] for request in requests]
+        width = max(len(suffix) for suffix in suffixes)
+        rows, masks = [], []
+        for suffix in suffixes:
+            padding = width - len(suffix)
+            rows.append(prefix_ids + [pad_id] * padding + suffix)
+            masks.append([1] * len(prefix_ids) + [0] * padding + [1] * len(suffix))
+
+        input_ids = torch.tensor(rows, device=self.model.device)
+        inputs = {
+            "input_ids": input_ids,
+            "attention_mask": torch.tensor(masks, device=input_ids.device),
+        }
+        if prefix_ids:
+            past_key_values = self._prefix_past_key_values(prefix_ids)
+            if len(requests) > 1:
+                past_key_values.batch_repeat_interleave(len(requests))
+            inputs["past_key_values"] = past_key_values
+
+        prompt_length = input_ids.shape[1]
+        matchers = [
+            StopSequenceMatcher(self.stop_sequences, stop_at_semicolon=self.stop_at_semicolon)
+            for _ in requests
+        ]
+        generation_kwargs = self._sampling_kwargs(max(request.max_tokens for request in requests))
+        if self.constrained_decoding:
+            generation_kwargs.update(self._grammar_kwargs(requests, prompt_length))
+        elif generation_kwargs.get("do_sample", False) and any(
+            request.temperature is not None for request in requests
+        ):
+            # Per-call temperatures: scale each row itself, then apply top-p.
+            generation_kwargs.update(
+                logits_processor=LogitsProcessorList(self._sampling_processors(requests)),
+                temperature=1.0,
+                top_p=1.0,
+            )
+        output_ids = self.model.generate(
+            **inputs,
+            **generation_kwargs,
+            streamer=BatchTextStreamer(self.tokenizer, requests, matchers),
+            stopping_criteria=StoppingCriteriaList(
+                [RequestStoppingCriteria(requests, prompt_length, matchers)]
+            ),
+        )
 
-        # Use safe temperature (>0) to avoid numerical issues
-        safe_temperature = max(self.temperature, 0.1)
+        for index, request in enumerate(requests):
+            generated_ids = output_ids[index, prompt_length:]
+            text = self.tokenizer.decode(generated_ids, skip_special_tokens=True)
+            request.finish(result=matchers[index].truncate(text).strip())
 
-        generation_kwargs = {
-            **inputs,
+    def _sampling_kwargs(self, max_tokens: int) -> dict:
+        """Build sampling arguments for model.generate()."""
+        return {
             "max_new_tokens": max_tokens,
-            "temperature": safe_temperature,
+            # Use safe temperature (>0) to avoid numerical issues
+            "temperature": max(self.temperature, 0.1),
             "top_p": self.top_p,
             "do_sample": True,
             "pad_token_id": self.tokenizer.eos_token_id,
-            "streamer": streamer,
         }
 
-        thread = Thread(target=self.model.generate, kwargs=generation_kwargs)
-        thread.start()
+    def _sampling_processors(self, requests: list[GenerationRequest]) -> list[LogitsProcessor]:
+        """Temperature (per row, for per-call overrides) and top-p as logits processors."""
+        temperatures = [
+            # Use safe temperature (>0) to avoid numerical issues
+            max(self.temperature if request.temperature is None else request.temperature, 0.1)
+            for request in requests
+        ]
+        return [RowTemperatureLogitsWarper(temperatures), TopPLogitsWarper(self.top_p)]
+
+    def _grammar_kwargs(self, requests: list[GenerationRequest], prompt_length: int) -> dict:
+        """
+        Build generate() arguments that mask logits to the SQL grammar of each prompt's schema.
+
+        The grammar mask has to run before temperature / top-p, but generate() appends
+        custom processors after its own warpers, so sampling is moved into the
+        custom list (after the mask) and disabled in the defaults.
+        """
+        if self._token_strings is None:
+            self._token_strings = build_token_strings(self.tokenizer)
+
+        grammars = []
+        for request in requests:
+            prefix, _ = TextToSQLPrompt.split_cacheable_prefix(request.prompt)
+            grammars.append(get_sql_grammar(prefix or request.prompt))
+
+        eos_token_ids = {self.tokenizer.eos_token_id}
+        generation_eos = getattr(self.model.generation_config, "eos_token_id", None)
+        if isinstance(generation_eos, int):
+            eos_token_ids.add(generation_eos)
+        elif generation_eos:
+            eos_token_ids.update(generation_eos)
+
+        sampling = self._sampling_kwargs(0)
+        processors = [
+            SQLGrammarLogitsProcessor(grammars, self._token_strings, eos_token_ids, prompt_length)
+        ]
+        if sampling.get("do_sample", False):
+            processors += self._sampling_processors(requests)
+            return {
+                "logits_processor": LogitsProcessorList(processors),
+                "temperature": 1.0,
+                "top_p": 1.0,
+                "top_k": 0,
+            }
+        return {"logits_processor": LogitsProcessorList(processors)}
+
+    def _split_prompt_ids(self, prompt: str) -> tuple[list[int], list[int]]:
+        """
+        Tokenize the chat-formatted prompt as (cacheable prefix IDs, remaining IDs).
+
+        The prefix covers the chat template header, system instruction and schema.
+        It is tokenized on its own so its IDs are identical across requests.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        prompt_text = self.tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True
+        )
+
+        prefix, _ = TextToSQLPrompt.split_cacheable_prefix(prompt)
+        position = prompt_text.find(prefix) if self.use_prefix_cache and prefix else -1
+        if position < 0:
+            return [], self.tokenizer(prompt_text)["input_ids"]
+
+        boundary = position + len(prefix)
+        prefix_ids = self.tokenizer(prompt_text[:boundary])["input_ids"]
+        suffix_ids = self.tokenizer(prompt_text[boundary:], add_special_tokens=False)["input_ids"]
+        if not suffix_ids:
+            return [], prefix_ids
+        return prefix_ids, suffix_ids
+
+    def _prefix_past_key_values(self, prefix_ids: list[int]):
+        """Return a private copy of the prefix KV states, prefilling them on a miss."""
 
-        yield from streamer
+        def prefill():
+            input_ids = torch.tensor([prefix_ids], device=self.model.device)
+            with torch.no_grad():
+                return self.model(input_ids=input_ids, use_cache=True).past_key_values
 
-        thread.join()
+        key = PrefixKVCache.make_key(self.model_name, prefix_ids)
+        return self.prefix_cache.get_or_compute(key, prefill)
@@ -13,8 +13,9 @@ def create_model(
     Create a language model instance based on provider.
 
     Args:
-        provider: Provider name ("local", "bedrock", "genai")
-        model_id: Model ID (provider-specific)
+        provider: Provider name ("local", "bedrock", "genai", "fallback")
+        model_id: Model ID (provider-specific; for "fallback" the provider chain,
+            e.g. "genai>bedrock>local")
         **kwargs: Additional model parameters
 
     Returns:
@@ -52,10 +53,46 @@ def create_model(
             )
             raise ValueError(msg) from e
 
+    elif provider == "fallback":
+        from src.models.fallback_model import HedgedFallbackModel
+
+        # Providers are leased from the model registry, so a local provider shares
+        # the weights already loaded for it.
+        return HedgedFallbackModel(chain=model_id, **kwargs)
+
     else:
-        msg = f"Unknown provider: {provider}. Valid options: local, bedrock, genai"
+        msg = f"Unknown provider: {provider}. Valid options: local, bedrock, genai, fallback"
+        raise ValueError(msg)
+
+
+def resolve_model_id(provider: str | None = None, model_id: str | None = None) -> str:
+    """
+    Resolve the effective model ID for a provider.
+
+    Args:
+        provider: Provider name ("local", "bedrock", "genai", "fallback")
+        model_id: Model ID (provider-specific), or None for the configured default
+
+    Returns:
+        Model ID that create_model() would use
+    """
+    provider = provider or config.MODEL_PROVIDER
+
+    if model_id:
+        return model_id
+
+    defaults = {
+        "local": config.MODEL_NAME,
+        "bedrock": config.BEDROCK_MODEL_ID,
+        "genai": config.GENAI_MODEL_NAME,
+        "fallback": config.MODEL_FALLBACK_CHAIN,
+    }
+    if provider not in defaults:
+        msg = f"Unknown provider: {provider}. Valid options: local, bedrock, genai, fallback"
         raise ValueError(msg)
 
+    return defaults[provider]
+
 
 def parse_provider_from_arg(arg: str) -> tuple[str, str | None]:
     """
@@ -72,6 +109,7 @@ def parse_provider_from_arg(arg: str) -> tuple[str, str | None]:
         "-bedrock" -> ("bedrock", None)
         "-bedrock us.anthropic.claude-sonnet-4-v1:0" -> ("bedrock", "us.anthropic...")
         "-genai gemini-2.5-pro" -> ("genai", "gemini-2.5-pro")
+        "-fallback genai>local" -> ("fallback", "genai>local")
     """
     arg = arg.strip()
 
@@ -81,8 +119,8 @@ def parse_provider_from_arg(arg: str) -> tuple[str, str | None]:
     parts = arg.split(None, 1)
     provider = parts[0].lower()
 
-    if provider not in ["local", "bedrock", "genai"]:
-        msg = f"Invalid provider: {provider}. Valid options: local, bedrock, genai"
+    if provider not in ["local", "bedrock", "genai", "fallback"]:
+        msg = f"Invalid provider: {provider}. Valid options: local, bedrock, genai, fallback"
         raise ValueError(msg)
 
     model_id = parts[1] if len(parts) > 1 else None
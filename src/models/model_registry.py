@@ -0,0 +1,296 @@
+"""Process-wide registry of initialized language models."""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+import config
+from src.interfaces.language_model import ILanguageModel
+from src.models.model_factory import create_model, resolve_model_id
+
+RegistryKey = tuple[str, str, tuple[tuple[str, Any], ...]]
+
+
+def estimate_model_memory(model: ILanguageModel) -> int:
+    """
+    Estimate the resident memory of an initialized model in bytes.
+
+    Only local models hold weights in-process; cloud clients count as zero.
+
+    Args:
+        model: Initialized language model
+
+    Returns:
+        Estimated size in bytes
+    """
+    weights = getattr(model, "model", None)
+    parameters = getattr(weights, "parameters", None)
+    if not callable(parameters):
+        return 0
+
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return 0
+
+
+@dataclass
+class _RegistryEntry:
+    """A loaded model and its bookkeeping."""
+
+    model: ILanguageModel
+    memory_bytes: int
+    active: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ModelRegistry:
+    """
+    Keyed cache of initialized models shared across requests.
+
+    Models are keyed by provider, model ID and sampling parameters. Each key is
+    loaded at most once even when several threads request it concurrently, and
+    idle models are evicted in LRU order when the memory budget is exceeded.
+    """
+
+    def __init__(
+        self,
+        memory_budget_mb: int | None = None,
+        factory: Callable[..., ILanguageModel] = create_model,
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            memory_budget_mb: Memory budget for loaded models (default: from config.py)
+            factory: Callable used to build new model instances
+        """
+        budget_mb = (
+            memory_budget_mb
+            if memory_budget_mb is not None
+            else config.MODEL_REGISTRY_MEMORY_BUDGET_MB
+        )
+        self.memory_budget_bytes = budget_mb * 1024 * 1024
+        self._factory = factory
+        self._entries: OrderedDict[RegistryKey, _RegistryEntry] = OrderedDict()
+        self._key_locks: dict[RegistryKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(provider: str | None = None, model_id: str | None = None, **kwargs) -> RegistryKey:
+        """
+        Build the registry key for a model request.
+
+        Args:
+            provider: Provider name ("local", "bedrock", "genai")
+            model_id: Model ID (provider-specific)
+            **kwargs: Sampling parameters passed to the model constructor
+
+        Returns:
+            Hashable registry key
+        """
+        provider = provider or config.MODEL_PROVIDER
+        params = tuple(sorted((k, v) for k, v in kwargs.items() if v is not None))
+        return (provider, resolve_model_id(provider, model_id), params)
+
+    def get(
+        self, provider: str | None = None, model_id: str | None = None, **kwargs
+    ) -> ILanguageModel:
+        """
+        Return an initialized model, loading it on first use.
+
+        Args:
+            provider: Provider name ("local", "bedrock", "genai")
+            model_id: Model ID (provider-specific)
+            **kwargs: Sampling parameters passed to the model constructor
+
+        Returns:
+            Shared, initialized ILanguageModel instance
+        """
+        return self._acquire(self.make_key(provider, model_id, **kwargs), lease=False).model
+
+    @contextmanager
+    def lease(
+        self, provider: str | None = None, model_id: str | None = None, **kwargs
+    ) -> Iterator[ILanguageModel]:
+        """
+        Borrow a model for the duration of a request.
+
+        A leased model is never evicted while the lease is held.
+
+        Args:
+            provider: Provider name ("local", "bedrock", "genai")
+            model_id: Model ID (provider-specific)
+            **kwargs: Sampling parameters passed to the model constructor
+
+        Yields:
+            Shared, initialized ILanguageModel instance
+        """
+        entry = self._acquire(self.make_key(provider, model_id, **kwargs), lease=True)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.active -= 1
+                entry.last_used = time.monotonic()
+
+    def preload(self, specs: list[str]) -> None:
+        """
+        Load models ahead of the first request.
+
+        Args:
+            specs: Model specs in "provider" or "provider:model_id" form
+        """
+        for spec in specs:
+            provider, _, model_id = spec.partition(":")
+            self.get(provider.strip(), model_id.strip() or None)
+
+    def evict(self, provider: str | None = None, model_id: str | None = None, **kwargs) -> bool:
+        """
+        Remove a model from the registry if it is idle.
+
+        Returns:
+            True if the model was evicted
+        """
+        key = self.make_key(provider, model_id, **kwargs)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.active > 0:
+                return False
+            del self._entries[key]
+            self.evictions += 1
+
+        self._release(entry)
+        return True
+
+    def clear(self) -> None:
+        """Drop every idle model."""
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if entry.active == 0]
+            evicted = [self._entries.pop(key) for key in idle]
+            self.evictions += len(evicted)
+
+        for entry in evicted:
+            self._release(entry)
+
+    def stats(self) -> dict[str, Any]:
+        """Return registry statistics for monitoring."""
+        now = time.monotonic()
+        with self._lock:
+            models = [
+                {
+                    "provider": key[0],
+                    "model_id": key[1],
+                    "params": dict(key[2]),
+                    "memory_mb": round(entry.memory_bytes / 1024 / 1024, 1),
+                    "active": entry.active,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    **self._runtime_stats(entry.model),
+                }
+                for key, entry in self._entries.items()
+            ]
+            return {
+                "models": models,
+                "memory_mb": round(self._memory_bytes() / 1024 / 1024, 1),
+                "memory_budget_mb": round(self.memory_budget_bytes / 1024 / 1024, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _acquire(self, key: RegistryKey, lease: bool) -> _RegistryEntry:
+        """Look up or load the entry for a key."""
+        with self._lock:
+            entry = self._hit(key, lease)
+            if entry is not None:
+                return entry
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given key; the others wait here and then hit.
+        with key_lock:
+            with self._lock:
+                entry = self._hit(key, lease)
+                if entry is not None:
+                    return entry
+
+            provider, model_id, params = key
+            model = self._factory(provider=provider, model_id=model_id, **dict(params))
+            if not model.is_initialized():
+                model.initialize()
+
+            entry = _RegistryEntry(model=model, memory_bytes=estimate_model_memory(model))
+            with self._lock:
+                self.misses += 1
+                if lease:
+                    entry.active += 1
+                self._entries[key] = entry
+                evicted = self._evict_over_budget(protect=key)
+
+        for old in evicted:
+            self._release(old)
+        return entry
+
+    def _hit(self, key: RegistryKey, lease: bool) -> _RegistryEntry | None:
+        """Mark an existing entry as used. Caller must hold the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        self._entries.move_to_end(key)
+        entry.last_used = time.monotonic()
+        if lease:
+            entry.active += 1
+        self.hits += 1
+        return entry
+
+    def _evict_over_budget(self, protect: RegistryKey) -> list[_RegistryEntry]:
+        """Pop idle LRU entries until within budget. Caller must hold the lock."""
+        evicted = []
+        for key in list(self._entries):
+            if self._memory_bytes() <= self.memory_budget_bytes:
+                break
+            entry = self._entries[key]
+            if key == protect or entry.active > 0:
+                continue
+            evicted.append(self._entries.pop(key))
+            self.evictions += 1
+        return evicted
+
+    def _memory_bytes(self) -> int:
+        """Total memory of loaded models. Caller must hold the lock."""
+        return sum(entry.memory_bytes for entry in self._entries.values())
+
+    @staticmethod
+    def _runtime_stats(model: ILanguageModel) -> dict[str, Any]:
+        """Include model-level statistics (prefix KV cache, batching) when available."""
+        runtime_stats = getattr(model, "runtime_stats", None)
+        if not callable(runtime_stats) or not model.is_initialized():
+            return {}
+        return {"runtime": runtime_stats()}
+
+    @staticmethod
+    def _release(entry: _RegistryEntry) -> None:
+        """Free the resources held by an evicted model."""
+        cleanup = getattr(entry.model, "cleanup", None)
+        if callable(cleanup):
+            cleanup()
+
+
+_registry: ModelRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
@@ -0,0 +1,92 @@
+"""LRU cache of precomputed key/value states for shared prompt prefixes."""
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from typing import Any
+
+
+class PrefixKVCache:
+    """
+    Cache of past-key-values keyed by the exact prefix token IDs.
+
+    Because the key is derived from the tokens themselves, any change to the
+    system instruction or schema produces a new key; stale prefixes simply age
+    out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of prefixes kept in memory
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace: str, token_ids: Sequence[int]) -> str:
+        """Build a cache key from a namespace (e.g. model name) and prefix token IDs."""
+        digest = hashlib.sha256(namespace.encode("utf-8"))
+        digest.update(",".join(map(str, token_ids)).encode("ascii"))
+        return digest.hexdigest()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Return a private copy of the cached state, computing it on a miss.
+
+        Generation mutates the cache it is given, so callers always get a copy.
+
+        Args:
+            key: Cache key from make_key()
+            compute: Callable producing the past-key-values for the prefix
+
+        Returns:
+            Copy of the cached past-key-values
+        """
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                self.hits += 1
+                return copy.deepcopy(cached)
+
+        # Serialize prefill so concurrent misses on the same prefix compute it once.
+        with self._compute_lock:
+            with self._lock:
+                cached = self._lookup(key)
+                if cached is not None:
+                    self.hits += 1
+                    return copy.deepcopy(cached)
+                self.misses += 1
+
+            cached = compute()
+            with self._lock:
+                self._entries[key] = cached
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return copy.deepcopy(cached)
+
+    def clear(self) -> None:
+        """Drop all cached prefixes."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss statistics."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _lookup(self, key: str) -> Any:
+        """Return the cached entry and mark it recently used. Caller must hold the lock."""
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+        return cached
@@ -0,0 +1,296 @@
+"""Client-side rate limiting and concurrency limits for cloud providers."""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import config
+
+
+class TokenBucket:
+    """
+    In-process token bucket refilled at ``per_minute`` units per minute.
+
+    Callers reserve units up front and sleep for the returned wait. The level
+    may go negative, so each caller waits behind everyone who reserved before
+    it: callers are served in arrival order and nobody is rejected.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        """
+        Initialize the bucket.
+
+        Args:
+            per_minute: Refill rate (units per minute)
+            capacity: Burst size (default: one minute's worth)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else float(per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take ``amount`` units from the bucket.
+
+        Requests larger than the bucket are charged a full bucket, so they are
+        slowed down rather than blocked forever.
+
+        Returns:
+            Seconds the caller must wait before proceeding
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            self._level -= amount
+            return max(-self._level / self.rate, 0.0)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Token bucket stored in a SQLite file, shared by every process using the same path.
+
+    Each reservation is one ``BEGIN IMMEDIATE`` transaction, so processes are
+    served in the order their reservations commit.
+    """
+
+    def __init__(self, path: str, name: str, per_minute: float, capacity: float | None = None):
+        """
+        Initialize the bucket.
+
+        Args:
+            path: SQLite database file
+            name: Bucket key (one row per provider and unit)
+            per_minute: Refill rate (units per minute)
+            capacity: Burst size (default: one minute's worth)
+        """
+        super().__init__(per_minute, capacity)
+        self.path = path
+        self.name = name
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets "
+                "(name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` units from the shared bucket; returns the seconds to wait."""
+        amount = min(amount, self.capacity)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute(
+                "SELECT level, updated FROM token_buckets WHERE name = ?", (self.name,)
+            ).fetchone()
+            level = self.capacity
+            if row is not None:
+                level = min(self.capacity, row[0] + max(now - row[1], 0.0) * self.rate)
+            level -= amount
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (name, level, updated) VALUES (?, ?, ?)",
+                (self.name, level, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return max(-level / self.rate, 0.0)
+
+
+class FairSemaphore:
+    """Counting semaphore that hands free slots to waiters in arrival order."""
+
+    def __init__(self, limit: int):
+        """
+        Initialize the semaphore.
+
+        Args:
+            limit: Maximum number of holders
+        """
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._holders = 0
+        self._waiters: deque[threading.Event] = deque()
+
+    def acquire(self) -> None:
+        """Block until a slot is free and every earlier caller has been served."""
+        with self._lock:
+            if self._holders < self.limit and not self._waiters:
+                self._holders += 1
+                return
+            turn = threading.Event()
+            self._waiters.append(turn)
+        # The releasing thread passes its slot directly to us.
+        turn.wait()
+
+    def release(self) -> None:
+        """Free a slot, handing it to the longest waiter if there is one."""
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._holders -= 1
+
+    @property
+    def in_flight(self) -> int:
+        """Number of current holders."""
+        with self._lock:
+            return self._holders
+
+    @property
+    def queued(self) -> int:
+        """Number of callers waiting for a slot."""
+        with self._lock:
+            return len(self._waiters)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough token cost of a request: ~4 characters per prompt token plus the output budget."""
+    return len(prompt) // 4 + max_tokens
+
+
+class ProviderRateLimiter:
+    """
+    Requests/min and tokens/min buckets plus a max-in-flight limit for one provider.
+
+    Callers are queued rather than rejected. The in-flight limit is per process;
+    the buckets can be shared across processes with ``shared_path``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_in_flight: int = 0,
+        shared_path: str = "",
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            name: Provider label used in statistics and as the shared bucket key
+            requests_per_minute: Request budget (0 = unlimited)
+            tokens_per_minute: Token budget (0 = unlimited)
+            max_in_flight: Concurrent requests (0 = unlimited)
+            shared_path: SQLite file shared by all workers ("" = in-process buckets)
+        """
+        self.name = name
+        self.requests = self._bucket(f"{name}:requests", requests_per_minute, shared_path)
+        self.tokens = self._bucket(f"{name}:tokens", tokens_per_minute, shared_path)
+        self.semaphore = FairSemaphore(max_in_flight) if max_in_flight > 0 else None
+
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @staticmethod
+    def _bucket(key: str, per_minute: float, shared_path: str) -> TokenBucket | None:
+        if per_minute <= 0:
+            return None
+        if shared_path:
+            return SQLiteTokenBucket(shared_path, key, per_minute)
+        return TokenBucket(per_minute)
+
+    @contextmanager
+    def acquire(self, tokens: int = 0) -> Iterator[None]:
+        """
+        Wait for a slot and for rate budget, then hold the slot for the block.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+        """
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            if self.semaphore is not None:
+                self.semaphore.acquire()
+            try:
+                wait = 0.0
+                if self.requests is not None:
+                    wait = self.requests.reserve(1)
+                if self.tokens is not None and tokens:
+                    wait = max(wait, self.tokens.reserve(tokens))
+                if wait > 0:
+                    time.sleep(wait)
+            except BaseException:
+                if self.semaphore is not None:
+                    self.semaphore.release()
+                raise
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        waited = time.monotonic() - started
+        with self._lock:
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        try:
+            yield
+        finally:
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth and wait times for monitoring."""
+        with self._lock:
+            return {
+                "queued": self._waiting,
+                "in_flight": self.semaphore.in_flight if self.semaphore is not None else None,
+                "acquired": self.acquired,
+                "avg_wait_seconds": self.total_wait / self.acquired if self.acquired else 0.0,
+                "max_wait_seconds": self.max_wait,
+            }
+
+
+_limiters: dict[str, ProviderRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """
+    Return the process-wide limiter for a provider ("bedrock" or "genai").
+
+    Limits are read from config.<PROVIDER>_REQUESTS_PER_MINUTE, _TOKENS_PER_MINUTE
+    and _MAX_IN_FLIGHT; quotas are per account, so every model of a provider
+    shares one limiter.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            prefix = provider.upper()
+            limiter = _limiters[provider] = ProviderRateLimiter(
+                provider,
+                requests_per_minute=getattr(config, f"{prefix}_REQUESTS_PER_MINUTE", 0),
+                tokens_per_minute=getattr(config, f"{prefix}_TOKENS_PER_MINUTE", 0),
+                max_in_flight=getattr(config, f"{prefix}_MAX_IN_FLIGHT", 0),
+                shared_path=config.RATE_LIMIT_SHARED_PATH,
+            )
+        return limiter
+
+
+def rate_limiter_stats() -> dict[str, dict[str, Any]]:
+    """Return the statistics of every provider's limiter."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,359 @@
+"""Retry with jittered backoff, generation deadlines and circuit breakers for cloud providers."""
+
+import random
+import threading
+import time
+from collections.abc import Callable, Generator, Iterator
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+import config
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: throttling and server-side failures.
+_TRANSIENT_STATUSES = frozenset((408, 429, 500, 502, 503, 504, 529))
+
+# Error codes / exception class names used by boto3 and google-genai for the same.
+_TRANSIENT_CODES = frozenset(
+    """
+    ThrottlingException TooManyRequestsException ServiceUnavailableException
+    InternalServerException ModelNotReadyException ModelTimeoutException
+    RESOURCE_EXHAUSTED UNAVAILABLE DEADLINE_EXCEEDED INTERNAL
+    """.split()
+)
+_TRANSIENT_CLASS_NAMES = frozenset(
+    """
+    EndpointConnectionError ConnectTimeoutError ReadTimeoutError ConnectionClosedError
+    ServerError ReadTimeout ConnectTimeout RemoteProtocolError
+    """.split()
+)
+
+# Floor for the last attempt's read timeout, so an SDK never receives zero (= no timeout).
+_MIN_ATTEMPT_TIMEOUT = 0.001
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+class GenerationTimeoutError(TimeoutError):
+    """Raised when a generation exceeds its deadline."""
+
+
+def _status_and_code(error: BaseException) -> tuple[Any, Any]:
+    """Extract an HTTP status and an error code from boto3 / google-genai style errors."""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        code = response.get("Error", {}).get("Code")
+        return status, code
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status, getattr(error, "status", None)
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Return whether an error is worth retrying (throttling, 5xx, timeouts, dropped connections).
+
+    Wrapped errors are followed through ``__cause__`` / ``__context__``, so a
+    RuntimeError raised ``from`` a throttling error counts as transient.
+    """
+    seen = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, CircuitOpenError):
+            return False
+        if isinstance(current, (TimeoutError, ConnectionError)):
+            return True
+        if type(current).__name__ in _TRANSIENT_CLASS_NAMES:
+            return True
+        status, code = _status_and_code(current)
+        if status in _TRANSIENT_STATUSES or code in _TRANSIENT_CODES:
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff settings (defaults come from config.py)."""
+
+    enabled: bool = True
+    max_attempts: int = 3
+    initial_delay: float = 1.0
+    max_delay: float = 10.0
+    exponential_base: float = 2
+    jitter: bool = True
+
+    @classmethod
+    def from_config(cls) -> "RetryPolicy":
+        """Build the policy from the RETRY_* settings."""
+        return cls(
+            enabled=config.RETRY_ENABLED,
+            max_attempts=config.RETRY_MAX_ATTEMPTS,
+            initial_delay=config.RETRY_INITIAL_DELAY,
+            max_delay=config.RETRY_MAX_DELAY,
+            exponential_base=config.RETRY_EXPONENTIAL_BASE,
+            jitter=config.RETRY_JITTER,
+        )
+
+    def delay(self, attempt: int) -> float:
+        """
+        Seconds to wait after failed attempt number ``attempt`` (1-based).
+
+        With jitter the delay is drawn uniformly from [0, backoff] ("full jitter"),
+        which spreads out clients that were throttled at the same moment.
+        """
+        backoff = min(self.max_delay, self.initial_delay * self.exponential_base ** (attempt - 1))
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After ``failure_threshold`` consecutive transient failures the circuit opens
+    and calls fail immediately with CircuitOpenError. After ``reset_timeout``
+    seconds one probe call is let through (half-open): success closes the circuit,
+    failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the breaker.
+
+        Args:
+            name: Provider label used in errors and statistics
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds before a probe is allowed through an open circuit
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        """Current state: "closed", "open" or "half_open"."""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        """
+        Admit a call or fail fast.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or half-open with a probe in flight)
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            retry_in = max(self.reset_timeout - (time.monotonic() - self._opened_at), 0)
+        msg = f"{self.name} is unavailable (circuit open, next probe in {retry_in:.0f}s)"
+        raise CircuitOpenError(msg)
+
+    def record_success(self) -> None:
+        """The provider answered: close the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self) -> None:
+        """A call ended without an outcome (e.g. abandoned): let another probe through."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """The provider failed transiently: count it and open the circuit at the threshold."""
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self) -> dict[str, Any]:
+        """Return breaker state for monitoring."""
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide breaker for a provider, creating it on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=config.CIRCUIT_BREAKER_RESET_SECONDS,
+            )
+        return breaker
+
+
+def circuit_breaker_stats() -> dict[str, dict[str, Any]]:
+    """Return the state of every provider's breaker."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+class Resilience:
+    """
+    Retries, deadline and circuit breaker around one provider's calls.
+
+    Only transient errors are retried and counted by the breaker; a provider
+    that answers with a client error (bad request, auth) is reachable, so it
+    resets the breaker and the error is raised at once.
+
+    Every attempt is handed a read timeout that ends it by the deadline (never
+    more than config.REQUEST_TIMEOUT); the provider applies it to its request,
+    so a hung attempt or a stalled stream fails instead of outliving the deadline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        policy: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        timeout: float | None = None,
+    ):
+        """
+        Initialize the wrapper.
+
+        Args:
+            name: Provider label, e.g. "bedrock:<model_id>"
+            policy: Retry policy (default: RetryPolicy.from_config())
+            breaker: Circuit breaker (default: the shared breaker for ``name``)
+            timeout: Deadline in seconds for a whole generation, retries included
+                (default: config.GENERATION_TIMEOUT)
+        """
+        self.name = name
+        self.policy = policy or RetryPolicy.from_config()
+        self.breaker = breaker or get_circuit_breaker(name)
+        self.timeout = timeout if timeout is not None else config.GENERATION_TIMEOUT
+
+    @staticmethod
+    def attempt_timeout(deadline: float) -> float:
+        """Read timeout for an attempt: time left until the deadline, at most REQUEST_TIMEOUT."""
+        return max(min(config.REQUEST_TIMEOUT, deadline - time.monotonic()), _MIN_ATTEMPT_TIMEOUT)
+
+    def _backoff(self, attempt: int, deadline: float, error: BaseException) -> bool:
+        """Sleep before the next attempt; False when no retry should happen."""
+        if not self.policy.enabled or attempt >= self.policy.max_attempts:
+            return False
+        if not is_transient(error):
+            return False
+        delay = self.policy.delay(attempt)
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _record(self, error: BaseException) -> None:
+        if is_transient(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def call(self, func: Callable[[float], T]) -> T:
+        """
+        Call ``func`` with retries; no retry starts once it could not finish by the deadline.
+
+        Args:
+            func: The provider request; takes the attempt's read timeout in seconds
+
+        Returns:
+            The result of ``func``
+
+        Raises:
+            CircuitOpenError: If the provider's circuit is open
+        """
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = func(self.attempt_timeout(deadline))
+            except Exception as e:
+                self._record(e)
+                if not self._backoff(attempt, deadline, e):
+                    raise
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stream(self, factory: Callable[[float], Iterator[T]]) -> Generator[T, None, None]:
+        """
+        Iterate a provider stream with retries until its first item.
+
+        Once an item has been yielded the caller has consumed part of the answer,
+        so a later failure is raised instead of restarting the stream. The deadline
+        is checked between items; the read timeout given to ``factory`` cuts off a
+        stream that stalls before the next item arrives.
+
+        Args:
+            factory: Opens the provider stream; takes the attempt's read timeout in seconds
+
+        Yields:
+            Items of the stream
+        """
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            started = False
+            try:
+                for item in factory(self.attempt_timeout(deadline)):
+                    if time.monotonic() > deadline:
+                        msg = f"{self.name} generation exceeded {self.timeout:.0f}s"
+                        raise GenerationTimeoutError(msg)
+                    if not started:
+                        started = True
+                        self.breaker.record_success()
+                    yield item
+            except GeneratorExit:
+                if not started:
+                    # Closed before the provider answered: no verdict on its health.
+                    self.breaker.release()
+                raise
+            except Exception as e:
+                self._record(e)
+                if started or not self._backoff(attempt, deadline, e):
+                    raise
+                continue
+            if not started:
+                self.breaker.record_success()
+            return
@@ -0,0 +1,665 @@
+"""Grammar-constrained decoding of MySQL SELECT statements for the local model."""
+
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple
+
+import torch
+from transformers import LogitsProcessor
+
+from src.schema.serializer import parse_schema
+
+FENCE_OPEN = "```sql\n"
+FENCE_CLOSE = "\n```"
+MAX_NESTING = 8
+MAX_CONSECUTIVE_SPACES = 3
+# Longest qualifier the select list may use before FROM declares it (table aliases are short).
+MAX_FORWARD_QUALIFIER_LENGTH = 16
+
+# Opaque tokens decode to U+FFFD on their own (partial UTF-8); they only fit inside string literals.
+OPAQUE_TOKEN = "�"
+
+FUNCTIONS = frozenset(
+    {
+        "ABS", "AVG", "CAST", "CEIL", "CEILING", "COALESCE", "CONCAT", "CONCAT_WS", "CONVERT",
+        "COUNT", "CURDATE", "CURRENT_DATE", "CURRENT_TIMESTAMP", "DATE", "DATE_ADD",
+        "DATE_FORMAT", "DATE_SUB", "DATEDIFF", "DAY", "EXISTS", "EXTRACT", "FLOOR",
+        "GREATEST", "GROUP_CONCAT", "HOUR", "IF", "IFNULL", "INSTR", "LAST_DAY", "LEAST",
+        "LEFT", "LENGTH", "LOCATE", "LOWER", "LPAD", "LTRIM", "MAX", "MIN", "MONTH", "NOW",
+        "NULLIF", "PERIOD_DIFF", "QUARTER", "REPLACE", "RIGHT", "ROUND", "RTRIM", "STDDEV",
+        "STR_TO_DATE", "SUBSTR", "SUBSTRING", "SUBSTRING_INDEX", "SUM", "TIMESTAMPDIFF",
+        "TRIM", "TRUNCATE", "UPPER", "WEEK", "YEAR", "YEARWEEK",
+    }
+)  # fmt: skip
+VALUE_KEYWORDS = frozenset({"NULL", "TRUE", "FALSE", "CURRENT_DATE", "CURRENT_TIMESTAMP"})
+PREFIX_KEYWORDS = frozenset({"NOT", "CASE", "WHEN", "INTERVAL", "DISTINCT"})
+BINARY_KEYWORDS = frozenset(
+    {"AND", "OR", "XOR", "LIKE", "IN", "BETWEEN", "IS", "REGEXP", "DIV", "MOD", "THEN", "ELSE"}
+)
+UNIT_KEYWORDS = frozenset(
+    {"MICROSECOND", "SECOND", "MINUTE", "HOUR", "DAY", "WEEK", "MONTH", "QUARTER", "YEAR"}
+)
+TYPE_KEYWORDS = frozenset(
+    {"BINARY", "CHAR", "DATE", "DATETIME", "DECIMAL", "DOUBLE", "JSON", "SIGNED", "TIME"}
+    | {"UNSIGNED"}
+)
+JOIN_KEYWORDS = frozenset({"LEFT", "RIGHT", "INNER", "CROSS", "JOIN"})
+CLAUSE_KEYWORDS = frozenset({"FROM", "WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "OFFSET", "ON"})
+RESERVED_WORDS = (
+    VALUE_KEYWORDS
+    | PREFIX_KEYWORDS
+    | BINARY_KEYWORDS
+    | JOIN_KEYWORDS
+    | CLAUSE_KEYWORDS
+    | {"SELECT", "AS", "BY", "END", "ASC", "DESC", "OUTER", "UNION", "ALL", "EXISTS"}
+)
+
+# Clauses that may precede each clause keyword, in MySQL's fixed order.
+_CLAUSE_AFTER = {
+    "FROM": {"select"},
+    "WHERE": {"from", "on"},
+    "GROUP": {"from", "on", "where"},
+    "HAVING": {"group"},
+    "ORDER": {"from", "on", "where", "group", "having"},
+    "LIMIT": {"from", "on", "where", "group", "having", "order"},
+    "OFFSET": {"limit"},
+    "UNION": {"select", "from", "on", "where", "group", "having"},
+}
+_FORWARD_QUALIFIER = re.compile(rf"[A-Za-z_][A-Za-z0-9_]{{0,{MAX_FORWARD_QUALIFIER_LENGTH - 1}}}")
+_NOT_QUALIFIERS = RESERVED_WORDS | FUNCTIONS
+
+
+_OPERAND_PHASES = frozenset({"item", "operand", "open"})
+_IDENTIFIER_PHASES = _OPERAND_PHASES | {"table", "qualified", "alias", "after_table"}
+
+
+class GrammarState(NamedTuple):
+    """Immutable decoder position: syntactic phase plus the token being lexed."""
+
+    phase: str
+    clause: str = "select"
+    frames: tuple = ()
+    aliases: frozenset = frozenset()
+    pending: frozenset = frozenset()  # Qualifiers used before FROM declared them
+    lex: str = ""
+    text: str = ""
+    spaces: int = 0
+
+
+def extract_schema_identifiers(schema: str) -> dict[str, list[str]]:
+    """
+    Extract table and column names from a schema in any prompt format.
+
+    Args:
+        schema: Schema text (other text around it is ignored)
+
+    Returns:
+        Mapping of table name to its column names
+    """
+    return {table.name: [column.name for column in table.columns] for table in parse_schema(schema)}
+
+
+def _completions(words) -> dict[str, tuple[str, ...]]:
+    """Map every prefix to the words it can still become."""
+    completions: dict[str, list[str]] = {}
+    for word in sorted(words):
+        for i in range(1, len(word) + 1):
+            completions.setdefault(word[:i], []).append(word)
+    return {prefix: tuple(words) for prefix, words in completions.items()}
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch == "_" or ch.isalnum()
+
+
+class SQLGrammar:
+    """
+    Character-level automaton accepting ```sql fenced MySQL SELECT statements.
+
+    Identifiers are restricted to the schema's tables and columns plus aliases
+    declared with AS (or directly after a table name). Qualifiers in the select
+    list may name aliases declared later in FROM: they are recorded and the
+    statement is rejected if the outermost FROM clause ends without declaring
+    them. Transitions for (state, token text) are memoized, so a grammar is
+    built once per schema and reused across requests.
+    """
+
+    def __init__(self, tables: dict[str, list[str]], max_transitions: int = 200_000):
+        """
+        Initialize the grammar.
+
+        Args:
+            tables: Mapping of table name to column names
+            max_transitions: Memoized token transitions kept in the LRU
+        """
+        self.tables = frozenset(tables)
+        self.columns = frozenset(column for columns in tables.values() for column in columns)
+        self.max_transitions = max_transitions
+        self._transitions: OrderedDict[tuple[GrammarState, str], GrammarState | None] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+        operand_keywords = FUNCTIONS | VALUE_KEYWORDS | PREFIX_KEYWORDS
+        operator_keywords = (
+            BINARY_KEYWORDS
+            | UNIT_KEYWORDS
+            | JOIN_KEYWORDS
+            | set(_CLAUSE_AFTER)
+            | {"NOT", "END", "AS", "ASC", "DESC"}
+        )
+        # (identifier completions, keyword completions) for words lexed in each phase.
+        self._vocab = {
+            "start": ({}, _completions({"SELECT"})),
+            "item": (_completions(self.columns | self.tables), _completions(operand_keywords)),
+            "operand": (_completions(self.columns | self.tables), _completions(operand_keywords)),
+            "open": (
+                _completions(self.columns | self.tables),
+                _completions(operand_keywords | {"SELECT"}),
+            ),
+            "operator": ({}, _completions(operator_keywords)),
+            "type_args": ({}, _completions(operator_keywords)),
+            "not": ({}, _completions({"IN", "LIKE", "BETWEEN", "REGEXP"})),
+            "by": ({}, _completions({"BY"})),
+            "join": ({}, _completions({"OUTER", "JOIN"})),
+            "table": (_completions(self.tables), {}),
+            "after_alias": ({}, _completions(JOIN_KEYWORDS | CLAUSE_KEYWORDS | {"UNION"})),
+            "union": ({}, _completions({"ALL", "DISTINCT", "SELECT"})),
+            "type": ({}, _completions(TYPE_KEYWORDS)),
+            "qualified": (_completions(self.columns), {}),
+        }
+
+    @classmethod
+    def from_schema(cls, schema: str) -> "SQLGrammar | None":
+        """Build a grammar from DDL text; None if it defines no tables."""
+        tables = extract_schema_identifiers(schema)
+        return cls(tables) if tables else None
+
+    def initial_state(self) -> GrammarState:
+        """State before any output: the opening ```sql fence is expected."""
+        return GrammarState(phase="fence")
+
+    def is_complete(self, state: GrammarState) -> bool:
+        """Whether generation may end (EOS) in this state."""
+        return state.lex == "" and (
+            state.phase == "end" or (state.phase == "close" and state.text == "")
+        )
+
+    def advance(self, state: GrammarState, text: str) -> GrammarState | None:
+        """
+        Consume a token's text.
+
+        Args:
+            state: Current state
+            text: Decoded token text
+
+        Returns:
+            Next state, or None if the text cannot continue a valid statement
+        """
+        key = (state, text)
+        with self._lock:
+            if key in self._transitions:
+                self._transitions.move_to_end(key)
+                return self._transitions[key]
+
+        result: GrammarState | None = state
+        if text == OPAQUE_TOKEN:
+            result = state if state.lex == "string" else None
+        else:
+            for ch in text:
+                result = self._step(result, ch)
+                if result is None:
+                    break
+
+        with self._lock:
+            self._transitions[key] = result
+            while len(self._transitions) > self.max_transitions:
+                self._transitions.popitem(last=False)
+        return result
+
+    # ------------------------------------------------------------------
+    # Character transitions
+    # ------------------------------------------------------------------
+
+    def _step(self, s: GrammarState, ch: str) -> GrammarState | None:
+        lex = s.lex
+        if lex == "word":
+            if _is_word_char(ch):
+                word = s.text + ch
+                return s._replace(text=word) if self._word_prefix_ok(s, word) else None
+            return self._after_word(s, s.text, ch)
+        if lex == "bquote":
+            if ch == "`":
+                fits = s.text and (self._free_word_phase(s) or self._word_fits(s, s.text))
+                return s._replace(lex="bquote_end") if fits else None
+            if not _is_word_char(ch):
+                return None
+            word = s.text + ch
+            return s._replace(text=word) if self._word_prefix_ok(s, word) else None
+        if lex == "bquote_end":
+            return None if _is_word_char(ch) else self._after_word(s, s.text, ch)
+        if lex == "number":
+            if ch.isdigit() or (ch == "." and "." not in s.text):
+                return s._replace(text=s.text + ch)
+            if _is_word_char(ch) or s.text.endswith("."):
+                return None
+            return self._step(self._operand_done(s), ch)
+        if lex == "string":
+            if ch == "\\":
+                return s._replace(lex="string_escape")
+            if ch == s.text:
+                return s._replace(lex="string_end")
+            return s
+        if lex == "string_escape":
+            return s._replace(lex="string")
+        if lex == "string_end":
+            if ch == s.text:
+                return s._replace(lex="string")
+            return self._step(self._operand_done(s), ch)
+        if lex == "op":
+            if ch == "=" or (s.text == "<" and ch == ">"):
+                return s._replace(phase="operand", lex="", text="")
+            if s.text == "!":
+                return None
+            return self._step(s._replace(phase="operand", lex="", text=""), ch)
+        return self._start_token(s, ch)
+
+    def _start_token(self, s: GrammarState, ch: str) -> GrammarState | None:
+        phase = s.phase
+        if phase == "fence":
+            return self._literal(s, ch, FENCE_OPEN, "start")
+        if phase == "close":
+            return self._literal(s, ch, FENCE_CLOSE, "end")
+        if phase in ("end", "dot", "call"):
+            if phase == "dot" and ch == ".":
+                return s._replace(phase="qualified", spaces=0)
+            if phase == "call" and ch == "(" and len(s.frames) < MAX_NESTING:
+                return s._replace(phase="open", frames=(*s.frames, ("call", s.phase)), spaces=0)
+            return None
+
+        if ch in " \n\t":
+            if s.spaces >= MAX_CONSECUTIVE_SPACES:
+                return None
+            return s._replace(spaces=s.spaces + 1)
+        s = s._replace(spaces=0)
+
+        if ch.isalpha() or ch == "_" or ch == "`":
+            if phase == "limit":
+                return None
+            if ch == "`":
+                quotable = phase in _IDENTIFIER_PHASES
+                return s._replace(lex="bquote", text="") if quotable else None
+            return s._replace(lex="word", text=ch) if self._word_prefix_ok(s, ch) else None
+
+        if phase in _OPERAND_PHASES or phase == "limit":
+            return self._operand_char(s, ch)
+        if phase in ("operator", "type_args"):
+            return self._operator_char(s, ch)
+        if phase in ("after_table", "after_alias"):
+            if ch == ",":
+                return s._replace(phase="table")
+            return self._close_or_end(s, ch)
+        if phase == "table" and ch == "(" and len(s.frames) < MAX_NESTING:
+            return s._replace(phase="open", frames=(*s.frames, ("paren", "table")))
+        if phase == "qualified" and ch == "*":
+            return s._replace(phase="operator")
+        return None
+
+    def _operand_char(self, s: GrammarState, ch: str) -> GrammarState | None:
+        if ch.isdigit():
+            return s._replace(lex="number", text=ch)
+        if s.phase == "limit":
+            return None
+        if ch in "'\"":
+            return s._replace(lex="string", text=ch)
+        if ch == "(" and len(s.frames) < MAX_NESTING:
+            return s._replace(phase="open", frames=(*s.frames, ("paren", s.phase)))
+        if ch in "+-":
+            return s._replace(phase="operand")
+        in_call = bool(s.frames) and s.frames[-1][0] == "call"
+        if ch == "*" and (s.phase == "item" or (s.phase == "open" and in_call)):
+            return s._replace(phase="operator")
+        if ch == ")" and s.phase == "open" and in_call:
+            return s._replace(phase="operator", frames=s.frames[:-1])
+        return None
+
+    def _operator_char(self, s: GrammarState, ch: str) -> GrammarState | None:
+        if ch == "(" and s.phase == "type_args" and len(s.frames) < MAX_NESTING:
+            return s._replace(phase="open", frames=(*s.frames, ("paren", "operator")))
+        if s.clause != "limit":
+            if ch == "=":
+                return s._replace(phase="operand")
+            if ch in "<>!":
+                return s._replace(lex="op", text=ch)
+            if ch in "+-*/%":
+                return s._replace(phase="operand")
+        if ch == ",":
+            if s.frames and s.frames[-1][0] != "query":
+                return s._replace(phase="operand")
+            if s.clause == "select":
+                return s._replace(phase="item")
+            if s.clause in ("group", "order"):
+                return s._replace(phase="operand")
+            if s.clause == "limit":
+                return s._replace(phase="limit")
+            return None
+        return self._close_or_end(s, ch)
+
+    def _close_or_end(self, s: GrammarState, ch: str) -> GrammarState | None:
+        """Handle ')' closing the innermost frame and ';' ending the statement."""
+        if ch == ")" and s.frames:
+            frame = s.frames[-1]
+            if frame[0] == "query":
+                _, clause, phase = frame
+                return s._replace(phase=phase, clause=clause, frames=s.frames[:-1])
+            if s.phase in ("operator", "type_args"):
+                return s._replace(phase="operator", frames=s.frames[:-1])
+            return None
+        if ch == ";" and not s.frames:
+            return self._declared(s._replace(phase="close", text=""))
+        return None
+
+    def _literal(self, s: GrammarState, ch: str, literal: str, next_phase: str):
+        position = len(s.text)
+        if ch != literal[position]:
+            return None
+        if position + 1 == len(literal):
+            return s._replace(phase=next_phase, text="")
+        return s._replace(text=s.text + ch)
+
+    def _operand_done(self, s: GrammarState) -> GrammarState:
+        return s._replace(phase="operator", lex="", text="")
+
+    # ------------------------------------------------------------------
+    # Words
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _free_word_phase(s: GrammarState) -> bool:
+        """Phases where any identifier may appear (new aliases)."""
+        return s.phase in ("alias", "after_table")
+
+    @staticmethod
+    def _forward_qualifier_ok(s: GrammarState, word: str) -> bool:
+        """Whether ``word`` may still become a select-list qualifier that FROM declares later."""
+        return (
+            s.clause == "select"
+            and s.phase in _OPERAND_PHASES
+            and _FORWARD_QUALIFIER.fullmatch(word) is not None
+        )
+
+    @staticmethod
+    def _declared(s: GrammarState) -> GrammarState | None:
+        """
+        Check the forward-referenced qualifiers once the outermost FROM clause is over.
+
+        Inside a subquery the check waits: its qualifiers may name an alias of the
+        enclosing query.
+        """
+        if any(frame[0] == "query" for frame in s.frames):
+            return s
+        return s._replace(pending=frozenset()) if s.pending <= s.aliases else None
+
+    def _word_prefix_ok(self, s: GrammarState, word: str) -> bool:
+        if self._free_word_phase(s):
+            return not word[0].isdigit()
+        identifiers, keywords = self._vocab.get(s.phase, ({}, {}))
+        candidates = [*identifiers.get(word, ()), *keywords.get(word.upper(), ())]
+        if s.phase in _OPERAND_PHASES or s.phase == "qualified":
+            candidates += [alias for alias in s.aliases if alias.startswith(word)]
+        # A prefix is only worth continuing if some completion fits the current context,
+        # otherwise decoding could walk into a word it can never finish.
+        if any(self._word_fits(s, candidate) for candidate in candidates):
+            return True
+        return self._forward_qualifier_ok(s, word)
+
+    def _word_fits(self, s: GrammarState, word: str) -> bool:
+        """Whether ``word`` can be completed here (followed by a space, "." or "(")."""
+        return any(self._after_word(s, word, ch) is not None for ch in " .(")
+
+    def _after_word(self, s: GrammarState, word: str, ch: str) -> GrammarState | None:
+        """Classify a completed word (using the character that ended it) and consume ``ch``."""
+        s = s._replace(lex="", text="")
+        upper = word.upper()
+        phase = s.phase
+
+        if phase in _OPERAND_PHASES:
+            nxt = self._operand_word(s, word, upper, ch)
+        elif phase in ("operator", "type_args"):
+            nxt = self._operator_word(s, upper)
+        elif phase in ("after_table", "after_alias"):
+            nxt = self._table_suffix_word(s, word, upper)
+        elif phase == "alias":
+            if upper in RESERVED_WORDS:
+                return None
+            next_phase = "operator" if s.clause == "select" else "after_alias"
+            nxt = s._replace(phase=next_phase, aliases=s.aliases | {word})
+        elif phase == "start":
+            nxt = s._replace(phase="item", clause="select") if upper == "SELECT" else None
+        elif phase == "union":
+            if upper == "SELECT":
+                nxt = s._replace(phase="item", clause="select")
+            else:
+                nxt = s._replace(phase="start") if upper in ("ALL", "DISTINCT") else None
+        elif phase == "table":
+            nxt = s._replace(phase="after_table") if word in self.tables else None
+        elif phase == "qualified":
+            known = word in self.columns or word in s.aliases
+            nxt = s._replace(phase="operator") if known else None
+        elif phase == "by":
+            nxt = s._replace(phase="operand") if upper == "BY" else None
+        elif phase == "not":
+            known = upper in ("IN", "LIKE", "BETWEEN", "REGEXP")
+            nxt = s._replace(phase="operand") if known else None
+        elif phase == "join":
+            nxt = {"OUTER": s._replace(phase="join"), "JOIN": s._replace(phase="table")}.get(upper)
+        elif phase == "type":
+            nxt = s._replace(phase="type_args") if upper in TYPE_KEYWORDS else None
+        else:
+            nxt = None
+
+        return None if nxt is None else self._step(nxt, ch)
+
+    def _operand_word(self, s: GrammarState, word: str, upper: str, ch: str):
+        if ch == ".":
+            if word in self.tables or word in s.aliases:
+                return s._replace(phase="dot")
+            if upper not in _NOT_QUALIFIERS and self._forward_qualifier_ok(s, word):
+                return s._replace(phase="dot", pending=s.pending | {word})
+            return None
+        if ch == "(":
+            return s._replace(phase="call") if upper in FUNCTIONS else None
+        if word in self.columns or word in s.aliases or upper in VALUE_KEYWORDS:
+            return s._replace(phase="operator")
+        if upper == "DISTINCT":
+            return s
+        if upper in PREFIX_KEYWORDS:
+            return s._replace(phase="operand")
+        if upper == "SELECT" and s.phase == "open":
+            kind, opened_in = s.frames[-1]
+            return_phase = "after_table" if opened_in == "table" else "operator"
+            frames = (*s.frames[:-1], ("query", s.clause, return_phase))
+            return s._replace(phase="item", clause="select", frames=frames)
+        return None
+
+    def _operator_word(self, s: GrammarState, upper: str):
+        if upper in BINARY_KEYWORDS or upper == "WHEN":
+            return s._replace(phase="operand")
+        if upper == "NOT":
+            return s._replace(phase="not")
+        if upper == "END" or upper in UNIT_KEYWORDS:
+            return s._replace(phase="operator")
+        if upper in ("ASC", "DESC"):
+            return s._replace(phase="operator") if s.clause == "order" else None
+        if upper == "AS":
+            if s.frames and s.frames[-1][0] == "call":
+                return s._replace(phase="type")
+            return s._replace(phase="alias") if self._at_query_level(s, "select") else None
+        return self._clause_word(s, upper)
+
+    def _table_suffix_word(self, s: GrammarState, word: str, upper: str):
+        if s.phase == "after_table" and upper == "AS":
+            return s._replace(phase="alias")
+        if upper == "ON":
+            return s._replace(phase="operand", clause="on")
+        nxt = self._clause_word(s, upper)
+        if nxt is not None or s.phase == "after_alias" or upper in RESERVED_WORDS:
+            return nxt
+        return s._replace(phase="after_alias", aliases=s.aliases | {word})
+
+    def _clause_word(self, s: GrammarState, upper: str):
+        """Clause and join keywords, valid only outside parentheses of the current query."""
+        if not self._at_query_level(s):
+            return None
+        if upper in JOIN_KEYWORDS:
+            if s.clause not in ("from", "on"):
+                return None
+            if upper == "JOIN":
+                return s._replace(phase="table", clause="from")
+            return s._replace(phase="join", clause="from")
+        if s.clause not in _CLAUSE_AFTER.get(upper, ()):
+            return None
+        if upper == "FROM":
+            return s._replace(phase="table", clause="from")
+        s = self._declared(s)
+        if s is None:
+            return None
+        if upper == "UNION":
+            return s._replace(phase="union", clause="select")
+        if upper in ("GROUP", "ORDER"):
+            return s._replace(phase="by", clause=upper.lower())
+        if upper in ("LIMIT", "OFFSET"):
+            return s._replace(phase="limit", clause="limit")
+        return s._replace(phase="operand", clause=upper.lower())
+
+    @staticmethod
+    def _at_query_level(s: GrammarState, clause: str | None = None) -> bool:
+        if s.frames and s.frames[-1][0] != "query":
+            return False
+        return clause is None or s.clause == clause
+
+
+@lru_cache(maxsize=16)
+def get_sql_grammar(schema: str) -> SQLGrammar | None:
+    """Return the (cached) grammar for a schema DDL string."""
+    return SQLGrammar.from_schema(schema)
+
+
+def build_token_strings(tokenizer) -> list[str | None]:
+    """
+    Decode every vocabulary entry on its own.
+
+    Special tokens map to None; tokens that are only part of a UTF-8 character
+    map to OPAQUE_TOKEN.
+    """
+    special_ids = set(tokenizer.all_special_ids)
+    strings: list[str | None] = []
+    for token_id in range(len(tokenizer)):
+        if token_id in special_ids:
+            strings.append(None)
+            continue
+        text = tokenizer.decode([token_id], clean_up_tokenization_spaces=False)
+        strings.append(OPAQUE_TOKEN if OPAQUE_TOKEN in text else text)
+    return strings
+
+
+class SQLGrammarLogitsProcessor(LogitsProcessor):
+    """
+    Masks every token that would make a row's output leave the SQL grammar.
+
+    Candidates are checked in descending score order: the ``top_k`` best tokens
+    first, then the rest of the vocabulary only if none of those is valid. All
+    tokens that were not verified as valid are set to -inf, so sampling warpers
+    applied afterwards only ever see grammatical continuations.
+    """
+
+    def __init__(
+        self,
+        grammars: list[SQLGrammar | None],
+        token_strings: list[str | None],
+        eos_token_ids: set[int],
+        prompt_length: int,
+        top_k: int = 32,
+    ):
+        """
+        Initialize the processor.
+
+        Args:
+            grammars: Grammar per batch row (None leaves the row unconstrained)
+            token_strings: Output of build_token_strings()
+            eos_token_ids: Tokens that end generation
+            prompt_length: Length of the (padded) prompt in input_ids
+            top_k: Candidates checked before falling back to the full vocabulary
+        """
+        self.grammars = grammars
+        self.token_strings = token_strings
+        self.eos_token_ids = eos_token_ids
+        self.prompt_length = prompt_length
+        self.top_k = top_k
+        self.states: list[GrammarState | None] = [
+            grammar.initial_state() if grammar is not None else None for grammar in grammars
+        ]
+        self._consumed = 0
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor):
+        generated = input_ids.shape[1] - self.prompt_length
+        if generated > self._consumed:
+            self._advance(input_ids[:, -1].tolist())
+            self._consumed = generated
+
+        for row, state in enumerate(self.states):
+            if state is None:
+                continue
+            allowed = self._allowed_tokens(self.grammars[row], state, scores[row])
+            if allowed:
+                mask = torch.full_like(scores[row], float("-inf"))
+                index = torch.tensor(allowed, device=scores.device)
+                mask[index] = 0
+                scores[row] = scores[row] + mask
+        return scores
+
+    def _advance(self, last_tokens: list[int]) -> None:
+        for row, token_id in enumerate(last_tokens):
+            state = self.states[row]
+            if state is None:
+                continue
+            text = self._token_text(token_id)
+            if token_id in self.eos_token_ids or text is None:
+                self.states[row] = None
+            else:
+                self.states[row] = self.grammars[row].advance(state, text)
+
+    def _token_text(self, token_id: int) -> str | None:
+        if token_id < len(self.token_strings):
+            return self.token_strings[token_id]
+        return None
+
+    def _allowed_tokens(self, grammar: SQLGrammar, state: GrammarState, row_scores) -> list[int]:
+        complete = grammar.is_complete(state)
+        k = min(self.top_k, row_scores.shape[0])
+        candidates = torch.topk(row_scores, k).indices.tolist()
+        allowed = self._filter(grammar, state, candidates, complete)
+        if allowed:
+            return allowed
+
+        ranked = torch.argsort(row_scores, descending=True).tolist()
+        for start in range(k, len(ranked), 1024):
+            allowed = self._filter(grammar, state, ranked[start : start + 1024], complete)
+            if allowed:
+                return allowed
+        # No grammatical continuation is representable by this vocabulary: end the row.
+        return sorted(self.eos_token_ids)
+
+    def _filter(self, grammar, state, candidates: list[int], complete: bool) -> list[int]:
+        allowed = []
+        for token_id in candidates:
+            if token_id in self.eos_token_ids:
+                if complete:
+                    allowed.append(token_id)
+                continue
+            text = self._token_text(token_id)
+            if text and grammar.advance(state, text) is not None:
+                allowed.append(token_id)
+        return allowed
@@ -0,0 +1,137 @@
+"""Detect the end of a generated SQL answer while text is still streaming."""
+
+import re
+from collections.abc import Sequence
+
+# The prompt asks for SQL wrapped in ```sql fences; statement-level stops only apply inside one.
+_SQL_FENCE_OPEN = re.compile(r"```sql", re.IGNORECASE)
+
+
+class StopSequenceMatcher:
+    """
+    Incremental matcher for stop sequences and the end of the first SQL statement.
+
+    Call update() with the full text decoded so far after every step. Matching
+    mirrors hosted APIs: the text is cut before a stop sequence, so callers
+    never see it. With ``stop_at_semicolon`` generation also ends right after
+    a ``;`` at statement depth zero (outside strings, comments and parentheses)
+    inside a ```sql block.
+    """
+
+    def __init__(self, stop_sequences: Sequence[str] = (), stop_at_semicolon: bool = False):
+        """
+        Initialize the matcher.
+
+        Args:
+            stop_sequences: Strings that end generation (excluded from the output)
+            stop_at_semicolon: Also stop after the first top-level ``;`` in a ```sql block
+        """
+        self.stop_sequences = tuple(sequence for sequence in stop_sequences if sequence)
+        self.stop_at_semicolon = stop_at_semicolon
+        self.stop_index: int | None = None
+        self._holdback = max((len(sequence) for sequence in self.stop_sequences), default=1) - 1
+        self._searched = 0
+
+        self._sql_start: int | None = None
+        self._scanned = 0
+        self._quote: str | None = None
+        self._comment: str | None = None
+        self._depth = 0
+
+    @property
+    def stopped(self) -> bool:
+        """Whether the end of the answer has been reached."""
+        return self.stop_index is not None
+
+    def update(self, text: str) -> bool:
+        """
+        Scan newly decoded text.
+
+        Args:
+            text: Full text generated so far (earlier characters must be unchanged)
+
+        Returns:
+            True once generation should stop
+        """
+        if self.stopped:
+            return True
+
+        self._match_sequences(text)
+        if self.stop_at_semicolon:
+            self._scan_statement(text)
+        return self.stopped
+
+    def safe_length(self, text: str, final: bool = False) -> int:
+        """
+        Return how many characters of ``text`` can be emitted to a streaming caller.
+
+        Characters that could still turn out to be the start of a stop sequence
+        are held back until the next update (or until generation ends).
+        """
+        if self.stopped:
+            return self.stop_index
+        if final:
+            return len(text)
+        return max(0, len(text) - self._holdback)
+
+    def truncate(self, text: str) -> str:
+        """Return ``text`` cut at the stop point (unchanged if no stop was found)."""
+        self.update(text)
+        return text if self.stop_index is None else text[: self.stop_index]
+
+    def _stop_at(self, index: int) -> None:
+        if self.stop_index is None or index < self.stop_index:
+            self.stop_index = index
+
+    def _match_sequences(self, text: str) -> None:
+        """Look for stop sequences overlapping the newly added text."""
+        start = max(0, self._searched - self._holdback)
+        for sequence in self.stop_sequences:
+            position = text.find(sequence, start)
+            if position >= 0:
+                self._stop_at(position)
+        self._searched = len(text)
+
+    def _scan_statement(self, text: str) -> None:
+        """Track quotes, comments and parentheses to find a top-level ``;``."""
+        if self._sql_start is None:
+            match = _SQL_FENCE_OPEN.search(text)
+            if match is None:
+                return
+            self._sql_start = self._scanned = match.end()
+
+        i = self._scanned
+        while i < len(text):
+            ch = text[i]
+            nxt = text[i + 1] if i + 1 < len(text) else None
+            # Wait for the next character before deciding on "--", "/*", "*/" or an escape.
+            if nxt is None and ch in "-/*\\":
+                break
+            if self._comment == "line":
+                if ch == "\n":
+                    self._comment = None
+            elif self._comment == "block":
+                if ch == "*" and nxt == "/":
+                    self._comment = None
+                    i += 1
+            elif self._quote is not None:
+                if ch == "\\":
+                    i += 1
+                elif ch == self._quote:
+                    self._quote = None
+            elif ch in "'\"`":
+                self._quote = ch
+            elif ch == "#" or (ch == "-" and nxt == "-"):
+                self._comment = "line"
+            elif ch == "/" and nxt == "*":
+                self._comment = "block"
+                i += 1
+            elif ch == "(":
+                self._depth += 1
+            elif ch == ")":
+                self._depth = max(0, self._depth - 1)
+            elif ch == ";" and self._depth == 0:
+                self._stop_at(i + 1)
+                return
+            i += 1
+        self._scanned = i
@@ -47,6 +47,10 @@ PROMPT_TEMPLATE = """### 資料庫Schema:
 """
 
 
+# 所有 prompt 共用的前綴（系統指令 + schema）之後，第一個可變區段的標題
+VARIABLE_SECTION_MARKERS = ("\n### 歷史錯誤記錄", "\n### 使用者問題")
+
+
 class TextToSQLPrompt:
     """Text-to-SQL prompt template manager."""
 
@@ -125,6 +129,28 @@ class TextToSQLPrompt:
         )
         return full_prompt
 
+    @staticmethod
+    def split_cacheable_prefix(prompt: str) -> tuple[str, str]:
+        """
+        Split a prompt into its shared prefix and the per-request remainder.
+
+        The prefix (system instruction + schema) is identical for every prompt
+        built from the same schema, so models can cache its computation.
+
+        Args:
+            prompt: Prompt built by build_prompt() or build_retry_prompt()
+
+        Returns:
+            Tuple of (prefix, remainder); prefix is empty if the prompt has no markers
+        """
+        positions = [prompt.find(marker) for marker in VARIABLE_SECTION_MARKERS]
+        positions = [pos for pos in positions if pos > 0]
+        if not positions:
+            return "", prompt
+
+        boundary = len(prompt[: min(positions)].rstrip())
+        return prompt[:boundary], prompt[boundary:]
+
     @staticmethod
     def get_system_instruction() -> str:
         """Get the system instruction for the model."""
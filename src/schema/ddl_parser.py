@@ -0,0 +1,226 @@
+"""Parse MySQL CREATE TABLE statements into structured table definitions."""
+
+import re
+from dataclasses import dataclass, field
+
+_CREATE_TABLE = re.compile(
+    r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\(", re.IGNORECASE
+)
+_COMMENT = re.compile(r"\bCOMMENT\s*=?\s*'((?:[^'\\]|\\.|'')*)'", re.IGNORECASE)
+_DEFAULT = re.compile(r"\bDEFAULT\s+('(?:[^'\\]|\\.|'')*'|\S+)", re.IGNORECASE)
+_KEY_PREFIX_LENGTH = re.compile(r"\s*\(\d+\)$")
+_KEY_NAME = re.compile(r"^(?:UNIQUE\s+)?(?:KEY|INDEX)\s+`?(\w+)`?", re.IGNORECASE)
+
+
+@dataclass
+class Column:
+    """A table column."""
+
+    name: str
+    data_type: str
+    nullable: bool = True
+    default: str | None = None
+    comment: str = ""
+
+
+@dataclass
+class Table:
+    """A table with its columns and key constraints."""
+
+    name: str
+    columns: list[Column] = field(default_factory=list)
+    primary_key: tuple[str, ...] = ()
+    unique_keys: dict[str, tuple[str, ...]] = field(default_factory=dict)
+    comment: str = ""
+
+    @property
+    def key_columns(self) -> set[str]:
+        """Names of columns that are part of the primary key or a unique key."""
+        keys = set(self.primary_key)
+        for columns in self.unique_keys.values():
+            keys.update(columns)
+        return keys
+
+    def column(self, name: str) -> Column | None:
+        """Return the column with the given name, if any."""
+        return next((column for column in self.columns if column.name == name), None)
+
+    def select_columns(self, names: set[str]) -> "Table":
+        """
+        Return a copy restricted to ``names`` (schema order kept).
+
+        Key constraints are kept only when all of their columns are kept.
+        """
+        kept = {column.name for column in self.columns if column.name in names}
+        return Table(
+            name=self.name,
+            columns=[column for column in self.columns if column.name in kept],
+            primary_key=self.primary_key if set(self.primary_key) <= kept else (),
+            unique_keys={
+                key: columns for key, columns in self.unique_keys.items() if set(columns) <= kept
+            },
+            comment=self.comment,
+        )
+
+    def to_ddl(self) -> str:
+        """Render minimal DDL: types, NOT NULL, comments and keys, without storage options."""
+        lines = []
+        for column in self.columns:
+            line = f"  {column.name} {column.data_type}"
+            if not column.nullable:
+                line += " NOT NULL"
+            if column.comment:
+                line += f" COMMENT {quote_literal(column.comment)}"
+            lines.append(line)
+        if self.primary_key:
+            lines.append(f"  PRIMARY KEY ({','.join(self.primary_key)})")
+        for key, columns in self.unique_keys.items():
+            lines.append(f"  UNIQUE KEY {key} ({','.join(columns)})")
+
+        suffix = f" COMMENT={quote_literal(self.comment)}" if self.comment else ""
+        return f"CREATE TABLE {self.name} (\n" + ",\n".join(lines) + f"\n){suffix};"
+
+
+def parse_ddl(ddl: str) -> list[Table]:
+    """
+    Parse every CREATE TABLE statement in ``ddl``.
+
+    Text outside the statements is ignored, so prompts containing DDL can be
+    parsed directly.
+
+    Args:
+        ddl: Text containing CREATE TABLE statements
+
+    Returns:
+        Parsed tables in order of appearance
+    """
+    tables = []
+    for match in _CREATE_TABLE.finditer(ddl):
+        body_end = _matching_paren(ddl, match.end() - 1)
+        if body_end < 0:
+            continue
+        table = Table(name=match.group(1))
+        for item in split_top_level(ddl[match.end() : body_end]):
+            _parse_item(table, item)
+
+        options = ddl[body_end + 1 : ddl.find(";", body_end) if ";" in ddl[body_end:] else None]
+        comment = _COMMENT.search(options)
+        if comment:
+            table.comment = unquote_literal(comment.group(1))
+        tables.append(table)
+    return tables
+
+
+def format_schema(tables: list[Table]) -> str:
+    """Render tables as minimal DDL separated by blank lines."""
+    return "\n\n".join(table.to_ddl() for table in tables)
+
+
+def _parse_item(table: Table, item: str) -> None:
+    """Add a column or key definition from the table body to ``table``."""
+    upper = item.upper()
+    if upper.startswith("PRIMARY KEY"):
+        table.primary_key = _key_columns(item)
+    elif upper.startswith(("UNIQUE KEY", "UNIQUE INDEX", "UNIQUE ")):
+        name = _KEY_NAME.match(item)
+        key = name.group(1) if name else f"unique_{len(table.unique_keys) + 1:02d}"
+        table.unique_keys[key] = _key_columns(item)
+    elif upper.startswith(("KEY ", "INDEX ", "CONSTRAINT", "FOREIGN KEY", "FULLTEXT", "SPATIAL")):
+        return
+    else:
+        name, _, rest = item.partition(" ")
+        data_type, rest = _read_type(rest.strip())
+        default = _DEFAULT.search(rest)
+        comment = _COMMENT.search(rest)
+        table.columns.append(
+            Column(
+                name=name.strip("`"),
+                data_type=data_type,
+                nullable="NOT NULL" not in rest.upper(),
+                default=default.group(1) if default else None,
+                comment=unquote_literal(comment.group(1)) if comment else "",
+            )
+        )
+
+
+def _read_type(text: str) -> tuple[str, str]:
+    """Split ``decimal(20,10) NOT NULL ...`` into the type and the remaining options."""
+    match = re.match(r"\w+(?:\s*\([^)]*\))?(?:\s+(?:unsigned|zerofill))*", text, re.IGNORECASE)
+    if match is None:
+        return text, ""
+    return match.group(0), text[match.end() :]
+
+
+def _key_columns(item: str) -> tuple[str, ...]:
+    start = item.find("(")
+    end = _matching_paren(item, start) if start >= 0 else -1
+    if end < 0:
+        return ()
+    # Drop prefix lengths such as `name`(20).
+    return tuple(
+        _KEY_PREFIX_LENGTH.sub("", part).strip("`")
+        for part in split_top_level(item[start + 1 : end])
+    )
+
+
+def _matching_paren(text: str, start: int) -> int:
+    """Index of the parenthesis closing the one at ``start`` (quotes respected), or -1."""
+    depth = 0
+    quote = None
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == "\\":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+def split_top_level(body: str) -> list[str]:
+    """Split a table body (or key column list) on commas outside parentheses and quotes."""
+    items, current = [], []
+    depth = 0
+    quote = None
+    escaped = False
+    for ch in body:
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    items.append("".join(current).strip())
+    return [" ".join(item.split()) for item in items if item]
+
+
+def unquote_literal(text: str) -> str:
+    """Undo SQL string escaping (``''`` and ``\\'``)."""
+    return text.replace("''", "'").replace("\\'", "'")
+
+
+def quote_literal(text: str) -> str:
+    """Quote text as a SQL string literal."""
+    return "'" + text.replace("'", "''") + "'"
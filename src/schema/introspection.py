@@ -0,0 +1,109 @@
+"""Load table definitions from a live MySQL database via information_schema."""
+
+from collections.abc import Iterable
+from typing import Any
+
+from src.database.db_connector import DatabaseConnector
+from src.schema.ddl_parser import Column, Table
+
+_TABLES_SQL = """
+SELECT TABLE_NAME AS table_name, TABLE_COMMENT AS table_comment
+FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = COALESCE(%s, DATABASE()) AND TABLE_TYPE = 'BASE TABLE'
+ORDER BY TABLE_NAME
+"""
+
+_COLUMNS_SQL = """
+SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name, COLUMN_TYPE AS column_type,
+       IS_NULLABLE AS is_nullable, COLUMN_DEFAULT AS column_default,
+       COLUMN_COMMENT AS column_comment
+FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = COALESCE(%s, DATABASE())
+ORDER BY TABLE_NAME, ORDINAL_POSITION
+"""
+
+_KEYS_SQL = """
+SELECT TABLE_NAME AS table_name, INDEX_NAME AS index_name, COLUMN_NAME AS column_name
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = COALESCE(%s, DATABASE()) AND NON_UNIQUE = 0
+ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+"""
+
+
+def load_tables(database: str | None = None, tables: Iterable[str] | None = None) -> list[Table]:
+    """
+    Read table definitions from information_schema.
+
+    Args:
+        database: Schema to read (default: the connection's current database)
+        tables: Only return these tables (default: all base tables)
+
+    Returns:
+        Tables with columns, comments and primary/unique keys
+    """
+    with DatabaseConnector.pooled_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(_TABLES_SQL, (database,))
+            table_rows = cursor.fetchall()
+            cursor.execute(_COLUMNS_SQL, (database,))
+            column_rows = cursor.fetchall()
+            cursor.execute(_KEYS_SQL, (database,))
+            key_rows = cursor.fetchall()
+
+    result = tables_from_information_schema(table_rows, column_rows, key_rows)
+    if tables is not None:
+        wanted = set(tables)
+        result = [table for table in result if table.name in wanted]
+    return result
+
+
+def tables_from_information_schema(
+    table_rows: Iterable[dict[str, Any]],
+    column_rows: Iterable[dict[str, Any]],
+    key_rows: Iterable[dict[str, Any]],
+) -> list[Table]:
+    """
+    Build tables from information_schema rows (as returned by load_tables' queries).
+
+    Args:
+        table_rows: Rows with table_name, table_comment
+        column_rows: Rows with table_name, column_name, column_type, is_nullable,
+            column_default, column_comment (in ordinal order)
+        key_rows: Unique index rows with table_name, index_name, column_name (in index order)
+
+    Returns:
+        Tables in table_rows order
+    """
+    tables = {
+        row["table_name"]: Table(name=row["table_name"], comment=row["table_comment"] or "")
+        for row in table_rows
+    }
+
+    for row in column_rows:
+        table = tables.get(row["table_name"])
+        if table is None:
+            continue
+        default = row["column_default"]
+        table.columns.append(
+            Column(
+                name=row["column_name"],
+                data_type=row["column_type"],
+                nullable=row["is_nullable"] == "YES",
+                default=None if default is None else str(default),
+                comment=row["column_comment"] or "",
+            )
+        )
+
+    keys: dict[tuple[str, str], list[str]] = {}
+    for row in key_rows:
+        keys.setdefault((row["table_name"], row["index_name"]), []).append(row["column_name"])
+    for (table_name, index_name), columns in keys.items():
+        table = tables.get(table_name)
+        if table is None:
+            continue
+        if index_name == "PRIMARY":
+            table.primary_key = tuple(columns)
+        else:
+            table.unique_keys[index_name] = tuple(columns)
+
+    return list(tables.values())
@@ -0,0 +1,254 @@
+"""Pick the tables and columns relevant to a question before building the prompt."""
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+import config
+from src.schema.ddl_parser import Table, format_schema
+from src.schema.serializer import parse_schema
+from src.utils.embeddings import create_embedder
+
+_ASCII_WORD = re.compile(r"[A-Za-z0-9]+")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+_STOP_WORDS = frozenset(
+    {
+        "a", "all", "an", "and", "are", "as", "by", "each", "for", "from", "give", "how",
+        "in", "is", "list", "me", "many", "of", "on", "or", "per", "show", "the", "to",
+        "what", "which", "with",
+    }
+)  # fmt: skip
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into matching terms.
+
+    ASCII identifiers are split on underscores and camelCase boundaries;
+    CJK runs become character bigrams (single characters for 1-character runs).
+    """
+    terms = []
+    for word in _ASCII_WORD.findall(_CAMEL_BOUNDARY.sub(" ", text)):
+        word = word.lower()
+        if word not in _STOP_WORDS:
+            terms.append(word)
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        terms.extend(run[i : i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+@dataclass
+class _SchemaIndex:
+    """Per-schema lookup structures, built once and reused for every question."""
+
+    tables: list[Table]
+    column_refs: list[tuple[int, str]]  # (table index, column name) per document
+    column_terms: list[set[str]]
+    table_terms: list[set[str]]
+    idf: dict[str, float]
+    column_vectors: object = None  # numpy array when an embedder is configured
+
+
+class SchemaLinker:
+    """
+    Prune a DDL schema to the tables and columns a question refers to.
+
+    Columns are scored by IDF-weighted overlap between the question and the
+    column name and comment; an optional embedder adds semantic matches.
+    Primary and unique key columns of every selected table are always kept.
+    A table named in the question keeps all of its columns, and when nothing
+    matches every table is returned, so pruning never leaves the model without
+    the table it needs.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        synonyms: dict[str, str] | None = None,
+        max_tables: int | None = None,
+        min_score: float = 1.5,
+        min_similarity: float = 0.35,
+        max_cached_schemas: int = 4,
+    ):
+        """
+        Initialize the linker.
+
+        Args:
+            embedder: Object with ``encode(texts) -> ndarray`` returning normalised
+                vectors (see src.utils.embeddings), or None for lexical matching only
+            synonyms: Question phrases mapped to schema wording (e.g. {"騰訊": "tencent"}),
+                for terms that never appear in column names or comments
+            max_tables: Keep at most this many tables (None for no limit)
+            min_score: Minimum IDF-weighted overlap for a column to match
+            min_similarity: Minimum cosine similarity for an embedding match
+            max_cached_schemas: Number of parsed schemas kept in memory
+        """
+        self.embedder = embedder
+        self.synonyms = {phrase.lower(): text for phrase, text in (synonyms or {}).items()}
+        self.max_tables = max_tables
+        self.min_score = min_score
+        self.min_similarity = min_similarity
+        self.max_cached_schemas = max_cached_schemas
+        self._indexes: OrderedDict[str, _SchemaIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def warmup(self, schema: str) -> None:
+        """Parse and index a schema ahead of the first question (e.g. at startup)."""
+        self._get_index(schema)
+
+    def link(self, schema: str, question: str) -> str:
+        """
+        Return compact DDL for the parts of ``schema`` relevant to ``question``.
+
+        Args:
+            schema: DDL text with CREATE TABLE statements
+            question: User's natural language query
+
+        Returns:
+            Pruned schema, or ``schema`` unchanged if it has no CREATE TABLE statements
+        """
+        tables = self.select(schema, question)
+        return format_schema(tables) if tables else schema
+
+    def select(self, schema: str, question: str) -> list[Table]:
+        """
+        Return the pruned tables (schema order) relevant to ``question``.
+
+        Args:
+            schema: DDL text with CREATE TABLE statements
+            question: User's natural language query
+
+        Returns:
+            Tables restricted to the relevant columns; all tables if nothing matched
+        """
+        index = self._get_index(schema)
+        if not index.tables:
+            return []
+
+        terms = self._question_terms(question)
+        # A table named in the question is selected whole; its name words
+        # ("bill" in tencent_bill) are not evidence for individual columns.
+        named = [
+            table_index
+            for table_index, table_terms in enumerate(index.table_terms)
+            if table_terms and table_terms <= terms
+        ]
+        name_terms = set().union(*(index.table_terms[i] for i in named))
+        column_scores = self._score_columns(index, terms - name_terms, question)
+
+        matched: dict[int, set[str]] = {}
+        table_scores: Counter = Counter()
+        for (table_index, column), score in zip(index.column_refs, column_scores, strict=True):
+            if score >= self.min_score:
+                matched.setdefault(table_index, set()).add(column)
+                table_scores[table_index] += score
+        for table_index in named:
+            table_scores[table_index] += sum(
+                index.idf[term] for term in index.table_terms[table_index]
+            )
+
+        if not table_scores:
+            return list(index.tables)
+
+        selected = [table_index for table_index, _ in table_scores.most_common(self.max_tables)]
+        pruned = []
+        for table_index in sorted(selected):
+            table = index.tables[table_index]
+            columns = matched.get(table_index)
+            if not columns or table_index in named:
+                pruned.append(table)
+            else:
+                pruned.append(table.select_columns(columns | table.key_columns))
+        return pruned
+
+    def _question_terms(self, question: str) -> set[str]:
+        terms = set(tokenize(question))
+        lowered = question.lower()
+        for phrase, text in self.synonyms.items():
+            if phrase in lowered:
+                terms.update(tokenize(text))
+        return terms
+
+    def _score_columns(self, index: _SchemaIndex, terms: set[str], question: str) -> list[float]:
+        scores = [
+            sum(index.idf[term] for term in terms & column_terms)
+            for column_terms in index.column_terms
+        ]
+        if index.column_vectors is not None:
+            query = self.embedder.encode([question])[0]
+            similarities = index.column_vectors @ query
+            for i, similarity in enumerate(similarities.tolist()):
+                if similarity >= self.min_similarity:
+                    scores[i] += self.min_score + similarity
+        return scores
+
+    def _get_index(self, schema: str) -> _SchemaIndex:
+        with self._lock:
+            index = self._indexes.get(schema)
+            if index is not None:
+                self._indexes.move_to_end(schema)
+                return index
+
+        index = self._build_index(schema)
+        with self._lock:
+            self._indexes[schema] = index
+            while len(self._indexes) > self.max_cached_schemas:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _build_index(self, schema: str) -> _SchemaIndex:
+        tables = parse_schema(schema)
+        column_refs, column_terms, documents = [], [], []
+        for table_index, table in enumerate(tables):
+            for column in table.columns:
+                column_refs.append((table_index, column.name))
+                column_terms.append(set(tokenize(f"{column.name} {column.comment}")))
+                documents.append(f"{column.name.replace('_', ' ')} {column.comment}")
+        table_terms = [set(tokenize(table.name)) for table in tables]
+
+        # Smoothed IDF over column documents: terms shared by most columns weigh ~0.
+        document_frequency: Counter = Counter()
+        for term_set in column_terms + table_terms:
+            document_frequency.update(term_set)
+        count = len(column_terms) + len(table_terms)
+        idf = {
+            term: math.log((count + 1) / (frequency + 1))
+            for term, frequency in document_frequency.items()
+        }
+
+        column_vectors = None
+        if self.embedder is not None and documents:
+            column_vectors = self.embedder.encode(documents)
+
+        return _SchemaIndex(
+            tables=tables,
+            column_refs=column_refs,
+            column_terms=column_terms,
+            table_terms=table_terms,
+            idf=idf,
+            column_vectors=column_vectors,
+        )
+
+
+_linker: SchemaLinker | None = None
+_linker_lock = threading.Lock()
+
+
+def get_schema_linker() -> SchemaLinker | None:
+    """Return the process-wide schema linker, or None when schema linking is disabled."""
+    global _linker
+    if not config.SCHEMA_LINKING_ENABLED:
+        return None
+    with _linker_lock:
+        if _linker is None:
+            _linker = SchemaLinker(
+                embedder=create_embedder(config.SCHEMA_LINKING_EMBEDDER, config.MODEL_DEVICE),
+                synonyms=config.SCHEMA_LINKING_SYNONYMS,
+                max_tables=config.SCHEMA_LINKING_MAX_TABLES or None,
+            )
+        return _linker
@@ -0,0 +1,249 @@
+"""Render parsed schemas in compact prompt formats and measure their token cost."""
+
+import json
+import re
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+
+from src.schema.ddl_parser import (
+    Column,
+    Table,
+    format_schema,
+    parse_ddl,
+    quote_literal,
+    split_top_level,
+    unquote_literal,
+)
+
+# "original" sends the configured DDL untouched; the others re-render the parsed tables.
+SCHEMA_FORMATS = ("original", "ddl", "compact", "json")
+
+_COMPACT_LINE = re.compile(
+    r"^(\w+)\((.*)\)(?:\s+'((?:[^']|'')*)')?[ \t]*$",
+    re.MULTILINE,
+)
+_COMPACT_COLUMN = re.compile(
+    r"^(\w+)\s+(\w+(?:\([^)]*\))?(?:\s+(?:unsigned|zerofill))*)(\s+NOT NULL)?"
+    r"(?:\s+'((?:[^']|'')*)')?$",
+    re.IGNORECASE,
+)
+_COMPACT_KEY = re.compile(r"^(PK|UK)\((.*)\)$")
+_JSON_START = re.compile(r'\{\s*"tables"\s*:')
+_CJK = re.compile(r"[　-鿿豈-﫿＀-￯]")
+
+
+def serialize_schema(tables: Iterable[Table], schema_format: str = "ddl") -> str:
+    """
+    Render tables in one of the prompt formats.
+
+    Formats:
+        ddl: Minimal CREATE TABLE statements (types, NOT NULL, comments, keys)
+        compact: One line per table, e.g. ``t(id int NOT NULL '主鍵', PK(id))``
+        json: ``{"tables": [...]}`` without whitespace
+
+    Args:
+        tables: Parsed tables
+        schema_format: "ddl", "compact" or "json"
+
+    Returns:
+        Rendered schema
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    tables = list(tables)
+    if schema_format == "ddl":
+        return format_schema(tables)
+    if schema_format == "compact":
+        return "\n".join(_compact_line(table) for table in tables)
+    if schema_format == "json":
+        payload = {"tables": [_table_to_dict(table) for table in tables]}
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    msg = f"Unknown schema format: {schema_format}. Use one of: ddl, compact, json"
+    raise ValueError(msg)
+
+
+def parse_schema(text: str) -> list[Table]:
+    """
+    Parse a schema rendered in any supported format.
+
+    DDL, JSON and compact lines are recognised inside surrounding text, so a
+    prompt prefix can be parsed directly.
+
+    Args:
+        text: Schema text
+
+    Returns:
+        Parsed tables (empty if no schema is found)
+    """
+    tables = parse_ddl(text)
+    if tables:
+        return tables
+
+    match = _JSON_START.search(text)
+    if match is not None:
+        try:
+            payload, _ = json.JSONDecoder().raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            payload = None
+        if payload is not None:
+            return [_table_from_dict(table) for table in payload["tables"]]
+
+    return [table for table in map(_parse_compact_line, _COMPACT_LINE.finditer(text)) if table]
+
+
+@lru_cache(maxsize=16)
+def render_schema(schema: str, schema_format: str) -> str:
+    """Re-render a schema string in ``schema_format`` (memoized; "original" returns it as is)."""
+    if schema_format == "original":
+        return schema
+    tables = parse_schema(schema)
+    return serialize_schema(tables, schema_format) if tables else schema
+
+
+def prepare_schema(
+    schema: str, question: str, schema_linker=None, schema_format: str = "original"
+) -> str:
+    """
+    Return the schema text to put in the prompt for ``question``.
+
+    Args:
+        schema: Full schema text
+        question: User's natural language query
+        schema_linker: Optional SchemaLinker used to prune unrelated tables/columns
+        schema_format: One of SCHEMA_FORMATS (pruned schemas render "original" as "ddl")
+
+    Returns:
+        Schema text for the prompt
+    """
+    if schema_linker is None:
+        return render_schema(schema, schema_format)
+    tables = schema_linker.select(schema, question)
+    if not tables:
+        return render_schema(schema, schema_format)
+    return serialize_schema(tables, "ddl" if schema_format == "original" else schema_format)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count when no tokenizer is available.
+
+    CJK characters count as one token each, other text as one token per four
+    characters, which is close to BPE tokenizers on mixed DDL.
+    """
+    cjk = len(_CJK.findall(text))
+    return cjk + -(-(len(text) - cjk) // 4)
+
+
+def tokenizer_counter(tokenizer) -> Callable[[str], int]:
+    """Build a token counter from a HuggingFace tokenizer."""
+
+    def count(text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    return count
+
+
+def token_report(
+    schema: str,
+    count_tokens: Callable[[str], int] | None = None,
+    formats: Iterable[str] = SCHEMA_FORMATS,
+) -> dict[str, int]:
+    """
+    Count the prompt tokens of a schema in each format.
+
+    Args:
+        schema: Schema text (any supported format)
+        count_tokens: Token counter (default: estimate_tokens)
+        formats: Formats to measure
+
+    Returns:
+        Mapping of format name to token count
+    """
+    count_tokens = count_tokens or estimate_tokens
+    return {
+        schema_format: count_tokens(render_schema(schema, schema_format))
+        for schema_format in formats
+    }
+
+
+def _compact_line(table: Table) -> str:
+    items = []
+    for column in table.columns:
+        item = f"{column.name} {column.data_type}"
+        if not column.nullable:
+            item += " NOT NULL"
+        if column.comment:
+            item += f" {quote_literal(column.comment)}"
+        items.append(item)
+    if table.primary_key:
+        items.append(f"PK({','.join(table.primary_key)})")
+    items.extend(f"UK({','.join(columns)})" for columns in table.unique_keys.values())
+
+    line = f"{table.name}({', '.join(items)})"
+    return f"{line} {quote_literal(table.comment)}" if table.comment else line
+
+
+def _parse_compact_line(match: re.Match) -> Table | None:
+    table = Table(name=match.group(1), comment=unquote_literal(match.group(3) or ""))
+    for item in split_top_level(match.group(2)):
+        key = _COMPACT_KEY.match(item)
+        if key is not None:
+            columns = tuple(part.strip() for part in key.group(2).split(","))
+            if key.group(1) == "PK":
+                table.primary_key = columns
+            else:
+                table.unique_keys[f"unique_{len(table.unique_keys) + 1:02d}"] = columns
+            continue
+        column = _COMPACT_COLUMN.match(item)
+        if column is None:
+            # Not a compact schema line (e.g. "COUNT(*)" in surrounding text).
+            return None
+        table.columns.append(
+            Column(
+                name=column.group(1),
+                data_type=column.group(2),
+                nullable=column.group(3) is None,
+                comment=unquote_literal(column.group(4) or ""),
+            )
+        )
+    return table if table.columns else None
+
+
+def _table_to_dict(table: Table) -> dict:
+    columns = []
+    for column in table.columns:
+        entry = {"name": column.name, "type": column.data_type}
+        if not column.nullable:
+            entry["not_null"] = True
+        if column.comment:
+            entry["comment"] = column.comment
+        columns.append(entry)
+
+    data = {"name": table.name}
+    if table.comment:
+        data["comment"] = table.comment
+    data["columns"] = columns
+    if table.primary_key:
+        data["primary_key"] = list(table.primary_key)
+    if table.unique_keys:
+        data["unique_keys"] = {key: list(columns) for key, columns in table.unique_keys.items()}
+    return data
+
+
+def _table_from_dict(data: dict) -> Table:
+    return Table(
+        name=data["name"],
+        columns=[
+            Column(
+                name=column["name"],
+                data_type=column["type"],
+                nullable=not column.get("not_null", False),
+                comment=column.get("comment", ""),
+            )
+            for column in data["columns"]
+        ],
+        primary_key=tuple(data.get("primary_key", ())),
+        unique_keys={key: tuple(columns) for key, columns in data.get("unique_keys", {}).items()},
+        comment=data.get("comment", ""),
+    )
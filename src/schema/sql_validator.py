@@ -0,0 +1,671 @@
+"""Check generated SELECT queries against the schema without a database round-trip."""
+
+import difflib
+import re
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+
+import config
+from src.schema.ddl_parser import Table
+from src.schema.serializer import parse_schema
+
+_TOKEN = re.compile(
+    r"""
+    (?P<skip>\s+|--[^\n]*|\#[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<str>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    |(?P<qid>`(?:[^`]|``)*`)
+    |(?P<num>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+    |(?P<id>[^\W\d][\w$]*)
+    |(?P<var>@@?[\w.$]*|\?|%s)
+    |(?P<op>->>|->|<=>|<>|!=|<=|>=|:=|\|\||&&|.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_CLAUSES = frozenset(
+    ("select", "from", "where", "group", "having", "window", "order", "limit", "for", "into")
+)
+_SET_OPERATORS = frozenset(("union", "intersect", "except"))
+_JOINS = frozenset(("join", "straight_join"))
+_AGGREGATES = frozenset(
+    """
+    avg bit_and bit_or bit_xor count group_concat json_arrayagg json_objectagg max min std
+    stddev stddev_pop stddev_samp sum var_pop var_samp variance any_value
+    """.split()
+)
+# Words that never name a column when unquoted (operators, clause words, type names,
+# interval units). Function names need no entry: a call is recognised by its "(".
+_KEYWORDS = (
+    frozenset(
+        """
+        all and any as asc between binary both by case collate cross current current_date
+        current_time current_timestamp current_user default desc distinct distinctrow div
+        dual else end escape except exists false first following for force from full group
+        having high_priority if ignore in inner intersect interval into is join last lateral
+        leading left like limit localtime localtimestamp lock match mod natural not null nulls of
+        offset on or order outer over partition preceding range recursive regexp right rlike
+        rollup row rows select separator share some sounds sql_big_result sql_buffer_result
+        sql_calc_found_rows sql_no_cache sql_small_result straight_join then trailing true unbounded
+        union unknown update use using when where window with xor
+        char character date datetime decimal double float integer json nchar signed time
+        unsigned year quarter month week day hour minute second microsecond year_month
+        day_hour day_minute day_second hour_minute hour_second minute_second
+        """.split()
+    )
+    | _CLAUSES
+)
+# Unquoted words that may end an expression, so a following identifier is an alias.
+_EXPRESSION_ENDS = frozenset(("end", "null", "true", "false"))
+
+
+@dataclass(frozen=True)
+class ValidationIssue:
+    """A problem found in a query, worded like the MySQL error it prevents."""
+
+    code: str  # unknown_table, unknown_alias, unknown_column, ambiguous_column, ...
+    message: str
+    suggestion: str | None = None
+
+    def __str__(self) -> str:
+        if self.suggestion:
+            return f"{self.message} (did you mean '{self.suggestion}'?)"
+        return self.message
+
+
+@dataclass(frozen=True)
+class SchemaCatalog:
+    """Lower-cased table → column and primary key sets, built once per schema."""
+
+    tables: dict[str, frozenset[str]]
+    primary_keys: dict[str, frozenset[str]]
+
+    @classmethod
+    def from_tables(cls, tables: Iterable[Table]) -> "SchemaCatalog":
+        """Index parsed table definitions."""
+        columns, keys = {}, {}
+        for table in tables:
+            name = table.name.lower()
+            columns[name] = frozenset(column.name.lower() for column in table.columns)
+            keys[name] = frozenset(column.lower() for column in table.primary_key)
+        return cls(tables=columns, primary_keys=keys)
+
+
+class _Token:
+    __slots__ = ("kind", "text", "key", "quoted", "sub")
+
+    def __init__(self, kind: str, text: str, key: str = "", quoted: bool = False, sub=None):
+        self.kind = kind  # id, str, num, var, op, sub (folded subquery)
+        self.text = text
+        self.key = key  # lower-cased identifier
+        self.quoted = quoted
+        self.sub = sub
+
+    def is_word(self, *words: str) -> bool:
+        return self.kind == "id" and not self.quoted and self.key in words
+
+    def is_in(self, words: frozenset[str]) -> bool:
+        return self.kind == "id" and not self.quoted and self.key in words
+
+    @property
+    def is_name(self) -> bool:
+        """An identifier that can name a table, column or alias."""
+        return self.kind == "id" and (self.quoted or self.key not in _KEYWORDS)
+
+
+_END = _Token("end", "")
+
+
+def _tokenize(sql: str) -> list[_Token]:
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind == "skip":
+            continue
+        if kind == "id":
+            tokens.append(_Token("id", text, text.lower()))
+        elif kind == "qid":
+            name = text[1:-1].replace("``", "`")
+            tokens.append(_Token("id", name, name.lower(), quoted=True))
+        else:
+            tokens.append(_Token(kind, text))
+    return tokens
+
+
+def _close(tokens: list[_Token], start: int) -> int:
+    """Index of the ")" matching the "(" at ``start`` (len(tokens) when unbalanced)."""
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i].text == "(" and tokens[i].kind == "op":
+            depth += 1
+        elif tokens[i].text == ")" and tokens[i].kind == "op":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(tokens)
+
+
+def _fold(tokens: list[_Token]) -> list[_Token]:
+    """Replace each top-level "(SELECT ...)" / "(WITH ...)" with a single sub token."""
+    folded, i = [], 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.text == "(" and i + 1 < len(tokens) and tokens[i + 1].is_word("select", "with"):
+            end = _close(tokens, i)
+            folded.append(_Token("sub", "(subquery)", sub=tokens[i + 1 : end]))
+            i = end + 1
+            continue
+        folded.append(token)
+        i += 1
+    return folded
+
+
+def _split(tokens: list[_Token], is_separator) -> list[list[_Token]]:
+    """Split on separator tokens outside parentheses."""
+    parts, current, depth = [], [], 0
+    for token in tokens:
+        if token.kind == "op" and token.text == "(":
+            depth += 1
+        elif token.kind == "op" and token.text == ")":
+            depth -= 1
+        elif depth == 0 and is_separator(token):
+            parts.append(current)
+            current = []
+            continue
+        current.append(token)
+    parts.append(current)
+    return parts
+
+
+def _is_comma(token: _Token) -> bool:
+    return token.kind == "op" and token.text == ","
+
+
+def _text(tokens: list[_Token]) -> str:
+    """Normalized expression text used to match SELECT items with GROUP BY items."""
+    return " ".join(token.key or token.text for token in tokens)
+
+
+def _is_aggregate_call(tokens: list[_Token], i: int) -> int:
+    """Return the index past an aggregate call starting at ``i`` (0 if there is none)."""
+    token = tokens[i]
+    if not token.is_in(_AGGREGATES):
+        return 0
+    if i + 1 >= len(tokens) or tokens[i + 1].text != "(":
+        return 0
+    end = _close(tokens, i + 1)
+    if end + 1 < len(tokens) and tokens[end + 1].is_word("over"):
+        return 0  # window function, not an aggregation
+    return end + 1
+
+
+def _has_aggregate(tokens: list[_Token]) -> bool:
+    return any(_is_aggregate_call(tokens, i) for i in range(len(tokens)))
+
+
+def _refs(
+    tokens: list[_Token], skip_aggregates: bool = False
+) -> Iterator[tuple[_Token | None, _Token | None]]:
+    """
+    Yield ``(qualifier, column)`` references in an expression.
+
+    ``qualifier`` is None for bare columns; ``column`` is None for ``alias.*``.
+    Subqueries (sub tokens) are not entered.
+    """
+    i, count = 0, len(tokens)
+    while i < count:
+        token = tokens[i]
+        if token.kind != "id":
+            i += 1
+            continue
+        following = tokens[i + 1] if i + 1 < count else _END
+        if following.text == "(" and following.kind == "op":
+            end = _is_aggregate_call(tokens, i) if skip_aggregates else 0
+            i = end or i + 1
+            continue
+        previous = tokens[i - 1] if i else _END
+        if not token.is_name or previous.text == "." or previous.is_word("as", "collate", "using"):
+            i += 1
+            continue
+        if following.kind == "str" and token.key.startswith("_"):
+            i += 1  # charset introducer: _utf8mb4'text'
+            continue
+        if following.text == ".":
+            third = tokens[i + 2] if i + 2 < count else _END
+            if third.text == "*":
+                yield token, None
+                i += 3
+                continue
+            if third.kind == "id":
+                if i + 4 < count and tokens[i + 3].text == "." and tokens[i + 4].kind == "id":
+                    yield third, tokens[i + 4]  # database.table.column
+                    i += 5
+                else:
+                    yield token, third
+                    i += 3
+                continue
+        yield None, token
+        i += 1
+
+
+def _split_alias(item: list[_Token]) -> tuple[list[_Token], str | None]:
+    """Separate a SELECT item into its expression and its alias, if any."""
+    if len(item) >= 2 and item[-2].is_word("as") and item[-1].kind in ("id", "str"):
+        alias = item[-1]
+        return item[:-2], alias.key if alias.kind == "id" else alias.text[1:-1].lower()
+    if len(item) >= 2 and item[-1].is_name:
+        previous = item[-2]
+        if (
+            previous.is_name
+            or previous.kind in ("num", "str", "sub")
+            or previous.text == ")"
+            or previous.is_in(_EXPRESSION_ENDS)
+        ):
+            return item[:-1], item[-1].key
+    return item, None
+
+
+@dataclass(eq=False)
+class _Source:
+    """A table or derived table in a FROM clause."""
+
+    name: str
+    table: str | None  # catalog table (None for derived tables / CTEs)
+    columns: frozenset[str] | None  # None when the columns are unknown
+
+
+class _Scope:
+    """Sources and SELECT aliases visible in one SELECT block."""
+
+    def __init__(self, parent: "_Scope | None"):
+        self.parent = parent
+        self.sources: dict[str, _Source] = {}
+        self.aliases: set[str] = set()
+
+
+class _Checker:
+    def __init__(self, catalog: SchemaCatalog):
+        self.catalog = catalog
+        self.issues: list[ValidationIssue] = []
+
+    def report(self, code: str, message: str, name: str = "", candidates=()) -> None:
+        matches = difflib.get_close_matches(name.lower(), list(candidates), n=1, cutoff=0.6)
+        issue = ValidationIssue(code, message, matches[0] if matches else None)
+        if issue not in self.issues:
+            self.issues.append(issue)
+
+    def query(
+        self, tokens: list[_Token], parent: _Scope | None, ctes: dict
+    ) -> frozenset[str] | None:
+        """Check a query expression (WITH, UNION) and return its output column names."""
+        tokens = _fold(tokens)
+        ctes = dict(ctes)
+        i = 0
+        if tokens and tokens[0].is_word("with"):
+            i = 2 if len(tokens) > 1 and tokens[1].is_word("recursive") else 1
+            while i < len(tokens) and tokens[i].kind == "id":
+                name = tokens[i].key
+                ctes[name] = None  # visible to itself (recursive CTEs)
+                i += 1
+                columns = None
+                if i < len(tokens) and tokens[i].text == "(":
+                    end = _close(tokens, i)
+                    columns = frozenset(t.key for t in tokens[i + 1 : end] if t.kind == "id")
+                    i = end + 1
+                if i < len(tokens) and tokens[i].is_word("as"):
+                    i += 1
+                if i < len(tokens) and tokens[i].kind == "sub":
+                    output = self.query(tokens[i].sub, parent, ctes)
+                    ctes[name] = columns if columns is not None else output
+                    i += 1
+                if i < len(tokens) and _is_comma(tokens[i]):
+                    i += 1
+                    continue
+                break
+
+        blocks = _split(tokens[i:], lambda token: token.is_in(_SET_OPERATORS))
+        output = None
+        for index, block in enumerate(blocks):
+            if block and block[0].is_word("all", "distinct"):
+                block = block[1:]
+            # ORDER BY after a UNION may use the first block's column names.
+            block_output = self.select(block, parent, ctes, output or frozenset())
+            if index == 0:
+                output = block_output
+        return output
+
+    def select(
+        self, tokens: list[_Token], parent: _Scope | None, ctes: dict, outer_names: frozenset
+    ) -> frozenset[str] | None:
+        """Check one SELECT block and return its output column names."""
+        clauses: dict[str, list[_Token]] = {}
+        current, depth, i = None, 0, 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token.kind == "op" and token.text == "(":
+                depth += 1
+            elif token.kind == "op" and token.text == ")":
+                depth -= 1
+            elif depth == 0 and token.is_in(_CLAUSES) and token.key not in clauses:
+                current = token.key
+                clauses[current] = []
+                if i + 1 < len(tokens) and tokens[i + 1].is_word("by"):
+                    i += 1
+                i += 1
+                continue
+            if current is not None:
+                clauses[current].append(token)
+            i += 1
+        if "select" not in clauses:
+            return None
+
+        scope = _Scope(parent)
+        scope.aliases.update(outer_names)
+        conditions = self.from_clause(clauses.get("from", []), scope, ctes)
+
+        items, aliases, output, star = [], [], set(), False
+        for item in _split(clauses["select"], _is_comma):
+            expression, alias = _split_alias(item)
+            items.append(expression)
+            aliases.append(alias)
+            if alias is not None:
+                scope.aliases.add(alias)
+                output.add(alias)
+            elif expression and expression[-1].text == "*":
+                star = True
+            elif expression and expression[-1].kind == "id":
+                output.add(expression[-1].key)
+
+        for expression in items + conditions:
+            self.expression(expression, scope, ctes)
+        for clause in ("where", "group", "having", "window", "order"):
+            if clause in clauses:
+                self.expression(clauses[clause], scope, ctes)
+        self.grouping(scope, items, aliases, clauses.get("group"))
+        return None if star else frozenset(output)
+
+    def from_clause(self, tokens: list[_Token], scope: _Scope, ctes: dict) -> list[list[_Token]]:
+        """Register the FROM sources in ``scope`` and return their ON conditions."""
+        conditions: list[list[_Token]] = []
+        expect_source, depth, condition_depth, i = True, 0, 0, 0
+        while i < len(tokens):
+            token = tokens[i]
+            if expect_source:
+                i += 1
+                if token.text == "(":
+                    depth += 1
+                    continue
+                if token.kind == "sub":
+                    columns = self.query(token.sub, scope.parent, ctes)
+                    source = _Source("(subquery)", None, columns)
+                elif token.is_name:
+                    parts = [token]
+                    while i + 1 < len(tokens) and tokens[i].text == "." and tokens[i + 1].is_name:
+                        parts.append(tokens[i + 1])
+                        i += 2
+                    source = self.table_source(parts, ctes)
+                else:
+                    continue
+                alias = None
+                if i < len(tokens) and tokens[i].is_word("as"):
+                    i += 1
+                if i < len(tokens) and tokens[i].is_name:
+                    alias = tokens[i]
+                    i += 1
+                if alias is not None:
+                    source.name = alias.text
+                elif token.kind == "sub":
+                    self.report("missing_alias", "Every derived table must have its own alias")
+                    source.name = f"(subquery {len(scope.sources) + 1})"
+                key = source.name.lower()
+                if key in scope.sources:
+                    self.report("duplicate_alias", f"Not unique table/alias: '{source.name}'")
+                scope.sources[key] = source
+                expect_source = False
+                condition_depth = depth
+                conditions.append([])
+                continue
+
+            i += 1
+            if token.kind == "op" and token.text == "(":
+                depth += 1
+            elif token.kind == "op" and token.text == ")":
+                depth -= 1
+                condition_depth = min(condition_depth, depth)
+            elif depth <= condition_depth and (_is_comma(token) or token.is_in(_JOINS)):
+                expect_source = True
+                continue
+            elif token.is_word("using") and i < len(tokens) and tokens[i].text == "(":
+                end = _close(tokens, i)
+                for column in tokens[i + 1 : end]:
+                    if column.is_name:
+                        self.using_column(column, scope)
+                i = end + 1
+                continue
+            elif token.is_word("use", "force", "ignore"):
+                while i < len(tokens) and tokens[i].text != "(":
+                    i += 1
+                i = _close(tokens, i) + 1
+                continue
+            conditions[-1].append(token)
+        return conditions
+
+    def table_source(self, parts: list[_Token], ctes: dict) -> _Source:
+        name = parts[-1]
+        if len(parts) == 1 and name.key in ctes:
+            return _Source(name.text, None, ctes[name.key])
+        if name.key in self.catalog.tables:
+            return _Source(name.text, name.key, self.catalog.tables[name.key])
+        if len(parts) == 1:
+            self.report(
+                "unknown_table",
+                f"Table '{name.text}' doesn't exist",
+                name.text,
+                self.catalog.tables,
+            )
+        return _Source(name.text, None, None)
+
+    def using_column(self, column: _Token, scope: _Scope) -> None:
+        sources = scope.sources.values()
+        if any(source.columns is None or column.key in source.columns for source in sources):
+            return
+        self.report(
+            "unknown_column",
+            f"Unknown column '{column.text}' in 'from clause'",
+            column.text,
+            {name for source in sources for name in source.columns or ()},
+        )
+
+    def expression(self, tokens: list[_Token], scope: _Scope, ctes: dict) -> None:
+        for token in tokens:
+            if token.kind == "sub":
+                self.query(token.sub, scope, ctes)
+        for qualifier, column in _refs(tokens):
+            self.resolve(scope, qualifier, column, report=True)
+
+    def resolve(
+        self, scope: _Scope, qualifier: _Token | None, column: _Token | None, report: bool
+    ) -> tuple[_Scope, _Source, str] | None:
+        """Find the source of a column reference, reporting it when it cannot be found."""
+        if qualifier is not None:
+            current = scope
+            while current is not None and qualifier.key not in current.sources:
+                current = current.parent
+            if current is None:
+                if report:
+                    defined = ", ".join(_visible_sources(scope)) or "none"
+                    self.report(
+                        "unknown_alias",
+                        f"Unknown table or alias '{qualifier.text}' (defined: {defined})",
+                    )
+                return None
+            source = current.sources[qualifier.key]
+            if column is None or source.columns is None:
+                return None
+            if column.key not in source.columns:
+                if report:
+                    self.report(
+                        "unknown_column",
+                        f"Unknown column '{qualifier.text}.{column.text}'",
+                        column.text,
+                        source.columns,
+                    )
+                return None
+            return current, source, column.key
+
+        current = scope
+        while current is not None:
+            sources = current.sources.values()
+            matches = [s for s in sources if s.columns is not None and column.key in s.columns]
+            if len(matches) > 1:
+                if report:
+                    names = ", ".join(source.name for source in matches)
+                    self.report(
+                        "ambiguous_column",
+                        f"Column '{column.text}' is ambiguous (in {names}); qualify it",
+                    )
+                return None
+            if matches:
+                return current, matches[0], column.key
+            if current is scope and column.key in current.aliases:
+                return None
+            if any(source.columns is None for source in sources):
+                return None
+            current = current.parent
+        if report:
+            known = {name for source in scope.sources.values() for name in source.columns or ()}
+            self.report(
+                "unknown_column",
+                f"Unknown column '{column.text}'",
+                column.text,
+                known or {name for columns in self.catalog.tables.values() for name in columns},
+            )
+        return None
+
+    def grouping(
+        self,
+        scope: _Scope,
+        items: list[list[_Token]],
+        aliases: list[str | None],
+        group: list[_Token] | None,
+    ) -> None:
+        """Report SELECT items that MySQL's ONLY_FULL_GROUP_BY mode would reject."""
+        if group is None and not any(_has_aggregate(item) for item in items):
+            return
+        grouped_items: set[int] = set()
+        grouped_texts: set[str] = set()
+        grouped_columns: set[tuple[int, str]] = set()
+        for expression in _split(group or [], _is_comma):
+            while expression and expression[-1].is_word("asc", "desc", "with", "rollup"):
+                expression = expression[:-1]
+            if len(expression) == 1 and expression[0].kind == "num":
+                grouped_items.add(int(float(expression[0].text)) - 1)
+                continue
+            if len(expression) == 1 and expression[0].key in aliases:
+                grouped_items.add(aliases.index(expression[0].key))
+            grouped_texts.add(_text(expression))
+            for qualifier, column in _refs(expression):
+                resolved = self.resolve(scope, qualifier, column, report=False)
+                if resolved is not None:
+                    grouped_columns.add((id(resolved[1]), resolved[2]))
+
+        for index, item in enumerate(items):
+            if index in grouped_items or _text(item) in grouped_texts:
+                continue
+            for qualifier, column in _refs(item, skip_aggregates=True):
+                if column is None:
+                    continue
+                resolved = self.resolve(scope, qualifier, column, report=False)
+                if resolved is None or resolved[0] is not scope:
+                    continue  # unknown (reported elsewhere) or an outer reference
+                _, source, name = resolved
+                if (id(source), name) in grouped_columns or self.key_grouped(
+                    source, grouped_columns
+                ):
+                    continue
+                described = f"{source.name}.{name}"
+                if group is None:
+                    message = (
+                        f"In aggregated query without GROUP BY, expression #{index + 1} of "
+                        f"SELECT list contains nonaggregated column '{described}'"
+                    )
+                else:
+                    message = (
+                        f"Expression #{index + 1} of SELECT list is not in GROUP BY clause "
+                        f"and contains nonaggregated column '{described}'"
+                    )
+                self.report("not_grouped", message)
+                break
+
+    def key_grouped(self, source: _Source, grouped_columns: set[tuple[int, str]]) -> bool:
+        """Whether the source's primary key is grouped (its other columns then are too)."""
+        key = self.catalog.primary_keys.get(source.table or "")
+        return bool(key) and all((id(source), column) in grouped_columns for column in key)
+
+
+def _visible_sources(scope: _Scope | None) -> list[str]:
+    names = []
+    while scope is not None:
+        names.extend(source.name for source in scope.sources.values())
+        scope = scope.parent
+    return names
+
+
+def validate_query(sql: str, catalog: SchemaCatalog) -> list[ValidationIssue]:
+    """
+    Resolve every table, alias and column reference of a SELECT against ``catalog``.
+
+    Finds unknown tables/columns, aliases used without being defined (T1 vs T2),
+    ambiguous bare columns and SELECT items MySQL's ONLY_FULL_GROUP_BY rejects.
+    Derived tables and CTEs are checked with the columns they select; anything
+    the checker cannot see into (``SELECT *`` subqueries, other databases) is
+    assumed valid. Statements other than SELECT / WITH are not checked.
+
+    Args:
+        sql: Query text
+        catalog: Schema to check against
+
+    Returns:
+        Problems found (empty when the query looks valid)
+    """
+    checker = _Checker(catalog)
+    for statement in _split(_tokenize(sql), lambda token: token.text == ";"):
+        if statement and statement[0].is_word("select", "with"):
+            checker.query(statement, None, {})
+    return checker.issues
+
+
+@lru_cache(maxsize=8)
+def catalog_for_schema(schema: str) -> SchemaCatalog:
+    """Build the catalog of a schema text (memoized: the text is the schema version)."""
+    return SchemaCatalog.from_tables(parse_schema(schema))
+
+
+_live_catalog: SchemaCatalog | None = None
+_live_catalog_lock = threading.Lock()
+
+
+def get_schema_catalog(schema: str | None = None) -> SchemaCatalog | None:
+    """
+    Return the catalog used to validate generated SQL, or None when validation is off.
+
+    With SQL_VALIDATION_SCHEMA_SOURCE="database" the catalog is read once from
+    information_schema; otherwise it is built from ``schema`` (default:
+    config.FULL_SCHEMA).
+    """
+    global _live_catalog
+    if not config.SQL_STATIC_VALIDATION:
+        return None
+    if config.SQL_VALIDATION_SCHEMA_SOURCE == "database":
+        with _live_catalog_lock:
+            if _live_catalog is None:
+                try:
+                    from src.schema.introspection import load_tables
+
+                    _live_catalog = SchemaCatalog.from_tables(load_tables())
+                except Exception as e:
+                    print(f"[WARN] 無法讀取資料庫 schema，改用設定檔 schema 驗證: {e}")
+                    return catalog_for_schema(schema or config.FULL_SCHEMA)
+            return _live_catalog
+    return catalog_for_schema(schema or config.FULL_SCHEMA)
@@ -0,0 +1,122 @@
+"""Self-consistency voting: sample several SQL candidates and pick the most common result."""
+
+import hashlib
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any
+
+from src.utils.result_serializer import to_json_value
+
+# execute(sql, max_rows) -> (rows, truncated), e.g. DatabaseConnector.aexecute_limited
+QueryRunner = Callable[[str, int], Awaitable[tuple[list[dict[str, Any]], bool]]]
+
+
+@dataclass
+class Candidate:
+    """One sampled SQL query and the outcome of running it."""
+
+    sql: str
+    temperature: float
+    rows: list[dict[str, Any]] | None = None
+    truncated: bool = False
+    fingerprint: str | None = None
+    error: str | None = None
+
+
+@dataclass
+class ConsistencyResult:
+    """Outcome of a self-consistency run."""
+
+    candidates: list[Candidate] = field(default_factory=list)
+    winner: Candidate | None = None
+    votes: int = 0
+
+    @property
+    def sql(self) -> str:
+        """The winning SQL ("" when every candidate failed)."""
+        return self.winner.sql if self.winner is not None else ""
+
+
+def candidate_temperatures(count: int, base: float, highest: float) -> list[float]:
+    """
+    Spread sampling temperatures from ``base`` up to ``highest``.
+
+    The first candidate keeps the model's own temperature, so ties in the vote
+    go to the answer the model would have given without self-consistency.
+
+    Args:
+        count: Number of candidates
+        base: Temperature of the first candidate
+        highest: Temperature of the last candidate
+
+    Returns:
+        ``count`` temperatures in increasing order
+    """
+    if count <= 1:
+        return [base]
+    highest = max(highest, base)
+    step = (highest - base) / (count - 1)
+    return [round(base + step * index, 3) for index in range(count)]
+
+
+def _canonical_value(value: Any) -> str:
+    """Render a value so equal results compare equal across SQL formulations."""
+    if value is None:
+        return "\x00"
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float, Decimal)):
+        number = Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+        # SUM(x) and ROUND(SUM(x), 2) may differ only in trailing zeros.
+        return format(number.normalize(), "f") if number.is_finite() else str(number)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(to_json_value(value))
+
+
+def result_fingerprint(rows: Iterable[dict[str, Any]], truncated: bool = False) -> str:
+    """
+    Hash a query result independently of row order, column order and aliases.
+
+    Each row is reduced to its sorted values, so candidates that select the same
+    data under different aliases or in a different column order agree.
+
+    Args:
+        rows: Result rows as dictionaries
+        truncated: Whether the rows were cut off at a row limit
+
+    Returns:
+        Hex digest identifying the result
+    """
+    canonical = sorted(
+        "\x1f".join(sorted(_canonical_value(value) for value in row.values())) for row in rows
+    )
+    digest = hashlib.sha256("\x1e".join(canonical).encode("utf-8"))
+    if truncated:
+        digest.update(b"\x1dtruncated")
+    return digest.hexdigest()
+
+
+def vote(candidates: list[Candidate]) -> tuple[Candidate | None, int]:
+    """
+    Pick the candidate whose fingerprint is shared by the most candidates.
+
+    Failed candidates do not vote. Ties go to the group containing the earliest
+    (lowest-temperature) candidate.
+
+    Args:
+        candidates: Candidates in generation order
+
+    Returns:
+        (winning candidate, number of votes), or (None, 0) when none succeeded
+    """
+    groups: dict[str, list[Candidate]] = {}
+    for candidate in candidates:
+        if candidate.error is None and candidate.fingerprint is not None:
+            groups.setdefault(candidate.fingerprint, []).append(candidate)
+    if not groups:
+        return None, 0
+    # dicts keep insertion order, so max() returns the earliest group on ties.
+    members = max(groups.values(), key=len)
+    return members[0], len(members)
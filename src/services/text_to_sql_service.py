@@ -1,25 +1,114 @@
 """Text-to-SQL conversion service."""
 
-from collections.abc import Generator
+import asyncio
+from collections.abc import AsyncIterator, Generator
+from contextlib import aclosing
 
+import config
+from src.cache.generation_cache import GenerationCache
+from src.cache.result_cache import is_read_only, sql_fingerprint
+from src.cache.semantic_cache import SemanticCache
 from src.interfaces.language_model import ILanguageModel
 from src.prompts.text_to_sql_prompt import TextToSQLPrompt
-from src.utils.sql_parser import SQLParser
+from src.schema.schema_linker import SchemaLinker
+from src.schema.serializer import prepare_schema
+from src.schema.sql_validator import get_schema_catalog, validate_query
+from src.services.self_consistency import (
+    Candidate,
+    ConsistencyResult,
+    QueryRunner,
+    candidate_temperatures,
+    result_fingerprint,
+    vote,
+)
+from src.utils.executors import get_model_executor, run_in_executor
+from src.utils.sql_parser import IncrementalSQLExtractor, SQLParser
 
 
 class TextToSQLService:
     """Service for converting natural language to SQL queries."""
 
-    def __init__(self, model: ILanguageModel):
+    def __init__(
+        self,
+        model: ILanguageModel,
+        schema_linker: SchemaLinker | None = None,
+        schema_format: str | None = None,
+        generation_cache: GenerationCache | None = None,
+        semantic_cache: SemanticCache | None = None,
+    ):
         """
         Initialize the Text-to-SQL service.
 
         Args:
             model: Language model implementation
+            schema_linker: Prunes the schema to the tables/columns relevant to each query
+            schema_format: Prompt schema format (default: config.SCHEMA_FORMAT)
+            generation_cache: Reuses model outputs for repeated questions
+            semantic_cache: Serves paraphrases of earlier questions (after an exact-cache miss)
         """
         self.model = model
+        self.schema_linker = schema_linker
+        self.schema_format = schema_format or config.SCHEMA_FORMAT
+        self.generation_cache = generation_cache
+        self.semantic_cache = semantic_cache
         self.sql_parser = SQLParser()
 
+    def prepare_schema(self, schema: str, user_query: str) -> str:
+        """Return the schema text to send for this query (pruned and/or re-rendered)."""
+        return prepare_schema(schema, user_query, self.schema_linker, self.schema_format)
+
+    def _cache_key(self, schema: str, user_query: str) -> str | None:
+        if self.generation_cache is None:
+            return None
+        return self.generation_cache.make_key(user_query, schema, self.model.cache_identity())
+
+    def _semantic_scope(self, schema: str) -> str:
+        # Keyed on the full schema: linked schemas differ between paraphrases.
+        identity = {**self.model.cache_identity(), "schema_format": self.schema_format}
+        return self.semantic_cache.make_scope(schema, identity)
+
+    def _cached_output(self, key: str | None, full_schema: str, user_query: str) -> str | None:
+        """Return a cached raw output from the exact tier, then the semantic tier."""
+        if key is not None:
+            cached = self.generation_cache.get(key)
+            if cached is not None:
+                return cached
+        if self.semantic_cache is not None:
+            sql = self.semantic_cache.lookup(user_query, self._semantic_scope(full_schema))
+            if sql is not None:
+                return f"```sql\n{sql}\n```"
+        return None
+
+    def _store_output(
+        self, key: str | None, raw_output: str, full_schema: str, user_query: str
+    ) -> None:
+        # Outputs without usable SQL are not cached so the next request retries.
+        sql = self.sql_parser.clean_sql(raw_output)
+        if not sql:
+            return
+        if key is not None:
+            self.generation_cache.put(key, raw_output)
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(user_query, self._semantic_scope(full_schema), sql)
+
+    async def _acached_output(self, key: str | None, full_schema: str, user_query: str):
+        if self.semantic_cache is None:
+            return self._cached_output(key, full_schema, user_query)
+        # Embedding the question is CPU work; keep it off the event loop.
+        return await run_in_executor(
+            get_model_executor(), self._cached_output, key, full_schema, user_query
+        )
+
+    async def _astore_output(
+        self, key: str | None, raw_output: str, full_schema: str, user_query: str
+    ) -> None:
+        if self.semantic_cache is None:
+            self._store_output(key, raw_output, full_schema, user_query)
+            return
+        await run_in_executor(
+            get_model_executor(), self._store_output, key, raw_output, full_schema, user_query
+        )
+
     def convert(self, schema: str, user_query: str, max_tokens: int = 512) -> str:
         """
         Convert natural language query to SQL.
@@ -32,11 +121,16 @@ class TextToSQLService:
         Returns:
             Generated SQL query
         """
-        if not self.model.is_initialized():
-            self.model.initialize()
+        prompt_schema = self.prepare_schema(schema, user_query)
+        key = self._cache_key(prompt_schema, user_query)
+        raw_output = self._cached_output(key, schema, user_query)
+        if raw_output is None:
+            if not self.model.is_initialized():
+                self.model.initialize()
+            prompt = TextToSQLPrompt.build_prompt(prompt_schema, user_query)
+            raw_output = self.model.generate(prompt, max_tokens)
+            self._store_output(key, raw_output, schema, user_query)
 
-        prompt = TextToSQLPrompt.build_prompt(schema, user_query)
-        raw_output = self.model.generate(prompt, max_tokens)
         sql = self.sql_parser.clean_sql(raw_output)
 
         return sql
@@ -53,15 +147,173 @@ class TextToSQLService:
             max_tokens: Maximum tokens to generate
 
         Yields:
-            Generated text tokens
+            Generated text tokens (a cached answer is replayed as a single chunk)
         """
+        prompt_schema = self.prepare_schema(schema, user_query)
+        key = self._cache_key(prompt_schema, user_query)
+        cached = self._cached_output(key, schema, user_query)
+        if cached is not None:
+            yield cached
+            return
+
         if not self.model.is_initialized():
             self.model.initialize()
 
-        prompt = TextToSQLPrompt.build_prompt(schema, user_query)
+        prompt = TextToSQLPrompt.build_prompt(prompt_schema, user_query)
 
         if hasattr(self.model, "generate_stream"):
-            yield from self.model.generate_stream(prompt, max_tokens)
+            tokens = []
+            for token in self.model.generate_stream(prompt, max_tokens):
+                tokens.append(token)
+                yield token
+            # Only reached when the stream ran to completion (not closed early).
+            self._store_output(key, "".join(tokens), schema, user_query)
         else:
             raw_output = self.model.generate(prompt, max_tokens)
+            self._store_output(key, raw_output, schema, user_query)
             yield raw_output
+
+    async def aconvert(self, schema: str, user_query: str, max_tokens: int = 512) -> str:
+        """
+        Convert natural language query to SQL without blocking the event loop.
+
+        Args:
+            schema: Database schema description
+            user_query: User's natural language query
+            max_tokens: Maximum tokens to generate
+
+        Returns:
+            Generated SQL query
+        """
+        prompt_schema = self.prepare_schema(schema, user_query)
+        key = self._cache_key(prompt_schema, user_query)
+        raw_output = await self._acached_output(key, schema, user_query)
+        if raw_output is None:
+            prompt = TextToSQLPrompt.build_prompt(prompt_schema, user_query)
+            raw_output = await self.model.agenerate(prompt, max_tokens)
+            await self._astore_output(key, raw_output, schema, user_query)
+        return self.sql_parser.clean_sql(raw_output)
+
+    async def aconvert_stream(
+        self,
+        schema: str,
+        user_query: str,
+        max_tokens: int = 1000,
+        extractor: IncrementalSQLExtractor | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Convert natural language query to SQL with async streaming output.
+
+        Args:
+            schema: Database schema description
+            user_query: User's natural language query
+            max_tokens: Maximum tokens to generate
+            extractor: Fed every token; generation is cancelled as soon as it
+                completes the SQL statement (read it from ``extractor.sql``)
+
+        Yields:
+            Generated text tokens (a cached answer is replayed as a single chunk)
+        """
+        prompt_schema = self.prepare_schema(schema, user_query)
+        key = self._cache_key(prompt_schema, user_query)
+        cached = await self._acached_output(key, schema, user_query)
+        if cached is not None:
+            if extractor is not None:
+                extractor.feed(cached)
+            yield cached
+            return
+
+        prompt = TextToSQLPrompt.build_prompt(prompt_schema, user_query)
+        tokens = []
+        async with aclosing(self.model.agenerate_stream(prompt, max_tokens)) as stream:
+            async for token in stream:
+                tokens.append(token)
+                yield token
+                if extractor is not None and extractor.feed(token) is not None:
+                    break
+        await self._astore_output(key, "".join(tokens), schema, user_query)
+
+    async def aconvert_consistent(
+        self,
+        schema: str,
+        user_query: str,
+        execute: QueryRunner | None = None,
+        candidates: int | None = None,
+        max_tokens: int = 512,
+    ) -> ConsistencyResult:
+        """
+        Convert with self-consistency: sample several queries and vote on their results.
+
+        Candidates are generated concurrently at increasing temperatures (the local
+        model batches them into shared model.generate calls), each is executed as
+        soon as it is ready with a row limit, and the query whose result is shared
+        by the most candidates wins. Identical queries are executed once, and
+        queries that fail the static schema check are not executed. Without
+        ``execute`` the vote is on the normalized SQL text instead. Caches are not
+        used: the point is to get independent samples.
+
+        Args:
+            schema: Database schema description
+            user_query: User's natural language query
+            execute: Runs ``(sql, max_rows)`` and returns ``(rows, truncated)``
+            candidates: Number of candidates (default: config.SELF_CONSISTENCY_CANDIDATES)
+            max_tokens: Maximum tokens to generate per candidate
+
+        Returns:
+            All candidates and the winner (None when every candidate failed)
+        """
+        count = max(1, candidates or config.SELF_CONSISTENCY_CANDIDATES)
+        base = getattr(self.model, "temperature", None)
+        temperatures = candidate_temperatures(
+            count,
+            config.MODEL_TEMPERATURE if base is None else base,
+            config.SELF_CONSISTENCY_MAX_TEMPERATURE,
+        )
+        prompt = TextToSQLPrompt.build_prompt(self.prepare_schema(schema, user_query), user_query)
+        # One budget for in-flight model calls and queries together.
+        budget = asyncio.Semaphore(max(1, config.SELF_CONSISTENCY_CONCURRENCY))
+        executions: dict[str, asyncio.Task] = {}
+        catalog = get_schema_catalog(schema)
+
+        async def run_query(sql: str):
+            async with budget:
+                return await execute(sql, config.SELF_CONSISTENCY_ROW_LIMIT)
+
+        async def run_candidate(temperature: float) -> Candidate:
+            candidate = Candidate(sql="", temperature=temperature)
+            try:
+                async with budget:
+                    raw_output = await self.model.agenerate(
+                        prompt, max_tokens, temperature=temperature
+                    )
+            except Exception as e:
+                candidate.error = f"生成失敗: {e}"
+                return candidate
+
+            candidate.sql = self.sql_parser.clean_sql(raw_output)
+            if not candidate.sql or not is_read_only(candidate.sql):
+                candidate.error = "未產生可執行的 SELECT 查詢"
+                return candidate
+            if catalog is not None:
+                issues = validate_query(candidate.sql, catalog)
+                if issues:
+                    candidate.error = "; ".join(map(str, issues))
+                    return candidate
+            if execute is None:
+                candidate.fingerprint = sql_fingerprint(candidate.sql)
+                return candidate
+
+            key = sql_fingerprint(candidate.sql)
+            if key not in executions:
+                executions[key] = asyncio.ensure_future(run_query(candidate.sql))
+            try:
+                candidate.rows, candidate.truncated = await executions[key]
+            except Exception as e:
+                candidate.error = str(e)
+                return candidate
+            candidate.fingerprint = result_fingerprint(candidate.rows, candidate.truncated)
+            return candidate
+
+        results = await asyncio.gather(*(run_candidate(t) for t in temperatures))
+        winner, votes = vote(results)
+        return ConsistencyResult(candidates=results, winner=winner, votes=votes)
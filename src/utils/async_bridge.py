@@ -0,0 +1,87 @@
+"""Bridge from blocking (sync) iterators to async iterators."""
+
+import asyncio
+import threading
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import Executor
+from typing import TypeVar
+
+import config
+from src.utils.executors import get_model_executor
+
+T = TypeVar("T")
+
+_ITEM = "item"
+_DONE = "done"
+_ERROR = "error"
+
+
+async def iterate_in_thread(
+    factory: Callable[[], Iterator[T]],
+    maxsize: int | None = None,
+    executor: Executor | None = None,
+) -> AsyncIterator[T]:
+    """
+    Consume a blocking iterator on a worker thread and yield its items asynchronously.
+
+    The worker hands items to the event loop with ``call_soon_threadsafe``, so the
+    loop never blocks or polls. At most ``maxsize`` items are buffered; beyond that
+    the worker waits for the consumer. When the consumer stops early (client
+    disconnect, ``break``, cancellation), the worker stops iterating and closes the
+    source iterator, which lets generators release their resources.
+
+    Args:
+        factory: Callable returning the iterator; called on the worker thread
+        maxsize: Maximum buffered items (default: from config.py)
+        executor: Executor that runs the worker (default: model executor)
+
+    Yields:
+        Items produced by the iterator
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(maxsize or config.STREAM_BUFFER_SIZE)
+    cancelled = threading.Event()
+
+    def push(kind: str, value=None) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            return True
+        except RuntimeError:
+            # Event loop already closed; nobody is listening anymore.
+            cancelled.set()
+            return False
+
+    def produce() -> None:
+        try:
+            iterator = factory()
+            try:
+                for item in iterator:
+                    while not slots.acquire(timeout=0.1):
+                        if cancelled.is_set():
+                            return
+                    if cancelled.is_set() or not push(_ITEM, item):
+                        return
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+            push(_DONE)
+        except BaseException as e:
+            push(_ERROR, e)
+
+    loop.run_in_executor(executor or get_model_executor(), produce)
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == _ITEM:
+                slots.release()
+                yield value
+            elif kind == _ERROR:
+                raise value
+            else:
+                break
+    finally:
+        cancelled.set()
+        # Wake a worker that is waiting for buffer space so it can exit promptly.
+        slots.release()
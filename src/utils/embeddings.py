@@ -0,0 +1,117 @@
+"""Local text embedders used to match questions against schema descriptions."""
+
+import re
+import threading
+import zlib
+from collections.abc import Sequence
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder based on hashed character n-grams.
+
+    Captures surface similarity only (shared sub-words such as ``cost`` in
+    ``total_cost`` or ``帳單`` in ``帳單月份``), which is what schema matching needs
+    when no neural model is installed.
+    """
+
+    def __init__(self, dimensions: int = 1024, ngram_sizes: Sequence[int] = (2, 3)):
+        """
+        Initialize the embedder.
+
+        Args:
+            dimensions: Size of the hashed feature space
+            ngram_sizes: Character n-gram lengths to hash
+        """
+        self.dimensions = dimensions
+        self.ngram_sizes = tuple(ngram_sizes)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts as L2-normalised vectors.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Array of shape (len(texts), dimensions)
+        """
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _NON_WORD.split(text.lower()):
+                if not word:
+                    continue
+                padded = f" {word} "
+                for size in self.ngram_sizes:
+                    for i in range(len(padded) - size + 1):
+                        # crc32 is stable across processes, unlike hash().
+                        bucket = zlib.crc32(padded[i : i + size].encode()) % self.dimensions
+                        vectors[row, bucket] += 1.0
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by a local sentence-transformers model (loaded on first use)."""
+
+    def __init__(self, model_name: str, device: str = "cpu"):
+        """
+        Initialize the embedder.
+
+        Args:
+            model_name: sentence-transformers model name or path
+            device: Device to run the model on
+        """
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            msg = (
+                "sentence-transformers is not installed. "
+                "Install with: pip install sentence-transformers"
+            )
+            raise ImportError(msg)
+
+        self.model_name = model_name
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts as L2-normalised vectors."""
+        with self._lock:
+            if self._model is None:
+                self._model = SentenceTransformer(self.model_name, device=self.device)
+        vectors = self._model.encode(list(texts), convert_to_numpy=True)
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def create_embedder(name: str | None, device: str = "cpu"):
+    """
+    Create an embedder from a configuration value.
+
+    Args:
+        name: "" or "none" to disable, "hashing" for the built-in embedder,
+            otherwise a sentence-transformers model name
+        device: Device for neural models
+
+    Returns:
+        Embedder with an ``encode(texts)`` method, or None when disabled
+    """
+    if not name or name.lower() == "none":
+        return None
+    if name.lower() == "hashing":
+        return HashingEmbedder()
+    return SentenceTransformerEmbedder(name, device=device)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
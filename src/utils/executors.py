@@ -0,0 +1,73 @@
+"""Dedicated thread pools for blocking work called from async code."""
+
+import asyncio
+import functools
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
+
+import config
+
+T = TypeVar("T")
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """Return the named executor, creating it on first use."""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+            _executors[name] = executor
+        return executor
+
+
+def get_model_executor() -> ThreadPoolExecutor:
+    """Return the bounded executor for blocking model calls."""
+    return _get_executor("model", config.MODEL_EXECUTOR_WORKERS)
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Return the bounded executor for blocking database calls."""
+    return _get_executor("db", config.DB_EXECUTOR_WORKERS)
+
+
+def get_stream_executor() -> ThreadPoolExecutor:
+    """
+    Return the executor for streamed query results.
+
+    A stream keeps its thread for as long as the client reads, so streams get
+    their own threads instead of starving the database executor.
+    """
+    return _get_executor("db-stream", config.DB_CONFIG.stream_max_concurrent)
+
+
+async def run_in_executor(
+    executor: ThreadPoolExecutor, func: Callable[..., T], *args: Any, **kwargs: Any
+) -> T:
+    """
+    Run a blocking callable on an executor without blocking the event loop.
+
+    Args:
+        executor: Executor to run the callable on
+        func: Blocking callable
+        *args: Positional arguments for the callable
+        **kwargs: Keyword arguments for the callable
+
+    Returns:
+        Return value of the callable
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """Shut down all executors (used on application shutdown)."""
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
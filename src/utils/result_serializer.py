@@ -0,0 +1,143 @@
+"""Convert query result rows to JSON-safe values column by column and encode them quickly."""
+
+import json
+from collections.abc import Callable, Iterable, Sequence
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any
+
+from pymysql.constants import FIELD_TYPE
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Python type PyMySQL returns for each column type, when it is fixed.
+_DESCRIPTION_TYPES = {
+    FIELD_TYPE.DECIMAL: Decimal,
+    FIELD_TYPE.NEWDECIMAL: Decimal,
+    FIELD_TYPE.DATE: date,
+    FIELD_TYPE.NEWDATE: date,
+    FIELD_TYPE.DATETIME: datetime,
+    FIELD_TYPE.TIMESTAMP: datetime,
+    FIELD_TYPE.TIME: timedelta,
+}
+
+_NATIVE_TYPES = (str, int, float, bool)
+
+
+def _isoformat(value) -> str:
+    return value.isoformat()
+
+
+def to_json_value(value: Any) -> Any:
+    """
+    Convert one value to its JSON form.
+
+    Dates and datetimes become ISO strings, JSON-native values are kept and
+    anything else (Decimal, timedelta, bytes) becomes ``str(value)``.
+    """
+    if value is None or isinstance(value, _NATIVE_TYPES):
+        return value
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _converter_for(value_type: type) -> Callable[[Any], Any] | None:
+    """Return the conversion for values of ``value_type`` (None when already JSON-native)."""
+    if issubclass(value_type, _NATIVE_TYPES):
+        return None
+    if issubclass(value_type, date):
+        return _isoformat
+    return str
+
+
+class ResultSerializer:
+    """
+    Converts result rows to JSON-safe values one column at a time.
+
+    Each column's value type is taken from ``cursor.description`` when it pins
+    one down (DECIMAL, DATE, DATETIME, TIME) and otherwise from the first
+    non-null value seen. Columns of JSON-native types are skipped entirely; the
+    others get a single converter applied down the column. A value whose type
+    differs from the column's (e.g. a zero date PyMySQL returns as a string)
+    falls back to to_json_value(). Reuse one instance for all chunks of a result.
+    """
+
+    def __init__(self, columns: Sequence[str], description: Iterable[tuple] | None = None):
+        """
+        Initialize the serializer.
+
+        Args:
+            columns: Column names (row dict keys)
+            description: PEP 249 cursor.description, if available
+        """
+        self.columns = list(columns)
+        # column -> (value type, converter); None until the type is known.
+        self._plans: dict[str, tuple[type, Callable[[Any], Any] | None] | None] = dict.fromkeys(
+            self.columns
+        )
+        for column in description or ():
+            value_type = _DESCRIPTION_TYPES.get(column[1])
+            if value_type is not None and column[0] in self._plans:
+                self._plans[column[0]] = (value_type, _converter_for(value_type))
+
+    def convert(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Convert rows in place.
+
+        Args:
+            rows: Result rows as dictionaries
+
+        Returns:
+            The same list, with JSON-safe values
+        """
+        if not rows:
+            return rows
+        for column in self.columns:
+            plan = self._plans[column]
+            if plan is None:
+                sample = next((row[column] for row in rows if row[column] is not None), None)
+                if sample is None:
+                    continue
+                plan = self._plans[column] = (sample.__class__, _converter_for(sample.__class__))
+            value_type, convert = plan
+            if convert is None:
+                # JSON-native column: only stray values of another type need work.
+                for row in rows:
+                    value = row[column]
+                    if value is not None and value.__class__ is not value_type:
+                        row[column] = to_json_value(value)
+                continue
+            for row in rows:
+                value = row[column]
+                if value.__class__ is value_type:
+                    row[column] = convert(value)
+                elif value is not None:
+                    row[column] = to_json_value(value)
+        return rows
+
+
+def serialize_rows(
+    rows: list[dict[str, Any]], description: Iterable[tuple] | None = None
+) -> list[dict[str, Any]]:
+    """Convert a complete result to JSON-safe values (in place)."""
+    if not rows:
+        return rows
+    return ResultSerializer(list(rows[0].keys()), description).convert(rows)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode JSON-safe data as compact UTF-8 JSON.
+
+    Uses orjson when installed, otherwise the standard library with the same
+    settings as FastAPI's JSONResponse.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -1,8 +1,153 @@
 """SQL parsing and validation utilities."""
 
 import re
+from functools import lru_cache
 
 import sqlparse
+from sqlparse import filters, formatter, lexer
+from sqlparse.engine import grouping
+from sqlparse.engine.statement_splitter import StatementSplitter
+
+import config
+
+_SQL_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "DROP", "ALTER")
+_ANY_KEYWORD = re.compile(r"\b(?:" + "|".join(_SQL_KEYWORDS) + r")\b", re.IGNORECASE)
+_VALID_TYPES = frozenset(_SQL_KEYWORDS)
+
+
+@lru_cache(maxsize=4)
+def _format_options(reindent: bool, keyword_case: str | None) -> dict:
+    return formatter.validate_options({"reindent": reindent, "keyword_case": keyword_case})
+
+
+def _statement_filters(options: dict) -> list:
+    """The statement filters sqlparse.format would run for ``options``."""
+    if not options.get("reindent"):
+        return []
+    return [
+        filters.StripWhitespaceFilter(),
+        filters.ReindentFilter(
+            char=options["indent_char"],
+            width=options["indent_width"],
+            indent_after_first=options["indent_after_first"],
+            indent_columns=options["indent_columns"],
+            wrap_after=options["wrap_after"],
+            comma_first=options["comma_first"],
+            compact=options["compact"],
+        ),
+    ]
+
+
+def _analyze(sql: str, formatted: bool) -> tuple[bool, str]:
+    """
+    Tokenize ``sql`` once and return (is valid SQL, formatted SQL).
+
+    Validation and formatting share the token stream and the grouped statements;
+    the output matches sqlparse.format(sql, reindent=..., keyword_case=...).
+    """
+    options = _format_options(config.SQL_FORMAT_REINDENT, config.SQL_FORMAT_KEYWORD_CASE)
+    stream = lexer.tokenize(sql)
+    if formatted and options.get("keyword_case"):
+        stream = filters.KeywordCaseFilter(options["keyword_case"]).process(stream)
+    statements = [grouping.group(statement) for statement in StatementSplitter().process(stream)]
+    if not statements:
+        return False, sql
+    statement_type = statements[0].get_type()
+    valid = statement_type is not None and statement_type.upper() in _VALID_TYPES
+    if not (valid and formatted):
+        return valid, sql
+    # One filter instance for all statements: ReindentFilter separates them with a blank line.
+    statement_filters = _statement_filters(options)
+    output = []
+    for statement in statements:
+        for statement_filter in statement_filters:
+            statement_filter.process(statement)
+        output.append(filters.SerializerUnicode.process(statement))
+    return True, "".join(output)
+
+
+@lru_cache(maxsize=config.SQL_PARSER_CACHE_SIZE)
+def _clean(raw: str, formatted: bool) -> str:
+    """Memoized clean_sql (model outputs repeat across retries, votes and evaluations)."""
+    extracted = SQLParser.extract_sql(raw)
+    if not formatted:
+        return extracted
+    try:
+        _, result = _analyze(extracted, formatted=True)
+    except Exception as e:
+        # _analyze drives sqlparse internals; fall back to its public API if they change.
+        print(f"[WARN] SQL 單次格式化失敗，改用 sqlparse.format: {e}")
+        parsed = sqlparse.parse(extracted)
+        statement_type = parsed[0].get_type() if parsed else None
+        if statement_type is not None and statement_type.upper() in _VALID_TYPES:
+            return SQLParser.format_sql(extracted)
+        return extracted
+    return result
+
+
+# Significant tokens for the LIMIT rewrite; strings and comments never contain keywords.
+_LIMIT_SCAN = re.compile(
+    r"""
+    (?P<skip>\s+|--[^\n]*|\#[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<quoted>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`)
+    |(?P<word>\w+)
+    |(?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_PARENTHESIZED_SELECT = re.compile(r"[\s(]*(?:select|with)\b", re.IGNORECASE)
+_SET_OPERATORS = frozenset(("union", "intersect", "except"))
+_NOT_A_QUERY = frozenset(("insert", "update", "delete", "replace", "into"))
+_LOCKING = frozenset(("for", "lock"))
+
+
+def _top_level_tokens(sql: str) -> list[tuple[str, int, int]] | None:
+    """
+    (lower-cased text, start, end) of the tokens outside parentheses.
+
+    A parenthesized group shows up as its "(" and ")" tokens. Returns None
+    when ``sql`` holds more than one statement.
+    """
+    tokens = []
+    depth = 0
+    ended = False
+    for match in _LIMIT_SCAN.finditer(sql):
+        if match.lastgroup == "skip":
+            continue
+        if ended:
+            return None
+        text = match.group()
+        if text == ")":
+            depth = max(depth - 1, 0)
+        if depth == 0:
+            if text == ";":
+                ended = True
+                continue
+            tokens.append((text.lower(), match.start(), match.end()))
+        if text == "(":
+            depth += 1
+    return tokens
+
+
+def _extract_unfenced(text: str) -> str:
+    """
+    Fallback for text without a code block or line-start SELECT/WITH.
+
+    Returns the lines from the first SQL keyword (the first line starting at the
+    keyword) through the first line ending in ``;``, or the text itself when it
+    has no keyword.
+    """
+    text = text.strip()
+    first = _ANY_KEYWORD.search(text)
+    if first is None:
+        return text
+
+    sql_lines = []
+    for line in text[first.start() :].split("\n"):
+        sql_lines.append(line)
+        if line.strip().endswith(";"):
+            break
+    return "\n".join(sql_lines).strip()
 
 
 class SQLParser:
@@ -13,44 +158,20 @@ class SQLParser:
         """
         Extract SQL statement from generated text.
 
+        Runs IncrementalSQLExtractor over the whole text, so the result is the
+        same as when the text is streamed: the first code block or line-start
+        SELECT/WITH up to its closing fence or top-level ``;``, otherwise the
+        lines from the first SQL keyword through the first ending in ``;``.
+
         Args:
             text: Generated text that may contain SQL
 
         Returns:
             Extracted SQL statement
         """
-        text = text.strip()
-
-        sql_block_pattern = r"```sql\s*(.*?)\s*```"
-        match = re.search(sql_block_pattern, text, re.DOTALL | re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-
-        code_block_pattern = r"```\s*(.*?)\s*```"
-        match = re.search(code_block_pattern, text, re.DOTALL)
-        if match:
-            return match.group(1).strip()
-
-        sql_keywords = ["SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "DROP", "ALTER"]
-        for keyword in sql_keywords:
-            if keyword in text.upper():
-                lines = text.split("\n")
-                sql_lines = []
-                in_sql = False
-
-                for line in lines:
-                    if any(kw in line.upper() for kw in sql_keywords):
-                        in_sql = True
-
-                    if in_sql:
-                        sql_lines.append(line)
-
-                        if line.strip().endswith(";"):
-                            break
-
-                return "\n".join(sql_lines).strip()
-
-        return text
+        extractor = IncrementalSQLExtractor()
+        extractor.feed(text)
+        return extractor.finish()
 
     @staticmethod
     def validate_sql(sql: str) -> bool:
@@ -64,21 +185,10 @@ class SQLParser:
             True if valid SQL, False otherwise
         """
         try:
-            parsed = sqlparse.parse(sql)
-            if not parsed:
-                return False
-
-            statement = parsed[0]
-            stmt_type = statement.get_type()
-
-            if stmt_type is None:
-                return False
-
-            valid_types = ["SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "DROP", "ALTER"]
-            return stmt_type.upper() in valid_types
-
+            valid, _ = _analyze(sql, formatted=False)
         except Exception:
             return False
+        return valid
 
     @staticmethod
     def format_sql(sql: str) -> str:
@@ -91,20 +201,267 @@ class SQLParser:
         Returns:
             Formatted SQL statement
         """
-        return sqlparse.format(sql, reindent=True, keyword_case="upper")
+        return sqlparse.format(
+            sql,
+            reindent=config.SQL_FORMAT_REINDENT,
+            keyword_case=config.SQL_FORMAT_KEYWORD_CASE,
+        )
 
     @staticmethod
-    def clean_sql(sql: str) -> str:
+    def clean_sql(sql: str, formatted: bool | None = None) -> str:
         """
         Clean and extract pure SQL from text.
 
+        The statement is tokenized once for both validation and formatting, and
+        results are memoized by raw text. With ``formatted=False`` (for callers
+        that only execute or compare the SQL) sqlparse is skipped entirely.
+
         Args:
             sql: Raw SQL text
+            formatted: Reindent and upper-case keywords (default: config.SQL_FORMAT_OUTPUT)
 
         Returns:
             Cleaned SQL statement
         """
-        extracted = SQLParser.extract_sql(sql)
-        if SQLParser.validate_sql(extracted):
-            return SQLParser.format_sql(extracted)
-        return extracted
+        if formatted is None:
+            formatted = config.SQL_FORMAT_OUTPUT
+        return _clean(sql, formatted)
+
+    @staticmethod
+    def apply_limit(sql: str, limit: int) -> str:
+        """
+        Add a LIMIT to the outermost SELECT, or tighten the one it already has.
+
+        Only the top level is rewritten: LIMITs inside subqueries and CTEs are
+        left alone, and a trailing LIMIT after UNION/INTERSECT/EXCEPT caps the
+        whole set operation. Other statements, several statements, SELECT ...
+        INTO and LIMITs with placeholders are returned unchanged.
+
+        Args:
+            sql: Single SQL statement
+            limit: Maximum rows (0 = leave the statement unchanged)
+
+        Returns:
+            The rewritten statement
+        """
+        tokens = _top_level_tokens(sql) if limit > 0 else None
+        if not tokens:
+            return sql
+        words = [token[0] for token in tokens]
+        if words[0] == "(":
+            if not _PARENTHESIZED_SELECT.match(sql, tokens[0][2]):
+                return sql
+        elif words[0] not in ("select", "with"):
+            return sql
+        for i, word in enumerate(words):
+            # Not REPLACE(...) or FOR UPDATE
+            if word in _NOT_A_QUERY and words[i - 1] != "for" and words[i + 1 : i + 2] != ["("]:
+                return sql
+
+        # Clauses after the last set operator apply to the whole query.
+        start = max((i for i, word in enumerate(words) if word in _SET_OPERATORS), default=0)
+        tail = words[start:]
+        if "limit" in tail:
+            at = start + len(tail) - 1 - tail[::-1].index("limit")
+            args = words[at + 1 : at + 4]
+            # LIMIT count | LIMIT offset, count | LIMIT count OFFSET offset
+            index = at + 3 if args[1:2] == [","] else at + 1
+            if index >= len(tokens) or not words[index].isdigit():
+                return sql
+            if int(words[index]) <= limit:
+                return sql
+            _, begin, end = tokens[index]
+            return f"{sql[:begin]}{limit}{sql[end:]}"
+
+        # Before FOR UPDATE / LOCK IN SHARE MODE, otherwise after the last token.
+        for word, begin, _ in tokens[start:]:
+            if word in _LOCKING:
+                return f"{sql[:begin]}LIMIT {limit} {sql[begin:]}"
+        end = tokens[-1][2]
+        return f"{sql[:end]} LIMIT {limit}{sql[end:]}"
+
+    @staticmethod
+    def apply_execution_timeout(sql: str, milliseconds: int) -> str:
+        """
+        Add a MAX_EXECUTION_TIME optimizer hint to the outermost SELECT.
+
+        MySQL aborts the query once it runs longer than the hint allows. Statements
+        without a top-level SELECT keyword (e.g. a parenthesized UNION) are
+        returned unchanged.
+
+        Args:
+            sql: Single SQL statement
+            milliseconds: Time limit for the query
+
+        Returns:
+            The rewritten statement
+        """
+        for word, _, end in _top_level_tokens(sql) or ():
+            if word == "select":
+                return f"{sql[:end]} /*+ MAX_EXECUTION_TIME({milliseconds}) */{sql[end:]}"
+        return sql
+
+
+# Unfenced SQL starts at an upper-case statement keyword, or any-case SELECT/WITH at a line start.
+_LINE_KEYWORD = re.compile(r"^[ \t]*((?:select|with)\s)", re.IGNORECASE | re.MULTILINE)
+# A last line of prose that may still grow into a line-start keyword.
+_LINE_KEYWORD_PREFIX = re.compile(r"[ \t]*[a-z]{0,6}", re.IGNORECASE)
+_FENCE = "```"
+_FENCE_LANGUAGES = frozenset(("", "sql", "mysql"))
+# Characters whose meaning depends on the next one(s): "--", "/*", "*/", escapes, "```".
+_LOOKAHEAD = {"-": 1, "/": 1, "*": 1, "\\": 1, "`": 2}
+
+
+class IncrementalSQLExtractor:
+    """
+    Extract the SQL statement from generated text while it is streaming.
+
+    feed() each token delta as it arrives; the first call that completes the
+    statement (a closing ``` fence, or a ``;`` outside strings, comments and
+    parentheses) returns it, so callers can stop generation and start running
+    the query. Work per call is proportional to the delta.
+
+    The statement starts at the first ``` fence or the first line starting
+    with SELECT/WITH. Keywords in the middle of a prose line are not trusted
+    (``I will SELECT the rows.``); if nothing else starts a statement, finish()
+    falls back to them. The result does not depend on how the text is split
+    into deltas, and SQLParser.extract_sql() returns the same for the whole text.
+    """
+
+    def __init__(self):
+        """Initialize the extractor."""
+        self.sql: str | None = None
+        self._chunks: list[str] = []
+        self._state = "prose"  # prose -> language -> sql -> done
+        # Unprocessed text. In prose its first character is context only: "\n" at
+        # a line start, otherwise the character before the unprocessed text.
+        self._pending = "\n"
+        self._content: list[str] = []
+        self._quote: str | None = None
+        self._comment: str | None = None
+        self._depth = 0
+
+    @property
+    def complete(self) -> bool:
+        """Whether the statement has ended."""
+        return self.sql is not None
+
+    def feed(self, delta: str) -> str | None:
+        """
+        Consume a token delta.
+
+        Args:
+            delta: Newly generated text
+
+        Returns:
+            The SQL statement on the call that completes it, otherwise None
+        """
+        if self.complete or not delta:
+            return None
+        self._chunks.append(delta)
+        self._pending += delta
+        self._advance(final=False)
+        return self.sql
+
+    def finish(self) -> str:
+        """
+        Return the SQL once the stream has ended, complete or not.
+
+        An unterminated block is returned as is; text without any recognisable
+        start of SQL falls back to SQLParser.extract_sql.
+        """
+        if not self.complete:
+            self._advance(final=True)
+        if self.complete:
+            return self.sql
+        if self._state == "prose":
+            return _extract_unfenced("".join(self._chunks))
+        return "".join(self._content).strip()
+
+    def _advance(self, final: bool) -> None:
+        if self._state == "prose":
+            self._scan_prose(final)
+        if self._state == "language":
+            self._scan_language(final)
+        if self._state == "sql":
+            self._scan_sql(final)
+
+    def _scan_prose(self, final: bool) -> None:
+        text = self._pending
+        # Searching from 1 lets "^" match there only when the context is "\n".
+        fence = text.find(_FENCE, 1)
+        match = _LINE_KEYWORD.search(text, 1)
+        keyword = match.start(1) if match is not None else -1
+        if fence >= 0 and (keyword < 0 or fence < keyword):
+            self._state = "language"
+            self._pending = text[fence + len(_FENCE) :]
+        elif keyword >= 0:
+            self._state = "sql"
+            self._pending = text[keyword:]
+        elif not final:
+            # Keep what a fence or line-start keyword split across deltas could
+            # start with, behind one character of context.
+            line = text.rfind("\n")
+            if line >= 0 and _LINE_KEYWORD_PREFIX.fullmatch(text, line + 1):
+                self._pending = "\n" + text[line + 1 :].lstrip(" \t")
+            else:
+                self._pending = text[-len(_FENCE) :]
+
+    def _scan_language(self, final: bool) -> None:
+        text = self._pending
+        end = next((i for i, ch in enumerate(text) if ch.isspace()), -1)
+        if end < 0 and not final:
+            return
+        word = text if end < 0 else text[:end]
+        self._state = "sql"
+        self._pending = text[len(word) :] if word.lower() in _FENCE_LANGUAGES else text
+
+    def _scan_sql(self, final: bool) -> None:
+        text = self._pending
+        i, count = 0, len(text)
+        while i < count:
+            ch = text[i]
+            if not final and i + _LOOKAHEAD.get(ch, 0) >= count:
+                break
+            nxt = text[i + 1] if i + 1 < count else ""
+            if self._comment == "line":
+                if ch == "\n":
+                    self._comment = None
+            elif self._comment == "block":
+                if ch == "*" and nxt == "/":
+                    self._comment = None
+                    self._content.append(ch)
+                    i += 1
+                    ch = nxt
+            elif self._quote is not None:
+                if ch == "\\" and nxt:
+                    self._content.append(ch)
+                    i += 1
+                    ch = nxt
+                elif ch == self._quote:
+                    self._quote = None
+            elif text.startswith(_FENCE, i):
+                self._complete()
+                return
+            elif ch in "'\"`":
+                self._quote = ch
+            elif ch == "#" or (ch == "-" and nxt == "-"):
+                self._comment = "line"
+            elif ch == "/" and nxt == "*":
+                self._comment = "block"
+            elif ch == "(":
+                self._depth += 1
+            elif ch == ")":
+                self._depth = max(0, self._depth - 1)
+            elif ch == ";" and self._depth == 0:
+                self._content.append(ch)
+                self._complete()
+                return
+            self._content.append(ch)
+            i += 1
+        self._pending = text[i:]
+
+    def _complete(self) -> None:
+        self.sql = "".join(self._content).strip()
+        self._state = "done"
+        self._pending = ""
@@ -0,0 +1,58 @@
+"""Shared test fixtures."""
+
+import string
+
+import pytest
+import torch
+from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+import config
+from src.models.huggingface_model import HuggingFaceModel
+from src.prompts.text_to_sql_prompt import SYSTEM_INSTRUCTION
+
+
+def _build_tiny_model(use_prefix_cache: bool = True, **kwargs) -> HuggingFaceModel:
+    """Character-level tokenizer + randomly initialized 2-layer Qwen2."""
+    chars = sorted(set(string.printable + SYSTEM_INSTRUCTION + config.FULL_SCHEMA + "查詢"))
+    vocab = {"<unk>": 0, "<eos>": 1}
+    for ch in chars:
+        vocab.setdefault(ch, len(vocab))
+
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split(Regex(r"[\s\S]"), behavior="isolated")
+    backend.decoder = decoders.Fuse()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", eos_token="<eos>", pad_token="<eos>"
+    )
+    tokenizer.chat_template = (
+        "{% for m in messages %}<{{ m['content'] }}>\n{% endfor %}"
+        "{% if add_generation_prompt %}A:{% endif %}"
+    )
+
+    torch.manual_seed(0)
+    weights = Qwen2ForCausalLM(
+        Qwen2Config(
+            vocab_size=len(vocab),
+            hidden_size=32,
+            intermediate_size=64,
+            num_hidden_layers=2,
+            num_attention_heads=2,
+            num_key_value_heads=1,
+            max_position_embeddings=8192,
+            eos_token_id=1,
+            pad_token_id=1,
+        )
+    ).eval()
+
+    model = HuggingFaceModel(model_name="tiny", use_prefix_cache=use_prefix_cache, **kwargs)
+    model.tokenizer = tokenizer
+    model.model = weights
+    model._initialized = True
+    return model
+
+
+@pytest.fixture
+def build_tiny_model():
+    """Factory for a tiny local model that runs on CPU without downloads."""
+    return _build_tiny_model
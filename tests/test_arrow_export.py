@@ -0,0 +1,219 @@
+"""Tests for Arrow / Parquet export of query results."""
+
+import asyncio
+import io
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+from src.database import arrow_export
+from src.database.db_connector import DatabaseConnector, RowChunk
+
+requires_pyarrow = pytest.mark.skipif(
+    not arrow_export.PYARROW_AVAILABLE, reason="pyarrow is not installed"
+)
+
+DESCRIPTION = (
+    ("id", FIELD_TYPE.LONG, None, 11, 11, 0, False),
+    ("cost", FIELD_TYPE.NEWDECIMAL, None, 22, 22, 10, True),
+    ("created_date", FIELD_TYPE.DATETIME, None, 19, 19, 0, True),
+    ("note", FIELD_TYPE.BLOB, None, 400, 400, 0, True),
+)
+ROWS = [
+    (i, Decimal("12.3456789012"), datetime(2024, 1, i + 1), None if i % 2 else "備註")
+    for i in range(5)
+]
+
+
+def _chunks(rows=ROWS, chunk_size=2, truncated=False):
+    columns = [column[0] for column in DESCRIPTION]
+    yield RowChunk(columns, [], description=DESCRIPTION)
+    for start in range(0, len(rows), chunk_size):
+        yield RowChunk(columns, rows[start : start + chunk_size], description=DESCRIPTION)
+    yield RowChunk(columns, [], True, truncated, DESCRIPTION)
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        (None, None),
+        ("application/json", None),
+        ("application/vnd.apache.arrow.stream", "arrow"),
+        ("application/json;q=0.5, application/vnd.apache.parquet", "parquet"),
+        ("application/vnd.apache.parquet;q=0, application/json", None),
+        ("application/json, application/vnd.apache.arrow.stream;q=0.1", None),
+        ("application/vnd.apache.arrow.stream;q=0.9, application/json;q=0.8", "arrow"),
+        ("application/vnd.apache.arrow.stream, */*", "arrow"),
+        ("*/*;q=1, application/vnd.apache.parquet;q=0.5", None),
+        ("application/vnd.apache.arrow.file", "arrow_file"),
+        ("text/html, application/vnd.apache.parquet;q=0.2", "parquet"),
+    ],
+)
+def test_negotiate_format(accept, expected):
+    assert arrow_export.negotiate_format(accept) == expected
+
+
+@requires_pyarrow
+def test_schema_keeps_decimal_and_datetime_types():
+    import pyarrow as pa
+
+    schema = arrow_export.arrow_schema(DESCRIPTION, ROWS)
+
+    assert schema.field("id").type == pa.int64()
+    assert not schema.field("id").nullable
+    assert schema.field("cost").type == pa.decimal128(21, 10)
+    assert schema.field("created_date").type == pa.timestamp("us")
+    assert schema.field("note").type == pa.string()
+
+
+@requires_pyarrow
+def test_wide_decimal_uses_decimal256():
+    import pyarrow as pa
+
+    assert arrow_export.arrow_type(FIELD_TYPE.NEWDECIMAL, 44, 10) == pa.decimal256(43, 10)
+
+
+@requires_pyarrow
+def test_record_batches_rebatch_rows():
+    batches = list(arrow_export.record_batches(_chunks(), batch_size=3))
+
+    schema, *record_batches = batches
+    assert schema.names == ["id", "cost", "created_date", "note"]
+    assert [batch.num_rows for batch in record_batches] == [3, 2]
+
+
+@requires_pyarrow
+def test_arrow_ipc_round_trip():
+    import pyarrow as pa
+
+    data = b"".join(arrow_export.encode_batches(_chunks(), "arrow", batch_size=2))
+    table = pa.ipc.open_stream(data).read_all()
+
+    assert table.num_rows == 5
+    assert table.to_pylist()[0] == {
+        "id": 0,
+        "cost": Decimal("12.3456789012"),
+        "created_date": datetime(2024, 1, 1),
+        "note": "備註",
+    }
+
+
+@requires_pyarrow
+def test_parquet_round_trip_one_row_group_per_batch():
+    import pyarrow.parquet as pq
+
+    data = b"".join(arrow_export.encode_batches(_chunks(), "parquet", batch_size=2))
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+
+    assert parquet_file.metadata.num_rows == 5
+    assert parquet_file.num_row_groups == 3
+    assert parquet_file.read().column("cost").to_pylist()[1] == Decimal("12.3456789012")
+
+
+@requires_pyarrow
+def test_arrow_file_format_round_trip():
+    import pyarrow as pa
+
+    data = b"".join(arrow_export.encode_batches(_chunks(), "arrow_file", batch_size=2))
+    reader = pa.ipc.open_file(data)
+
+    assert reader.num_record_batches == 3
+    assert reader.read_all().num_rows == 5
+
+
+@requires_pyarrow
+@pytest.mark.parametrize("export_format", ["arrow", "arrow_file"])
+def test_truncated_arrow_export_ends_with_marker_batch(export_format):
+    import pyarrow as pa
+
+    chunks = _chunks(rows=ROWS[:3], truncated=True)
+    data = b"".join(arrow_export.encode_batches(chunks, export_format, batch_size=2))
+    if export_format == "arrow":
+        batches = list(pa.ipc.open_stream(data).iter_batches_with_custom_metadata())
+    else:
+        reader = pa.ipc.open_file(data)
+        batches = [
+            reader.get_batch_with_custom_metadata(index)
+            for index in range(reader.num_record_batches)
+        ]
+
+    assert sum(batch.batch.num_rows for batch in batches) == 3
+    assert batches[-1].batch.num_rows == 0
+    assert batches[-1].custom_metadata[b"truncated"] == b"true"
+
+
+@requires_pyarrow
+def test_truncated_parquet_export_marks_footer():
+    import pyarrow.parquet as pq
+
+    complete = b"".join(arrow_export.encode_batches(_chunks(), "parquet", batch_size=2))
+    chunks = _chunks(rows=ROWS[:3], truncated=True)
+    truncated = b"".join(arrow_export.encode_batches(chunks, "parquet", batch_size=2))
+
+    assert b"truncated" not in pq.ParquetFile(io.BytesIO(complete)).metadata.metadata
+    metadata = pq.ParquetFile(io.BytesIO(truncated)).metadata
+    assert metadata.num_rows == 3
+    assert metadata.metadata[b"truncated"] == b"true"
+
+
+@requires_pyarrow
+def test_empty_result_still_has_schema():
+    import pyarrow as pa
+
+    data = b"".join(arrow_export.encode_batches(_chunks(rows=[]), "arrow", batch_size=2))
+    table = pa.ipc.open_stream(data).read_all()
+
+    assert table.num_rows == 0
+    assert table.schema.names == ["id", "cost", "created_date", "note"]
+
+
+def test_encode_requires_pyarrow(monkeypatch):
+    monkeypatch.setattr(arrow_export, "PYARROW_AVAILABLE", False)
+
+    with pytest.raises(ImportError, match="pyarrow"):
+        next(arrow_export.encode_batches(_chunks(), "arrow", batch_size=2))
+
+
+@requires_pyarrow
+def test_closing_export_closes_query_stream():
+    chunks = _chunks()
+    encoded = arrow_export.encode_batches(chunks, "arrow", batch_size=2)
+    next(encoded)
+    encoded.close()
+
+    assert chunks.gi_frame is None
+
+
+@requires_pyarrow
+@patch("src.database.db_connector.pymysql")
+def test_aexport_query(mock_pymysql):
+    import pyarrow as pa
+
+    remaining = list(ROWS)
+
+    def fetchmany(size):
+        batch, remaining[:] = remaining[:size], remaining[size:]
+        return batch
+
+    cursor = MagicMock()
+    cursor.description = DESCRIPTION
+    cursor.fetchmany.side_effect = fetchmany
+    cursor.fetchone.return_value = None
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    mock_pymysql.connect.return_value = conn
+    DatabaseConnector.reset_pool()
+
+    async def scenario():
+        return [part async for part in arrow_export.aexport_query("SELECT * FROM t", "arrow", 2)]
+
+    try:
+        data = b"".join(asyncio.run(scenario()))
+    finally:
+        DatabaseConnector.reset_pool()
+
+    assert pa.ipc.open_stream(data).read_all().num_rows == 5
+    conn.cursor.assert_called_once_with(mock_pymysql.cursors.SSCursor)
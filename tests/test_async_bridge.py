@@ -0,0 +1,103 @@
+"""Tests for the sync-to-async iterator bridge."""
+
+import asyncio
+import threading
+import time
+from contextlib import aclosing
+
+import pytest
+
+from src.utils.async_bridge import iterate_in_thread
+
+
+def test_yields_all_items_in_order():
+    async def scenario():
+        return [item async for item in iterate_in_thread(lambda: iter(range(100)))]
+
+    assert asyncio.run(scenario()) == list(range(100))
+
+
+def test_propagates_iterator_errors():
+    def failing():
+        yield "SELECT"
+        raise RuntimeError("model crashed")
+
+    async def scenario():
+        return [item async for item in iterate_in_thread(failing)]
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        asyncio.run(scenario())
+
+
+def test_consumer_stop_closes_source_generator():
+    closed = threading.Event()
+    produced = []
+
+    def endless():
+        try:
+            while True:
+                produced.append(len(produced))
+                yield produced[-1]
+                time.sleep(0.001)
+        finally:
+            closed.set()
+
+    async def scenario():
+        async with aclosing(iterate_in_thread(endless, maxsize=4)) as stream:
+            async for item in stream:
+                if item == 3:
+                    break
+
+    asyncio.run(scenario())
+
+    assert closed.wait(timeout=2)
+    assert len(produced) < 50
+
+
+def test_bounded_buffer_applies_backpressure():
+    produced = []
+
+    def source():
+        for i in range(20):
+            produced.append(i)
+            yield i
+
+    async def scenario():
+        stream = iterate_in_thread(source, maxsize=2)
+        first = await anext(stream)
+        await asyncio.sleep(0.2)
+        ahead = len(produced)
+        rest = [item async for item in stream]
+        return first, ahead, rest
+
+    first, ahead, rest = asyncio.run(scenario())
+
+    assert first == 0
+    assert ahead <= 4
+    assert rest == list(range(1, 20))
+
+
+def test_event_loop_stays_responsive():
+    def slow():
+        for i in range(3):
+            time.sleep(0.1)
+            yield i
+
+    async def scenario():
+        ticks = 0
+        consumer = asyncio.create_task(
+            asyncio.wait_for(_collect(iterate_in_thread(slow)), timeout=5)
+        )
+        while not consumer.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        return consumer.result(), ticks
+
+    items, ticks = asyncio.run(scenario())
+
+    assert items == [0, 1, 2]
+    assert ticks >= 15
+
+
+async def _collect(stream):
+    return [item async for item in stream]
@@ -0,0 +1,136 @@
+"""Tests for the micro-batching scheduler."""
+
+import threading
+
+import pytest
+import torch
+
+import config
+from src.models.batch_scheduler import BatchScheduler, GenerationRequest
+from src.prompts.text_to_sql_prompt import TextToSQLPrompt
+
+
+def test_concurrent_requests_share_a_batch():
+    batches = []
+
+    def run_batch(requests):
+        batches.append([request.prompt for request in requests])
+        for request in requests:
+            request.finish(result=request.prompt.upper())
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=4, max_wait_ms=200)
+    requests = [scheduler.submit(GenerationRequest(prompt=p, max_tokens=4)) for p in "abc"]
+
+    assert [request.wait() for request in requests] == ["A", "B", "C"]
+    assert batches == [["a", "b", "c"]]
+    assert scheduler.stats()["max_batch_size_seen"] == 3
+    scheduler.close()
+
+
+def test_batch_size_is_capped():
+    batches = []
+
+    def run_batch(requests):
+        batches.append(len(requests))
+        for request in requests:
+            request.finish(result="")
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=2, max_wait_ms=200)
+    requests = [scheduler.submit(GenerationRequest(prompt="q", max_tokens=4)) for _ in range(5)]
+    for request in requests:
+        request.wait()
+
+    assert batches == [2, 2, 1]
+    scheduler.close()
+
+
+def test_runner_error_fails_every_request_in_batch():
+    def run_batch(requests):
+        raise ValueError("out of memory")
+
+    scheduler = BatchScheduler(run_batch, max_wait_ms=50)
+    requests = [scheduler.submit(GenerationRequest(prompt=p, max_tokens=4)) for p in "ab"]
+
+    for request in requests:
+        with pytest.raises(ValueError, match="out of memory"):
+            request.wait()
+    scheduler.close()
+
+
+def test_cancelled_request_is_not_generated():
+    seen = []
+    release = threading.Event()
+
+    def run_batch(requests):
+        seen.extend(request.prompt for request in requests)
+        release.wait(timeout=5)
+        for request in requests:
+            request.finish(result="")
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=1, max_wait_ms=0)
+    first = scheduler.submit(GenerationRequest(prompt="first", max_tokens=4))
+    second = GenerationRequest(prompt="second", max_tokens=4)
+    second.cancel()
+    scheduler.submit(second)
+    release.set()
+
+    first.wait()
+    assert second.wait() == ""
+    assert seen == ["first"]
+    scheduler.close()
+
+
+def test_closing_stream_cancels_request():
+    request = GenerationRequest(prompt="q", max_tokens=4, stream=True)
+    request.emit("SELECT")
+    chunks = request.iter_chunks()
+
+    assert next(chunks) == "SELECT"
+    chunks.close()
+    assert request.cancelled.is_set()
+
+
+def test_batched_generation_matches_single_requests(build_tiny_model):
+    single = build_tiny_model(max_batch_size=1)
+    batched = build_tiny_model(max_batch_size=4, max_batch_wait_ms=500)
+    batched.model = single.model
+    # Greedy decoding so results do not depend on how sampling draws are shared.
+    single.temperature = batched.temperature = 0.0
+    for model in (single, batched):
+        model._sampling_kwargs = lambda max_tokens, m=model: {
+            "max_new_tokens": max_tokens,
+            "do_sample": False,
+            "pad_token_id": m.tokenizer.eos_token_id,
+        }
+
+    questions = ["查詢", "查詢 users", "q"]
+    prompts = [TextToSQLPrompt.build_prompt(config.FULL_SCHEMA, q) for q in questions]
+    max_tokens = [6, 3, 5]
+    expected = [single.generate(p, n) for p, n in zip(prompts, max_tokens, strict=True)]
+
+    results = [None] * len(prompts)
+
+    def worker(index):
+        results[index] = batched.generate(prompts[index], max_tokens[index])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(prompts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == expected
+    assert batched.scheduler.stats()["max_batch_size_seen"] == 3
+    assert batched.cache_stats()["misses"] == 1
+
+
+def test_stream_matches_generate(build_tiny_model):
+    model = build_tiny_model()
+    prompt = TextToSQLPrompt.build_prompt(config.FULL_SCHEMA, "查詢")
+
+    torch.manual_seed(7)
+    streamed = "".join(model.generate_stream(prompt, max_tokens=6))
+    torch.manual_seed(7)
+    generated = model.generate(prompt, max_tokens=6)
+
+    assert streamed.strip() == generated
@@ -0,0 +1,131 @@
+"""Tests for the database connection pool."""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.database.connection_pool import ConnectionPool, PoolTimeoutError
+
+
+def make_pool(**kwargs):
+    connections = []
+
+    def connect():
+        conn = MagicMock()
+        connections.append(conn)
+        return conn
+
+    return ConnectionPool(connect=connect, **kwargs), connections
+
+
+def test_released_connection_is_reused():
+    pool, connections = make_pool(max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert len(connections) == 1
+    first.rollback.assert_called()
+
+
+def test_reset_runs_on_release():
+    reset = MagicMock()
+    pool, connections = make_pool(reset=reset)
+
+    with pool.connection():
+        pass
+
+    reset.assert_called_once_with(connections[0])
+    assert pool.stats()["idle"] == 1
+
+
+def test_failed_reset_discards_connection():
+    pool, connections = make_pool(reset=MagicMock(side_effect=OSError("gone")))
+
+    with pool.connection():
+        pass
+
+    connections[0].close.assert_called_once()
+    assert pool.stats()["size"] == 0
+
+
+def test_connection_discarded_on_error():
+    pool, connections = make_pool()
+
+    with pytest.raises(ValueError), pool.connection():
+        raise ValueError("boom")
+
+    connections[0].close.assert_called_once()
+    assert pool.stats()["size"] == 0
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    pool.acquire()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiter_gets_released_connection():
+    pool, connections = make_pool(max_size=1, timeout=2)
+    held = pool.acquire()
+    result = []
+
+    waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(held)
+    waiter.join()
+
+    assert result == [held]
+    assert len(connections) == 1
+    assert pool.stats()["wait_seconds_max"] > 0
+
+
+def test_failed_health_check_replaces_connection():
+    pool, connections = make_pool(health_check_interval=0)
+    pool.release(pool.acquire())
+    connections[0].ping.side_effect = Exception("gone away")
+
+    conn = pool.acquire()
+
+    assert conn is connections[1]
+    assert pool.stats()["failed_health_checks"] == 1
+
+
+def test_max_lifetime_rotates_connection():
+    pool, connections = make_pool(max_lifetime=0)
+
+    pool.release(pool.acquire())
+
+    connections[0].close.assert_called_once()
+    assert pool.stats()["recycled_lifetime"] == 1
+
+
+def test_idle_timeout_keeps_min_size():
+    pool, connections = make_pool(min_size=1, idle_timeout=0)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+
+    pool.release(pool.acquire())
+
+    assert pool.stats()["size"] == 1
+    assert pool.stats()["recycled_idle"] == 1
+
+
+def test_warmup_opens_min_size():
+    pool, connections = make_pool(min_size=3)
+
+    pool.warmup()
+
+    assert len(connections) == 3
+    assert pool.stats()["idle"] == 3
@@ -0,0 +1,185 @@
+"""Tests for the EXPLAIN-based cost guard."""
+
+import pytest
+
+import config
+from src.database import cost_guard
+from src.database.cost_guard import CostGuard, QueryCostError, get_cost_guard, parse_plan
+
+# EXPLAIN FORMAT=JSON of a non-sargable filter joined to an indexed lookup
+FULL_SCAN_PLAN = {
+    "query_block": {
+        "select_id": 1,
+        "cost_info": {"query_cost": "251234.50"},
+        "ordering_operation": {
+            "using_filesort": True,
+            "nested_loop": [
+                {
+                    "table": {
+                        "table_name": "g",
+                        "access_type": "ALL",
+                        "rows_examined_per_scan": 2400000,
+                        "rows_produced_per_join": 240000,
+                        "filtered": "10.00",
+                        "attached_condition": "(date_format(`g`.`bill_month`,'%Y') = '2024')",
+                    }
+                },
+                {
+                    "table": {
+                        "table_name": "t",
+                        "access_type": "eq_ref",
+                        "key": "PRIMARY",
+                        "rows_examined_per_scan": 1,
+                    }
+                },
+            ],
+        },
+    }
+}
+INDEXED_PLAN = {
+    "query_block": {
+        "cost_info": {"query_cost": "42.10"},
+        "table": {
+            "table_name": "global_bill_l3",
+            "access_type": "ref",
+            "key": "idx_bill_month",
+            "rows_examined_per_scan": 120,
+        },
+    }
+}
+UNFILTERED_PLAN = {
+    "query_block": {
+        "cost_info": {"query_cost": "240000.00"},
+        "table": {
+            "table_name": "global_bill_l3",
+            "access_type": "ALL",
+            "rows_examined_per_scan": 2400000,
+        },
+    }
+}
+
+SLOW_SQL = (
+    "SELECT g.product_name, t.tencent_id FROM global_bill_l3 g JOIN tencent_bill t "
+    "ON t.id = g.id WHERE DATE_FORMAT(g.bill_month, '%Y') = '2024' ORDER BY g.product_name"
+)
+
+
+def fake_explain(plans):
+    calls = []
+
+    def explain(sql):
+        calls.append(sql)
+        return plans[len(calls) - 1] if isinstance(plans, list) else plans
+
+    explain.calls = calls
+    return explain
+
+
+def test_parse_plan_finds_nested_accesses():
+    plan = parse_plan(FULL_SCAN_PLAN)
+
+    assert plan.cost == pytest.approx(251234.5)
+    assert [(a.table, a.access_type, a.rows) for a in plan.accesses] == [
+        ("g", "ALL", 2400000),
+        ("t", "eq_ref", 1),
+    ]
+    assert plan.accesses[0].full_scan
+    assert not plan.accesses[1].full_scan
+
+
+def test_filtered_full_scan_is_rejected_with_reason():
+    guard = CostGuard(fake_explain(FULL_SCAN_PLAN), max_scan_rows=1_000_000)
+
+    with pytest.raises(QueryCostError) as excinfo:
+        guard.enforce(SLOW_SQL)
+
+    message = str(excinfo.value)
+    assert message.startswith("成本檢查未通過: Full table scan of 'g' examines ~2,400,000 rows")
+    assert "cannot use an index" in message
+    assert excinfo.value.verdict.action == "reject"
+    assert guard.stats()["rejected"] == 1
+
+
+def test_within_budget_and_unfiltered_scans_are_allowed():
+    guard = CostGuard(fake_explain([INDEXED_PLAN, UNFILTERED_PLAN]), max_scan_rows=1_000_000)
+
+    assert guard.enforce("SELECT * FROM global_bill_l3 WHERE bill_month = '2024-01'").startswith(
+        "SELECT * FROM global_bill_l3 WHERE"
+    )
+    assert guard.enforce("SELECT * FROM global_bill_l3 LIMIT 1001").endswith("LIMIT 1001")
+
+
+def test_query_cost_budget():
+    guard = CostGuard(fake_explain(UNFILTERED_PLAN), max_query_cost=100_000)
+
+    verdict = guard.check("SELECT SUM(total_cost) FROM global_bill_l3")
+
+    assert verdict.action == "reject"
+    assert str(verdict).startswith("Estimated query cost 240,000 exceeds budget 100,000")
+
+
+def test_downgrade_adds_execution_time_hint():
+    guard = CostGuard(
+        fake_explain(FULL_SCAN_PLAN), max_scan_rows=1000, action="downgrade", timeout_ms=5000
+    )
+
+    sql = guard.enforce(SLOW_SQL)
+
+    assert sql.startswith("SELECT /*+ MAX_EXECUTION_TIME(5000) */ g.product_name")
+    assert guard.stats()["downgraded"] == 1
+
+
+def test_plans_are_cached_by_fingerprint():
+    explain = fake_explain(INDEXED_PLAN)
+    guard = CostGuard(explain, max_scan_rows=1000)
+
+    guard.check("SELECT * FROM global_bill_l3 WHERE bill_month = '2024-01'")
+    guard.check("select *  from `global_bill_l3` where bill_month = '2024-01';")
+    guard.check("SELECT * FROM global_bill_l3 WHERE bill_month = '2024-02'")
+
+    assert len(explain.calls) == 2
+    assert guard.stats()["hits"] == 1
+
+
+def test_expired_and_evicted_plans_are_refreshed():
+    explain = fake_explain(INDEXED_PLAN)
+    guard = CostGuard(explain, max_scan_rows=1000, cache_size=1, cache_ttl=0)
+
+    guard.check("SELECT 1 FROM global_bill_l3")
+    guard.check("SELECT 1 FROM global_bill_l3")
+
+    assert len(explain.calls) == 2
+    assert guard.stats()["plans"] == 1
+
+
+def test_unchecked_statements_skip_explain():
+    explain = fake_explain(FULL_SCAN_PLAN)
+    guard = CostGuard(explain, max_scan_rows=1)
+
+    assert guard.check("SHOW TABLES").action == "allow"
+    assert guard.check("SELECT * FROM t FOR UPDATE").action == "allow"
+    assert explain.calls == []
+
+
+def test_explain_failure_allows_query():
+    def explain(sql):
+        raise RuntimeError("(1064, 'You have an error in your SQL syntax')")
+
+    guard = CostGuard(explain, max_scan_rows=1)
+
+    assert guard.check("SELECT nope FROM").action == "allow"
+
+
+def test_unknown_action():
+    with pytest.raises(ValueError, match="Unknown cost guard action"):
+        CostGuard(fake_explain(INDEXED_PLAN), action="warn")
+
+
+def test_get_cost_guard(monkeypatch):
+    monkeypatch.setattr(cost_guard, "_guard", None)
+    monkeypatch.setattr(config, "SQL_COST_GUARD_ENABLED", True)
+    assert get_cost_guard() is get_cost_guard()
+    assert get_cost_guard().max_scan_rows == config.SQL_COST_MAX_SCAN_ROWS
+
+    monkeypatch.setattr(config, "SQL_COST_GUARD_ENABLED", False)
+    assert get_cost_guard() is None
@@ -1,8 +1,24 @@
 """Tests for database connector."""
 
+import asyncio
+import threading
 from unittest.mock import MagicMock, patch
 
-from src.database.db_connector import DatabaseConnector
+import pytest
+
+import config
+from src.database.db_connector import DatabaseConnector, StreamLimitError
+
+ROWS = [{"id": i, "name": f"row{i}"} for i in range(5)]
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    DatabaseConnector.reset_pool()
+    DatabaseConnector.invalidate_cache()
+    yield
+    DatabaseConnector.reset_pool()
+    DatabaseConnector.invalidate_cache()
 
 
 @patch("src.database.db_connector.pymysql")
@@ -18,16 +34,7 @@ def test_get_connection(mock_pymysql):
 
 @patch("src.database.db_connector.pymysql")
 def test_execute_query(mock_pymysql):
-    mock_cursor = MagicMock()
-    mock_cursor.fetchall.return_value = [{"id": 1, "name": "test"}]
-
-    mock_conn = MagicMock()
-    mock_conn.__enter__.return_value = mock_conn
-    mock_conn.__exit__.return_value = None
-    mock_conn.cursor.return_value.__enter__.return_value = mock_cursor
-    mock_conn.cursor.return_value.__exit__.return_value = None
-
-    mock_pymysql.connect.return_value = mock_conn
+    _, mock_cursor = _streaming_connection(mock_pymysql, [{"id": 1, "name": "test"}])
 
     results = DatabaseConnector.execute_query("SELECT * FROM test")
 
@@ -36,6 +43,18 @@ def test_execute_query(mock_pymysql):
     mock_cursor.execute.assert_called_once_with("SELECT * FROM test")
 
 
+@patch("src.database.db_connector.pymysql")
+def test_explain(mock_pymysql):
+    cursor = MagicMock()
+    cursor.fetchone.return_value = {"EXPLAIN": '{"query_block": {"select_id": 1}}'}
+    mock_pymysql.connect.return_value.cursor.return_value.__enter__.return_value = cursor
+
+    plan = DatabaseConnector.explain("SELECT 1")
+
+    assert plan == {"query_block": {"select_id": 1}}
+    cursor.execute.assert_called_once_with("EXPLAIN FORMAT=JSON SELECT 1")
+
+
 @patch("src.database.db_connector.pymysql")
 def test_test_connection_success(mock_pymysql):
     mock_cursor = MagicMock()
@@ -60,3 +79,200 @@ def test_test_connection_failure(mock_pymysql):
     result = DatabaseConnector.test_connection()
 
     assert result is False
+
+
+@patch("src.database.db_connector.pymysql")
+def test_execute_query_reuses_pooled_connection(mock_pymysql):
+    mock_conn, _ = _streaming_connection(mock_pymysql, [])
+
+    DatabaseConnector.execute_query("SELECT 1")
+    DatabaseConnector.execute_query("SELECT 2")
+
+    mock_pymysql.connect.assert_called_once()
+    mock_conn.close.assert_not_called()
+    assert DatabaseConnector.pool_stats()["checkouts"] == 2
+
+
+@patch("src.database.db_connector.pymysql")
+def test_aexecute_query(mock_pymysql):
+    _streaming_connection(mock_pymysql, [{"id": 1}])
+
+    results = asyncio.run(DatabaseConnector.aexecute_query("SELECT id FROM test"))
+
+    assert results == [{"id": 1}]
+
+
+def _streaming_connection(mock_pymysql, rows):
+    cursor = MagicMock()
+    cursor.description = [("id",), ("name",)]
+    remaining = list(rows)
+
+    def fetchmany(size):
+        batch, remaining[:] = remaining[:size], remaining[size:]
+        return batch
+
+    cursor.fetchmany.side_effect = fetchmany
+    cursor.fetchone.side_effect = lambda: remaining.pop(0) if remaining else None
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    mock_pymysql.connect.return_value = conn
+    return conn, cursor
+
+
+@patch("src.database.db_connector.pymysql")
+def test_stream_query_yields_chunks(mock_pymysql):
+    conn, cursor = _streaming_connection(mock_pymysql, ROWS)
+
+    chunks = list(DatabaseConnector.stream_query("SELECT * FROM t", chunk_size=2))
+
+    assert chunks[0].columns == ["id", "name"]
+    assert chunks[0].rows == []
+    assert [len(chunk.rows) for chunk in chunks[1:-1]] == [2, 2, 1]
+    assert chunks[-1].done
+    assert not chunks[-1].truncated
+    conn.cursor.assert_called_once_with(mock_pymysql.cursors.SSDictCursor)
+    cursor.close.assert_called_once()
+    conn.close.assert_not_called()
+    assert DatabaseConnector.pool_stats()["idle"] == 1
+
+
+@patch("src.database.db_connector.pymysql")
+def test_released_connection_restores_default_database(mock_pymysql, monkeypatch):
+    monkeypatch.setattr(config.DB_CONFIG, "database", "billing")
+    conn, _ = _streaming_connection(mock_pymysql, [])
+
+    DatabaseConnector.execute_query("USE information_schema")
+
+    conn.select_db.assert_called_once_with("billing")
+    conn.close.assert_not_called()
+
+
+@patch("src.database.db_connector.pymysql")
+def test_use_without_default_database_discards_connection(mock_pymysql, monkeypatch):
+    monkeypatch.setattr(config.DB_CONFIG, "database", "")
+    conn, _ = _streaming_connection(mock_pymysql, [])
+
+    DatabaseConnector.execute_query("USE information_schema")
+
+    conn.close.assert_called_once()
+    assert DatabaseConnector.pool_stats()["idle"] == 0
+
+
+@patch("src.database.db_connector.pymysql")
+def test_stream_query_row_cap_discards_connection(mock_pymysql):
+    conn, cursor = _streaming_connection(mock_pymysql, ROWS)
+
+    chunks = list(DatabaseConnector.stream_query("SELECT * FROM t", chunk_size=2, max_rows=3))
+
+    assert sum(len(chunk.rows) for chunk in chunks) == 3
+    assert chunks[-1].truncated
+    cursor.close.assert_not_called()
+    conn.close.assert_called_once()
+
+
+@patch("src.database.db_connector.pymysql")
+def test_stream_query_byte_cap(mock_pymysql):
+    conn, _ = _streaming_connection(mock_pymysql, ROWS)
+
+    # Each row is about 12 bytes: an int (8) and "rowN" (4)
+    chunks = list(DatabaseConnector.stream_query("SELECT * FROM t", chunk_size=2, max_bytes=30))
+
+    assert [row for chunk in chunks for row in chunk.rows] == ROWS[:2]
+    assert chunks[-1].truncated
+    conn.close.assert_called_once()
+
+
+@patch("src.database.db_connector.pymysql")
+def test_execute_bounded_injects_limit_and_flags_truncation(mock_pymysql):
+    _, cursor = _streaming_connection(mock_pymysql, ROWS[:4])
+
+    rows, truncated = DatabaseConnector.execute_bounded("SELECT * FROM t", row_limit=3)
+
+    cursor.execute.assert_called_once_with("SELECT * FROM t LIMIT 4")
+    assert rows == ROWS[:3]
+    assert truncated
+
+
+@patch("src.database.db_connector.pymysql")
+def test_execute_bounded_hard_row_ceiling(mock_pymysql, monkeypatch):
+    monkeypatch.setattr(config.DB_CONFIG, "result_max_rows", 3)
+    _, cursor = _streaming_connection(mock_pymysql, ROWS)
+
+    rows, truncated = DatabaseConnector.execute_bounded("SHOW TABLES")
+
+    cursor.execute.assert_called_once_with("SHOW TABLES")
+    assert rows == ROWS[:3]
+    assert truncated
+
+
+@patch("src.database.db_connector.pymysql")
+def test_stream_query_exact_row_cap_is_not_truncated(mock_pymysql):
+    _streaming_connection(mock_pymysql, ROWS)
+
+    chunks = list(DatabaseConnector.stream_query("SELECT * FROM t", max_rows=5))
+
+    assert not chunks[-1].truncated
+
+
+@patch("src.database.db_connector.pymysql")
+def test_stream_query_closed_early_discards_connection(mock_pymysql):
+    conn, _ = _streaming_connection(mock_pymysql, ROWS)
+
+    stream = DatabaseConnector.stream_query("SELECT * FROM t", chunk_size=2)
+    next(stream)
+    next(stream)
+    stream.close()
+
+    conn.close.assert_called_once()
+    assert DatabaseConnector.pool_stats()["size"] == 0
+
+
+@patch("src.database.db_connector.pymysql")
+def test_astream_query(mock_pymysql):
+    _streaming_connection(mock_pymysql, ROWS)
+
+    async def scenario():
+        return [chunk async for chunk in DatabaseConnector.astream_query("SELECT * FROM t", 4)]
+
+    chunks = asyncio.run(scenario())
+
+    assert [row for chunk in chunks for row in chunk.rows] == ROWS
+    assert chunks[-1].done
+
+
+@patch("src.database.db_connector.pymysql")
+def test_astream_query_reads_on_stream_executor(mock_pymysql):
+    _, cursor = _streaming_connection(mock_pymysql, ROWS)
+    threads = []
+    cursor.execute.side_effect = lambda sql: threads.append(threading.current_thread().name)
+
+    async def scenario():
+        return [chunk async for chunk in DatabaseConnector.astream_query("SELECT * FROM t")]
+
+    asyncio.run(scenario())
+
+    assert threads[0].startswith("db-stream")
+    assert DatabaseConnector.stream_stats()["open"] == 0
+
+
+@patch("src.database.db_connector.pymysql")
+def test_concurrent_streams_are_capped(mock_pymysql, monkeypatch):
+    monkeypatch.setattr(config.DB_CONFIG, "stream_max_concurrent", 1)
+    _streaming_connection(mock_pymysql, ROWS)
+
+    async def scenario():
+        first = DatabaseConnector.astream_query("SELECT * FROM t", 2)
+        await anext(first)
+        second = DatabaseConnector.astream_query("SELECT * FROM t", 2)
+        with pytest.raises(StreamLimitError):
+            await anext(second)
+        assert DatabaseConnector.stream_stats()["open"] == 1
+        await first.aclose()
+        third = DatabaseConnector.astream_query("SELECT * FROM t", 2)
+        return [chunk async for chunk in third]
+
+    chunks = asyncio.run(scenario())
+
+    assert chunks[-1].done
+    assert DatabaseConnector.stream_stats()["open"] == 0
+    assert DatabaseConnector.stream_stats()["rejected"] >= 1
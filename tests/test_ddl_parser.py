@@ -0,0 +1,69 @@
+"""Tests for the CREATE TABLE parser."""
+
+import config
+from src.models.sql_grammar import extract_schema_identifiers
+from src.schema.ddl_parser import format_schema, parse_ddl
+
+SCHEMA = """
+CREATE TABLE orders (
+  id char(32) CHARACTER SET utf8mb4 NOT NULL DEFAULT 'UUID()' COMMENT '主鍵, UUID',
+  `amount` decimal(20,10) unsigned DEFAULT NULL COMMENT 'it''s the total',
+  name varchar(100) DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY unique_01 (`name`(20),`amount`),
+  KEY idx_amount (`amount`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='訂單';
+"""
+
+
+def test_parse_columns_and_keys():
+    (table,) = parse_ddl(SCHEMA)
+
+    assert table.name == "orders"
+    assert table.comment == "訂單"
+    assert [column.name for column in table.columns] == ["id", "amount", "name"]
+    assert table.primary_key == ("id",)
+    assert table.unique_keys == {"unique_01": ("name", "amount")}
+
+    identifier, amount, name = table.columns
+    assert identifier.data_type == "char(32)"
+    assert not identifier.nullable
+    assert identifier.default == "'UUID()'"
+    assert identifier.comment == "主鍵, UUID"
+    assert amount.data_type == "decimal(20,10) unsigned"
+    assert amount.comment == "it's the total"
+    assert name.nullable and name.comment == ""
+
+
+def test_to_ddl_drops_storage_options_and_round_trips():
+    (table,) = parse_ddl(SCHEMA)
+    ddl = table.to_ddl()
+
+    assert "CHARACTER SET" not in ddl and "ENGINE" not in ddl and "DEFAULT" not in ddl
+    assert "PRIMARY KEY (id)" in ddl
+    assert "UNIQUE KEY unique_01 (name,amount)" in ddl
+
+    (reparsed,) = parse_ddl(ddl)
+    assert [column.name for column in reparsed.columns] == ["id", "amount", "name"]
+    assert reparsed.primary_key == table.primary_key
+    assert reparsed.unique_keys == table.unique_keys
+    assert reparsed.columns[1].comment == "it's the total"
+
+
+def test_select_columns_keeps_only_complete_keys():
+    (table,) = parse_ddl(SCHEMA)
+
+    pruned = table.select_columns({"id", "amount"})
+
+    assert [column.name for column in pruned.columns] == ["id", "amount"]
+    assert pruned.primary_key == ("id",)
+    assert pruned.unique_keys == {}
+
+
+def test_full_schema_is_parsed_and_compacted():
+    tables = parse_ddl(config.FULL_SCHEMA)
+
+    assert [table.name for table in tables] == ["tencent_bill", "global_bill", "global_bill_l3"]
+    compact = format_schema(tables)
+    assert len(compact) < len(config.FULL_SCHEMA)
+    assert extract_schema_identifiers(compact) == extract_schema_identifiers(config.FULL_SCHEMA)
@@ -0,0 +1,34 @@
+"""Tests for the local text embedders."""
+
+import numpy as np
+import pytest
+
+from src.utils import embeddings
+from src.utils.embeddings import HashingEmbedder, create_embedder
+
+
+def test_hashing_embedder_returns_normalized_vectors():
+    vectors = HashingEmbedder(dimensions=256).encode(["total cost", "", "區域"])
+
+    assert vectors.shape == (3, 256)
+    np.testing.assert_allclose(np.linalg.norm(vectors[[0, 2]], axis=1), 1.0, rtol=1e-5)
+    assert not vectors[1].any()
+
+
+def test_hashing_embedder_ranks_surface_similarity():
+    vectors = HashingEmbedder().encode(["total_cost", "sum of the total cost", "region"])
+
+    assert vectors[1] @ vectors[0] > vectors[1] @ vectors[2]
+
+
+def test_create_embedder():
+    assert create_embedder("") is None
+    assert create_embedder("none") is None
+    assert isinstance(create_embedder("hashing"), HashingEmbedder)
+
+
+def test_sentence_transformer_requires_dependency(monkeypatch):
+    monkeypatch.setattr(embeddings, "SENTENCE_TRANSFORMERS_AVAILABLE", False)
+
+    with pytest.raises(ImportError, match="sentence-transformers"):
+        create_embedder("some/model")
@@ -0,0 +1,73 @@
+"""Tests for async execution helpers and the async model interface."""
+
+import asyncio
+import time
+
+from src.interfaces.language_model import ILanguageModel
+from src.utils.executors import get_db_executor, get_model_executor, run_in_executor
+
+
+class SlowModel(ILanguageModel):
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+
+    def generate(self, prompt: str, max_tokens: int = 512) -> str:
+        time.sleep(self.delay)
+        return f"{prompt}:{max_tokens}"
+
+    def initialize(self) -> None:
+        pass
+
+    def is_initialized(self) -> bool:
+        return True
+
+
+class SlowStreamingModel(SlowModel):
+    def generate_stream(self, prompt: str, max_tokens: int = 512):
+        for token in ["SELECT", " 1", ";"]:
+            time.sleep(self.delay / 3)
+            yield token
+
+
+async def count_ticks(until: asyncio.Task) -> int:
+    ticks = 0
+    while not until.done():
+        await asyncio.sleep(0.01)
+        ticks += 1
+    return ticks
+
+
+def test_executors_are_shared_and_bounded():
+    assert get_model_executor() is get_model_executor()
+    assert get_db_executor() is not get_model_executor()
+
+
+def test_run_in_executor_passes_arguments():
+    result = asyncio.run(run_in_executor(get_db_executor(), lambda a, b=0: a + b, 1, b=2))
+    assert result == 3
+
+
+def test_agenerate_does_not_block_event_loop():
+    async def scenario():
+        task = asyncio.create_task(SlowModel().agenerate("q", 64))
+        ticks = await count_ticks(task)
+        return task.result(), ticks
+
+    result, ticks = asyncio.run(scenario())
+
+    assert result == "q:64"
+    assert ticks >= 5
+
+
+def test_agenerate_stream_yields_tokens():
+    async def scenario():
+        return [token async for token in SlowStreamingModel(delay=0.03).agenerate_stream("q")]
+
+    assert asyncio.run(scenario()) == ["SELECT", " 1", ";"]
+
+
+def test_agenerate_stream_falls_back_to_generate():
+    async def scenario():
+        return [token async for token in SlowModel(delay=0).agenerate_stream("q", 8)]
+
+    assert asyncio.run(scenario()) == ["q:8"]
@@ -0,0 +1,207 @@
+"""Tests for the hedged multi-provider fallback model."""
+
+import asyncio
+
+import pytest
+
+from src.interfaces.language_model import ILanguageModel
+from src.models.fallback_model import HedgedFallbackModel, LatencyHistogram, parse_chain
+from src.models.model_factory import create_model
+from src.models.model_registry import ModelRegistry
+
+
+class FakeProvider(ILanguageModel):
+    """Streams ``tokens`` after ``delay`` seconds, or raises ``error``."""
+
+    def __init__(self, tokens=("SELECT", " 1"), delay=0.0, error=None):
+        self.tokens = tokens
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+        self.temperatures = []
+
+    def generate(self, prompt, max_tokens=512, temperature=None):
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, max_tokens=None, temperature=None):
+        self.temperatures.append(temperature)
+        return "".join([token async for token in self.agenerate_stream(prompt, max_tokens)])
+
+    async def agenerate_stream(self, prompt, max_tokens=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            for token in self.tokens:
+                yield token
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    def initialize(self):
+        pass
+
+    def is_initialized(self):
+        return True
+
+
+def build(*providers, **kwargs):
+    models = dict(zip(["p1", "p2", "p3"], providers, strict=False))
+    kwargs.setdefault("hedge_default_delay", 0.05)
+    model = HedgedFallbackModel(
+        chain=[(name, None) for name in models],
+        factory=lambda provider, model_id: models[provider],
+        **kwargs,
+    )
+    model.initialize()
+    return model
+
+
+def test_histogram_percentiles_and_aging():
+    histogram = LatencyHistogram(max_samples=100)
+    assert histogram.percentile(95) is None
+
+    for _ in range(90):
+        histogram.observe(0.1)
+    for _ in range(9):
+        histogram.observe(2.0)
+
+    assert 0.1 <= histogram.percentile(50) < 0.13
+    assert 2.0 <= histogram.percentile(95) < 2.5
+    histogram.observe(2.0)
+    assert histogram.count == 50
+
+
+def test_parse_chain():
+    assert parse_chain("genai > bedrock:us.anthropic.claude-v1:0>local") == [
+        ("genai", None),
+        ("bedrock", "us.anthropic.claude-v1:0"),
+        ("local", None),
+    ]
+
+
+def test_fast_primary_is_not_hedged():
+    primary, secondary = FakeProvider(), FakeProvider(tokens=("other",))
+    model = build(primary, secondary)
+
+    assert asyncio.run(model.agenerate("q")) == "SELECT 1"
+    assert secondary.calls == 0
+    assert model.runtime_stats()["providers"]["p1"]["wins"] == 1
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary = FakeProvider(tokens=("slow",), delay=1.0)
+    secondary = FakeProvider(tokens=("fast",))
+    model = build(primary, secondary)
+
+    assert asyncio.run(model.agenerate("q")) == "fast"
+    assert primary.cancelled
+    stats = model.runtime_stats()["providers"]
+    assert stats["p1"]["hedges"] == 1
+    assert stats["p2"]["wins"] == 1
+    # The cancelled attempt still counts towards the primary's latency.
+    assert stats["p1"]["first_token_seconds"]["samples"] == 1
+
+
+def test_failure_falls_back_without_waiting_for_deadline():
+    primary = FakeProvider(error=RuntimeError("throttled"))
+    secondary = FakeProvider(tokens=("ok",))
+    model = build(primary, secondary, hedge_default_delay=10)
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await model.agenerate("q")
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(timed())
+    assert result == "ok"
+    assert elapsed < 1
+    assert model.runtime_stats()["providers"]["p1"]["errors"] == 1
+
+
+def test_all_providers_failing_raises():
+    model = build(
+        FakeProvider(error=RuntimeError("throttled")), FakeProvider(error=RuntimeError("down"))
+    )
+
+    with pytest.raises(RuntimeError, match="p1: throttled; p2: down"):
+        asyncio.run(model.agenerate("q"))
+
+
+def test_hedge_delay_follows_latency_percentile():
+    primary = FakeProvider()
+    model = build(primary, FakeProvider(), hedge_min_samples=5, hedge_percentile=90)
+    state = model.providers[0]
+
+    assert model.hedge_delay(state) == 0.05
+    for _ in range(5):
+        state.first_token.observe(0.5)
+    assert 0.5 <= model.hedge_delay(state) < 0.63
+
+
+def test_stream_commits_to_first_provider_with_a_token():
+    primary = FakeProvider(tokens=("slow",), delay=1.0)
+    secondary = FakeProvider(tokens=("SELECT", " 2"))
+    model = build(primary, secondary)
+
+    async def collect():
+        return [token async for token in model.agenerate_stream("q")]
+
+    assert asyncio.run(collect()) == ["SELECT", " 2"]
+    assert primary.cancelled
+
+
+def test_temperature_is_passed_to_providers():
+    primary = FakeProvider()
+    model = build(primary)
+
+    asyncio.run(model.agenerate("q", temperature=0.7))
+
+    assert primary.temperatures == [0.7]
+
+
+def test_unavailable_providers_are_skipped():
+    def factory(provider, model_id):
+        if provider == "genai":
+            msg = "Google API key is required"
+            raise ValueError(msg)
+        return FakeProvider()
+
+    model = HedgedFallbackModel(chain="genai>local", factory=factory)
+    model.initialize()
+
+    assert [state.label for state in model.providers] == ["local"]
+
+
+def test_factory_builds_fallback_model():
+    model = create_model("fallback", "genai>local")
+
+    assert isinstance(model, HedgedFallbackModel)
+    assert model.chain == [("genai", None), ("local", None)]
+    assert not model.is_initialized()
+
+
+def test_providers_are_leased_from_the_registry():
+    built = []
+
+    def factory(provider, model_id):
+        built.append(provider)
+        return FakeProvider()
+
+    registry = ModelRegistry(memory_budget_mb=1024, factory=factory)
+    local = registry.get("local")
+    model = HedgedFallbackModel(chain="genai>local", registry=registry)
+    model.initialize()
+
+    # The chain shares the loaded local model instead of building a second copy.
+    assert model.providers[1].model is local
+    assert built == ["local", "genai"]
+    assert all(entry["active"] == 1 for entry in registry.stats()["models"])
+
+    model.cleanup()
+
+    assert all(entry["active"] == 0 for entry in registry.stats()["models"])
+    assert registry.get("local") is local
@@ -0,0 +1,177 @@
+"""Tests for the generation cache and its use in TextToSQLService."""
+
+import asyncio
+import json
+from unittest.mock import Mock
+
+from src.cache import generation_cache
+from src.cache.generation_cache import GenerationCache, normalize_question
+from src.services.text_to_sql_service import TextToSQLService
+
+SCHEMA = "CREATE TABLE users (\n  id int\n);"
+IDENTITY = {"provider": "local", "model": "m", "temperature": 0.1}
+ANSWER = "```sql\nSELECT * FROM users;\n```"
+CLEAN_SQL = "SELECT *\nFROM users;"
+
+
+def _model():
+    model = Mock()
+    model.is_initialized.return_value = True
+    model.cache_identity.return_value = IDENTITY
+    model.generate.return_value = ANSWER
+    model.generate_stream.return_value = iter(["```sql\nSELECT ", "* FROM users;\n```"])
+    return model
+
+
+def test_normalize_question():
+    assert normalize_question("  統計每個帳期的總成本？ ") == "統計每個帳期的總成本"
+    assert normalize_question("Show  ALL\tusers.") == "show all users"
+    assert normalize_question("ＳＥＬＥＣＴ ２０２５") == "select 2025"
+
+
+def test_key_depends_on_question_schema_and_identity():
+    key = GenerationCache.make_key("List users", SCHEMA, IDENTITY)
+
+    assert key == GenerationCache.make_key("list users?", SCHEMA + "\n", IDENTITY)
+    assert key != GenerationCache.make_key("list orders", SCHEMA, IDENTITY)
+    assert key != GenerationCache.make_key("list users", "CREATE TABLE x (\n  y int\n);", IDENTITY)
+    assert key != GenerationCache.make_key("list users", SCHEMA, {**IDENTITY, "temperature": 0.7})
+
+
+def test_lru_eviction_and_stats():
+    cache = GenerationCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(generation_cache.time, "time", lambda: now[0])
+    cache = GenerationCache(ttl_seconds=10)
+    cache.put("a", "1")
+
+    now[0] += 5
+    assert cache.get("a") == "1"
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    GenerationCache(disk_dir=tmp_path).put("ab12", "value")
+
+    cache = GenerationCache(disk_dir=tmp_path)
+    assert cache.get("ab12") == "value"
+    assert cache.get("ab12") == "value"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_malformed_disk_entry_is_a_miss(tmp_path):
+    cache = GenerationCache(disk_dir=tmp_path)
+    entries = {
+        "ab01": '{"value": "SELECT 1"}',  # old format without "created"
+        "ab02": '{"value": "SELECT 1", "created": null}',
+        "ab03": '["SELECT 1"]',
+        "ab04": '{"value": "SELE',  # truncated
+    }
+    for key, text in entries.items():
+        path = tmp_path / key[:2] / f"{key}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+
+    for key in entries:
+        assert cache.get(key) is None
+        assert not (tmp_path / key[:2] / f"{key}.json").exists()
+    assert cache.stats()["misses"] == len(entries)
+
+
+def test_disk_tier_evicts_oldest(tmp_path):
+    cache = GenerationCache(disk_dir=tmp_path, max_disk_entries=10)
+    for i in range(11):
+        cache.put(f"{i:04d}", str(i))
+
+    files = sorted(path.stem for path in tmp_path.glob("*/*.json"))
+    assert len(files) == 9
+    assert "0000" not in files and "0010" in files
+    assert json.loads((tmp_path / "00" / "0010.json").read_text())["value"] == "10"
+
+
+def test_convert_reuses_cached_output():
+    model = _model()
+    service = TextToSQLService(model, generation_cache=GenerationCache())
+
+    first = service.convert(SCHEMA, "List users")
+    second = service.convert(SCHEMA, "list users?")
+
+    assert first == second == CLEAN_SQL
+    model.generate.assert_called_once()
+
+
+def test_unusable_output_is_not_cached():
+    model = _model()
+    model.generate.return_value = ""
+    service = TextToSQLService(model, generation_cache=GenerationCache())
+
+    service.convert(SCHEMA, "list users")
+    service.convert(SCHEMA, "list users")
+
+    assert model.generate.call_count == 2
+
+
+def test_stream_is_cached_and_replayed():
+    model = _model()
+    cache = GenerationCache()
+    service = TextToSQLService(model, generation_cache=cache)
+
+    assert list(service.convert_stream(SCHEMA, "list users")) == [
+        "```sql\nSELECT ",
+        "* FROM users;\n```",
+    ]
+    assert list(service.convert_stream(SCHEMA, "list users")) == [ANSWER]
+    assert service.convert(SCHEMA, "list users") == CLEAN_SQL
+    model.generate_stream.assert_called_once()
+    model.generate.assert_not_called()
+
+
+def test_stream_closed_early_is_not_cached():
+    model = _model()
+    service = TextToSQLService(model, generation_cache=GenerationCache())
+
+    stream = service.convert_stream(SCHEMA, "list users")
+    next(stream)
+    stream.close()
+
+    assert service.convert(SCHEMA, "list users") == CLEAN_SQL
+    model.generate.assert_called_once()
+
+
+def test_async_paths_share_the_cache():
+    model = _model()
+
+    async def agenerate_stream(prompt, max_tokens):
+        for token in ["```sql\nSELECT ", "* FROM users;\n```"]:
+            yield token
+
+    model.agenerate_stream = agenerate_stream
+    service = TextToSQLService(model, generation_cache=GenerationCache())
+
+    async def run():
+        tokens = [token async for token in service.aconvert_stream(SCHEMA, "list users")]
+        sql = await service.aconvert(SCHEMA, "list users")
+        return tokens, sql
+
+    tokens, sql = asyncio.run(run())
+
+    assert "".join(tokens) == ANSWER
+    assert sql == CLEAN_SQL
@@ -0,0 +1,63 @@
+"""Tests for building tables from information_schema rows."""
+
+from src.schema.introspection import tables_from_information_schema
+from src.schema.serializer import serialize_schema
+
+
+def test_tables_from_information_schema():
+    table_rows = [
+        {"table_name": "orders", "table_comment": "訂單"},
+        {"table_name": "users", "table_comment": ""},
+    ]
+    column_rows = [
+        {
+            "table_name": "orders",
+            "column_name": "id",
+            "column_type": "char(32)",
+            "is_nullable": "NO",
+            "column_default": None,
+            "column_comment": "主鍵",
+        },
+        {
+            "table_name": "orders",
+            "column_name": "amount",
+            "column_type": "decimal(20,10)",
+            "is_nullable": "YES",
+            "column_default": 0,
+            "column_comment": "",
+        },
+        {
+            "table_name": "users",
+            "column_name": "email",
+            "column_type": "varchar(100)",
+            "is_nullable": "NO",
+            "column_default": None,
+            "column_comment": None,
+        },
+        {
+            "table_name": "some_view",
+            "column_name": "x",
+            "column_type": "int",
+            "is_nullable": "YES",
+            "column_default": None,
+            "column_comment": "",
+        },
+    ]
+    key_rows = [
+        {"table_name": "orders", "index_name": "PRIMARY", "column_name": "id"},
+        {"table_name": "users", "index_name": "uk_email", "column_name": "email"},
+    ]
+
+    orders, users = tables_from_information_schema(table_rows, column_rows, key_rows)
+
+    assert orders.comment == "訂單"
+    assert [(c.name, c.nullable, c.default) for c in orders.columns] == [
+        ("id", False, None),
+        ("amount", True, "0"),
+    ]
+    assert orders.primary_key == ("id",)
+    assert users.unique_keys == {"uk_email": ("email",)}
+    assert users.columns[0].comment == ""
+    assert serialize_schema([orders], "compact") == (
+        "orders(id char(32) NOT NULL '主鍵', amount decimal(20,10), PK(id)) '訂單'"
+    )
@@ -2,7 +2,10 @@
 
 from unittest.mock import MagicMock, patch
 
-from src.models.huggingface_model import HuggingFaceModel
+import torch
+
+from src.models.batch_scheduler import GenerationRequest
+from src.models.huggingface_model import HuggingFaceModel, RequestStoppingCriteria
 
 
 def test_model_initialization():
@@ -15,15 +18,12 @@ def test_model_initialization():
 
 @patch("src.models.huggingface_model.AutoTokenizer")
 @patch("src.models.huggingface_model.AutoModelForCausalLM")
-@patch("src.models.huggingface_model.pipeline")
-def test_initialize_loads_model(mock_pipeline, mock_model_cls, mock_tokenizer_cls):
+def test_initialize_loads_model(mock_model_cls, mock_tokenizer_cls):
     mock_tokenizer = MagicMock()
     mock_model = MagicMock()
-    mock_pipe = MagicMock()
 
     mock_tokenizer_cls.from_pretrained.return_value = mock_tokenizer
     mock_model_cls.from_pretrained.return_value = mock_model
-    mock_pipeline.return_value = mock_pipe
 
     model = HuggingFaceModel(model_name="test-model")
     model.initialize()
@@ -35,24 +35,34 @@ def test_initialize_loads_model(mock_pipeline, mock_model_cls, mock_tokenizer_cl
 
 @patch("src.models.huggingface_model.AutoTokenizer")
 @patch("src.models.huggingface_model.AutoModelForCausalLM")
-@patch("src.models.huggingface_model.pipeline")
-def test_generate_text(mock_pipeline, mock_model_cls, mock_tokenizer_cls):
-    mock_pipe = MagicMock()
-    mock_pipe.return_value = [
-        {
-            "generated_text": [
-                {"role": "user"},
-                {"role": "assistant", "content": "SELECT * FROM users;"},
-            ]
-        }
-    ]
-
-    mock_pipeline.return_value = mock_pipe
-    mock_tokenizer_cls.from_pretrained.return_value = MagicMock()
-    mock_model_cls.from_pretrained.return_value = MagicMock()
+def test_generate_text(mock_model_cls, mock_tokenizer_cls):
+    mock_tokenizer = MagicMock()
+    mock_tokenizer.apply_chat_template.return_value = "<test prompt>"
+    mock_tokenizer.return_value = {"input_ids": [1, 2, 3]}
+    mock_tokenizer.decode.return_value = "SELECT * FROM users;"
+    mock_tokenizer.pad_token_id = 0
+    mock_model = MagicMock()
+    mock_model.device = "cpu"
+    mock_model.generate.return_value = torch.tensor([[1, 2, 3, 4, 5]])
+
+    mock_tokenizer_cls.from_pretrained.return_value = mock_tokenizer
+    mock_model_cls.from_pretrained.return_value = mock_model
 
     model = HuggingFaceModel()
     result = model.generate("test prompt")
 
     assert result == "SELECT * FROM users;"
-    assert mock_pipe.called
+    assert mock_model.generate.called
+    generated_ids = mock_tokenizer.decode.call_args.args[0]
+    assert generated_ids.tolist() == [4, 5]
+
+
+def test_request_stopping_criteria_is_per_row():
+    short = GenerationRequest(prompt="a", max_tokens=2)
+    long = GenerationRequest(prompt="b", max_tokens=10)
+    cancelled = GenerationRequest(prompt="c", max_tokens=10)
+    cancelled.cancel()
+    criteria = RequestStoppingCriteria([short, long, cancelled], prompt_length=3)
+
+    assert criteria(torch.zeros((3, 4), dtype=torch.long), None).tolist() == [False, False, True]
+    assert criteria(torch.zeros((3, 5), dtype=torch.long), None).tolist() == [True, False, True]
@@ -0,0 +1,114 @@
+"""Tests for the process-wide model registry."""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+from src.models.model_registry import ModelRegistry
+
+
+def make_factory(memory_bytes: int = 0, load_delay: float = 0.0):
+    created = []
+
+    def factory(provider, model_id, **kwargs):
+        model = MagicMock()
+        model.is_initialized.return_value = False
+        model.model.parameters.return_value = [
+            MagicMock(
+                **{
+                    "numel.return_value": memory_bytes,
+                    "element_size.return_value": 1,
+                }
+            )
+        ]
+        if load_delay:
+            model.initialize.side_effect = lambda: time.sleep(load_delay)
+        created.append((provider, model_id, kwargs, model))
+        return model
+
+    return factory, created
+
+
+def test_get_reuses_initialized_model():
+    factory, created = make_factory()
+    registry = ModelRegistry(factory=factory)
+
+    first = registry.get("local", "test-model")
+    second = registry.get("local", "test-model")
+
+    assert first is second
+    assert len(created) == 1
+    first.initialize.assert_called_once()
+    assert registry.hits == 1
+    assert registry.misses == 1
+
+
+def test_sampling_params_are_part_of_key():
+    factory, created = make_factory()
+    registry = ModelRegistry(factory=factory)
+
+    registry.get("local", "test-model", temperature=0.1)
+    registry.get("local", "test-model", temperature=0.7)
+
+    assert len(created) == 2
+    assert created[1][2] == {"temperature": 0.7}
+
+
+def test_default_model_id_shares_key():
+    assert ModelRegistry.make_key("bedrock", None) == ModelRegistry.make_key(
+        "bedrock", ModelRegistry.make_key("bedrock")[1]
+    )
+
+
+def test_concurrent_requests_load_once():
+    factory, created = make_factory(load_delay=0.05)
+    registry = ModelRegistry(factory=factory)
+    results = []
+
+    def worker():
+        results.append(registry.get("local", "test-model"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(model is results[0] for model in results)
+
+
+def test_lru_eviction_over_budget():
+    mb = 1024 * 1024
+    factory, created = make_factory(memory_bytes=60 * mb)
+    registry = ModelRegistry(memory_budget_mb=100, factory=factory)
+
+    first = registry.get("local", "model-a")
+    registry.get("local", "model-b")
+
+    assert registry.evictions == 1
+    first.cleanup.assert_called_once()
+    assert [m["model_id"] for m in registry.stats()["models"]] == ["model-b"]
+
+
+def test_leased_model_is_not_evicted():
+    mb = 1024 * 1024
+    factory, _ = make_factory(memory_bytes=60 * mb)
+    registry = ModelRegistry(memory_budget_mb=100, factory=factory)
+
+    with registry.lease("local", "model-a") as leased:
+        registry.get("local", "model-b")
+        leased.cleanup.assert_not_called()
+        assert registry.stats()["models"][0]["active"] == 1
+
+    assert registry.evict("local", "model-a") is True
+
+
+def test_preload_parses_specs():
+    factory, created = make_factory()
+    registry = ModelRegistry(factory=factory)
+
+    registry.preload(["local", "bedrock:us.anthropic.claude-sonnet-4-20250514-v1:0"])
+
+    assert created[0][:2] == ("local", ModelRegistry.make_key("local")[1])
+    assert created[1][:2] == ("bedrock", "us.anthropic.claude-sonnet-4-20250514-v1:0")
@@ -0,0 +1,69 @@
+"""Tests for prefix KV caching in the local model."""
+
+import torch
+
+import config
+from src.models.prefix_cache import PrefixKVCache
+from src.prompts.text_to_sql_prompt import TextToSQLPrompt
+
+
+def test_cache_returns_copies_and_counts_hits():
+    cache = PrefixKVCache(max_entries=2)
+    key = PrefixKVCache.make_key("model", [1, 2, 3])
+
+    first = cache.get_or_compute(key, lambda: {"kv": [1]})
+    first["kv"].append(2)
+    second = cache.get_or_compute(key, lambda: {"kv": [99]})
+
+    assert second == {"kv": [1]}
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PrefixKVCache(max_entries=1)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+
+    assert cache.get_or_compute("a", lambda: 3) == 3
+    assert cache.stats()["misses"] == 3
+
+
+def test_key_changes_with_prefix_tokens():
+    assert PrefixKVCache.make_key("m", [1, 2]) != PrefixKVCache.make_key("m", [1, 2, 3])
+    assert PrefixKVCache.make_key("m", [1, 2]) != PrefixKVCache.make_key("n", [1, 2])
+
+
+def test_cached_prefix_matches_full_prefill(build_tiny_model):
+    cached = build_tiny_model(use_prefix_cache=True)
+    uncached = build_tiny_model(use_prefix_cache=False)
+    uncached.model = cached.model
+    prompt = TextToSQLPrompt.build_prompt(config.FULL_SCHEMA, "查詢")
+
+    outputs = []
+    for model in (cached, uncached):
+        torch.manual_seed(42)
+        outputs.append(model.generate(prompt, max_tokens=8))
+
+    assert outputs[0] == outputs[1]
+    assert cached.cache_stats()["misses"] == 1
+
+
+def test_retry_prompt_reuses_prefix(build_tiny_model):
+    model = build_tiny_model(use_prefix_cache=True)
+    history = [{"attempt": 1, "sql": "SELECT 1", "error": "Unknown column"}]
+
+    model.generate(TextToSQLPrompt.build_prompt(config.FULL_SCHEMA, "查詢"), max_tokens=4)
+    model.generate(
+        TextToSQLPrompt.build_retry_prompt(config.FULL_SCHEMA, "查詢", history), max_tokens=4
+    )
+
+    assert model.cache_stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_schema_change_invalidates_prefix(build_tiny_model):
+    model = build_tiny_model(use_prefix_cache=True)
+
+    model.generate(TextToSQLPrompt.build_prompt(config.TENCENT_BILL_SCHEMA, "查詢"), 4)
+    model.generate(TextToSQLPrompt.build_prompt(config.GLOBAL_BILL_SCHEMA, "查詢"), 4)
+
+    assert model.cache_stats()["misses"] == 2
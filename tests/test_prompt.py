@@ -37,3 +37,23 @@ def test_get_template():
 
     assert "{schema}" in template
     assert "{user_query}" in template
+
+
+def test_split_cacheable_prefix_is_shared_by_retry_prompt():
+    schema = "CREATE TABLE test (id INT);"
+    history = [{"attempt": 1, "sql": "SELECT 1", "error": "boom"}]
+
+    prefix, rest = TextToSQLPrompt.split_cacheable_prefix(
+        TextToSQLPrompt.build_prompt(schema, "test query")
+    )
+    retry_prefix, retry_rest = TextToSQLPrompt.split_cacheable_prefix(
+        TextToSQLPrompt.build_retry_prompt(schema, "test query", history)
+    )
+
+    assert prefix == retry_prefix
+    assert prefix.endswith(schema)
+    assert "test query" in rest and "test query" in retry_rest
+
+
+def test_split_cacheable_prefix_without_markers():
+    assert TextToSQLPrompt.split_cacheable_prefix("plain prompt") == ("", "plain prompt")
@@ -0,0 +1,122 @@
+"""Tests for provider rate limiting and concurrency limits."""
+
+import threading
+import time
+
+import pytest
+
+from src.models.rate_limiter import (
+    FairSemaphore,
+    ProviderRateLimiter,
+    SQLiteTokenBucket,
+    TokenBucket,
+    estimate_tokens,
+)
+
+
+def test_bucket_allows_burst_then_spaces_callers():
+    bucket = TokenBucket(per_minute=60)  # one per second, burst of 60
+
+    assert bucket.reserve(60) == 0.0
+    first = bucket.reserve(1)
+    second = bucket.reserve(1)
+
+    assert first == pytest.approx(1.0, abs=0.05)
+    assert second == pytest.approx(2.0, abs=0.05)
+
+
+def test_oversized_request_is_charged_a_full_bucket():
+    bucket = TokenBucket(per_minute=600)
+
+    assert bucket.reserve(10_000) == 0.0
+    assert bucket.reserve(600) == pytest.approx(60.0, abs=0.1)
+
+
+def test_sqlite_bucket_is_shared(tmp_path):
+    path = str(tmp_path / "buckets.db")
+    worker_a = SQLiteTokenBucket(path, "genai:requests", per_minute=60)
+    worker_b = SQLiteTokenBucket(path, "genai:requests", per_minute=60)
+    other = SQLiteTokenBucket(path, "bedrock:requests", per_minute=60)
+
+    assert worker_a.reserve(60) == 0.0
+    assert worker_b.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert other.reserve(1) == 0.0
+
+
+def test_fair_semaphore_serves_waiters_in_order():
+    semaphore = FairSemaphore(1)
+    semaphore.acquire()
+    order = []
+
+    def worker(index):
+        semaphore.acquire()
+        order.append(index)
+        semaphore.release()
+
+    threads = []
+    for index in range(4):
+        thread = threading.Thread(target=worker, args=(index,))
+        thread.start()
+        threads.append(thread)
+        while semaphore.queued <= index:
+            time.sleep(0.001)
+
+    semaphore.release()
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2, 3]
+    assert semaphore.in_flight == 0
+
+
+def test_limiter_bounds_in_flight_and_reports_waits():
+    limiter = ProviderRateLimiter("test", max_in_flight=2)
+    lock = threading.Lock()
+    active = peak = 0
+
+    def worker():
+        nonlocal active, peak
+        with limiter.acquire():
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = limiter.stats()
+    assert peak == 2
+    assert stats["acquired"] == 6
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
+    assert stats["max_wait_seconds"] >= 0.02
+
+
+def test_limiter_waits_for_request_budget():
+    limiter = ProviderRateLimiter("test", requests_per_minute=1200)  # 20 per second
+    limiter.requests.reserve(1200)
+
+    started = time.monotonic()
+    with limiter.acquire():
+        pass
+
+    assert time.monotonic() - started >= 0.04
+
+
+def test_limiter_releases_slot_on_error():
+    limiter = ProviderRateLimiter("test", max_in_flight=1)
+
+    with pytest.raises(RuntimeError), limiter.acquire():
+        raise RuntimeError("boom")
+
+    assert limiter.semaphore.in_flight == 0
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("x" * 400, 512) == 612
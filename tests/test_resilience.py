@@ -0,0 +1,214 @@
+"""Tests for provider retries, deadlines and circuit breakers."""
+
+import time
+
+import pytest
+
+import config
+from src.models.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Resilience,
+    RetryPolicy,
+    is_transient,
+)
+
+
+class ThrottlingError(Exception):
+    """Mimics botocore's ClientError for a throttled request."""
+
+    def __init__(self):
+        super().__init__("Rate exceeded")
+        self.response = {
+            "Error": {"Code": "ThrottlingException"},
+            "ResponseMetadata": {"HTTPStatusCode": 400},
+        }
+
+
+class APIError(Exception):
+    """Mimics google-genai's APIError."""
+
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def flaky(failures, error_factory=ThrottlingError, result="ok"):
+    """Return a function failing ``failures`` times before returning ``result``."""
+    calls = []
+    timeouts = []
+
+    def func(timeout):
+        calls.append(time.monotonic())
+        timeouts.append(timeout)
+        if len(calls) <= failures:
+            raise error_factory()
+        return result
+
+    func.calls = calls
+    func.timeouts = timeouts
+    return func
+
+
+def build(max_attempts=3, threshold=5, reset_timeout=30.0, timeout=10.0):
+    policy = RetryPolicy(max_attempts=max_attempts, initial_delay=0.001, max_delay=0.01)
+    breaker = CircuitBreaker("test", failure_threshold=threshold, reset_timeout=reset_timeout)
+    return Resilience("test", policy=policy, breaker=breaker, timeout=timeout)
+
+
+def test_is_transient():
+    assert is_transient(ThrottlingError())
+    assert is_transient(APIError(503))
+    assert is_transient(TimeoutError())
+    assert not is_transient(APIError(400))
+    assert not is_transient(ValueError("bad prompt"))
+
+    try:
+        try:
+            raise ThrottlingError()
+        except ThrottlingError as e:
+            msg = "Bedrock API 調用失敗"
+            raise RuntimeError(msg) from e
+    except RuntimeError as wrapped:
+        assert is_transient(wrapped)
+
+
+def test_delay_is_capped_and_jittered():
+    policy = RetryPolicy(initial_delay=1.0, max_delay=4.0, jitter=False)
+    assert [policy.delay(n) for n in (1, 2, 3, 4)] == [1.0, 2.0, 4.0, 4.0]
+
+    policy.jitter = True
+    assert all(0 <= policy.delay(5) <= 4.0 for _ in range(50))
+
+
+def test_transient_errors_are_retried():
+    resilience = build()
+    func = flaky(2)
+
+    assert resilience.call(func) == "ok"
+    assert len(func.calls) == 3
+    assert resilience.breaker.state == "closed"
+
+
+def test_retries_are_bounded():
+    resilience = build(max_attempts=2)
+    func = flaky(5)
+
+    with pytest.raises(ThrottlingError):
+        resilience.call(func)
+    assert len(func.calls) == 2
+
+
+def test_client_errors_are_not_retried():
+    resilience = build()
+    func = flaky(1, lambda: APIError(400))
+
+    with pytest.raises(APIError):
+        resilience.call(func)
+    assert len(func.calls) == 1
+    assert resilience.breaker.stats()["consecutive_failures"] == 0
+
+
+def test_deadline_stops_retries():
+    resilience = build(max_attempts=10, timeout=0.05)
+    resilience.policy = RetryPolicy(max_attempts=10, initial_delay=0.1, jitter=False)
+    func = flaky(5)
+
+    with pytest.raises(ThrottlingError):
+        resilience.call(func)
+    assert len(func.calls) == 1
+
+
+def test_attempt_timeout_ends_by_deadline(monkeypatch):
+    monkeypatch.setattr(config, "REQUEST_TIMEOUT", 30)
+    resilience = build(timeout=10.0)
+    func = flaky(2)
+
+    resilience.call(func)
+
+    assert all(timeout <= 10.0 for timeout in func.timeouts)
+    assert func.timeouts == sorted(func.timeouts, reverse=True)
+
+    resilience = build(timeout=60.0)
+    func = flaky(0)
+    resilience.call(func)
+    assert func.timeouts == [30]
+
+
+def test_breaker_opens_and_fails_fast():
+    resilience = build(max_attempts=1, threshold=2)
+    func = flaky(10)
+
+    for _ in range(2):
+        with pytest.raises(ThrottlingError):
+            resilience.call(func)
+    with pytest.raises(CircuitOpenError, match="circuit open"):
+        resilience.call(func)
+
+    assert len(func.calls) == 2
+    stats = resilience.breaker.stats()
+    assert stats["state"] == "open"
+    assert stats["opened"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_half_open_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.02)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.03)
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(0.03)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_stream_is_retried_before_first_item():
+    resilience = build()
+    opened = []
+
+    def factory(timeout):
+        opened.append(1)
+        if len(opened) == 1:
+            raise ThrottlingError()
+        yield from ["SELECT", " 1"]
+
+    assert list(resilience.stream(factory)) == ["SELECT", " 1"]
+    assert len(opened) == 2
+
+
+def test_stream_is_not_retried_after_first_item():
+    resilience = build()
+    opened = []
+
+    def factory(timeout):
+        opened.append(1)
+        yield "SELECT"
+        raise ConnectionError("stream reset")
+
+    received = []
+    with pytest.raises(ConnectionError):
+        for item in resilience.stream(factory):
+            received.append(item)
+    assert received == ["SELECT"]
+    assert len(opened) == 1
+
+
+def test_first_streamed_item_closes_circuit():
+    resilience = build(threshold=1, reset_timeout=0.01)
+    resilience.breaker.record_failure()
+    time.sleep(0.02)
+
+    stream = resilience.stream(lambda timeout: iter(["SELECT", " 1"]))
+    assert next(stream) == "SELECT"
+    stream.close()
+    assert resilience.breaker.state == "closed"
@@ -0,0 +1,232 @@
+"""Tests for the query result cache and its use in DatabaseConnector."""
+
+import time
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import config
+from src.cache.result_cache import ResultCache, normalize_sql, referenced_tables, sql_fingerprint
+from src.database.db_connector import DatabaseConnector
+
+SQL = "SELECT bill_month, SUM(cost) AS total FROM tencent_bill GROUP BY bill_month"
+ROWS = [{"bill_month": "2024-01", "total": Decimal("12.50")}]
+
+
+def test_normalize_sql():
+    assert normalize_sql("select  `cost`\n from t -- note\n;") == "SELECT cost FROM t"
+    assert normalize_sql("SELECT 'a  b' FROM t") == "SELECT 'a  b' FROM t"
+    assert sql_fingerprint("select * from t where x = 'A'") != sql_fingerprint(
+        "select * from t where x = 'a'"
+    )
+
+
+@pytest.mark.parametrize(
+    ("sql", "tables"),
+    [
+        (SQL, ("tencent_bill",)),
+        (
+            "SELECT * FROM db.global_bill g JOIN global_bill_l3 AS l ON g.id = l.id",
+            ("global_bill", "global_bill_l3"),
+        ),
+        (
+            "SELECT * FROM tencent_bill t, global_bill g WHERE t.id = g.id",
+            ("global_bill", "tencent_bill"),
+        ),
+        ("WITH m AS (SELECT * FROM global_bill) SELECT * FROM m", ("global_bill",)),
+        ("SELECT * FROM (SELECT id FROM tencent_bill) sub", ("tencent_bill",)),
+    ],
+)
+def test_referenced_tables(sql, tables):
+    assert referenced_tables(sql) == tables
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 1",
+        "UPDATE tencent_bill SET cost = 0",
+        "SELECT * FROM tencent_bill WHERE created_date > NOW()",
+        "SELECT * FROM tencent_bill WHERE bill_month = CURRENT_DATE",
+        "SELECT * FROM tencent_bill ORDER BY RAND()",
+        "SELECT * FROM tencent_bill FOR UPDATE",
+        "SELECT * FROM tencent_bill; DELETE FROM tencent_bill",
+    ],
+)
+def test_uncacheable_statements(sql):
+    assert referenced_tables(sql) is None
+
+
+def test_put_get_returns_copies():
+    cache = ResultCache()
+
+    assert cache.get(SQL) is None
+    assert cache.put(SQL, ROWS)
+    rows = cache.get("select bill_month, SUM(cost) as total from tencent_bill group by bill_month;")
+    rows[0]["total"] = 0
+
+    assert cache.get(SQL) == ROWS
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["tables"]["tencent_bill"]["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_per_table_ttl_uses_shortest():
+    cache = ResultCache(ttl_seconds=60, table_ttls={"global_bill": 0.01})
+    sql = "SELECT * FROM tencent_bill t JOIN global_bill g ON t.id = g.id"
+    cache.put(SQL, ROWS)
+    cache.put(sql, ROWS)
+
+    time.sleep(0.02)
+
+    assert cache.get(sql) is None
+    assert cache.get(SQL) == ROWS
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResultCache(max_bytes=600, max_entry_bytes=400)
+    rows = [{"value": "x" * 200}]
+    cache.put("SELECT * FROM a", rows)
+    cache.put("SELECT * FROM b", rows)
+    cache.get("SELECT * FROM a")
+    cache.put("SELECT * FROM c", rows)
+
+    assert cache.get("SELECT * FROM b") is None
+    assert cache.get("SELECT * FROM a") == rows
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 600
+    assert not cache.put("SELECT * FROM d", [{"value": "x" * 500}])
+
+
+def test_invalidate_table():
+    cache = ResultCache()
+    cache.put(SQL, ROWS)
+    cache.put("SELECT * FROM global_bill", ROWS)
+
+    assert cache.invalidate_table("tencent_bill") == 1
+    assert cache.get(SQL) is None
+    assert cache.get("SELECT * FROM global_bill") == ROWS
+    assert cache.stats()["tables"]["tencent_bill"]["invalidations"] == 1
+
+
+def test_put_skipped_when_invalidated_while_running():
+    cache = ResultCache()
+    started = cache.clock()
+    cache.invalidate_table("tencent_bill")
+
+    assert not cache.put(SQL, ROWS, started)
+    assert cache.put(SQL, ROWS, cache.clock())
+
+
+def test_watermark_change_invalidates():
+    watermarks = {"tencent_bill": 1}
+    source = MagicMock(side_effect=lambda tables: {t: watermarks[t] for t in tables})
+    cache = ResultCache(watermark_source=source, watermark_interval=0)
+    cache.put(SQL, ROWS)
+
+    assert cache.get(SQL) == ROWS  # the first poll only sets the baseline
+    assert cache.get(SQL) == ROWS
+    watermarks["tencent_bill"] = 2
+    assert cache.get(SQL) is None
+    source.assert_called_with(["tencent_bill"])
+
+
+def test_watermark_poll_respects_interval():
+    source = MagicMock(return_value={"tencent_bill": 1})
+    cache = ResultCache(watermark_source=source, watermark_interval=60)
+
+    assert cache.get(SQL) is None  # the miss records the baseline
+    source.assert_called_once_with(["tencent_bill"])
+    cache.put(SQL, ROWS)
+    cache.refresh_watermarks(["tencent_bill"])
+
+    assert cache.get(SQL) == ROWS
+    assert cache.get(SQL) == ROWS
+    assert source.call_count == 1
+
+
+def test_first_repeat_after_baseline_on_miss_hits():
+    source = MagicMock(return_value={"tencent_bill": 1})
+    cache = ResultCache(watermark_source=source, watermark_interval=0)
+
+    assert cache.get(SQL) is None
+    cache.put(SQL, ROWS, cache.clock())
+
+    assert cache.get(SQL) == ROWS
+    assert source.call_count == 2
+
+
+def test_watermark_failure_invalidates():
+    cache = ResultCache(watermark_source=MagicMock(side_effect=RuntimeError("down")))
+    cache.put(SQL, ROWS)
+
+    assert cache.get(SQL) is None
+
+
+def _mock_connection(mock_pymysql, rows):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = rows
+    pending = []
+
+    def fetchmany(size):
+        batch, pending[:] = pending[:size], pending[size:]
+        return batch
+
+    # Each execute() makes ``rows`` readable again through the unbuffered cursor API.
+    cursor.execute.side_effect = lambda *args: pending.__setitem__(slice(None), rows)
+    cursor.fetchmany.side_effect = fetchmany
+    cursor.__enter__.return_value = cursor
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    mock_pymysql.connect.return_value = conn
+    return cursor
+
+
+@pytest.fixture
+def result_cache(monkeypatch):
+    monkeypatch.setattr(config, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "RESULT_CACHE_WATERMARK_INTERVAL", 0.0)
+    monkeypatch.setattr("src.database.db_connector._result_cache", None)
+    DatabaseConnector.reset_pool()
+    yield
+    DatabaseConnector.reset_pool()
+
+
+@patch("src.database.db_connector.pymysql")
+def test_execute_query_uses_result_cache(mock_pymysql, result_cache):
+    cursor = _mock_connection(mock_pymysql, ROWS)
+
+    assert DatabaseConnector.execute_query(SQL) == ROWS
+    assert DatabaseConnector.execute_query(SQL) == ROWS
+    assert DatabaseConnector.execute_query(SQL, use_cache=False) == ROWS
+
+    assert cursor.execute.call_count == 2
+    assert cursor.execute.call_args.args == (SQL,)
+    assert DatabaseConnector.result_cache_stats()["hits"] == 1
+    assert DatabaseConnector.invalidate_cache("tencent_bill") == 1
+
+
+@patch("src.database.db_connector.pymysql")
+def test_table_watermarks_queries(mock_pymysql, result_cache, monkeypatch):
+    monkeypatch.setattr(config, "RESULT_CACHE_WATERMARK_COLUMNS", {"tencent_bill": "created_date"})
+    cursor = _mock_connection(
+        mock_pymysql,
+        [{"table_name": "tencent_bill", "update_time": "t1"}],
+    )
+    cursor.fetchone.return_value = {"latest": "d1"}
+
+    watermarks = DatabaseConnector.table_watermarks(["tencent_bill", "missing"])
+
+    assert watermarks == {"tencent_bill": ("t1", "d1")}
+    assert cursor.execute.call_args_list[0].args[1] == ("tencent_bill", "missing")
+    cursor.execute.assert_called_with("SELECT MAX(`created_date`) AS latest FROM `tencent_bill`")
+
+
+def test_result_cache_disabled(monkeypatch):
+    monkeypatch.setattr(config, "RESULT_CACHE_ENABLED", False)
+
+    assert DatabaseConnector.get_result_cache() is None
+    assert DatabaseConnector.invalidate_cache() == 0
@@ -0,0 +1,84 @@
+"""Tests for column-wise result serialization."""
+
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from pymysql.constants import FIELD_TYPE
+
+from src.utils import result_serializer
+from src.utils.result_serializer import ResultSerializer, dumps, serialize_rows, to_json_value
+
+
+def _rows():
+    return [
+        {
+            "id": 1,
+            "cost": Decimal("12.3456789012"),
+            "bill_date": date(2024, 1, 31),
+            "created_date": datetime(2024, 2, 1, 8, 30),
+            "note": "備註",
+            "ratio": 0.5,
+        },
+        {
+            "id": 2,
+            "cost": None,
+            "bill_date": None,
+            "created_date": "0000-00-00 00:00:00",  # PyMySQL returns invalid dates as str
+            "note": None,
+            "ratio": None,
+        },
+    ]
+
+
+def test_to_json_value():
+    assert to_json_value(None) is None
+    assert to_json_value(True) is True
+    assert to_json_value(Decimal("1.50")) == "1.50"
+    assert to_json_value(datetime(2024, 1, 1, 12)) == "2024-01-01T12:00:00"
+    assert to_json_value(timedelta(hours=1)) == "1:00:00"
+
+
+def test_serialize_rows_matches_per_value_conversion():
+    expected = [{key: to_json_value(value) for key, value in row.items()} for row in _rows()]
+
+    assert serialize_rows(_rows()) == expected
+
+
+def test_type_is_inferred_from_first_non_null_value():
+    serializer = ResultSerializer(["cost"])
+
+    assert serializer.convert([{"cost": None}]) == [{"cost": None}]
+    assert serializer.convert([{"cost": None}, {"cost": Decimal("2.0")}]) == [
+        {"cost": None},
+        {"cost": "2.0"},
+    ]
+    assert serializer.convert([{"cost": Decimal("3")}]) == [{"cost": "3"}]
+
+
+def test_description_types_are_used_before_any_value():
+    description = [
+        ("cost", FIELD_TYPE.NEWDECIMAL, None, 22, 22, 10, True),
+        ("created_date", FIELD_TYPE.DATETIME, None, 19, 19, 0, True),
+    ]
+    serializer = ResultSerializer(["cost", "created_date"], description)
+
+    assert serializer._plans["cost"][0] is Decimal
+    assert serializer.convert([{"cost": Decimal("1"), "created_date": datetime(2024, 1, 1)}]) == [
+        {"cost": "1", "created_date": "2024-01-01T00:00:00"}
+    ]
+
+
+def test_dumps_is_compact_utf8():
+    payload = {"rows": serialize_rows(_rows())}
+
+    encoded = dumps(payload)
+
+    assert json.loads(encoded) == payload
+    assert "備註".encode() in encoded
+
+
+def test_dumps_without_orjson(monkeypatch):
+    monkeypatch.setattr(result_serializer, "ORJSON_AVAILABLE", False)
+
+    assert dumps({"a": "備註", "b": [1, None]}) == '{"a":"備註","b":[1,null]}'.encode()
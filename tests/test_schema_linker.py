@@ -0,0 +1,109 @@
+"""Tests for question-driven schema pruning."""
+
+from unittest.mock import Mock
+
+import config
+from src.schema.ddl_parser import parse_ddl
+from src.schema.schema_linker import SchemaLinker, tokenize
+from src.services.text_to_sql_service import TextToSQLService
+from src.utils.embeddings import HashingEmbedder
+
+
+def _selected(linker, question):
+    return {
+        table.name: [column.name for column in table.columns]
+        for table in linker.select(config.FULL_SCHEMA, question)
+    }
+
+
+def test_tokenize_splits_identifiers_and_cjk():
+    assert tokenize("VoucherPayAmount used_amount") == [
+        "voucher",
+        "pay",
+        "amount",
+        "used",
+        "amount",
+    ]
+    assert tokenize("各區域") == ["各區", "區域"]
+    assert tokenize("the 量") == ["量"]
+
+
+def test_matches_columns_by_comment_and_keeps_primary_key():
+    selected = _selected(SchemaLinker(), "各區域的用量")
+
+    assert selected == {"global_bill_l3": ["id", "region", "used_amount", "used_amount_unit"]}
+
+
+def test_unique_key_columns_are_kept():
+    selected = _selected(SchemaLinker(), "coupon")
+
+    assert selected == {
+        "tencent_bill": ["id", "tencent_id", "client_profile_id", "coupon", "bill_month"]
+    }
+
+
+def test_named_table_keeps_all_columns():
+    selected = _selected(SchemaLinker(), "tencent_bill 的 coupon")
+
+    assert list(selected) == ["tencent_bill"]
+    assert len(selected["tencent_bill"]) == 12
+
+
+def test_synonyms_map_question_wording_to_schema_terms():
+    linker = SchemaLinker(synonyms={"騰訊": "tencent", "帳單": "bill"})
+
+    assert len(_selected(linker, "查詢所有騰訊帳單")["tencent_bill"]) == 12
+
+
+def test_no_match_falls_back_to_every_table():
+    selected = _selected(SchemaLinker(), "hello")
+
+    assert list(selected) == ["tencent_bill", "global_bill", "global_bill_l3"]
+
+
+def test_max_tables_keeps_best_scoring_tables():
+    selected = _selected(SchemaLinker(max_tables=1), "帳期 region 用量")
+
+    assert list(selected) == ["global_bill_l3"]
+
+
+def test_link_returns_compact_ddl():
+    linked = SchemaLinker().link(config.FULL_SCHEMA, "各區域的用量")
+
+    assert "CHARACTER SET" not in linked
+    assert [table.name for table in parse_ddl(linked)] == ["global_bill_l3"]
+    assert SchemaLinker().link("no tables here", "用量") == "no tables here"
+
+
+def test_embedder_adds_semantic_matches():
+    lexical = _selected(SchemaLinker(), "voucherpay")
+    semantic = _selected(SchemaLinker(embedder=HashingEmbedder()), "voucherpay")
+
+    # No lexical match: every table is sent unpruned.
+    assert len(lexical["global_bill_l3"]) == 17
+    assert semantic["global_bill_l3"] == ["id", "voucher_pay_amount"]
+
+
+def test_index_is_built_once_per_schema():
+    embedder = Mock(wraps=HashingEmbedder())
+    linker = SchemaLinker(embedder=embedder)
+
+    linker.warmup(config.FULL_SCHEMA)
+    linker.link(config.FULL_SCHEMA, "用量")
+    linker.link(config.FULL_SCHEMA, "區域")
+
+    # One call for the column index, then one per question.
+    assert embedder.encode.call_count == 3
+
+
+def test_service_sends_linked_schema():
+    model = Mock()
+    model.is_initialized.return_value = True
+    model.generate.return_value = "```sql\nSELECT region FROM global_bill_l3;\n```"
+    service = TextToSQLService(model, schema_linker=SchemaLinker())
+
+    service.convert(config.FULL_SCHEMA, "各區域的用量")
+
+    prompt = model.generate.call_args[0][0]
+    assert "global_bill_l3" in prompt
+    assert "tencent_bill" not in prompt
@@ -0,0 +1,170 @@
+"""Tests for self-consistency candidate generation and voting."""
+
+import asyncio
+import threading
+from decimal import Decimal
+
+import torch
+
+import config
+from src.interfaces.language_model import ILanguageModel
+from src.models.huggingface_model import RowTemperatureLogitsWarper
+from src.prompts.text_to_sql_prompt import TextToSQLPrompt
+from src.services.self_consistency import (
+    Candidate,
+    candidate_temperatures,
+    result_fingerprint,
+    vote,
+)
+from src.services.text_to_sql_service import TextToSQLService
+
+SCHEMA = "CREATE TABLE users (id INT, name VARCHAR(20));"
+
+
+class SamplingModel(ILanguageModel):
+    """Returns a fixed answer per temperature and records the temperatures used."""
+
+    temperature = 0.1
+
+    def __init__(self, answers: dict[float, str]):
+        self.answers = answers
+        self.temperatures: list[float] = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, max_tokens: int = 512, temperature: float | None = None):
+        with self._lock:
+            self.temperatures.append(temperature)
+        answer = self.answers[temperature]
+        if isinstance(answer, Exception):
+            raise answer
+        return f"```sql\n{answer}\n```"
+
+    def initialize(self) -> None:
+        pass
+
+    def is_initialized(self) -> bool:
+        return True
+
+
+def test_candidate_temperatures():
+    assert candidate_temperatures(1, 0.1, 0.8) == [0.1]
+    assert candidate_temperatures(3, 0.1, 0.9) == [0.1, 0.5, 0.9]
+    assert candidate_temperatures(2, 0.5, 0.2) == [0.5, 0.5]
+
+
+def test_fingerprint_ignores_row_order_aliases_and_trailing_zeros():
+    first = [{"id": 1, "total": Decimal("10.50")}, {"id": 2, "total": Decimal("3")}]
+    second = [{"total_cost": 3.0, "user_id": 2}, {"total_cost": Decimal("10.5"), "user_id": 1}]
+
+    assert result_fingerprint(first) == result_fingerprint(second)
+    assert result_fingerprint(first) != result_fingerprint(first[:1])
+    assert result_fingerprint(first) != result_fingerprint(first, truncated=True)
+    assert result_fingerprint([{"a": None}]) != result_fingerprint([{"a": "None"}])
+
+
+def test_vote_prefers_majority_then_earliest():
+    a1 = Candidate("A1", 0.1, fingerprint="a")
+    b1 = Candidate("B1", 0.3, fingerprint="b")
+    b2 = Candidate("B2", 0.5, fingerprint="b")
+    failed = Candidate("C", 0.7, fingerprint="c", error="boom")
+
+    assert vote([a1, b1, b2, failed]) == (b1, 2)
+    assert vote([a1, b1]) == (a1, 1)
+    assert vote([failed]) == (None, 0)
+
+
+def test_aconvert_consistent_votes_on_results(monkeypatch):
+    monkeypatch.setattr(config, "SELF_CONSISTENCY_MAX_TEMPERATURE", 0.7)
+    model = SamplingModel(
+        {
+            0.1: "SELECT id FROM users",
+            0.3: "SELECT COUNT(*) FROM users",
+            0.5: "SELECT u.id AS user_id FROM users u",
+            0.7: "select id from users;",
+        }
+    )
+    executed = []
+
+    async def execute(sql, max_rows):
+        executed.append(sql)
+        assert max_rows == config.SELF_CONSISTENCY_ROW_LIMIT
+        if "COUNT" in sql:
+            return [{"COUNT(*)": 2}], False
+        if "user_id" in sql:
+            return [{"user_id": 2}, {"user_id": 1}], False
+        return [{"id": 1}, {"id": 2}], False
+
+    service = TextToSQLService(model)
+    result = asyncio.run(service.aconvert_consistent(SCHEMA, "list users", execute, candidates=4))
+
+    assert sorted(model.temperatures) == [0.1, 0.3, 0.5, 0.7]
+    assert result.winner.temperature == 0.1
+    assert result.votes == 3
+    assert result.winner.rows == [{"id": 1}, {"id": 2}]
+    # The lower-case duplicate of the first query is executed only once.
+    assert len(executed) == 3
+
+
+def test_aconvert_consistent_rejects_writes_and_failures(monkeypatch):
+    monkeypatch.setattr(config, "SELF_CONSISTENCY_MAX_TEMPERATURE", 0.5)
+    model = SamplingModel(
+        {
+            0.1: "DELETE FROM users",
+            0.3: RuntimeError("quota exceeded"),
+            0.5: "SELECT missing FROM users",
+        }
+    )
+
+    async def execute(sql, max_rows):
+        assert sql.startswith("SELECT")
+        msg = "Unknown column 'missing'"
+        raise RuntimeError(msg)
+
+    service = TextToSQLService(model)
+    result = asyncio.run(service.aconvert_consistent(SCHEMA, "list users", execute, candidates=3))
+
+    assert result.winner is None
+    assert result.sql == ""
+    errors = [candidate.error for candidate in result.candidates]
+    assert errors[0] == "未產生可執行的 SELECT 查詢"
+    assert "quota exceeded" in errors[1]
+    assert "Unknown column" in errors[2]
+
+
+def test_aconvert_consistent_without_executor_votes_on_sql(monkeypatch):
+    monkeypatch.setattr(config, "SELF_CONSISTENCY_MAX_TEMPERATURE", 0.5)
+    model = SamplingModel(
+        {0.1: "SELECT name FROM users", 0.3: "SELECT id FROM users", 0.5: "SELECT  id FROM users"}
+    )
+
+    service = TextToSQLService(model)
+    result = asyncio.run(service.aconvert_consistent(SCHEMA, "ids", candidates=3))
+
+    assert result.votes == 2
+    assert result.winner.temperature == 0.3
+
+
+def test_row_temperature_warper_scales_each_row():
+    scores = torch.tensor([[1.0, 2.0], [1.0, 2.0]])
+
+    warped = RowTemperatureLogitsWarper([0.5, 2.0])(torch.zeros(2, 1, dtype=torch.long), scores)
+
+    assert torch.equal(warped, torch.tensor([[2.0, 4.0], [0.5, 1.0]]))
+
+
+def test_mixed_temperatures_share_one_batch(build_tiny_model):
+    model = build_tiny_model(max_batch_size=4, max_batch_wait_ms=500)
+    prompt = TextToSQLPrompt.build_prompt(config.FULL_SCHEMA, "查詢")
+    results = [None] * 3
+
+    def worker(index, temperature):
+        results[index] = model.generate(prompt, 4, temperature=temperature)
+
+    threads = [threading.Thread(target=worker, args=(i, t)) for i, t in enumerate([None, 0.5, 1.0])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(result, str) for result in results)
+    assert model.scheduler.stats()["max_batch_size_seen"] == 3
@@ -0,0 +1,138 @@
+"""Tests for the semantic (paraphrase) cache."""
+
+from unittest.mock import Mock
+
+import numpy as np
+
+from src.cache.semantic_cache import (
+    NumpyVectorIndex,
+    SemanticCache,
+    Slot,
+    extract_slots,
+    fill_sql_template,
+    make_sql_template,
+)
+from src.services.text_to_sql_service import TextToSQLService
+
+SCOPE = "scope"
+SQL = "SELECT * FROM tencent_bill WHERE bill_month = '2025-01' LIMIT 10;"
+
+
+def test_extract_slots_normalizes_literals():
+    template, slots = extract_slots("查詢 2025年1月 前 10 筆")
+
+    assert template == "查詢 <month> 前 <number> 筆"
+    assert slots == [Slot("month", "2025-01"), Slot("number", "10")]
+    assert extract_slots("2025/3/5 的成本")[1] == [Slot("date", "2025-03-05")]
+    assert extract_slots("2024年 總成本")[1] == [Slot("year", "2024")]
+    assert extract_slots("tencent_bill2 成本") == ("tencent_bill2 成本", [])
+
+
+def test_sql_template_round_trip():
+    _, slots = extract_slots("2025-01 前 10 筆")
+    template = make_sql_template(SQL, slots)
+
+    filled = fill_sql_template(template, [Slot("month", "2024-12"), Slot("number", "3")])
+    assert filled == "SELECT * FROM tencent_bill WHERE bill_month = '2024-12' LIMIT 3;"
+
+
+def test_sql_template_month_covers_date_literals():
+    template = make_sql_template("WHERE d >= '2025-01-01'", [Slot("month", "2025-01")])
+
+    assert fill_sql_template(template, [Slot("month", "2025-02")]) == "WHERE d >= '2025-02-01'"
+
+
+def test_sql_template_rejects_missing_or_ambiguous_values():
+    assert make_sql_template(SQL, [Slot("number", "5")]) is None
+    assert make_sql_template(SQL, [Slot("number", "10"), Slot("number", "10")]) is None
+    # A number inside a month literal is not a match.
+    assert make_sql_template("WHERE m = '2025-10'", [Slot("number", "10")]) is None
+
+
+def test_numpy_index_search_restricted_to_rows():
+    index = NumpyVectorIndex(dimensions=2, capacity=3)
+    index.set(0, np.array([1.0, 0.0], dtype=np.float32))
+    index.set(1, np.array([0.0, 1.0], dtype=np.float32))
+    index.set(2, np.array([0.6, 0.8], dtype=np.float32))
+
+    query = np.array([0.0, 1.0], dtype=np.float32)
+    assert [row for row, _ in index.search(query, [0, 1, 2])] == [1, 2, 0]
+    assert [row for row, _ in index.search(query, [0, 2], k=1)] == [2]
+    assert index.search(query, []) == []
+
+
+def test_paraphrase_hit_substitutes_new_values():
+    cache = SemanticCache(threshold=0.8)
+    assert cache.add("查詢 2025-01 的騰訊帳單 前 10 筆", SCOPE, SQL)
+
+    sql = cache.lookup("查詢 2024年12月 的騰訊帳單 前 3 筆", SCOPE)
+
+    assert sql == "SELECT * FROM tencent_bill WHERE bill_month = '2024-12' LIMIT 3;"
+    assert cache.stats()["hits"] == 1
+
+
+def test_miss_on_other_scope_slot_kinds_or_low_similarity():
+    cache = SemanticCache(threshold=0.8)
+    cache.add("查詢 2025-01 的騰訊帳單 前 10 筆", SCOPE, SQL)
+
+    assert cache.lookup("查詢 2025-01 的騰訊帳單 前 10 筆", "other") is None
+    assert cache.lookup("查詢 2025-01 的騰訊帳單", SCOPE) is None
+    assert cache.lookup("各區域的用量 前 10 筆 2025-01", SCOPE) is None
+    assert cache.stats()["misses"] == 3
+
+
+def test_questions_whose_values_are_not_in_the_sql_are_not_stored():
+    cache = SemanticCache()
+
+    assert not cache.add("前 5 筆", SCOPE, "SELECT 1;")
+    assert cache.stats()["rejected"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_ring_buffer_overwrites_oldest():
+    cache = SemanticCache(max_entries=2, threshold=0.99)
+    cache.add("騰訊帳單 2025-01", SCOPE, "SELECT '2025-01';")
+    cache.add("全球帳單 2025-01", SCOPE, "SELECT '2025-01' AS g;")
+    cache.add("區域用量 2025-01", SCOPE, "SELECT '2025-01' AS r;")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("騰訊帳單 2025-02", SCOPE) is None
+    assert cache.lookup("區域用量 2025-02", SCOPE) == "SELECT '2025-02' AS r;"
+
+
+def test_persisted_index_survives_restart_without_reembedding(tmp_path):
+    cache = SemanticCache(threshold=0.8, directory=tmp_path)
+    cache.add("查詢 2025-01 的騰訊帳單 前 10 筆", SCOPE, SQL)
+    cache.flush()
+
+    reopened = SemanticCache(threshold=0.8, directory=tmp_path)
+    reopened.embedder = Mock(wraps=reopened.embedder)
+    sql = reopened.lookup("查詢 2025-02 的騰訊帳單 前 10 筆", SCOPE)
+
+    assert sql == SQL.replace("2025-01", "2025-02")
+    # Only the question was embedded; stored vectors came from the memory-mapped file.
+    assert reopened.embedder.encode.call_count == 1
+    assert (tmp_path / "vectors.f32").stat().st_size == 4096 * 1024 * 4
+
+
+def test_persisted_index_is_discarded_when_capacity_changes(tmp_path):
+    SemanticCache(directory=tmp_path).add("2025-01 帳單", SCOPE, "SELECT '2025-01';")
+
+    assert SemanticCache(directory=tmp_path, max_entries=8).stats()["entries"] == 0
+
+
+def test_service_serves_paraphrase_from_semantic_tier():
+    model = Mock()
+    model.is_initialized.return_value = True
+    model.cache_identity.return_value = {"provider": "local"}
+    model.generate.return_value = f"```sql\n{SQL}\n```"
+    service = TextToSQLService(model, semantic_cache=SemanticCache(threshold=0.8))
+    schema = "CREATE TABLE tencent_bill (\n  bill_month char(7)\n);"
+
+    service.convert(schema, "查詢 2025-01 的騰訊帳單 前 10 筆")
+    sql = service.convert(schema, "查詢 2025年3月 的騰訊帳單 前 20 筆")
+    streamed = "".join(service.convert_stream(schema, "查詢 2025-04 的騰訊帳單 前 5 筆"))
+
+    model.generate.assert_called_once()
+    assert "'2025-03'" in sql and "LIMIT 20" in sql
+    assert "'2025-04'" in streamed and "LIMIT 5" in streamed
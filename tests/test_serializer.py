@@ -0,0 +1,119 @@
+"""Tests for schema prompt formats and token reporting."""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+
+import config
+from src.models.sql_grammar import extract_schema_identifiers
+from src.prompts.text_to_sql_prompt import TextToSQLPrompt
+from src.schema.ddl_parser import parse_ddl
+from src.schema.schema_linker import SchemaLinker
+from src.schema.serializer import (
+    estimate_tokens,
+    parse_schema,
+    prepare_schema,
+    render_schema,
+    serialize_schema,
+    token_report,
+)
+from src.services.text_to_sql_service import TextToSQLService
+
+TABLES = parse_ddl(config.FULL_SCHEMA)
+
+
+@pytest.mark.parametrize("schema_format", ["ddl", "compact", "json"])
+def test_formats_round_trip(schema_format):
+    rendered = serialize_schema(TABLES, schema_format)
+    parsed = parse_schema(rendered)
+
+    assert [table.name for table in parsed] == [table.name for table in TABLES]
+    for table, original in zip(parsed, TABLES, strict=True):
+        assert [(c.name, c.data_type, c.nullable, c.comment) for c in table.columns] == [
+            (c.name, c.data_type, c.nullable, c.comment) for c in original.columns
+        ]
+        assert table.primary_key == original.primary_key
+        assert list(table.unique_keys.values()) == list(original.unique_keys.values())
+
+
+def test_compact_is_one_line_per_table_with_keys():
+    lines = serialize_schema(TABLES, "compact").splitlines()
+
+    assert len(lines) == 3
+    assert lines[0].startswith("tencent_bill(id char(32) NOT NULL '主鍵 UUID', ")
+    assert lines[0].endswith("PK(id), UK(tencent_id,client_profile_id,bill_month))")
+
+
+def test_json_omits_empty_fields():
+    payload = json.loads(serialize_schema(TABLES, "json"))
+
+    first_column, second_column = payload["tables"][0]["columns"][:2]
+    assert first_column == {
+        "name": "id",
+        "type": "char(32)",
+        "not_null": True,
+        "comment": "主鍵 UUID",
+    }
+    assert "not_null" not in second_column
+    assert payload["tables"][2]["primary_key"] == ["id"]
+    assert "unique_keys" not in payload["tables"][2]
+
+
+@pytest.mark.parametrize("schema_format", ["compact", "json"])
+def test_schema_found_inside_prompt(schema_format):
+    prompt = TextToSQLPrompt.build_prompt(render_schema(config.FULL_SCHEMA, schema_format), "q")
+
+    assert extract_schema_identifiers(prompt) == extract_schema_identifiers(config.FULL_SCHEMA)
+
+
+def test_compact_parser_ignores_other_lines():
+    assert parse_schema("COUNT(*)\nSELECT 1;") == []
+    assert render_schema("no schema", "compact") == "no schema"
+
+
+def test_unknown_format_raises():
+    with pytest.raises(ValueError, match="Unknown schema format"):
+        serialize_schema(TABLES, "yaml")
+
+
+def test_token_report_ranks_formats():
+    report = token_report(config.FULL_SCHEMA)
+
+    assert set(report) == {"original", "ddl", "compact", "json"}
+    assert report["compact"] < report["ddl"] < report["original"]
+
+
+def test_token_report_uses_given_counter():
+    report = token_report(config.FULL_SCHEMA, count_tokens=len, formats=["original"])
+
+    assert report == {"original": len(config.FULL_SCHEMA)}
+
+
+def test_estimate_tokens_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("帳期 abcd") == 4
+
+
+def test_prepare_schema_applies_linker_then_format():
+    linker = SchemaLinker()
+
+    assert prepare_schema(config.FULL_SCHEMA, "用量") == config.FULL_SCHEMA
+    pruned = prepare_schema(config.FULL_SCHEMA, "各區域的用量", linker, "compact")
+    assert pruned.startswith("global_bill_l3(id char(32) NOT NULL")
+    assert "\n" not in pruned
+    assert prepare_schema(config.FULL_SCHEMA, "用量", linker).startswith("CREATE TABLE")
+
+
+def test_service_uses_schema_format():
+    model = Mock()
+    model.is_initialized.return_value = True
+    model.generate.return_value = "SELECT 1;"
+    service = TextToSQLService(model, schema_format="compact")
+
+    service.convert(config.FULL_SCHEMA, "查詢帳期")
+
+    prompt = model.generate.call_args[0][0]
+    assert "tencent_bill(id char(32)" in prompt
+    assert "CHARACTER SET" not in prompt
@@ -1,8 +1,10 @@
 """Tests for Text-to-SQL service."""
 
-from unittest.mock import Mock
+import asyncio
+from unittest.mock import AsyncMock, Mock
 
 from src.services.text_to_sql_service import TextToSQLService
+from src.utils.sql_parser import IncrementalSQLExtractor
 
 
 def test_service_initialization():
@@ -55,3 +57,37 @@ def test_convert_with_max_tokens():
 
     call_args = mock_model.generate.call_args
     assert call_args[0][1] == 256
+
+
+def test_aconvert_generates_sql():
+    mock_model = Mock()
+    mock_model.agenerate = AsyncMock(return_value="```sql\nselect * from users;\n```")
+
+    service = TextToSQLService(mock_model)
+    result = asyncio.run(service.aconvert("CREATE TABLE users (id INT);", "Get all users"))
+
+    assert "SELECT" in result
+    mock_model.agenerate.assert_awaited_once()
+
+
+def test_aconvert_stream_stops_when_sql_is_complete():
+    tokens = ["```sql\n", "SELECT id ", "FROM users", ";", "\n```", "\nThis query lists ids."]
+    produced = []
+
+    async def agenerate_stream(prompt, max_tokens):
+        for token in tokens:
+            produced.append(token)
+            yield token
+
+    mock_model = Mock()
+    mock_model.agenerate_stream = agenerate_stream
+    service = TextToSQLService(mock_model)
+    extractor = IncrementalSQLExtractor()
+
+    async def collect():
+        stream = service.aconvert_stream("CREATE TABLE users (id INT);", "ids", extractor=extractor)
+        return [token async for token in stream]
+
+    assert asyncio.run(collect()) == tokens[:4]
+    assert extractor.sql == "SELECT id FROM users;"
+    assert produced == tokens[:4]
@@ -0,0 +1,124 @@
+"""Tests for grammar-constrained SQL decoding."""
+
+import pytest
+import torch
+
+import config
+from src.models.sql_grammar import (
+    SQLGrammar,
+    SQLGrammarLogitsProcessor,
+    extract_schema_identifiers,
+    get_sql_grammar,
+)
+from src.prompts.text_to_sql_prompt import TextToSQLPrompt
+
+
+@pytest.fixture
+def grammar() -> SQLGrammar:
+    return get_sql_grammar(config.FULL_SCHEMA)
+
+
+def accepts(grammar: SQLGrammar, sql: str):
+    return grammar.advance(grammar.initial_state(), "```sql\n" + sql)
+
+
+def test_extracts_tables_and_columns():
+    tables = extract_schema_identifiers(config.GLOBAL_BILL_SCHEMA)
+
+    assert list(tables) == ["global_bill"]
+    assert "business_code_name" in tables["global_bill"]
+    assert "PRIMARY" not in tables["global_bill"]
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM tencent_bill;",
+        "SELECT bill_month, SUM(cost) AS total FROM tencent_bill WHERE bill_month = '2024-01'\n"
+        "GROUP BY bill_month ORDER BY total DESC LIMIT 10;",
+        "SELECT t.cost FROM tencent_bill AS t LEFT JOIN global_bill g ON t.id = g.id;",
+        "SELECT COUNT(DISTINCT region) FROM global_bill_l3 WHERE note IS NOT NULL;",
+        "SELECT * FROM tencent_bill WHERE cost > (SELECT AVG(cost) FROM tencent_bill);",
+        "SELECT CASE WHEN cost >= 0 THEN 'a''b' ELSE \"c\" END AS sign FROM tencent_bill;",
+        "SELECT `cost` FROM tencent_bill WHERE created_date >= DATE_SUB(NOW(), INTERVAL 1 DAY);",
+        "SELECT SUM(t.cost) FROM tencent_bill t WHERE t.cost > 0;",
+        "SELECT bill_month FROM tencent_bill UNION SELECT bill_month FROM global_bill;",
+        "SELECT g.bill_month FROM global_bill g UNION ALL SELECT bill_month FROM tencent_bill\n"
+        "ORDER BY bill_month;",
+    ],
+)
+def test_accepts_select_statements(grammar, sql):
+    state = accepts(grammar, sql)
+
+    assert state is not None
+    assert grammar.is_complete(state)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT month FROM tencent_bill;",
+        "SELECT * FROM users;",
+        "DELETE FROM tencent_bill;",
+        "SELECT * FROM tencent_bill WHERE cost = = 1;",
+        "SELECT * FROM tencent_bill GROUP BY cost WHERE cost > 1;",
+        "SELECT * FROM tencent_bill WHERE (cost > 1;",
+        "SELECT COUNT (*) FROM tencent_bill;",
+        "SELECT foo.cost FROM tencent_bill;",
+        "SELECT foo.cost FROM tencent_bill t WHERE t.cost > 0;",
+        "SELECT cost FROM tencent_bill ORDER BY cost UNION SELECT cost FROM tencent_bill;",
+    ],
+)
+def test_rejects_invalid_statements(grammar, sql):
+    assert accepts(grammar, sql) is None
+
+
+def test_rejects_prefixes_that_cannot_be_completed(grammar):
+    state = accepts(grammar, "SELECT * FROM tencent_bill WHERE (cost ")
+
+    # "AS" / "ASC" are keywords, but neither is valid inside a WHERE parenthesis.
+    assert grammar.advance(state, "A") is not None  # AND
+    assert grammar.advance(state, "AS") is None
+    assert grammar.advance(accepts(grammar, "SELECT * FROM tencent_bill WHERE `co"), "`") is None
+
+
+def test_select_list_words_are_bounded(grammar):
+    state = accepts(grammar, "SELECT ")
+
+    assert grammar.advance(state, "bill_mo") is not None
+    assert grammar.advance(state, "t") is not None  # May be an alias FROM declares later
+    assert grammar.advance(state, "q統o每BwK3toQCw") is None
+    assert grammar.advance(state, "qoBwK3toQCw3ZelVou") is None
+
+
+def test_transitions_are_memoized(grammar):
+    state = accepts(grammar, "SELECT ")
+
+    assert grammar.advance(state, "cost") is grammar.advance(state, "cost")
+
+
+def test_processor_masks_invalid_tokens(grammar):
+    token_strings = ["```sql\n", "SELECT", " *", " FROM", " users", " tencent_bill", ";", None]
+    processor = SQLGrammarLogitsProcessor([grammar], token_strings, {7}, prompt_length=0)
+    generated = [0, 1, 2, 3]
+    for step in range(len(generated)):
+        processor(torch.tensor([generated[:step]]), torch.zeros(1, 8))
+
+    scores = processor(torch.tensor([generated]), torch.zeros(1, 8))
+
+    assert torch.isinf(scores[0, 4])
+    assert scores[0, 5] == 0
+    assert torch.isinf(scores[0, 7])
+
+
+def test_constrained_generation_stays_in_grammar(build_tiny_model):
+    model = build_tiny_model(constrained_decoding=True)
+    prompt = TextToSQLPrompt.build_prompt(config.TENCENT_BILL_SCHEMA, "查詢")
+    grammar = get_sql_grammar(TextToSQLPrompt.split_cacheable_prefix(prompt)[0])
+
+    for seed in range(3):
+        torch.manual_seed(seed)
+        output = model.generate(prompt, max_tokens=40)
+
+        assert output.startswith("```sql")
+        assert grammar.advance(grammar.initial_state(), output) is not None
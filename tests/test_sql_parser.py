@@ -1,6 +1,10 @@
 """Tests for SQL parser utilities."""
 
-from src.utils.sql_parser import SQLParser
+import pytest
+import sqlparse
+
+from src.utils import sql_parser
+from src.utils.sql_parser import IncrementalSQLExtractor, SQLParser
 
 
 def test_extract_sql_from_code_block():
@@ -9,6 +13,12 @@ def test_extract_sql_from_code_block():
     assert result == "SELECT * FROM users;"
 
 
+def test_extract_sql_from_unterminated_code_block():
+    text = "```sql\nSELECT * FROM users;"
+    result = SQLParser.extract_sql(text)
+    assert result == "SELECT * FROM users;"
+
+
 def test_extract_sql_from_plain_text():
     text = "Here is the query: SELECT * FROM users WHERE age > 18;"
     result = SQLParser.extract_sql(text)
@@ -48,3 +58,176 @@ def test_clean_sql():
     cleaned = SQLParser.clean_sql(text)
     assert "SELECT" in cleaned
     assert "FROM" in cleaned
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "```sql\nselect a, sum(b) from t where c > 1 group by a order by 2 desc;\n```",
+        "Here you go:\nselect * from t join u on t.id = u.id where u.x in (1, 2) limit 5;",
+        "```sql\nwith m as (select a from t) select a from m; select 1;\n```",
+        "```sql\nshow tables\n```",
+    ],
+)
+def test_clean_sql_matches_sqlparse_format(text):
+    extracted = SQLParser.extract_sql(text)
+    expected = extracted
+    if SQLParser.validate_sql(extracted):
+        expected = sqlparse.format(extracted, reindent=True, keyword_case="upper")
+
+    assert SQLParser.clean_sql(text, formatted=True) == expected
+    assert SQLParser.clean_sql(text, formatted=True) is SQLParser.clean_sql(text, formatted=True)
+
+
+def test_clean_sql_falls_back_to_sqlparse_format(monkeypatch):
+    def broken(sql, formatted):
+        raise KeyError("compact")
+
+    monkeypatch.setattr(sql_parser, "_analyze", broken)
+    sql_parser._clean.cache_clear()
+    text = "```sql\nselect a, b from t where c = 1 order by a;\n```"
+    try:
+        cleaned = SQLParser.clean_sql(text, formatted=True)
+    finally:
+        sql_parser._clean.cache_clear()
+
+    expected = sqlparse.format(
+        "select a, b from t where c = 1 order by a;", reindent=True, keyword_case="upper"
+    )
+    assert cleaned == expected
+
+
+def test_clean_sql_without_formatting_returns_extracted_sql():
+    text = "```sql\nselect *\n  from users;\n```"
+    assert SQLParser.clean_sql(text, formatted=False) == "select *\n  from users;"
+
+
+@pytest.mark.parametrize(
+    ("sql", "expected"),
+    [
+        ("SELECT * FROM global_bill_l3", "SELECT * FROM global_bill_l3 LIMIT 10"),
+        ("SELECT * FROM t;", "SELECT * FROM t LIMIT 10;"),
+        ("SELECT * FROM t -- every row", "SELECT * FROM t LIMIT 10 -- every row"),
+        ("SELECT *\nFROM t\nLIMIT 5000;", "SELECT *\nFROM t\nLIMIT 10;"),
+        ("SELECT * FROM t LIMIT 5", "SELECT * FROM t LIMIT 5"),
+        ("SELECT * FROM t LIMIT 20, 5000", "SELECT * FROM t LIMIT 20, 10"),
+        ("SELECT * FROM t LIMIT 5000 OFFSET 20", "SELECT * FROM t LIMIT 10 OFFSET 20"),
+        (
+            "SELECT * FROM (SELECT * FROM t LIMIT 5000) x",
+            "SELECT * FROM (SELECT * FROM t LIMIT 5000) x LIMIT 10",
+        ),
+        (
+            "WITH m AS (SELECT a FROM t LIMIT 50) SELECT a FROM m",
+            "WITH m AS (SELECT a FROM t LIMIT 50) SELECT a FROM m LIMIT 10",
+        ),
+        (
+            "SELECT a FROM t UNION SELECT a FROM u LIMIT 5000",
+            "SELECT a FROM t UNION SELECT a FROM u LIMIT 10",
+        ),
+        (
+            "(SELECT a FROM t LIMIT 5) UNION ALL (SELECT a FROM u)",
+            "(SELECT a FROM t LIMIT 5) UNION ALL (SELECT a FROM u) LIMIT 10",
+        ),
+        ("SELECT 'limit 5' FROM t", "SELECT 'limit 5' FROM t LIMIT 10"),
+        ("SELECT REPLACE(a, 'x', 'y') FROM t", "SELECT REPLACE(a, 'x', 'y') FROM t LIMIT 10"),
+        ("SELECT * FROM t FOR UPDATE", "SELECT * FROM t LIMIT 10 FOR UPDATE"),
+    ],
+)
+def test_apply_limit(sql, expected):
+    assert SQLParser.apply_limit(sql, 10) == expected
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SHOW TABLES",
+        "UPDATE t SET a = 1",
+        "WITH x AS (SELECT 1) DELETE FROM t",
+        "SELECT a INTO @x FROM t",
+        "SELECT * FROM t LIMIT ?",
+        "SELECT 1; SELECT 2",
+    ],
+)
+def test_apply_limit_leaves_other_statements(sql):
+    assert SQLParser.apply_limit(sql, 10) == sql
+    assert SQLParser.apply_limit("SELECT * FROM t", 0) == "SELECT * FROM t"
+
+
+def test_apply_execution_timeout():
+    hint = "/*+ MAX_EXECUTION_TIME(500) */"
+    assert SQLParser.apply_execution_timeout("SELECT a FROM t", 500) == f"SELECT {hint} a FROM t"
+    assert (
+        SQLParser.apply_execution_timeout("WITH m AS (SELECT 1) SELECT * FROM m", 500)
+        == f"WITH m AS (SELECT 1) SELECT {hint} * FROM m"
+    )
+    assert SQLParser.apply_execution_timeout("SHOW TABLES", 500) == "SHOW TABLES"
+
+
+def feed(text, step):
+    """Feed ``text`` in ``step``-sized deltas; return (sql, characters fed when complete)."""
+    extractor = IncrementalSQLExtractor()
+    for start in range(0, len(text), step):
+        if extractor.feed(text[start : start + step]) is not None:
+            return extractor.sql, start + step
+    return extractor.finish(), None
+
+
+def test_incremental_extractor_completes_at_closing_fence():
+    text = "Here:\n```sql\nSELECT a FROM t WHERE b = ';' AND c IN (1, 2)\n```\nExplanation"
+    for step in (1, 3, 7):
+        sql, fed = feed(text, step)
+        assert sql == "SELECT a FROM t WHERE b = ';' AND c IN (1, 2)"
+        assert fed < len(text) - len("Explanation") + step
+
+
+def test_incremental_extractor_completes_at_top_level_semicolon():
+    text = "```sql\nSELECT `a``b` /* ; */ FROM t -- ;\nWHERE x = 1;\nSELECT 2;\n```"
+    for step in (1, 2, 5):
+        assert feed(text, step)[0] == "SELECT `a``b` /* ; */ FROM t -- ;\nWHERE x = 1;"
+
+
+def test_incremental_extractor_unfenced_and_unterminated():
+    assert feed("Query: SELECT * FROM users WHERE age > 18;\nMore text", 4)[0] == (
+        "SELECT * FROM users WHERE age > 18;"
+    )
+    assert feed("select id\nfrom t", 3) == ("select id\nfrom t", None)
+    assert feed("```sql\nSELECT 1 FROM t", 4) == ("SELECT 1 FROM t", None)
+    assert feed("no sql here", 2) == ("no sql here", None)
+
+
+SPLIT_TEXTS = [
+    "We need to select the monthly totals.\n```sql\nSELECT bill_month FROM t;\n```",
+    "I will SELECT the rows.\n```sql\nSELECT a FROM t;\n```",
+    "Query: SELECT * FROM users WHERE age > 18;\nMore text",
+    "Sure!\n        select a,\n  b from t;",
+    "ALTERNATIVELY, as a CTE:\nWITH m AS (SELECT 1) SELECT * FROM m;",
+    "```mysql\nSELECT 'a;b' -- ;\nFROM t```",
+    "no sql here",
+]
+
+
+def feed_parts(parts):
+    extractor = IncrementalSQLExtractor()
+    for part in parts:
+        extractor.feed(part)
+    return extractor.finish()
+
+
+@pytest.mark.parametrize("text", SPLIT_TEXTS)
+def test_incremental_extractor_is_split_invariant(text):
+    expected = SQLParser.extract_sql(text)
+
+    assert feed_parts(list(text)) == expected
+    for split in range(len(text) + 1):
+        assert feed_parts([text[:split], text[split:]]) == expected, split
+
+
+def test_prose_keywords_do_not_start_sql():
+    prose = "We need to select the monthly totals.\n```sql\nSELECT bill_month;\n```"
+    words = ["We", " need", " to", " select", " the", " monthly", " totals", ".\n", "```sql\n"]
+    assert feed_parts([*words, "SELECT bill_month;\n```"]) == "SELECT bill_month;"
+
+    text = "I will SELECT the rows.\n```sql\nSELECT a FROM t;\n```"
+    assert feed_parts([text]) == "SELECT a FROM t;"
+    assert SQLParser.clean_sql(text, formatted=False) == "SELECT a FROM t;"
+    assert SQLParser.extract_sql(prose) == "SELECT bill_month;"
@@ -0,0 +1,106 @@
+"""Tests for the schema-aware static SQL validator."""
+
+import pytest
+
+import config
+from src.schema.sql_validator import catalog_for_schema, get_schema_catalog, validate_query
+
+
+@pytest.fixture
+def catalog():
+    return catalog_for_schema(config.FULL_SCHEMA)
+
+
+def issues(sql, catalog):
+    return [str(issue) for issue in validate_query(sql, catalog)]
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT bill_month, SUM(cost) AS total FROM tencent_bill GROUP BY bill_month "
+        "ORDER BY total DESC LIMIT 10;",
+        "SELECT t.bill_month, g.business_code_name FROM tencent_bill t "
+        "LEFT JOIN global_bill AS g ON t.bill_month = g.bill_month AND g.cost > 0",
+        "SELECT x.m, x.total FROM (SELECT bill_month AS m, SUM(cost) total FROM global_bill "
+        "GROUP BY bill_month) x WHERE x.total > 0",
+        "WITH m AS (SELECT bill_month, SUM(total_cost) AS tc FROM global_bill_l3 "
+        "GROUP BY bill_month) SELECT bill_month, tc FROM m ORDER BY tc",
+        "SELECT product_name FROM global_bill_l3 g WHERE g.total_cost > "
+        "(SELECT AVG(total_cost) FROM global_bill_l3 WHERE region = g.region)",
+        "SELECT DATE_FORMAT(created_date, '%Y-%m') AS ym, COUNT(*) FROM tencent_bill "
+        "WHERE created_date >= NOW() - INTERVAL 3 MONTH "
+        "GROUP BY DATE_FORMAT(created_date, '%Y-%m')",
+        "SELECT CAST(cost AS DECIMAL(10,2)) c, CASE WHEN cost > 0 THEN 'y' ELSE 'n' END flag "
+        "FROM `tencent_bill`",
+        "SELECT id, note FROM tencent_bill GROUP BY id",
+        "SELECT EXTRACT(YEAR FROM created_date) y, SUM(cost) FROM tencent_bill GROUP BY y",
+        "SELECT bill_month FROM tencent_bill UNION SELECT bill_month FROM global_bill "
+        "ORDER BY bill_month",
+        "SELECT region, SUM(total_cost) OVER (PARTITION BY region) FROM global_bill_l3",
+    ],
+)
+def test_valid_queries(sql, catalog):
+    assert issues(sql, catalog) == []
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT TRIM(LEADING '0' FROM bill_month) FROM tencent_bill",
+        "SELECT TRIM(TRAILING '.' FROM product_name) FROM global_bill_l3",
+        "SELECT TRIM(BOTH ' ' FROM bill_month) m FROM tencent_bill GROUP BY m",
+        "SELECT EXTRACT(YEAR_MONTH FROM created_date) FROM tencent_bill",
+        "SELECT POSITION('-' IN bill_month) FROM tencent_bill",
+        "SELECT CONVERT(bill_month USING utf8mb4) FROM tencent_bill",
+    ],
+)
+def test_special_function_syntax_is_not_a_column(sql, catalog):
+    assert issues(sql, catalog) == []
+
+
+def test_inconsistent_alias(catalog):
+    sql = (
+        "SELECT T1.bill_month, T2.cost FROM tencent_bill AS T1 "
+        "JOIN global_bill T3 ON T1.bill_month = T3.bill_month"
+    )
+    assert issues(sql, catalog) == ["Unknown table or alias 'T2' (defined: T1, T3)"]
+
+
+def test_unknown_column_and_table_suggestions(catalog):
+    assert issues("SELECT costs FROM tencent_bill", catalog) == [
+        "Unknown column 'costs' (did you mean 'cost'?)"
+    ]
+    assert issues("SELECT * FROM tencent_bils", catalog) == [
+        "Table 'tencent_bils' doesn't exist (did you mean 'tencent_bill'?)"
+    ]
+    derived = "SELECT x.nope FROM (SELECT bill_month AS m FROM global_bill) x"
+    assert issues(derived, catalog) == ["Unknown column 'x.nope'"]
+
+
+def test_ambiguous_column(catalog):
+    sql = "SELECT cost FROM tencent_bill t JOIN global_bill g ON t.bill_month = g.bill_month"
+    assert issues(sql, catalog) == ["Column 'cost' is ambiguous (in t, g); qualify it"]
+
+
+def test_group_by_checks(catalog):
+    assert issues("SELECT bill_month, cost FROM tencent_bill GROUP BY bill_month", catalog) == [
+        "Expression #2 of SELECT list is not in GROUP BY clause and contains "
+        "nonaggregated column 'tencent_bill.cost'"
+    ]
+    assert issues("SELECT bill_month, SUM(cost) FROM tencent_bill", catalog) == [
+        "In aggregated query without GROUP BY, expression #1 of SELECT list contains "
+        "nonaggregated column 'tencent_bill.bill_month'"
+    ]
+
+
+def test_non_select_statements_are_not_checked(catalog):
+    assert issues("UPDATE nowhere SET x = 1", catalog) == []
+
+
+def test_catalog_is_built_once_per_schema(monkeypatch):
+    assert catalog_for_schema(config.FULL_SCHEMA) is catalog_for_schema(config.FULL_SCHEMA)
+    assert get_schema_catalog() is catalog_for_schema(config.FULL_SCHEMA)
+
+    monkeypatch.setattr(config, "SQL_STATIC_VALIDATION", False)
+    assert get_schema_catalog() is None
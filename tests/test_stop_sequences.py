@@ -0,0 +1,78 @@
+"""Tests for stop-sequence detection during generation."""
+
+import torch
+
+import config
+from src.models.stop_sequences import StopSequenceMatcher
+from src.prompts.text_to_sql_prompt import TextToSQLPrompt
+
+FENCE = "\n```\n"
+
+
+def feed(matcher: StopSequenceMatcher, text: str, step: int = 1) -> str:
+    """Feed text in small increments like a decoder would; return the cut text."""
+    for end in range(step, len(text) + step, step):
+        if matcher.update(text[:end]):
+            break
+    return matcher.truncate(text)
+
+
+def test_stops_before_closing_fence():
+    matcher = StopSequenceMatcher([FENCE])
+    text = "```sql\nSELECT 1\n```\nThis query selects one."
+
+    assert feed(matcher, text) == "```sql\nSELECT 1"
+    assert matcher.stopped
+
+
+def test_opening_fence_does_not_stop():
+    matcher = StopSequenceMatcher([FENCE])
+
+    assert not matcher.update("Answer:\n```sql\nSELECT 1")
+
+
+def test_stops_after_top_level_semicolon():
+    matcher = StopSequenceMatcher(stop_at_semicolon=True)
+    text = "```sql\nSELECT 1;\nSELECT 2;\n```"
+
+    assert feed(matcher, text) == "```sql\nSELECT 1;"
+
+
+def test_semicolons_in_strings_comments_and_parens_are_ignored():
+    matcher = StopSequenceMatcher(stop_at_semicolon=True)
+    text = (
+        "Note; prose is skipped.\n```sql\n"
+        "SELECT 'a;b', \"c;d\", `e;f` -- g;\n"
+        "/* h; */ FROM t WHERE x = 'it''s;' AND y = 'a\\';' AND z IN (SELECT 1;)\n"
+        "# i;\n;"
+    )
+
+    assert feed(matcher, text, step=3) == text
+
+
+def test_safe_length_holds_back_possible_stop_prefix():
+    matcher = StopSequenceMatcher([FENCE])
+    text = "```sql\nSELECT 1\n``"
+    matcher.update(text)
+
+    assert matcher.safe_length(text) == len(text) - (len(FENCE) - 1)
+    assert matcher.safe_length(text, final=True) == len(text)
+
+
+def test_local_model_stops_at_stop_sequence(build_tiny_model):
+    prompt = TextToSQLPrompt.build_prompt(config.FULL_SCHEMA, "查詢")
+    free = build_tiny_model(stop_sequences=[], stop_at_semicolon=False)
+    torch.manual_seed(3)
+    full = free.generate(prompt, max_tokens=12)
+
+    stop = full[5:7]
+    stopped = build_tiny_model(stop_sequences=[stop], stop_at_semicolon=False)
+    stopped.model = free.model
+    torch.manual_seed(3)
+    result = stopped.generate(prompt, max_tokens=12)
+    torch.manual_seed(3)
+    streamed = "".join(stopped.generate_stream(prompt, max_tokens=12))
+
+    expected = full[: full.index(stop)].strip()
+    assert result == expected
+    assert streamed.strip() == expected
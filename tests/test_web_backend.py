@@ -0,0 +1,111 @@
+"""Tests for the FastAPI backend's execute endpoints."""
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+from src.database.cost_guard import CostGuard
+from src.database.db_connector import DatabaseConnector
+
+_spec = importlib.util.spec_from_file_location(
+    "web_backend_main", Path(__file__).parent.parent / "web" / "backend" / "main.py"
+)
+backend = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(backend)
+
+FULL_SCAN_PLAN = {
+    "query_block": {
+        "cost_info": {"query_cost": "251234.50"},
+        "table": {
+            "table_name": "global_bill_l3",
+            "access_type": "ALL",
+            "rows_examined_per_scan": 2400000,
+            "attached_condition": "(date_format(`bill_month`,'%Y') = '2024')",
+        },
+    }
+}
+SLOW_SQL = "SELECT * FROM global_bill_l3 WHERE DATE_FORMAT(bill_month, '%Y') = '2024'"
+
+
+def never_called(*args, **kwargs):
+    raise AssertionError("query must not run")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    guard = CostGuard(lambda sql: FULL_SCAN_PLAN, max_scan_rows=1_000_000)
+    monkeypatch.setattr(backend, "get_cost_guard", lambda: guard)
+    monkeypatch.setattr(DatabaseConnector, "astream_query", never_called)
+    monkeypatch.setattr(backend.arrow_export, "aexport_query", never_called)
+    return TestClient(backend.app)
+
+
+def test_stream_endpoint_rejects_over_budget_query(client):
+    response = client.post("/api/execute/stream", json={"sql": SLOW_SQL})
+
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("成本檢查未通過: Full table scan")
+
+
+@pytest.mark.skipif(not backend.arrow_export.PYARROW_AVAILABLE, reason="pyarrow not installed")
+def test_columnar_export_rejects_over_budget_query(client):
+    response = client.post(
+        "/api/execute",
+        json={"sql": SLOW_SQL},
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("成本檢查未通過: Full table scan")
+
+
+@pytest.mark.parametrize("body", [{"chunk_size": 0}, {"chunk_size": -5}, {"max_rows": -1}])
+def test_stream_endpoint_rejects_invalid_sizes(client, body):
+    response = client.post("/api/execute/stream", json={"sql": "SELECT 1", **body})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "greater_than_equal"  # not the cost guard
+
+
+@pytest.mark.skipif(not backend.arrow_export.PYARROW_AVAILABLE, reason="pyarrow not installed")
+@pytest.mark.parametrize(
+    ("full_results", "expected_limit"),
+    [(False, config.SQL_AUTO_LIMIT_EXECUTE), (True, config.DB_CONFIG.stream_max_rows)],
+)
+def test_columnar_export_row_limit(client, monkeypatch, full_results, expected_limit):
+    monkeypatch.setattr(backend, "get_cost_guard", lambda: None)
+    calls = []
+
+    async def export(sql, export_format, batch_size=None, max_rows=None):
+        calls.append((export_format, max_rows))
+        yield b"ARROW1"
+
+    monkeypatch.setattr(backend.arrow_export, "aexport_query", export)
+    response = client.post(
+        "/api/execute",
+        json={"sql": "SELECT 1", "full_results": full_results},
+        headers={"Accept": "application/json;q=0.5, application/vnd.apache.arrow.file"},
+    )
+
+    assert response.status_code == 200
+    assert calls == [("arrow_file", expected_limit)]
+    assert response.headers["X-Row-Limit"] == str(expected_limit)
+    assert response.headers["Content-Type"] == "application/vnd.apache.arrow.file"
+
+
+def test_stream_endpoint_returns_503_over_stream_limit(client, monkeypatch):
+    monkeypatch.setattr(backend, "get_cost_guard", lambda: None)
+    monkeypatch.setattr(config.DB_CONFIG, "stream_max_concurrent", 0)
+
+    async def astream_query(sql, chunk_size=None, max_rows=None):
+        with DatabaseConnector.stream_slot():
+            yield never_called()
+
+    monkeypatch.setattr(DatabaseConnector, "astream_query", astream_query)
+    response = client.post("/api/execute/stream", json={"sql": "SELECT 1"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,103 @@
+"""Benchmark column-wise result serialization against the per-cell isinstance loop."""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from pymysql.constants import FIELD_TYPE
+
+from src.utils.result_serializer import ORJSON_AVAILABLE, ResultSerializer, dumps
+
+# global_bill_l3-like columns: (name, type code, value factory)
+COLUMNS = [
+    ("id", FIELD_TYPE.STRING, lambda i: f"{i:032x}"),
+    ("bill_month", FIELD_TYPE.STRING, lambda i: f"2024-{i % 12 + 1:02d}"),
+    ("product_name", FIELD_TYPE.VAR_STRING, lambda i: f"CVM 標準型 S{i % 7}"),
+    ("region", FIELD_TYPE.VAR_STRING, lambda i: "ap-guangzhou" if i % 2 else "ap-shanghai"),
+    ("used_amount", FIELD_TYPE.NEWDECIMAL, lambda i: Decimal(i % 1000) / Decimal(7)),
+    ("real_cost", FIELD_TYPE.NEWDECIMAL, lambda i: Decimal("12.3456789012") * (i % 50)),
+    ("voucher_pay_amount", FIELD_TYPE.NEWDECIMAL, lambda i: None if i % 3 else Decimal("1.5")),
+    ("total_cost", FIELD_TYPE.NEWDECIMAL, lambda i: Decimal("98.7654321098") + i),
+    ("cost_at_list", FIELD_TYPE.NEWDECIMAL, lambda i: Decimal("0.0000000000")),
+    ("create_time", FIELD_TYPE.DATETIME, lambda i: datetime(2024, 1, 1, i % 24, i % 60)),
+]
+DESCRIPTION = [(name, type_code, None, 0, 0, 10, True) for name, type_code, _ in COLUMNS]
+
+
+def make_rows(count: int) -> list[dict]:
+    """Build synthetic result rows shaped like PyMySQL DictCursor output."""
+    return [{name: factory(i) for name, _, factory in COLUMNS} for i in range(count)]
+
+
+def legacy_serialize(rows: list[dict]) -> bytes:
+    """The per-cell conversion the web handlers used before, plus json.dumps."""
+    serializable_results = []
+    for row in rows:
+        serializable_row = {}
+        for key, value in row.items():
+            if isinstance(value, (date, datetime)):
+                serializable_row[key] = value.isoformat()
+            elif value is None:
+                serializable_row[key] = None
+            else:
+                serializable_row[key] = (
+                    str(value) if not isinstance(value, (int, float, bool, str)) else value
+                )
+        serializable_results.append(serializable_row)
+    return json.dumps({"rows": serializable_results}, ensure_ascii=False).encode("utf-8")
+
+
+def columnar_serialize(rows: list[dict]) -> bytes:
+    """The shared ResultSerializer plus the fast encoder."""
+    serializer = ResultSerializer([name for name, _, _ in COLUMNS], DESCRIPTION)
+    return dumps({"rows": serializer.convert(rows)})
+
+
+def timed(func, rows: list[dict], repeat: int) -> tuple[float, bytes]:
+    """Best-of-``repeat`` wall time (rows are copied outside the timed region)."""
+    best = float("inf")
+    output = b""
+    for _ in range(repeat):
+        batch = copy.deepcopy(rows)
+        started = time.perf_counter()
+        output = func(batch)
+        best = min(best, time.perf_counter() - started)
+    return best, output
+
+
+def main() -> None:
+    """比較逐格 isinstance 轉換與逐欄轉換的序列化耗時."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000, help="result size")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per method (best is kept)")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("查詢結果序列化效能測試")
+    print("=" * 80)
+    print(f"列數: {args.rows:,}, 欄位數: {len(COLUMNS)}, orjson: {ORJSON_AVAILABLE}")
+
+    rows = make_rows(args.rows)
+    legacy_seconds, legacy_output = timed(legacy_serialize, rows, args.repeat)
+    columnar_seconds, columnar_output = timed(columnar_serialize, rows, args.repeat)
+
+    if json.loads(legacy_output) != json.loads(columnar_output):
+        print("[WARN] 兩種方法的輸出內容不一致")
+
+    encoder = "orjson" if ORJSON_AVAILABLE else "json"
+    print(f"\n逐格 isinstance + json : {legacy_seconds * 1000:8.1f} ms")
+    print(f"逐欄轉換 + {encoder:<11}: {columnar_seconds * 1000:8.1f} ms")
+    print(f"加速: {legacy_seconds / columnar_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark the per-token overhead of grammar-constrained decoding."""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import torch
+from transformers import AutoTokenizer
+
+import config
+from src.models.sql_grammar import SQLGrammarLogitsProcessor, build_token_strings, get_sql_grammar
+
+SAMPLE_ANSWERS = [
+    "```sql\nSELECT * FROM tencent_bill WHERE bill_month = '2024-01';",
+    "```sql\nSELECT bill_month, SUM(cost) AS total_cost FROM tencent_bill\n"
+    "GROUP BY bill_month ORDER BY total_cost DESC LIMIT 10;",
+    "```sql\nSELECT t.tencent_id, g.business_code_name FROM tencent_bill AS t\n"
+    "JOIN global_bill AS g ON t.bill_month = g.bill_month WHERE t.cost > 1000;",
+    "```sql\nSELECT product_name, COUNT(*) FROM global_bill_l3\n"
+    "WHERE region IN ('ap-guangzhou', 'ap-shanghai') GROUP BY product_name;",
+]
+
+
+def run_pass(grammar, token_strings, eos_ids, answers_ids, vocab_size) -> tuple[float, int]:
+    """Replay each answer through the processor; return (seconds in processor, steps)."""
+    elapsed = 0.0
+    steps = 0
+    for token_ids in answers_ids:
+        processor = SQLGrammarLogitsProcessor([grammar], token_strings, eos_ids, prompt_length=0)
+        generated = torch.empty((1, 0), dtype=torch.long)
+        for token_id in token_ids:
+            scores = torch.randn(1, vocab_size)
+            scores[0, token_id] = 100.0  # the replayed token is the model's top choice
+            started = time.perf_counter()
+            processor(generated, scores)
+            elapsed += time.perf_counter() - started
+            steps += 1
+            generated = torch.cat([generated, torch.tensor([[token_id]])], dim=1)
+    return elapsed, steps
+
+
+def main() -> None:
+    """量測語法約束解碼每個 token 的額外耗時."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokenizer", default=config.MODEL_NAME, help="HuggingFace tokenizer")
+    parser.add_argument("--passes", type=int, default=3, help="warm passes after the cold one")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("語法約束解碼效能測試")
+    print("=" * 80)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    started = time.perf_counter()
+    token_strings = build_token_strings(tokenizer)
+    print(f"詞表解碼: {len(token_strings)} tokens, {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    grammar = get_sql_grammar(config.FULL_SCHEMA)
+    print(f"Schema 語法編譯: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    answers_ids = [
+        tokenizer(answer, add_special_tokens=False)["input_ids"] for answer in SAMPLE_ANSWERS
+    ]
+    eos_ids = {tokenizer.eos_token_id}
+    vocab_size = len(token_strings)
+
+    elapsed, steps = run_pass(grammar, token_strings, eos_ids, answers_ids, vocab_size)
+    print(f"\n首次 (cold): {elapsed / steps * 1e6:.0f} µs/token ({steps} tokens)")
+    for i in range(args.passes):
+        elapsed, steps = run_pass(grammar, token_strings, eos_ids, answers_ids, vocab_size)
+        print(f"快取 (warm #{i + 1}): {elapsed / steps * 1e6:.0f} µs/token")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark SQLParser.clean_sql against the previous parse-then-format pipeline."""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import sqlparse
+
+from src.utils.sql_parser import SQLParser, _clean
+
+# Typical model outputs: fenced, unterminated, unfenced with prose, CTE.
+OUTPUTS = [
+    "```sql\nSELECT bill_month, SUM(cost) AS total_cost\nFROM tencent_bill\n"
+    "WHERE bill_month >= '2024-01'\nGROUP BY bill_month\nORDER BY bill_month;\n```",
+    "```sql\nSELECT t.tencent_id, g.business_code_name, g.cost FROM tencent_bill t "
+    "JOIN global_bill g ON t.tencent_id = g.tencent_global_account_id "
+    "WHERE g.bill_month = '2024-05' AND g.cost > 100",
+    "根據問題，查詢如下：\nselect product_name, sum(total_cost) from global_bill_l3 "
+    "where bill_month = '2024-03' group by product_name order by 2 desc limit 10;\n說明：...",
+    "```sql\nWITH monthly AS (SELECT bill_month, SUM(total_cost) AS total FROM global_bill_l3 "
+    "GROUP BY bill_month) SELECT bill_month, total, total - LAG(total) OVER (ORDER BY "
+    "bill_month) AS diff FROM monthly ORDER BY bill_month;\n```",
+]
+
+
+def legacy_clean(text: str) -> str:
+    """extract_sql with per-call regexes + sqlparse.parse + sqlparse.format (two tokenizations)."""
+    text = text.strip()
+    match = re.search(r"```sql\s*(.*?)\s*(?:```|\Z)", text, re.DOTALL | re.IGNORECASE)
+    if match:
+        sql = match.group(1).strip()
+    else:
+        match = re.search(r"```\s*(.*?)\s*(?:```|\Z)", text, re.DOTALL)
+        sql = match.group(1).strip() if match else SQLParser.extract_sql(text)
+    parsed = sqlparse.parse(sql)
+    statement_type = parsed[0].get_type() if parsed else None
+    valid = ("SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "DROP", "ALTER")
+    if statement_type is not None and statement_type.upper() in valid:
+        return sqlparse.format(sql, reindent=True, keyword_case="upper")
+    return sql
+
+
+def per_call_us(func, repeat: int) -> float:
+    """Mean microseconds per output over ``repeat`` passes through OUTPUTS."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for output in OUTPUTS:
+            func(output)
+    return (time.perf_counter() - started) / (repeat * len(OUTPUTS)) * 1e6
+
+
+def uncached(output: str) -> str:
+    _clean.cache_clear()
+    return SQLParser.clean_sql(output, formatted=True)
+
+
+def main() -> None:
+    """比較 clean_sql 新舊流程的耗時."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the sample outputs")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("SQLParser.clean_sql 效能測試")
+    print("=" * 80)
+
+    for output in OUTPUTS:
+        if legacy_clean(output) != uncached(output):
+            print("[WARN] 新舊流程輸出不一致:", output[:60])
+
+    results = [
+        ("舊流程 (parse + format)", per_call_us(legacy_clean, args.repeat)),
+        ("單次 tokenize", per_call_us(uncached, args.repeat)),
+        ("不格式化 (formatted=False)", per_call_us(lambda o: _clean(o, False), args.repeat)),
+        ("LRU 快取命中", per_call_us(lambda o: SQLParser.clean_sql(o, True), args.repeat)),
+    ]
+    baseline = results[0][1]
+    for label, micros in results:
+        print(f"{label:<28}: {micros:10.1f} µs/次  ({baseline / micros:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -43,15 +43,14 @@ def main() -> None:
                 print(f"\n資料庫: {db_name}")
                 print("=" * 80)
 
-                DatabaseConnector.execute_query(f"USE {db_name}")
-                tables = DatabaseConnector.execute_query("SHOW TABLES")
+                tables = DatabaseConnector.execute_query(f"SHOW TABLES FROM `{db_name}`")
 
                 if tables:
                     for i, table in enumerate(tables, 1):
                         table_name = list(table.values())[0]
                         try:
                             count_result = DatabaseConnector.execute_query(
-                                f"SELECT COUNT(*) as count FROM {table_name}"
+                                f"SELECT COUNT(*) as count FROM `{db_name}`.`{table_name}`"
                             )
                             count = count_result[0]["count"]
                             print(f"{i}. {table_name} ({count} 筆資料)")
@@ -59,7 +58,7 @@ def main() -> None:
                             show_sample = input(f"   查看 {table_name} 的範例資料？(y/n): ").strip()
                             if show_sample.lower() == "y":
                                 sample = DatabaseConnector.execute_query(
-                                    f"SELECT * FROM {table_name} LIMIT 3"
+                                    f"SELECT * FROM `{db_name}`.`{table_name}` LIMIT 3"
                                 )
                                 print("\n   前 3 筆資料:")
                                 for idx, row in enumerate(sample, 1):
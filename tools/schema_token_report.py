@@ -0,0 +1,72 @@
+"""Compare the prompt token cost of each schema format."""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import config
+from src.schema.serializer import (
+    SCHEMA_FORMATS,
+    estimate_tokens,
+    render_schema,
+    serialize_schema,
+    token_report,
+    tokenizer_counter,
+)
+
+
+def main() -> None:
+    """比較各 schema 格式的 token 數."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokenizer", default=config.MODEL_NAME, help="HuggingFace tokenizer")
+    parser.add_argument(
+        "--estimate", action="store_true", help="use the built-in estimate instead of a tokenizer"
+    )
+    parser.add_argument(
+        "--from-db", action="store_true", help="introspect the live database instead of config"
+    )
+    parser.add_argument("--show", choices=SCHEMA_FORMATS, help="print the schema in this format")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("Schema 格式 token 數比較")
+    print("=" * 80)
+
+    if args.from_db:
+        from src.schema.introspection import load_tables
+
+        schema = serialize_schema(load_tables(), "ddl")
+        formats = [schema_format for schema_format in SCHEMA_FORMATS if schema_format != "original"]
+    else:
+        schema = config.FULL_SCHEMA
+        formats = list(SCHEMA_FORMATS)
+
+    count_tokens = estimate_tokens
+    source = "估算 (estimate)"
+    if not args.estimate:
+        try:
+            from transformers import AutoTokenizer
+
+            count_tokens = tokenizer_counter(AutoTokenizer.from_pretrained(args.tokenizer))
+            source = args.tokenizer
+        except Exception as e:
+            print(f"[WARN] 無法載入 tokenizer，改用估算: {e}")
+
+    report = token_report(schema, count_tokens, formats)
+    baseline = report[formats[0]]
+    print(f"Tokenizer: {source}\n")
+    print(f"{'格式':<12}{'tokens':>10}{'字元數':>10}{'相對':>10}")
+    for schema_format, tokens in report.items():
+        characters = len(render_schema(schema, schema_format))
+        print(f"{schema_format:<12}{tokens:>10}{characters:>10}{tokens / baseline:>10.0%}")
+
+    if args.show:
+        print("\n" + render_schema(schema, args.show))
+
+
+if __name__ == "__main__":
+    main()
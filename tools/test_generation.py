@@ -42,8 +42,7 @@ def show_tables_in_database(database_name: str) -> None:
     print(f"資料庫 '{database_name}' 中的表格:")
     print("=" * 80)
     try:
-        DatabaseConnector.execute_query(f"USE {database_name}")
-        tables = DatabaseConnector.execute_query("SHOW TABLES")
+        tables = DatabaseConnector.execute_query(f"SHOW TABLES FROM `{database_name}`")
         if tables:
             for i, table in enumerate(tables, 1):
                 table_name = list(table.values())[0]
@@ -7,19 +7,64 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import aclosing, asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 
 import config
-from src.models.model_factory import create_model
+from src.cache.generation_cache import get_generation_cache
+from src.cache.semantic_cache import get_semantic_cache
+from src.database import arrow_export
+from src.database.cost_guard import QueryCostError, get_cost_guard
+from src.database.db_connector import DatabaseConnector, StreamLimitError
+from src.models.model_registry import get_model_registry
+from src.models.rate_limiter import rate_limiter_stats
+from src.models.resilience import circuit_breaker_stats
+from src.schema.schema_linker import get_schema_linker
+from src.schema.serializer import prepare_schema
+from src.schema.sql_validator import get_schema_catalog, validate_query
 from src.services.text_to_sql_service import TextToSQLService
+from src.utils.executors import (
+    get_db_executor,
+    get_model_executor,
+    run_in_executor,
+    shutdown_executors,
+)
+from src.utils.result_serializer import ResultSerializer, dumps, serialize_rows
+from src.utils.sql_parser import IncrementalSQLExtractor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Preload configured models and warm the DB pool before serving requests."""
+    if config.MODEL_PRELOAD:
+        await asyncio.to_thread(get_model_registry().preload, config.MODEL_PRELOAD)
+    schema_linker = get_schema_linker()
+    if schema_linker is not None:
+        await asyncio.to_thread(schema_linker.warmup, config.FULL_SCHEMA)
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        await asyncio.to_thread(semantic_cache.warmup)
+    try:
+        await asyncio.to_thread(DatabaseConnector.get_pool().warmup)
+    except Exception as e:
+        print(f"[WARN] 資料庫連線池預熱失敗: {e}")
+    yield
+    if semantic_cache is not None:
+        semantic_cache.flush()
+    DatabaseConnector.reset_pool()
+    shutdown_executors()
+
 
 app = FastAPI(
     title="Text-to-SQL API",
     description="Convert natural language to SQL queries",
     version="1.4.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -29,6 +74,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Row-Limit"],
 )
 
 
@@ -39,6 +85,7 @@ class SQLGenerationRequest(BaseModel):
     provider: str = "local"
     model_id: str | None = None
     stream: bool = True
+    full_results: bool = False  # /api/auto-execute: skip the automatic LIMIT
 
 
 class SQLGenerationResponse(BaseModel):
@@ -50,6 +97,15 @@ class SQLGenerationResponse(BaseModel):
     model_id: str
 
 
+class SQLStreamRequest(BaseModel):
+    """Streaming SQL execution request model."""
+
+    sql: str
+    format: str = "ndjson"  # "ndjson" or "sse"
+    max_rows: int | None = Field(default=None, ge=0)  # Capped at DB_STREAM_MAX_ROWS
+    chunk_size: int | None = Field(default=None, ge=1)
+
+
 class ProviderInfo(BaseModel):
     """Provider information model."""
 
@@ -61,6 +117,25 @@ class ProviderInfo(BaseModel):
     requires_api_key: bool
 
 
+def _classify_db_error(error_msg: str) -> str:
+    """Label an execution error for display."""
+    if "pymysql" in error_msg or "MySQL" in error_msg:
+        return "資料庫錯誤"
+    if "SQL" in error_msg.upper():
+        return "SQL 語法錯誤"
+    return "執行錯誤"
+
+
+async def _load_model(request: SQLGenerationRequest) -> None:
+    """Load the requested model into the registry without blocking the event loop."""
+    await run_in_executor(
+        get_model_executor(),
+        get_model_registry().get,
+        provider=request.provider,
+        model_id=request.model_id,
+    )
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -99,6 +174,14 @@ async def get_providers():
             available=bool(config.GOOGLE_API_KEY),
             requires_api_key=True,
         ),
+        ProviderInfo(
+            id="fallback",
+            name="Fallback (Hedged)",
+            description="依序使用多個 provider，回應過慢時同時送出下一個，採用先完成者",
+            default_model=config.MODEL_FALLBACK_CHAIN,
+            available=True,
+            requires_api_key=False,
+        ),
     ]
     return providers
 
@@ -177,26 +260,44 @@ async def get_schema():
     }
 
 
+def _build_service(model) -> TextToSQLService:
+    """Create a service for a leased model with the shared schema linker and caches."""
+    return TextToSQLService(
+        model,
+        get_schema_linker(),
+        generation_cache=get_generation_cache(),
+        semantic_cache=get_semantic_cache(),
+    )
+
+
 @app.post("/api/generate")
 async def generate_sql(request: SQLGenerationRequest):
     """Generate SQL from natural language query."""
     try:
-        # Create model
-        model = create_model(provider=request.provider, model_id=request.model_id)
-        service = TextToSQLService(model)
+        # Load (or reuse) the shared model instance off the event loop
+        registry = get_model_registry()
+        await _load_model(request)
 
         if request.stream:
             # Streaming response
             async def generate():
-                full_response = []
+                # Generation stops as soon as the SQL statement is complete.
+                extractor = IncrementalSQLExtractor()
                 try:
-                    for token in service.convert_stream(config.FULL_SCHEMA, request.query):
-                        full_response.append(token)
-                        yield f"data: {token}\n\n"
+                    with registry.lease(
+                        provider=request.provider, model_id=request.model_id
+                    ) as model:
+                        service = _build_service(model)
+                        async with aclosing(
+                            service.aconvert_stream(
+                                config.FULL_SCHEMA, request.query, extractor=extractor
+                            )
+                        ) as token_stream:
+                            async for token in token_stream:
+                                yield f"data: {token}\n\n"
 
                     # Send final cleaned SQL
-                    full_sql = "".join(full_response)
-                    cleaned_sql = service.sql_parser.clean_sql(full_sql)
+                    cleaned_sql = service.sql_parser.clean_sql(extractor.finish())
                     yield "data: [DONE]\n\n"
                     yield f"data: {cleaned_sql}\n\n"
                 except Exception as e:
@@ -205,7 +306,9 @@ async def generate_sql(request: SQLGenerationRequest):
             return StreamingResponse(generate(), media_type="text/event-stream")
         else:
             # Non-streaming response
-            cleaned_sql = service.convert(config.FULL_SCHEMA, request.query)
+            with registry.lease(provider=request.provider, model_id=request.model_id) as model:
+                service = _build_service(model)
+                cleaned_sql = await service.aconvert(config.FULL_SCHEMA, request.query)
 
             return SQLGenerationResponse(
                 sql=cleaned_sql,
@@ -219,60 +322,198 @@ async def generate_sql(request: SQLGenerationRequest):
 
 
 @app.post("/api/execute")
-async def execute_sql(request: dict):
-    """Execute SQL query and return results."""
+async def execute_sql(request: dict, http_request: Request):
+    """
+    Execute SQL query and return results.
+
+    Returns JSON by default. Clients whose Accept header ranks
+    ``application/vnd.apache.arrow.stream``, ``application/vnd.apache.arrow.file``
+    or ``application/vnd.apache.parquet`` above JSON get the result as a streamed
+    Arrow IPC stream, Arrow IPC file or Parquet file instead.
+
+    Results are capped at SQL_AUTO_LIMIT_EXECUTE rows unless the body has
+    ``"full_results": true``. JSON is always capped at
+    DB_RESULT_MAX_ROWS/DB_RESULT_MAX_BYTES, and ``truncated`` tells whether rows
+    were left out. Columnar exports are always capped at DB_STREAM_MAX_ROWS; the
+    ``X-Row-Limit`` header gives the cap, and a cut-off export carries
+    ``truncated: "true"`` metadata (see arrow_export.encode_batches). Queries over
+    the EXPLAIN cost budget are rejected with 422 (see SQL_COST_GUARD_ACTION);
+    columnar exports beyond DB_STREAM_MAX_CONCURRENT open streams get 503.
+    """
+    row_limit = 0 if request.get("full_results") else config.SQL_AUTO_LIMIT_EXECUTE
+
+    export_format = arrow_export.negotiate_format(http_request.headers.get("accept"))
+    if export_format is not None:
+        return await _export_columnar(request.get("sql", "").strip(), export_format, row_limit)
+
     try:
         sql = request.get("sql", "").strip()
         if not sql:
             raise HTTPException(status_code=400, detail="SQL 查詢不能為空")
 
-        # Import database connector
-        from src.database.db_connector import DatabaseConnector
-
-        db_connector = DatabaseConnector()
+        # Execute the query and encode the response on the DB executor
+        body = await run_in_executor(get_db_executor(), _execute_to_json, sql, row_limit)
+        return Response(content=body, media_type="application/json")
 
-        # Execute query
-        results = db_connector.execute_query(sql)
+    except QueryCostError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except Exception as e:
+        error_msg = str(e)
+        # Extract more detailed error information
+        error_type = _classify_db_error(error_msg)
+        raise HTTPException(status_code=500, detail=f"{error_type}: {error_msg}") from e
 
-        # Get column names from results
-        columns = list(results[0].keys()) if results else []
 
-        # Convert datetime objects to strings for JSON serialization
-        from datetime import date, datetime
+def _execute_to_json(sql: str, row_limit: int) -> bytes:
+    """Run a query and encode the /api/execute JSON response."""
+    cost_guard = get_cost_guard()
+    if cost_guard is not None:
+        sql = cost_guard.enforce(sql)
+    results, truncated = DatabaseConnector.execute_bounded(sql, row_limit)
 
-        serializable_results = []
-        for row in results:
-            serializable_row = {}
-            for key, value in row.items():
-                if isinstance(value, (date, datetime)):
-                    serializable_row[key] = value.isoformat()
-                elif value is None:
-                    serializable_row[key] = None
-                else:
-                    serializable_row[key] = (
-                        str(value) if not isinstance(value, (int, float, bool, str)) else value
-                    )
-            serializable_results.append(serializable_row)
+    # Get column names from results
+    columns = list(results[0].keys()) if results else []
 
-        return {
+    return dumps(
+        {
             "success": True,
             "columns": columns,
-            "rows": serializable_results,
-            "row_count": len(serializable_results),
+            "rows": serialize_rows(results),
+            "row_count": len(results),
+            "truncated": truncated,
         }
+    )
+
 
+async def _enforce_cost_budget(sql: str) -> str:
+    """Run the EXPLAIN cost guard on a statement; over-budget queries get a 422."""
+    cost_guard = get_cost_guard()
+    if cost_guard is None:
+        return sql
+    try:
+        return await cost_guard.aenforce(sql)
+    except QueryCostError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+
+async def _export_columnar(sql: str, export_format: str, row_limit: int) -> StreamingResponse:
+    """Stream a query result as Arrow IPC or Parquet, up to ``row_limit`` rows (0 = no limit)."""
+    if not sql:
+        raise HTTPException(status_code=400, detail="SQL 查詢不能為空")
+    if not arrow_export.PYARROW_AVAILABLE:
+        raise HTTPException(status_code=406, detail="Arrow/Parquet 匯出需要安裝 pyarrow")
+
+    # Exports have no automatic LIMIT, so expensive plans must not get past here.
+    sql = await _enforce_cost_budget(sql)
+    max_rows = config.DB_CONFIG.stream_max_rows
+    if row_limit:
+        max_rows = min(row_limit, max_rows)
+    data = arrow_export.aexport_query(sql, export_format, max_rows=max_rows)
+    try:
+        # Wait for the first bytes so query errors still get a proper HTTP status.
+        first = await anext(data, b"")
+    except StreamLimitError as e:
+        await data.aclose()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"}) from e
     except Exception as e:
+        await data.aclose()
         error_msg = str(e)
-        # Extract more detailed error information
-        if "pymysql" in error_msg or "MySQL" in error_msg:
-            error_type = "資料庫錯誤"
-        elif "SQL" in error_msg.upper():
-            error_type = "SQL 語法錯誤"
-        else:
-            error_type = "執行錯誤"
+        error_type = _classify_db_error(error_msg)
+        raise HTTPException(status_code=500, detail=f"{error_type}: {error_msg}") from e
 
+    async def body():
+        async with aclosing(data):
+            yield first
+            async for part in data:
+                yield part
+
+    extension = arrow_export.EXTENSIONS[export_format]
+    return StreamingResponse(
+        body(),
+        media_type=arrow_export.MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="result.{extension}"',
+            "X-Row-Limit": str(max_rows),
+        },
+    )
+
+
+@app.post("/api/execute/stream")
+async def execute_sql_stream(request: SQLStreamRequest):
+    """
+    Execute SQL and stream the rows as NDJSON or SSE.
+
+    Events (one JSON object per line, or per ``data:`` frame for SSE):
+    ``{"type": "columns", "columns": [...]}`` first, then
+    ``{"type": "rows", "rows": [...]}`` per chunk, and finally
+    ``{"type": "done", "row_count": n, "truncated": bool}``. An error after the
+    first event is sent as ``{"type": "error", "error": "..."}``. Disconnecting
+    stops the query and closes its connection. Queries over the EXPLAIN cost
+    budget are rejected with 422, and requests beyond DB_STREAM_MAX_CONCURRENT
+    open streams with 503.
+    """
+    sql = request.sql.strip()
+    if not sql:
+        raise HTTPException(status_code=400, detail="SQL 查詢不能為空")
+    if request.format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format 必須是 ndjson 或 sse")
+
+    max_rows = config.DB_CONFIG.stream_max_rows
+    if request.max_rows is not None:
+        max_rows = min(request.max_rows, max_rows)
+
+    sql = await _enforce_cost_budget(sql)
+    chunks = DatabaseConnector.astream_query(sql, request.chunk_size, max_rows)
+    try:
+        # Wait for the header so syntax errors still get a proper HTTP status.
+        header = await anext(chunks)
+    except StreamLimitError as e:
+        await chunks.aclose()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"}) from e
+    except Exception as e:
+        await chunks.aclose()
+        error_msg = str(e)
+        error_type = _classify_db_error(error_msg)
         raise HTTPException(status_code=500, detail=f"{error_type}: {error_msg}") from e
 
+    if request.format == "sse":
+        media_type = "text/event-stream"
+
+        def frame(event: dict) -> bytes:
+            return b"data: " + dumps(event) + b"\n\n"
+
+    else:
+        media_type = "application/x-ndjson"
+
+        def frame(event: dict) -> bytes:
+            return dumps(event) + b"\n"
+
+    serializer = ResultSerializer(header.columns, header.description)
+
+    async def event_stream():
+        async with aclosing(chunks):
+            yield frame({"type": "columns", "columns": header.columns})
+            row_count = 0
+            try:
+                async for chunk in chunks:
+                    if chunk.rows:
+                        row_count += len(chunk.rows)
+                        rows = serializer.convert(chunk.rows)
+                        yield frame({"type": "rows", "rows": rows})
+                    if chunk.done:
+                        yield frame(
+                            {"type": "done", "row_count": row_count, "truncated": chunk.truncated}
+                        )
+            except Exception as e:
+                error_msg = str(e)
+                yield frame(
+                    {"type": "error", "error": f"{_classify_db_error(error_msg)}: {error_msg}"}
+                )
+        if request.format == "sse":
+            yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type=media_type)
+
 
 @app.post("/api/auto-execute")
 async def auto_execute(request: SQLGenerationRequest):
@@ -281,7 +522,6 @@ async def auto_execute(request: SQLGenerationRequest):
 
     from fastapi.responses import StreamingResponse
 
-    from src.database.db_connector import DatabaseConnector
     from src.utils.sql_parser import SQLParser
 
     async def generate_stream():
@@ -289,14 +529,26 @@ async def auto_execute(request: SQLGenerationRequest):
             max_retries = request.dict().get("max_retries", 5)
             db_connector = DatabaseConnector()
             sql_parser = SQLParser()
+            row_limit = 0 if request.full_results else config.SQL_AUTO_LIMIT_AUTO_EXECUTE
+            cost_guard = get_cost_guard()
+
+            async def execute_candidate(sql: str, max_rows: int):
+                # Over-budget candidates fail like execution errors and lose the vote.
+                if cost_guard is not None:
+                    sql = await cost_guard.aenforce(sql)
+                return await DatabaseConnector.aexecute_limited(sql, max_rows)
 
             original_query = request.query
             error_history = []
+            catalog = get_schema_catalog()
 
             # First attempt uses the standard prompt (same as manual generation)
             from src.prompts.text_to_sql_prompt import TextToSQLPrompt
 
-            current_prompt = TextToSQLPrompt.build_prompt(config.FULL_SCHEMA, original_query)
+            schema = prepare_schema(
+                config.FULL_SCHEMA, original_query, get_schema_linker(), config.SCHEMA_FORMAT
+            )
+            current_prompt = TextToSQLPrompt.build_prompt(schema, original_query)
 
             # Send start notification
             start_data = {
@@ -306,60 +558,137 @@ async def auto_execute(request: SQLGenerationRequest):
             }
             yield f"data: {json.dumps(start_data)}\n\n"
 
-            for attempt in range(1, max_retries + 1):
-                try:
-                    # Send generating status
-                    generating_data = {
+            registry = get_model_registry()
+            await _load_model(request)
+            with registry.lease(provider=request.provider, model_id=request.model_id) as model:
+                if config.SELF_CONSISTENCY_ENABLED:
+                    voting_data = {
                         "type": "generating",
-                        "attempt": attempt,
-                        "status": "生成 SQL 中...",
+                        "attempt": 1,
+                        "status": (
+                            f"同時產生 {config.SELF_CONSISTENCY_CANDIDATES} 個候選 SQL "
+                            "並比對執行結果..."
+                        ),
                     }
-                    yield f"data: {json.dumps(generating_data)}\n\n"
-
-                    # Generate SQL using streaming to avoid blocking
-                    model = create_model(provider=request.provider, model_id=request.model_id)
-                    service = TextToSQLService(model)
-
-                    if not model.is_initialized():
-                        model.initialize()
-
-                    # current_prompt is already a complete prompt (built earlier)
-                    prompt = current_prompt
-
-                    # Use threading + queue for non-blocking streaming
-                    import asyncio
-                    import queue
-                    import threading
-
-                    full_response = []
-                    token_count = 0
-
-                    if hasattr(model, "generate_stream"):
-                        # Create queue for token communication
-                        token_queue = queue.Queue()
-
-                        # Function to run in background thread
-                        def generate_in_thread():
-                            try:
-                                for token in model.generate_stream(prompt, max_tokens=512):
-                                    token_queue.put(("token", token))
-                                token_queue.put(("done", None))
-                            except Exception as e:
-                                token_queue.put(("error", str(e)))
-
-                        # Start generation in background thread
-                        gen_thread = threading.Thread(target=generate_in_thread)
-                        gen_thread.start()
-
-                        # Poll queue and yield progress
-                        while True:
-                            try:
-                                msg_type, msg_data = token_queue.get(timeout=0.1)
-
-                                if msg_type == "token":
-                                    full_response.append(msg_data)
+                    yield f"data: {json.dumps(voting_data)}\n\n"
+
+                    consistency = await _build_service(model).aconvert_consistent(
+                        config.FULL_SCHEMA, original_query, execute_candidate
+                    )
+                    candidates_data = {
+                        "type": "candidates",
+                        "sql": consistency.sql,
+                        "votes": consistency.votes,
+                        "candidates": [
+                            {
+                                "sql": candidate.sql,
+                                "temperature": candidate.temperature,
+                                "error": candidate.error,
+                            }
+                            for candidate in consistency.candidates
+                        ],
+                    }
+                    yield f"data: {json.dumps(candidates_data)}\n\n"
+
+                    winner = consistency.winner
+                    if winner is not None:
+                        # Voting read at most SELF_CONSISTENCY_ROW_LIMIT rows.
+                        results, truncated = winner.rows, False
+                        if row_limit and len(results) > row_limit:
+                            results, truncated = results[:row_limit], True
+                        elif winner.truncated:
+                            winner_sql = winner.sql
+                            if cost_guard is not None:
+                                winner_sql = await cost_guard.aenforce(winner_sql)
+                            results, truncated = await db_connector.aexecute_bounded(
+                                winner_sql, row_limit
+                            )
+                        votes = f"{consistency.votes}/{len(consistency.candidates)}"
+                        success_data = {
+                            "type": "success",
+                            "attempt": 1,
+                            "sql": winner.sql,
+                            "status": f"完成（{votes} 票）",
+                            "result": {
+                                "columns": list(results[0].keys()) if results else [],
+                                "rows": serialize_rows(results),
+                                "row_count": len(results),
+                                "truncated": truncated,
+                            },
+                        }
+                        yield f"data: {dumps(success_data).decode()}\n\n"
+                        yield "data: [DONE]\n\n"
+                        return
+
+                    # Every candidate failed: the vote counts as attempt 1 and the
+                    # remaining attempts run one at a time with the distinct errors.
+                    failures = {candidate.sql: candidate for candidate in consistency.candidates}
+                    error_history = [
+                        {"attempt": 1, "sql": candidate.sql, "error": candidate.error}
+                        for candidate in list(failures.values())[:3]
+                    ]
+                    error_data = {
+                        "type": "error",
+                        "attempt": 1,
+                        "sql": error_history[0]["sql"] or "SQL 生成失敗",
+                        "error": "\n".join(record["error"] for record in error_history),
+                        "prompt": current_prompt,
+                        "is_final": max_retries <= 1,
+                    }
+                    yield f"data: {json.dumps(error_data)}\n\n"
+                    if max_retries <= 1:
+                        final_error = {
+                            "type": "final_error",
+                            "message": f"所有候選 SQL 皆執行失敗。最後錯誤: {error_data['error']}",
+                        }
+                        yield f"data: {json.dumps(final_error)}\n\n"
+                        yield "data: [DONE]\n\n"
+                        return
+                    current_prompt = TextToSQLPrompt.build_retry_prompt(
+                        schema, original_query, error_history
+                    )
+                    first_attempt = 2
+                else:
+                    first_attempt = 1
+
+                for attempt in range(first_attempt, max_retries + 1):
+                    try:
+                        # Send generating status
+                        generating_data = {
+                            "type": "generating",
+                            "attempt": attempt,
+                            "status": "生成 SQL 中...",
+                        }
+                        yield f"data: {json.dumps(generating_data)}\n\n"
+
+                        # current_prompt is already a complete prompt (built earlier)
+                        prompt = current_prompt
+
+                        # Stream tokens from a worker thread; leaving this block early
+                        # (client disconnect) stops the generation thread as well.
+                        full_response = []
+                        token_count = 0
+                        extractor = IncrementalSQLExtractor()
+
+                        try:
+                            async with aclosing(
+                                model.agenerate_stream(prompt, max_tokens=512)
+                            ) as token_stream:
+                                async for token in token_stream:
+                                    full_response.append(token)
                                     token_count += 1
 
+                                    # Stop generating once the statement is complete
+                                    if extractor.feed(token) is not None:
+                                        complete_data = {
+                                            "type": "sql_complete",
+                                            "attempt": attempt,
+                                            "sql": extractor.sql,
+                                            "tokens": token_count,
+                                        }
+                                        yield f"data: {json.dumps(complete_data)}\n\n"
+                                        break
+
                                     # Send progress update every 10 tokens
                                     if token_count % 10 == 0:
                                         progress_data = {
@@ -368,136 +697,124 @@ async def auto_execute(request: SQLGenerationRequest):
                                             "status": f"生成 SQL 中... ({token_count} tokens)",
                                         }
                                         yield f"data: {json.dumps(progress_data)}\n\n"
-                                        await asyncio.sleep(0)  # Allow other tasks to run
-
-                                elif msg_type == "done":
-                                    break
-
-                                elif msg_type == "error":
-                                    raise Exception(f"生成失敗: {msg_data}")
-
-                            except queue.Empty:
-                                # Queue is empty, send heartbeat to keep connection alive
-                                await asyncio.sleep(0.1)
-                                continue
-
-                        gen_thread.join(timeout=5)
-
-                    else:
-                        # Fallback to non-streaming
-                        full_response.append(model.generate(prompt, max_tokens=512))
-
-                    raw_sql = "".join(full_response)
-                    cleaned_sql = sql_parser.clean_sql(raw_sql)
-
-                    # Validate SQL before execution
-                    if not cleaned_sql or not cleaned_sql.strip():
-                        raise Exception(
-                            f"SQL 清理失敗，無法提取有效的 SQL。原始輸出: {raw_sql[:200]}"
-                        )
-
-                    # Send generated SQL
-                    generated_data = {
-                        "type": "generated",
-                        "attempt": attempt,
-                        "sql": cleaned_sql,
-                        "raw_sql": raw_sql[:500],  # Include raw for debugging
-                        "status": "SQL 已生成",
-                    }
-                    yield f"data: {json.dumps(generated_data)}\n\n"
-
-                    # Send executing status
-                    executing_data = {
-                        "type": "executing",
-                        "attempt": attempt,
-                        "sql": cleaned_sql,
-                        "status": "執行中...",
-                    }
-                    yield f"data: {json.dumps(executing_data)}\n\n"
-
-                    # Execute SQL
-                    print(f"[DEBUG] Executing SQL: {cleaned_sql}")
-                    results = db_connector.execute_query(cleaned_sql)
-                    print(f"[DEBUG] Query returned {len(results)} rows")
-                    columns = list(results[0].keys()) if results else []
-
-                    # Convert datetime objects to strings for JSON serialization
-                    from datetime import date, datetime
-
-                    serializable_results = []
-                    for row in results:
-                        serializable_row = {}
-                        for key, value in row.items():
-                            if isinstance(value, (date, datetime)):
-                                serializable_row[key] = value.isoformat()
-                            elif value is None:
-                                serializable_row[key] = None
-                            else:
-                                serializable_row[key] = (
-                                    str(value)
-                                    if not isinstance(value, (int, float, bool, str))
-                                    else value
+                        except Exception as e:
+                            raise Exception(f"生成失敗: {e}") from e
+
+                        raw_sql = "".join(full_response)
+                        cleaned_sql = sql_parser.clean_sql(extractor.finish())
+
+                        # Validate SQL before execution
+                        if not cleaned_sql or not cleaned_sql.strip():
+                            raise Exception(
+                                f"SQL 清理失敗，無法提取有效的 SQL。原始輸出: {raw_sql[:200]}"
+                            )
+
+                        # Send generated SQL
+                        generated_data = {
+                            "type": "generated",
+                            "attempt": attempt,
+                            "sql": cleaned_sql,
+                            "raw_sql": raw_sql[:500],  # Include raw for debugging
+                            "status": "SQL 已生成",
+                        }
+                        yield f"data: {json.dumps(generated_data)}\n\n"
+
+                        # Catch unknown columns/aliases and GROUP BY errors without a DB round-trip
+                        if catalog is not None:
+                            issues = validate_query(cleaned_sql, catalog)
+                            if issues:
+                                raise Exception(
+                                    "靜態檢查未通過: " + "; ".join(str(issue) for issue in issues)
                                 )
-                        serializable_results.append(serializable_row)
-
-                    # Success!
-                    success_data = {
-                        "type": "success",
-                        "attempt": attempt,
-                        "sql": cleaned_sql,
-                        "status": "完成",
-                        "result": {
-                            "columns": columns,
-                            "rows": serializable_results,
-                            "row_count": len(serializable_results),
-                        },
-                    }
-                    print(f"[DEBUG] Sending success event: attempt={attempt}, rows={len(results)}")
-                    yield f"data: {json.dumps(success_data)}\n\n"
-                    yield "data: [DONE]\n\n"
-                    return
 
-                except Exception as e:
-                    error_msg = str(e)
-                    current_sql = cleaned_sql if "cleaned_sql" in locals() else "SQL 生成失敗"
+                        # Send executing status
+                        executing_data = {
+                            "type": "executing",
+                            "attempt": attempt,
+                            "sql": cleaned_sql,
+                            "status": "執行中...",
+                        }
+                        yield f"data: {json.dumps(executing_data)}\n\n"
+
+                        # EXPLAIN first: over-budget plans are rejected and the reason
+                        # goes into the retry prompt like any execution error
+                        run_sql = cleaned_sql
+                        if cost_guard is not None:
+                            run_sql = await cost_guard.aenforce(cleaned_sql)
+
+                        # Execute SQL
+                        print(f"[DEBUG] Executing SQL: {run_sql}")
+                        results, truncated = await db_connector.aexecute_bounded(run_sql, row_limit)
+                        print(f"[DEBUG] Query returned {len(results)} rows")
+                        columns = list(results[0].keys()) if results else []
+
+                        # Convert dates/decimals column by column for JSON serialization
+                        serializable_results = serialize_rows(results)
+
+                        # Success!
+                        success_data = {
+                            "type": "success",
+                            "attempt": attempt,
+                            "sql": cleaned_sql,
+                            "status": "完成",
+                            "result": {
+                                "columns": columns,
+                                "rows": serializable_results,
+                                "row_count": len(serializable_results),
+                                "truncated": truncated,
+                            },
+                        }
+                        print(
+                            f"[DEBUG] Sending success event: attempt={attempt}, rows={len(results)}"
+                        )
+                        yield f"data: {dumps(success_data).decode()}\n\n"
+                        yield "data: [DONE]\n\n"
+                        return
 
-                    print(f"[DEBUG] Exception caught: {error_msg}")
-                    print(f"[DEBUG] Current SQL: {current_sql}")
+                    except Exception as e:
+                        error_msg = str(e)
+                        current_sql = cleaned_sql if "cleaned_sql" in locals() else "SQL 生成失敗"
 
-                    # Record error history
-                    error_history.append(
-                        {"attempt": attempt, "sql": current_sql, "error": error_msg}
-                    )
+                        print(f"[DEBUG] Exception caught: {error_msg}")
+                        print(f"[DEBUG] Current SQL: {current_sql}")
 
-                    # Send error update immediately with prompt for debugging
-                    error_data = {
-                        "type": "error",
-                        "attempt": attempt,
-                        "sql": current_sql,
-                        "error": error_msg,
-                        "prompt": prompt,  # Include the actual prompt sent to LLM
-                        "is_final": attempt >= max_retries,
-                    }
-                    print(
-                        f"[DEBUG] Sending error event: attempt={attempt}, error={error_msg[:100]}"
-                    )
-                    yield f"data: {json.dumps(error_data)}\n\n"
+                        # Record error history
+                        error_history.append(
+                            {"attempt": attempt, "sql": current_sql, "error": error_msg}
+                        )
 
-                    # If this is the last attempt, end the stream
-                    if attempt >= max_retries:
-                        final_error = {
-                            "type": "final_error",
-                            "message": f"在 {max_retries} 次嘗試後仍然失敗。最後錯誤: {error_msg}",
+                        # Send error update immediately with prompt for debugging
+                        error_data = {
+                            "type": "error",
+                            "attempt": attempt,
+                            "sql": current_sql,
+                            "error": error_msg,
+                            "prompt": prompt,  # Include the actual prompt sent to LLM
+                            "is_final": attempt >= max_retries,
                         }
-                        yield f"data: {json.dumps(final_error)}\n\n"
-                        yield "data: [DONE]\n\n"
-                        return
-
-                    # Use the same prompt building method as first attempt
-                    # This ensures consistent quality
-                    current_prompt = TextToSQLPrompt.build_retry_prompt(
-                        config.FULL_SCHEMA, original_query, error_history
-                    )
+                        print(
+                            f"[DEBUG] Sending error event: attempt={attempt}, "
+                            f"error={error_msg[:100]}"
+                        )
+                        yield f"data: {json.dumps(error_data)}\n\n"
+
+                        # If this is the last attempt, end the stream
+                        if attempt >= max_retries:
+                            final_error = {
+                                "type": "final_error",
+                                "message": (
+                                    f"在 {max_retries} 次嘗試後仍然失敗。最後錯誤: {error_msg}"
+                                ),
+                            }
+                            yield f"data: {json.dumps(final_error)}\n\n"
+                            yield "data: [DONE]\n\n"
+                            return
+
+                        # Use the same prompt building method as first attempt
+                        # This ensures consistent quality
+                        current_prompt = TextToSQLPrompt.build_retry_prompt(
+                            schema, original_query, error_history
+                        )
 
         except Exception as e:
             error_response = {"type": "fatal_error", "message": str(e)}
@@ -541,12 +858,39 @@ async def get_examples():
     }
 
 
+@app.post("/api/cache/invalidate")
+async def invalidate_result_cache(request: dict):
+    """Drop cached query results for one table, or all of them when no table is given."""
+    table = (request.get("table") or "").strip() or None
+    invalidated = DatabaseConnector.invalidate_cache(table)
+    return {"success": True, "table": table, "invalidated": invalidated}
+
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "version": "1.4.0"}
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Runtime metrics for shared resources."""
+    generation_cache = get_generation_cache()
+    semantic_cache = get_semantic_cache()
+    cost_guard = get_cost_guard()
+    return {
+        "model_registry": get_model_registry().stats(),
+        "db_pool": DatabaseConnector.pool_stats(),
+        "db_streams": DatabaseConnector.stream_stats(),
+        "generation_cache": generation_cache.stats() if generation_cache is not None else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "result_cache": DatabaseConnector.result_cache_stats(),
+        "circuit_breakers": circuit_breaker_stats(),
+        "rate_limiters": rate_limiter_stats(),
+        "cost_guard": cost_guard.stats() if cost_guard is not None else None,
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
 